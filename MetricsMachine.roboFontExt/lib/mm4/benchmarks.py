@@ -0,0 +1,598 @@
+"""
+Timing checks for the kerning and group machinery.
+
+These are not tests. Each benchmark builds a synthetic
+font, times the operation in question and prints a
+short report. Run this file directly to run them all.
+"""
+
+import random
+import time
+import tracemalloc
+
+from defcon import Font
+
+import mm4.objects
+from mm4.tools.patternMatching import searchKerningPairList
+from mm4.tools.glyphSorting import sortBySuffixAndUnicodeCategoryAndUnicodeValue
+from mm4.tools.pairListBuilder import createPairs, iterPairs
+from mm4.tools.feaImport import AbstractFeatureWriter, parseFeatures, extractKerningData
+from mm4.objects.topographyModel import TopographyModel
+from mm4.masterSync import MasterKerningDiff, formatReport
+
+
+def _setupBenchmarkFont(glyphCount=2000, groupSize=10, pairCount=100000, seed=1):
+    """
+    Build a font with glyphCount glyphs that are split into
+    side 1 and side 2 groups of groupSize glyphs and a mix
+    of group, glyph and exception pairs.
+    """
+    randomizer = random.Random(seed)
+    font = Font()
+    glyphNames = ["glyph%05d" % i for i in range(glyphCount)]
+    for glyphName in glyphNames:
+        font.newGlyph(glyphName)
+    groups = {}
+    for i in range(0, glyphCount, groupSize):
+        members = glyphNames[i:i + groupSize]
+        groups["public.kern1.group%05d" % i] = members
+        groups["public.kern2.group%05d" % i] = list(members)
+    font.groups.update(groups)
+    side1Names = glyphNames + [groupName for groupName in groups if groupName.startswith("public.kern1.")]
+    side2Names = glyphNames + [groupName for groupName in groups if groupName.startswith("public.kern2.")]
+    kerning = {}
+    while len(kerning) < pairCount:
+        pair = (randomizer.choice(side1Names), randomizer.choice(side2Names))
+        kerning[pair] = randomizer.randint(-100, 100)
+    font.kerning.update(kerning)
+    return font
+
+
+def _time(function, *args, **kwargs):
+    start = time.time()
+    result = function(*args, **kwargs)
+    return time.time() - start, result
+
+
+def _report(title, rows):
+    print(title)
+    for label, seconds in rows:
+        print("    %-40s %10.6f s" % (label, seconds))
+
+
+# -----------------
+# Glyph Pair Counts
+# -----------------
+
+def benchmarkGlyphCounts(pairCount=100000, edits=1000):
+    """
+    Time the first pair count read, then time single pair
+    edits followed by a pair count read. The edit cost should
+    depend on the size of the groups in the pair, not on the
+    size of the kerning.
+    """
+    font = _setupBenchmarkFont(pairCount=pairCount)
+    mmKerning = font.kerning.metricsMachine
+    glyphNames = sorted(font.keys())
+    randomizer = random.Random(2)
+    coldTime, counts = _time(lambda: mmKerning.getGlyphCounts()[glyphNames[0]])
+
+    def editAndRead():
+        for i in range(edits):
+            side1 = randomizer.choice(glyphNames)
+            side2 = "public.kern2.group%05d" % (randomizer.randrange(0, len(glyphNames), 10))
+            if (side1, side2) in mmKerning:
+                del mmKerning[side1, side2]
+            else:
+                mmKerning[side1, side2] = 10
+            mmKerning.getGlyphCounts()[side1]
+
+    editTime, _ = _time(editAndRead)
+    _report(
+        "Glyph pair counts, %d pairs" % len(font.kerning),
+        [
+            ("first read (index build)", coldTime),
+            ("single pair edit + read (average)", editTime / edits),
+        ]
+    )
+
+
+# --------------
+# Feature Export
+# --------------
+
+def benchmarkFeatureExport(pairCount=50000):
+    """
+    Time a cold subtable break export, an unchanged warm
+    export and a warm export after editing one pair. Only
+    the lookup sections containing the edited pair need to
+    be compiled again in the last case.
+    """
+    font = _setupBenchmarkFont(pairCount=pairCount)
+    mmKerning = font.kerning.metricsMachine
+    coldTime, _ = _time(mmKerning.exportKerningToFeatureText, subtableBreaks=True)
+    warmTime, _ = _time(mmKerning.exportKerningToFeatureText, subtableBreaks=True)
+    pair = sorted(font.kerning.keys())[0]
+    mmKerning[pair] = font.kerning[pair] + 1
+    editTime, _ = _time(mmKerning.exportKerningToFeatureText, subtableBreaks=True)
+    _report(
+        "Subtable break feature export, %d pairs" % len(font.kerning),
+        [
+            ("cold", coldTime),
+            ("warm, no changes", warmTime),
+            ("warm, one pair edited", editTime),
+        ]
+    )
+
+
+def benchmarkAFMExport(glyphCount=2000, groupSize=100, pairCount=60000):
+    """
+    Time an AFM export of a font with large groups and trace
+    its peak memory. The flattened pairs are written as they
+    are made, so the peak does not grow with their number.
+    """
+    import os
+    import shutil
+    import tempfile
+    font = _setupBenchmarkFont(glyphCount=glyphCount, groupSize=groupSize, pairCount=pairCount)
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, "benchmark.afm")
+    tracemalloc.start()
+    exportTime, _ = _time(font.kerning.metricsMachine.exportKerningToAFMFile, path, glyphs=font.keys())
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    with open(path, "r") as f:
+        flatCount = sum(1 for line in f if line.startswith("KPX"))
+    shutil.rmtree(directory)
+    _report(
+        "AFM export, %d flattened pairs, %.1f MB peak" % (flatCount, peak / 1000000.0),
+        [
+            ("export", exportTime),
+        ]
+    )
+
+
+# ----------
+# Exceptions
+# ----------
+
+def benchmarkExceptions(pairCounts=(10000, 50000, 200000)):
+    """
+    Time the exception queries across every pair in fonts of
+    increasing size. The time per pair should stay flat as
+    the kerning grows.
+    """
+    rows = []
+    for pairCount in pairCounts:
+        font = _setupBenchmarkFont(pairCount=pairCount)
+        mmKerning = font.kerning.metricsMachine
+        pairs = list(font.kerning.keys())
+
+        def query():
+            for pair in pairs:
+                mmKerning.getExceptedPairs(pair)
+                mmKerning.getConflictingExceptions(pair)
+
+        queryTime, _ = _time(query)
+        removeTime, _ = _time(mmKerning.removeRedundantExceptions, pairs)
+        rows.append(("%d pairs, queries" % pairCount, queryTime))
+        rows.append(("%d pairs, removeRedundantExceptions" % pairCount, removeTime))
+    _report("Exception analysis", rows)
+
+
+# -----
+# Batch
+# -----
+
+def benchmarkBatch(pairCount=50000, edits=20000):
+    """
+    Time edits made through MMKerning with and without a
+    batch. The batched edits should be no slower.
+    """
+    rows = []
+    for batched in (False, True):
+        font = _setupBenchmarkFont(pairCount=pairCount)
+        mmKerning = font.kerning.metricsMachine
+        randomizer = random.Random(1)
+        pairs = list(font.kerning.keys())
+        pairs = [randomizer.choice(pairs) for i in range(edits)]
+
+        def edit():
+            for pair in pairs:
+                mmKerning[pair] = randomizer.randint(-100, 100)
+
+        def batchEdit():
+            with mmKerning.batch():
+                edit()
+
+        if batched:
+            editTime, _ = _time(batchEdit)
+            rows.append(("%d edits, batched" % edits, editTime))
+        else:
+            editTime, _ = _time(edit)
+            rows.append(("%d edits, unbatched" % edits, editTime))
+    _report("Batch", rows)
+
+
+# ------------
+# Apply Groups
+# ------------
+
+def benchmarkApplyGroups(pairCounts=(10000, 50000)):
+    """
+    Time applyGroups and applyKerning after moving a single
+    glyph from one group to another. Only the super pairs
+    touched by the move are resolved and written back.
+    """
+    rows = []
+    for pairCount in pairCounts:
+        font = _setupBenchmarkFont(pairCount=pairCount)
+        groups = font.groups.metricsMachine.mutableCopy()
+        groups.metricsMachine.addToGroup("public.kern1.group00010", ["glyph00000"])
+        applyTime, _ = _time(groups.metricsMachine.applyGroups)
+        kerningTime, _ = _time(groups.metricsMachine.applyKerning)
+        rows.append(("%d pairs, one glyph moved" % pairCount, applyTime))
+        rows.append(("%d pairs, apply kerning" % pairCount, kerningTime))
+    _report("Apply groups", rows)
+
+
+# -----------
+# Group Moves
+# -----------
+
+def benchmarkGroupMoves(glyphCount=4000, moves=1000):
+    """
+    Time single glyph moves in a mutable copy of the groups.
+    Every move creates a group for the glyph, renames it and
+    removes the group the glyph was moved to before. Each step
+    is followed by the glyph to group lookups that kerning
+    value lookups make. The glyph to group maps are patched
+    by these edits instead of being rebuilt.
+    """
+    font = _setupBenchmarkFont(glyphCount=glyphCount, pairCount=0)
+    glyphNames = sorted(font.keys())
+    groups = font.groups.metricsMachine.mutableCopy()
+    mmGroups = groups.metricsMachine
+    randomizer = random.Random(4)
+
+    def lookup():
+        for glyphName in glyphNames[:20]:
+            mmGroups.getSide1GroupForGlyph(glyphName)
+            mmGroups.getSide2GroupForGlyph(glyphName)
+
+    def move():
+        previousGroupName = None
+        for i in range(moves):
+            glyphName = randomizer.choice(glyphNames)
+            groupName = "public.kern1.moved%d" % i
+            mmGroups.newGroup(groupName)
+            mmGroups.addToGroup(groupName, [glyphName])
+            lookup()
+            mmGroups.renameGroup(groupName, groupName + "_renamed")
+            lookup()
+            if previousGroupName is not None:
+                mmGroups.removeGroup(previousGroupName)
+                lookup()
+            previousGroupName = groupName + "_renamed"
+
+    moveTime, _ = _time(move)
+    font.groups.metricsMachine.cancelEverything()
+    _report(
+        "Group moves, %d glyphs" % glyphCount,
+        [
+            ("move + lookups (average)", moveTime / moves),
+        ]
+    )
+
+
+# ----------------
+# Pattern Matching
+# ----------------
+
+def benchmarkPatternMatching(pairCount=100000):
+    """
+    Time pair list searches as a filter expression is typed
+    one character at a time. Each search should cost about
+    one walk of the pair list no matter how many
+    sub-expressions the text contains.
+    """
+    font = _setupBenchmarkFont(pairCount=pairCount)
+    pairs = list(font.kerning.keys())
+    expressions = [
+        "glyph0001* or [group0002*, exception",
+        "glyph or {glyph0003*} not glyph00031, group0004*]",
+    ]
+    rows = []
+    for expression in expressions:
+        typed = [expression[:i] for i in range(1, len(expression) + 1)]
+
+        def search():
+            for text in typed:
+                searchKerningPairList(text, pairs, font)
+
+        searchTime, _ = _time(search)
+        rows.append(("%r (per keystroke)" % expression[:24], searchTime / len(typed)))
+    _report("Pair list search, %d pairs" % len(pairs), rows)
+
+
+# -------------
+# Glyph Sorting
+# -------------
+
+def benchmarkGlyphSorting(suffixes=("alt", "sc", "ss01", "ss02")):
+    """
+    Time a cold sort of a font with every AGL glyph plus
+    suffixed alternates, a warm sort and a sort after one
+    glyph has been renamed. Only the renamed glyph's sort
+    data has to be built again.
+    """
+    from fontTools.agl import AGL2UV
+    font = Font()
+    for glyphName, uniValue in AGL2UV.items():
+        font.newGlyph(glyphName).unicode = uniValue
+        for suffix in suffixes:
+            font.newGlyph(glyphName + "." + suffix)
+    coldTime, _ = _time(sortBySuffixAndUnicodeCategoryAndUnicodeValue, font, font)
+    warmTime, _ = _time(sortBySuffixAndUnicodeCategoryAndUnicodeValue, font, font)
+    font["A.alt"].name = "A.alt1"
+    editTime, _ = _time(sortBySuffixAndUnicodeCategoryAndUnicodeValue, font, font)
+    _report(
+        "Glyph sorting, %d glyphs" % len(font),
+        [
+            ("cold", coldTime),
+            ("warm, no changes", warmTime),
+            ("warm, one glyph renamed", editTime),
+        ]
+    )
+
+
+# --------------
+# Feature Import
+# --------------
+
+def benchmarkFeatureImport(ruleCount=100000, glyphCount=2000, groupSize=10):
+    """
+    Time parsing a synthetic kern feature with ruleCount
+    pos rules, once with writer callbacks that do nothing
+    and once through the kerning extraction. The parse
+    should grow linearly with the size of the text.
+    """
+    randomizer = random.Random(3)
+    glyphNames = ["glyph%05d" % i for i in range(glyphCount)]
+    side1Names = list(glyphNames)
+    side2Names = list(glyphNames)
+    lines = ["languagesystem DFLT dflt;", ""]
+    for i in range(0, glyphCount, groupSize):
+        members = " ".join(glyphNames[i:i + groupSize])
+        lines.append("@L_group%05d = [%s];" % (i, members))
+        lines.append("@R_group%05d = [%s];" % (i, members))
+        side1Names.append("@L_group%05d" % i)
+        side2Names.append("@R_group%05d" % i)
+    lines.append("")
+    lines.append("feature kern {")
+    pairs = set()
+    while len(pairs) < ruleCount:
+        pairs.add((randomizer.choice(side1Names), randomizer.choice(side2Names)))
+    for side1, side2 in sorted(pairs):
+        lines.append("    pos %s %s %d;" % (side1, side2, randomizer.randint(-100, 100)))
+    lines.append("} kern;")
+    text = "\n".join(lines)
+    parseTime, _ = _time(parseFeatures, AbstractFeatureWriter(), text)
+    extractTime, _ = _time(extractKerningData, text)
+    _report(
+        "Feature import, %d rules, %d characters" % (ruleCount, len(text)),
+        [
+            ("parse", parseTime),
+            ("parse + kerning extraction", extractTime),
+            ("parse, per rule (average)", parseTime / ruleCount),
+        ]
+    )
+
+
+# ----------
+# MMG Groups
+# ----------
+
+def benchmarkMMGGroups(glyphCount=6000, groupSize=4, pairCount=50000, moves=300):
+    """
+    Time writing and reading the MMG text for a font with
+    glyphCount / groupSize groups per side, importing it back
+    into a mutable copy of the groups after moves glyphs have
+    been moved to other groups and importing a file with new
+    group names that replaces all of the groups.
+    """
+    font = _setupBenchmarkFont(glyphCount=glyphCount, groupSize=groupSize, pairCount=pairCount)
+    randomizer = random.Random(7)
+    groups = font.groups.metricsMachine.mutableCopy()
+    glyphNames = sorted(font.keys())
+    side1Groups = sorted(groups.metricsMachine.getSide1Groups())
+    for i in range(moves):
+        groups.metricsMachine.addToGroup(randomizer.choice(side1Groups), [randomizer.choice(glyphNames)], postNotification=False)
+    exportTime, text = _time(groups.metricsMachine._exportGroupsToMMG)
+    font.groups.metricsMachine.cancelEverything()
+    groups = font.groups.metricsMachine.mutableCopy()
+    parseTime, groupNames = _time(groups.metricsMachine._importGroupsFromMMG, text, [], False, False)
+    importTime, _ = _time(groups.metricsMachine._importGroupsFromMMG, text, list(groupNames), False, True)
+    font.groups.metricsMachine.cancelEverything()
+    groups = font.groups.metricsMachine.mutableCopy()
+    conflictsTime, _ = _time(groups.metricsMachine._getConflictsForImportFromMMG, text, list(groupNames), False)
+    font.groups.metricsMachine.cancelEverything()
+    text = text.replace('name="group', 'name="other')
+    groups = font.groups.metricsMachine.mutableCopy()
+    groupNames = groups.metricsMachine._importGroupsFromMMG(text, [], False, False)
+    replaceTime, _ = _time(groups.metricsMachine._importGroupsFromMMG, text, list(groupNames), True, True)
+    font.groups.metricsMachine.cancelEverything()
+    _report(
+        "MMG groups, %d groups" % len(groupNames),
+        [
+            ("export", exportTime),
+            ("parse", parseTime),
+            ("import", importTime),
+            ("conflicts before import", conflictsTime),
+            ("import, clear existing", replaceTime),
+        ]
+    )
+
+
+# ------------------
+# Pair List Building
+# ------------------
+
+def benchmarkPairListBuilder(glyphCounts=(300, 1500)):
+    """
+    Time building group compressed, duplicate free pair lists
+    from glyphCount x glyphCount glyphs. The full list is only
+    built, and the peak memory is only traced, for the smaller
+    glyph counts.
+    """
+    font = _setupBenchmarkFont(pairCount=0)
+    glyphNames = sorted(font.keys())
+    settings = dict(font=font, createFlipped=True, compressGroups=True, avoidDuplicates=True)
+    rows = []
+    for glyphCount in glyphCounts:
+        glyphs = glyphNames[:glyphCount]
+        functions = [("streamed", lambda: sum(1 for pair in iterPairs(glyphs, glyphs, **settings)))]
+        if glyphCount <= 500:
+            functions.append(("full list", lambda: len(createPairs(glyphs, glyphs, **settings))))
+        for label, function in functions:
+            buildTime, count = _time(function)
+            label = "%d x %d, %s" % (glyphCount, glyphCount, label)
+            if glyphCount <= 500:
+                tracemalloc.start()
+                function()
+                label += ", %.1f MB peak" % (tracemalloc.get_traced_memory()[1] / 1000000.0)
+                tracemalloc.stop()
+            rows.append((label, buildTime))
+    _report("Pair list builder", rows)
+
+
+# -----------
+# Auto Groups
+# -----------
+
+def benchmarkAutoGroups(suffixes=("alt", "sc", "ss01", "ss02"), pairCount=20000):
+    """
+    Time following the decomposition in a mutable copy of the
+    groups of a font with the AGL glyphs and suffixed copies.
+    The decomposition bases are cached in the default layer,
+    so the second run only plans and applies the additions.
+    """
+    from fontTools.agl import AGL2UV
+    randomizer = random.Random(6)
+    font = Font()
+    for glyphName, uniValue in AGL2UV.items():
+        if isinstance(uniValue, list):
+            uniValue = uniValue[0]
+        font.newGlyph(glyphName).unicode = uniValue
+        for suffix in suffixes:
+            font.newGlyph(glyphName + "." + suffix)
+    glyphNames = sorted(font.keys())
+    kerning = {}
+    while len(kerning) < pairCount:
+        kerning[randomizer.choice(glyphNames), randomizer.choice(glyphNames)] = randomizer.randint(-100, 100)
+    font.kerning.update(kerning)
+    rows = []
+    for label in ("first run", "cached bases"):
+        groups = font.groups.metricsMachine.mutableCopy()
+        autoGroupsTime, _ = _time(groups.metricsMachine.autoGroups, followDecomposition=True)
+        font.groups.metricsMachine.cancelEverything()
+        rows.append((label, autoGroupsTime))
+    _report("Auto groups, %d glyphs" % len(font), rows)
+
+
+# ------------
+# Master Sync
+# ------------
+
+def benchmarkMasterSync(masterCount=8, pairCount=80000):
+    """
+    Time comparing masterCount masters with pairCount pairs.
+    Every master has a few pairs that the others don't have,
+    different values and a few glyphs in different groups.
+    """
+    base = _setupBenchmarkFont(pairCount=pairCount)
+    fonts = []
+    for master in range(masterCount):
+        randomizer = random.Random(master)
+        font = Font()
+        for glyphName in base.keys():
+            font.newGlyph(glyphName)
+        groups = dict((groupName, list(glyphList)) for groupName, glyphList in base.groups.items())
+        for i in range(20):
+            groupName = randomizer.choice(sorted(groups))
+            if groups[groupName]:
+                groups[groupName].pop()
+        font.groups.update(groups)
+        kerning = {}
+        for pair, value in base.kerning.items():
+            if randomizer.random() < .02:
+                continue
+            kerning[pair] = value + randomizer.randint(-20, 20)
+        font.kerning.update(kerning)
+        fonts.append(font)
+    diffTime, diff = _time(MasterKerningDiff, fonts)
+    planTime, plan = _time(diff.getApplyPlan)
+    reportTime, _ = _time(formatReport, diff, plan)
+    _report(
+        "Master sync, %d masters x %d pairs" % (masterCount, pairCount),
+        [
+            ("diff", diffTime),
+            ("plan", planTime),
+            ("report", reportTime),
+        ]
+    )
+
+
+# ----------
+# Topography
+# ----------
+
+def benchmarkTopography(glyphCount=3000, pairCount=200000, edits=100):
+    """
+    Time loading the topography of glyphCount x glyphCount
+    glyphs, updating it after single pair edits and getting
+    the cells that a 1000 x 1000 portion of the view draws.
+    Only the rows and columns covered by an edited pair are
+    resolved again.
+    """
+    font = _setupBenchmarkFont(glyphCount=glyphCount, pairCount=pairCount)
+    glyphNames = sorted(font.keys())
+    model = TopographyModel(font, glyphNames, glyphNames)
+    loadTime, _ = _time(model.load)
+    pairs = list(font.kerning.keys())
+    randomizer = random.Random(5)
+
+    def edit():
+        for i in range(edits):
+            pair = randomizer.choice(pairs)
+            font.kerning[pair] = randomizer.randint(-100, 100)
+            model.update([pair])
+
+    editTime, _ = _time(edit)
+    cellsTime, _ = _time(model.getCells, 0, 1000, 0, 1000)
+    _report(
+        "Topography, %d x %d glyphs" % (glyphCount, glyphCount),
+        [
+            ("load", loadTime),
+            ("edit + update (average)", editTime / edits),
+            ("cells for 1000 x 1000", cellsTime),
+        ]
+    )
+
+
+if __name__ == "__main__":
+    benchmarkGlyphCounts()
+    benchmarkFeatureExport()
+    benchmarkAFMExport()
+    benchmarkExceptions()
+    benchmarkBatch()
+    benchmarkApplyGroups()
+    benchmarkGroupMoves()
+    benchmarkPatternMatching()
+    benchmarkGlyphSorting()
+    benchmarkFeatureImport()
+    benchmarkMMGGroups()
+    benchmarkPairListBuilder()
+    benchmarkAutoGroups()
+    benchmarkMasterSync()
+    benchmarkTopography()
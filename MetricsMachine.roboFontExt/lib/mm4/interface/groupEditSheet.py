@@ -6,6 +6,7 @@ from ufo2fdk.kernFeatureWriter import side1Prefix, side2Prefix
 from defconAppKit.windows.baseWindow import BaseWindowController
 from defconAppKit.controls.glyphCollectionView import GlyphCollectionView
 from defconAppKit.windows.popUpWindow import InformationPopUpWindow, HUDTextBox, HUDHorizontalLine
+from mm4 import MetricsMachineError
 from mm4.objects.mmGroups import userFriendlyGroupName
 from mm4.interface.views.groupStackView import GroupStackView
 from mm4.tools.patternMatching import searchGlyphList, isValidExpression
@@ -251,6 +252,11 @@ class GroupEditSheet(BaseWindowController):
             progress = self.startProgress("Importing groups...")
             try:
                 groupNames = self.groups.metricsMachine.getAvailableGroupsForImportFromMMG(path)
+            except MetricsMachineError as error:
+                progress.close()
+                progress = None
+                self.showMessage("The file could not be loaded.", str(error))
+                return
             except:
                 progress.close()
                 progress = None
@@ -277,10 +283,21 @@ class GroupEditSheet(BaseWindowController):
             self._forceGlyphCellsToLoad()
             progress.close()
         else:
-            progress = self.startProgress("Importing groups...")
-            self.groups.metricsMachine.importGroupsFromMMG(path, groupNames, clearExisting)
-            self._forceGlyphCellsToLoad()
+            # show the problems before anything is imported
+            progress = self.startProgress("Searching for conflicts...")
+            messages, pairs = self.groups.metricsMachine.getConflictsForImportFromMMG(path, groupNames, clearExisting)
             progress.close()
+            if messages or pairs:
+                from mm4.interface.conflictResolutionSheet import ImportConflictsSheet
+                ImportConflictsSheet(self.w, messages, pairs, lambda: self._importGroups3(groupNames, clearExisting, path))
+            else:
+                self._importGroups3(groupNames, clearExisting, path)
+
+    def _importGroups3(self, groupNames, clearExisting, path):
+        progress = self.startProgress("Importing groups...")
+        self.groups.metricsMachine.importGroupsFromMMG(path, groupNames, clearExisting)
+        self._forceGlyphCellsToLoad()
+        progress.close()
 
     # export
 
@@ -8,7 +8,7 @@ from mm4.tools.patternMatching import searchGlyphList, isValidExpression
 from mm4.interface.formatters import GroupNameFormatter
 from mm4.interface.glyphSortDescriptors import sortGlyphNames
 from mm4.interface.glyphCellItem import MMGlyphCellItem
-from mm4.tools.pairListBuilder import createPairs
+from mm4.tools.pairListBuilder import iterPairs
 
 
 class PairListBuilderSheet(BaseWindowController):
@@ -291,7 +291,7 @@ class PairListBuilderSheet(BaseWindowController):
         side2Glyphs = self.side2CellView.get()
         side2Glyphs = [glyph.name for glyph in side2Glyphs]
 
-        result = createPairs(
+        result = iterPairs(
             side1Glyphs, side2Glyphs,
             font=self.font,
             createFlipped=self.w.compileFlipCheckBox.get(),
@@ -48,12 +48,9 @@ class MMLineView(AppKit.NSView):
             scale = self._scale = self._pointSize / float(font.info.unitsPerEm)
             glyphBuffer = self._glyphBuffer = self._pointSize * .2
             height = (font.info.unitsPerEm * scale) + (glyphBuffer * 2)
-        width = 0
-        previous = None
+        glyphNames = [glyph.name for glyph in self._glyphs]
+        width = sum(font.kerning.metricsMachine.getValues(zip(glyphNames, glyphNames[1:])))
         for glyph in self._glyphs:
-            if previous is not None:
-                width += font.kerning.metricsMachine[previous, glyph.name]
-            previous = glyph.name
             width += glyph.width
         width = (width * scale) + (glyphBuffer * 2)
         self.setFrame_(((0, 0), (width, height)))
@@ -5,6 +5,7 @@ import vanilla
 from defconAppKit.controls.placardScrollView import PlacardPopUpButton
 from defconAppKit.windows.popUpWindow import InformationPopUpWindow, HUDTextBox
 from mm4.objects.mmGroups import userFriendlyGroupName
+from mm4.objects.topographyModel import TopographyModel
 from mm4.interface.colors import *
 from mm4.interface.views.scrollView import MMScrollView, MMBaseView
 from mm4.interface.glyphSortDescriptors import sortGlyphNames
@@ -35,7 +36,8 @@ class MMTopographyView(MMBaseView):
 
         self._selectedPair = None
 
-        self._flatPairs = {}
+        self._model = None
+        self._highlightExceptions = True
 
         self._rowHeight = self._columnWidth = 3
         self._makeGlyphGridImage()
@@ -71,52 +73,8 @@ class MMTopographyView(MMBaseView):
     def positionSubviews(self):
         pass
 
-    def setFlatPairs_(self, pairs):
-        font = self._font
-
-        self._flatPairs = pairs
-
-        self._side1ToPairs = {}
-        self._side2ToPairs = {}
-        self._alphaToPairs = {}
-
-        self._zeroPairs = set()
-        self._negativePairs = set()
-        self._positivePairs = set()
-        self._exceptionPairs = set()
-
-        self._highlightExceptions = True
-
-        for (side1, side2), value in self._flatPairs.items():
-            if side1 not in self._side1ToPairs:
-                self._side1ToPairs[side1] = []
-            self._side1ToPairs[side1].append((side1, side2))
-            if side2 not in self._side2ToPairs:
-                self._side2ToPairs[side2] = []
-            self._side2ToPairs[side2].append((side1, side2))
-            # pair type
-            if "exception" in font.kerning.metricsMachine.getPairType((side1, side2)):
-                self._exceptionPairs.add((side1, side2))
-            # value storage
-            pair = (side1, side2)
-            if value == 0:
-                self._zeroPairs.add(pair)
-                continue
-            if value < 0:
-                self._negativePairs.add(pair)
-            else:
-                self._positivePairs.add(pair)
-            alpha = abs(value)
-            alpha = int(round(alpha * .01, 3) * 100)
-            if alpha > 100:
-                alpha = 100
-            elif alpha < 10:
-                alpha = 10
-            alpha = alpha * .01
-            if alpha not in self._alphaToPairs:
-                self._alphaToPairs[alpha] = set()
-            self._alphaToPairs[alpha].add(pair)
-
+    def setModel_(self, model):
+        self._model = model
         self.setNeedsDisplay_(True)
 
     def setGlyphsSide1_side2_(self, side1, side2):
@@ -360,88 +318,49 @@ class MMTopographyView(MMBaseView):
         AppKit.NSColor.blackColor().set()
         AppKit.NSRectFill(self.bounds())
         # draw the pairs
-        # group the rects
-        negativeRects = {}
-        positiveRects = {}
-        zeroRects = []
-        possibleSide1 = []
-        possibleSide2 = []
-        for side1Index in range(minSide1Index, maxSide1Index):
-            side1 = self._side1Glyphs[side1Index]
-            if side1 not in self._side1ToPairs:
-                continue
-            possibleSide1.extend(self._side1ToPairs[side1])
-        for side2Index in range(minSide2Index, maxSide2Index):
-            side2 = self._side2Glyphs[side2Index]
-            if side2 not in self._side2ToPairs:
-                continue
-            possibleSide2.extend(self._side2ToPairs[side2])
-        inView = set(possibleSide1) & set(possibleSide2)
-        zero = self._zeroPairs & inView
-        negative = self._negativePairs & inView
-        positive = self._positivePairs & inView
-        exceptions = self._exceptionPairs & inView
-        pairRects = {}
-        for side1, side2 in zero:
-            side1Index = self._side1GlyphToIndex[side1]
-            side2Index = self._side2GlyphToIndex[side2]
-            x = blockSize * side2Index
-            y = blockSize * side1Index
-            r = ((x, y), (blockSize, blockSize))
-            zeroRects.append(r)
-            pairRects[side1, side2] = r
-        for alpha, pairs in self._alphaToPairs.items():
-            negativeRects[alpha] = []
-            for side1, side2 in negative & pairs:
-                side1Index = self._side1GlyphToIndex[side1]
-                side2Index = self._side2GlyphToIndex[side2]
-                x = blockSize * side2Index
-                y = blockSize * side1Index
-                r = ((x, y), (blockSize, blockSize))
-                negativeRects[alpha].append(r)
-                pairRects[side1, side2] = r
-            if not negativeRects[alpha]:
-                del negativeRects[alpha]
-            positiveRects[alpha] = []
-            for side1, side2 in positive & pairs:
-                side1Index = self._side1GlyphToIndex[side1]
-                side2Index = self._side2GlyphToIndex[side2]
-                x = blockSize * side2Index
-                y = blockSize * side1Index
-                r = ((x, y), (blockSize, blockSize))
-                positiveRects[alpha].append(r)
-                pairRects[side1, side2] = r
-            if not positiveRects[alpha]:
-                del positiveRects[alpha]
-        # fill the rects
-        for alpha, rectList in negativeRects.items():
-            AppKit.NSColor.colorWithCalibratedRed_green_blue_alpha_(1, 0, 0, alpha).set()
-            AppKit.NSRectFillListUsingOperation(rectList, len(rectList), AppKit.NSCompositeSourceOver)
-        for alpha, rectList in positiveRects.items():
-            AppKit.NSColor.colorWithCalibratedRed_green_blue_alpha_(0, 1, 0, alpha).set()
-            AppKit.NSRectFillListUsingOperation(rectList, len(rectList), AppKit.NSCompositeSourceOver)
-        if zeroRects:
-            AppKit.NSColor.yellowColor().set()
-            AppKit.NSRectFillListUsingOperation(zeroRects, len(zeroRects), AppKit.NSCompositeSourceOver)
-        if exceptions:
-            sizes = {
-                1: 0,
-                2: 0,
-                3: 1,
-                4: 2,
-                5: 3,
-                6: 4,
-                7: 3,
-                8: 4,
-                9: 3,
-                10: 4
-            }
-            exceptionRectSize = sizes[self._columnWidth]
-            if exceptionRectSize:
-                exceptionRectOffset = (self._columnWidth - exceptionRectSize) / 2
-                exceptionRects = [((pairRects[pair][0][0] + exceptionRectOffset, pairRects[pair][0][1] + exceptionRectOffset), (exceptionRectSize, exceptionRectSize)) for pair in exceptions]
-                topographyViewExceptionColor.set()
-                AppKit.NSRectFillListUsingOperation(exceptionRects, len(exceptionRects), AppKit.NSCompositeSourceOver)
+        if self._model is not None:
+            cells = self._model.getCells(max(minSide1Index, 0), maxSide1Index, max(minSide2Index, 0), maxSide2Index)
+
+            def cellRect(cell):
+                side1Index, side2Index = cell
+                return ((blockSize * side2Index, blockSize * side1Index), (blockSize, blockSize))
+
+            # fill the rects
+            for alpha, cellList in cells["negative"].items():
+                rectList = [cellRect(cell) for cell in cellList]
+                AppKit.NSColor.colorWithCalibratedRed_green_blue_alpha_(1, 0, 0, alpha).set()
+                AppKit.NSRectFillListUsingOperation(rectList, len(rectList), AppKit.NSCompositeSourceOver)
+            for alpha, cellList in cells["positive"].items():
+                rectList = [cellRect(cell) for cell in cellList]
+                AppKit.NSColor.colorWithCalibratedRed_green_blue_alpha_(0, 1, 0, alpha).set()
+                AppKit.NSRectFillListUsingOperation(rectList, len(rectList), AppKit.NSCompositeSourceOver)
+            zeroRects = [cellRect(cell) for cell in cells["zero"]]
+            if zeroRects:
+                AppKit.NSColor.yellowColor().set()
+                AppKit.NSRectFillListUsingOperation(zeroRects, len(zeroRects), AppKit.NSCompositeSourceOver)
+            exceptions = cells["exceptions"]
+            if exceptions:
+                sizes = {
+                    1: 0,
+                    2: 0,
+                    3: 1,
+                    4: 2,
+                    5: 3,
+                    6: 4,
+                    7: 3,
+                    8: 4,
+                    9: 3,
+                    10: 4
+                }
+                exceptionRectSize = sizes[self._columnWidth]
+                if exceptionRectSize:
+                    exceptionRectOffset = (self._columnWidth - exceptionRectSize) / 2
+                    exceptionRects = []
+                    for cell in exceptions:
+                        (x, y), _ = cellRect(cell)
+                        exceptionRects.append(((x + exceptionRectOffset, y + exceptionRectOffset), (exceptionRectSize, exceptionRectSize)))
+                    topographyViewExceptionColor.set()
+                    AppKit.NSRectFillListUsingOperation(exceptionRects, len(exceptionRects), AppKit.NSCompositeSourceOver)
         # draw the glyph grid lines
         size = self._glyphGridPatternImage.size()
         xCount = int(width / size[0]) + 1
@@ -528,7 +447,9 @@ class MMTopographyView(MMBaseView):
                         if "." in side2:
                             _side2Suffix = side2.split(".", 1)[1]
                         suffix = (_side1Suffix, _side2Suffix)
-                        value = self._flatPairs.get(pair, 0)
+                        value = 0
+                        if self._model is not None:
+                            value = self._model.getValue(side1, side2)
                         detailPopUp.set(category, script, suffix, pair, (side1Group, side2Group), value)
                         detailPopUp.setPosition((detailX, detailY))
                         self._selectedPair = pair
@@ -723,6 +644,7 @@ class TopographyView(MMScrollView):
 
         font.kerning.addObserver(self, "_kerningChanged", "Kerning.PairSet")
         font.kerning.addObserver(self, "_kerningChanged", "Kerning.PairDeleted")
+        font.kerning.addObserver(self, "_kerningBatchChanged", "MMKerning.BatchChanged")
         addObserver(self, "updateBackgroundColor", "appearanceChanged")
 
         glyphNames = sortGlyphNames(font)
@@ -733,6 +655,9 @@ class TopographyView(MMScrollView):
         super(TopographyView, self).__init__(posSize, MMBaseView.alloc().init(),
             autohidesScrollers=False, backgroundColor=AppKit.NSColor.grayColor())
         self._loadView()
+        # the model has registered the glyph to group maps with
+        # the groups by now, so they are reset before this is called.
+        font.groups.addObserver(self, "_groupsChanged", "Groups.Changed")
 
         if self.showPlacard:
             placardW = 55
@@ -761,18 +686,22 @@ class TopographyView(MMScrollView):
         if self._font is not None:
             self._font.kerning.removeObserver(self, "Kerning.PairSet")
             self._font.kerning.removeObserver(self, "Kerning.PairDeleted")
+            self._font.kerning.removeObserver(self, "MMKerning.BatchChanged")
+            self._font.groups.removeObserver(self, "Groups.Changed")
         removeObserver(self, "appearanceChanged")
         self._selectionCallback = None
         self._font = None
         self._topographyView = None
+        self._model = None
         self._placard = None
 
     def _loadView(self):
-        self._flatPairs = self._font.kerning.metricsMachine.getFlatKerning()
+        self._model = TopographyModel(self._font, self._allGlyphNames, self._allGlyphNames)
+        self._model.load()
         self._topographyView = self.topographyViewClass.alloc().initWithFont_(self._font)
         self._topographyView.setGlyphsSide1_side2_(self._allGlyphNames, self._allGlyphNames)
         self._topographyView.vanillaWrapper = weakref.ref(self)
-        self._topographyView.setFlatPairs_(self._flatPairs)
+        self._topographyView.setModel_(self._model)
         self._nsObject.setDocumentView_(self._topographyView)
 
     def _placardSelection(self, sender):
@@ -786,12 +715,17 @@ class TopographyView(MMScrollView):
             self._selectionCallback(self)
 
     def _kerningChanged(self, notification):
-        pairs = {}
-        pair = notification.data["key"]
-        pairs[pair] = self._font.kerning.metricsMachine[pair]
-        newFlatPairs = self._font.kerning.metricsMachine.getFlatKerning(pairs)
-        self._flatPairs.update(newFlatPairs)
-        self._topographyView.setFlatPairs_(self._flatPairs)
+        self._model.update([notification.data["key"]])
+        self._topographyView.setNeedsDisplay_(True)
+
+    def _kerningBatchChanged(self, notification):
+        self._model.update(notification.data["pairs"])
+        self._topographyView.setNeedsDisplay_(True)
+
+    def _groupsChanged(self, notification):
+        self._model.setGlyphs(self._allGlyphNames, self._allGlyphNames)
+        self._model.load()
+        self._topographyView.setNeedsDisplay_(True)
 
     # ------------
     # external API
@@ -0,0 +1,509 @@
+"""
+Compare and synchronize the kerning of several masters.
+
+The groups and kerning of every master are loaded once and
+compared in a pair x master value matrix. The comparison can
+be printed as a report and turned into a plan that makes the
+kerning of the masters interpolation compatible:
+
+    python -m mm4.masterSync --reference 0 Light.ufo Regular.ufo Bold.ufo
+
+In the plan the kerning groups of every master are set to the
+kerning groups of the reference master and every pair that is
+missing in a master is added with the value that the master
+already applies to the pair. The kerning of a master does not
+change unless its groups had to be changed.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy
+
+from ufo2fdk.kernFeatureWriter import side1Prefix, side2Prefix
+
+
+# ----
+# Diff
+# ----
+
+def _getMasterName(font, index):
+    path = getattr(font, "path", None)
+    if path:
+        return os.path.splitext(os.path.basename(path))[0]
+    return "Master %d" % (index + 1)
+
+
+def _getKerningGroups(font, prefix):
+    groups = {}
+    for groupName, glyphList in font.groups.items():
+        if groupName.startswith(prefix):
+            groups[groupName] = list(glyphList)
+    return groups
+
+
+class MasterKerningDiff(object):
+
+    """
+    A comparison of the groups and kerning of several fonts.
+
+    - pairs: the pairs that are in any of the fonts.
+    - values: a pair x master float array with the values of
+      the pairs. NaN means that the pair is not in the master.
+    - present: a pair x master bool array.
+    - side1Glyphs, side2Glyphs: the glyphs that are in a group.
+    - side1Membership, side2Membership: glyph x master int arrays
+      with the index of the group, in side1Groups or side2Groups,
+      that the glyph is in. -1 means that it is not in a group.
+
+    >>> fonts = _setupTestFonts()
+    >>> diff = MasterKerningDiff(fonts)
+    >>> diff.names
+    ['Master 1', 'Master 2', 'Master 3']
+    >>> sorted(diff.getPartialPairs())
+    [('A', 'V'), ('T', 'O'), ('public.kern1.A', 'public.kern2.O')]
+    >>> diff.getMissingPairs(2)
+    [('A', 'V'), ('public.kern1.A', 'public.kern2.O')]
+    >>> diff.getValueRange(("public.kern1.A", "public.kern2.V"))
+    (-100.0, -60.0)
+    >>> diff.getGroupMismatches()
+    [('side 2', 'O', ['public.kern2.O', None, 'public.kern2.O']), ('side 2', 'Oacute', ['public.kern2.O', None, None])]
+    >>> diff.getMissingGroups()
+    [('public.kern2.O', [1])]
+    """
+
+    def __init__(self, fonts, names=None):
+        self.fonts = list(fonts)
+        if names is None:
+            names = [_getMasterName(font, index) for index, font in enumerate(self.fonts)]
+        self.names = list(names)
+        self._loadGroups()
+        self._loadKerning()
+
+    def _loadGroups(self):
+        masterCount = len(self.fonts)
+        self.side1Groups = []
+        self.side2Groups = []
+        self.side1Glyphs = []
+        self.side2Glyphs = []
+        self._masterGroups = []
+        for font in self.fonts:
+            self._masterGroups.append((_getKerningGroups(font, side1Prefix), _getKerningGroups(font, side2Prefix)))
+        for side, groupNames, glyphNames in ((0, self.side1Groups, self.side1Glyphs), (1, self.side2Groups, self.side2Glyphs)):
+            allGroups = set()
+            allGlyphs = set()
+            for groups in self._masterGroups:
+                allGroups.update(groups[side].keys())
+                for glyphList in groups[side].values():
+                    allGlyphs.update(glyphList)
+            groupNames.extend(sorted(allGroups))
+            glyphNames.extend(sorted(allGlyphs))
+        self.side1Membership = self._makeMembership(0, self.side1Groups, self.side1Glyphs)
+        self.side2Membership = self._makeMembership(1, self.side2Groups, self.side2Glyphs)
+        self.groupPresence = numpy.zeros((len(self.side1Groups) + len(self.side2Groups), masterCount), dtype=bool)
+        allGroupNames = self.side1Groups + self.side2Groups
+        for master, groups in enumerate(self._masterGroups):
+            for groupIndex, groupName in enumerate(allGroupNames):
+                if groupName in groups[0] or groupName in groups[1]:
+                    self.groupPresence[groupIndex, master] = True
+
+    def _makeMembership(self, side, groupNames, glyphNames):
+        groupIndexes = dict((groupName, index) for index, groupName in enumerate(groupNames))
+        glyphIndexes = dict((glyphName, index) for index, glyphName in enumerate(glyphNames))
+        membership = numpy.full((len(glyphNames), len(self.fonts)), -1, dtype=numpy.int32)
+        for master, groups in enumerate(self._masterGroups):
+            for groupName, glyphList in groups[side].items():
+                groupIndex = groupIndexes[groupName]
+                for glyphName in glyphList:
+                    membership[glyphIndexes[glyphName], master] = groupIndex
+        return membership
+
+    def _loadKerning(self):
+        masterCount = len(self.fonts)
+        pairIndexes = self._pairIndexes = {}
+        masterPairs = []
+        for font in self.fonts:
+            items = list(font.kerning.items())
+            count = len(items)
+            indexes = numpy.fromiter((pairIndexes.setdefault(pair, len(pairIndexes)) for pair, value in items), dtype=numpy.intp, count=count)
+            values = numpy.fromiter((value for pair, value in items), dtype=numpy.float64, count=count)
+            masterPairs.append((indexes, values))
+        self.pairs = [None] * len(pairIndexes)
+        for pair, index in pairIndexes.items():
+            self.pairs[index] = pair
+        self.values = numpy.full((len(self.pairs), masterCount), numpy.nan, dtype=numpy.float64)
+        for master, (indexes, values) in enumerate(masterPairs):
+            self.values[indexes, master] = values
+        self.present = ~numpy.isnan(self.values)
+        self.presenceCounts = self.present.sum(axis=1)
+        if len(self.pairs):
+            self.minimums = numpy.nanmin(self.values, axis=1)
+            self.maximums = numpy.nanmax(self.values, axis=1)
+        else:
+            self.minimums = self.maximums = numpy.zeros(0, dtype=numpy.float64)
+
+    # pairs
+
+    def getPartialPairs(self):
+        """
+        Get the pairs that are not in all of the masters.
+        """
+        indexes = numpy.flatnonzero(self.presenceCounts < len(self.fonts))
+        return [self.pairs[index] for index in indexes.tolist()]
+
+    def getMissingPairs(self, master):
+        """
+        Get the pairs that are in other masters but not
+        in the master with the given index.
+        """
+        indexes = numpy.flatnonzero(~self.present[:, master])
+        return sorted(self.pairs[index] for index in indexes.tolist())
+
+    def getValueRange(self, pair):
+        """
+        Get the smallest and largest value of the pair
+        in the masters that have the pair.
+        """
+        index = self._pairIndexes[pair]
+        return float(self.minimums[index]), float(self.maximums[index])
+
+    def getDeltas(self, reference=0):
+        """
+        Get a pair x master array of the differences between the
+        values and the values in the reference master. NaN means
+        that the pair is not in the master or in the reference.
+        """
+        return self.values - self.values[:, [reference]]
+
+    def getLargestSpreads(self, count=10):
+        """
+        Get (pair, minimum, maximum) for the count pairs with
+        the largest difference between their values.
+        """
+        spreads = self.maximums - self.minimums
+        indexes = numpy.argsort(-spreads, kind="stable")[:count]
+        return [(self.pairs[index], float(self.minimums[index]), float(self.maximums[index])) for index in indexes.tolist() if spreads[index] > 0]
+
+    # groups
+
+    def getGroupMismatches(self):
+        """
+        Get (side, glyph name, group names) for the glyphs that
+        are not in the same group in every master. The group
+        names are listed in master order, None means that the
+        glyph is not in a group.
+        """
+        mismatches = []
+        for side, groupNames, glyphNames, membership in (
+                ("side 1", self.side1Groups, self.side1Glyphs, self.side1Membership),
+                ("side 2", self.side2Groups, self.side2Glyphs, self.side2Membership)
+            ):
+            rows = numpy.flatnonzero((membership != membership[:, :1]).any(axis=1))
+            for row in rows.tolist():
+                names = [groupNames[index] if index >= 0 else None for index in membership[row].tolist()]
+                mismatches.append((side, glyphNames[row], names))
+        return mismatches
+
+    def getMissingGroups(self):
+        """
+        Get (group name, master indexes) for the groups that
+        are missing in some of the masters.
+        """
+        allGroupNames = self.side1Groups + self.side2Groups
+        missing = []
+        for index in numpy.flatnonzero(~self.groupPresence.all(axis=1)).tolist():
+            masters = numpy.flatnonzero(~self.groupPresence[index]).tolist()
+            missing.append((allGroupNames[index], masters))
+        return missing
+
+    # plan
+
+    def getApplyPlan(self, reference=0):
+        """
+        Get the changes that make the kerning of the masters
+        compatible. A list with a dict for every master is
+        returned. Each dict has:
+
+        - groups: a group name : glyph list dict of the kerning
+          groups that have to be changed. Groups that are not in
+          the reference master are kept, without the glyphs that
+          are in a group of the reference master.
+        - kerning: a pair : value dict of the pairs that have to
+          be added.
+        - blocked: the pairs that can't be added because they
+          reference a group that is not in the reference master.
+
+        >>> fonts = _setupTestFonts()
+        >>> diff = MasterKerningDiff(fonts)
+        >>> plan = diff.getApplyPlan(reference=0)
+        >>> plan[0]
+        {'groups': {}, 'kerning': {('T', 'O'): 0}, 'blocked': []}
+        >>> plan[1]["groups"], sorted(plan[1]["kerning"].items())
+        ({'public.kern2.O': ['O', 'Oacute']}, [(('public.kern1.A', 'public.kern2.O'), 0)])
+        >>> plan[2]["groups"], sorted(plan[2]["kerning"].items())
+        ({'public.kern2.O': ['O', 'Oacute']}, [(('A', 'V'), -60), (('public.kern1.A', 'public.kern2.O'), 0)])
+        """
+        referenceGroups = self._masterGroups[reference]
+        plan = []
+        for master, font in enumerate(self.fonts):
+            masterPlan = dict(groups={}, kerning={}, blocked=[])
+            plan.append(masterPlan)
+            # groups
+            syncedGroups = []
+            for side in (0, 1):
+                masterGroups = self._masterGroups[master][side]
+                groups = {}
+                grouped = set()
+                for groupName, glyphList in referenceGroups[side].items():
+                    glyphList = [glyphName for glyphName in glyphList if glyphName in font]
+                    groups[groupName] = glyphList
+                    grouped.update(glyphList)
+                for groupName, glyphList in masterGroups.items():
+                    if groupName not in groups:
+                        groups[groupName] = [glyphName for glyphName in glyphList if glyphName not in grouped]
+                for groupName, glyphList in groups.items():
+                    if groupName not in masterGroups or set(glyphList) != set(masterGroups[groupName]):
+                        masterPlan["groups"][groupName] = glyphList
+                syncedGroups.append(groups)
+            glyphToSide1Group = {}
+            for groupName, glyphList in syncedGroups[0].items():
+                for glyphName in glyphList:
+                    glyphToSide1Group[glyphName] = groupName
+            glyphToSide2Group = {}
+            for groupName, glyphList in syncedGroups[1].items():
+                for glyphName in glyphList:
+                    glyphToSide2Group[glyphName] = groupName
+            # kerning
+            kerning = font.kerning
+            for index in numpy.flatnonzero(~self.present[:, master]).tolist():
+                pair = side1, side2 = self.pairs[index]
+                if side1.startswith(side1Prefix) and side1 not in referenceGroups[0]:
+                    masterPlan["blocked"].append(pair)
+                    continue
+                if side2.startswith(side2Prefix) and side2 not in referenceGroups[1]:
+                    masterPlan["blocked"].append(pair)
+                    continue
+                if not side1.startswith(side1Prefix) and side1 not in font:
+                    continue
+                if not side2.startswith(side2Prefix) and side2 not in font:
+                    continue
+                # use the value that the master applies
+                # to the pair. the lookup order is the
+                # one used for flattening the kerning.
+                side1Group = side1
+                if not side1.startswith(side1Prefix):
+                    side1Group = glyphToSide1Group.get(side1)
+                side2Group = side2
+                if not side2.startswith(side2Prefix):
+                    side2Group = glyphToSide2Group.get(side2)
+                value = 0
+                for otherPair in ((side1, side2Group), (side1Group, side2), (side1Group, side2Group)):
+                    if None in otherPair or otherPair == pair:
+                        continue
+                    if otherPair in kerning:
+                        value = kerning[otherPair]
+                        break
+                masterPlan["kerning"][pair] = value
+            masterPlan["blocked"].sort()
+        return plan
+
+
+def applyPlan(fonts, plan):
+    """
+    Apply a plan made by MasterKerningDiff.getApplyPlan to the
+    fonts. The kerning of each font is changed in one batch.
+
+    >>> fonts = _setupTestFonts()
+    >>> applyPlan(fonts, MasterKerningDiff(fonts).getApplyPlan())
+    >>> diff = MasterKerningDiff(fonts)
+    >>> diff.getPartialPairs(), diff.getGroupMismatches(), diff.getMissingGroups()
+    ([], [], [])
+    """
+    for font, masterPlan in zip(fonts, plan):
+        mmKerning = font.kerning.metricsMachine
+        with mmKerning.batch(note="Synchronize Masters"):
+            if masterPlan["groups"]:
+                font.groups.metricsMachine.update(masterPlan["groups"])
+            if masterPlan["kerning"]:
+                mmKerning.update(masterPlan["kerning"])
+
+
+# ------
+# Report
+# ------
+
+def formatReport(diff, plan=None, limit=10):
+    """
+    >>> fonts = _setupTestFonts()
+    >>> diff = MasterKerningDiff(fonts)
+    >>> print(formatReport(diff, diff.getApplyPlan()))
+    3 masters, 5 pairs
+    <BLANKLINE>
+    Pairs missing in some masters: 3
+        Master 1    1 missing
+        Master 2    1 missing
+        Master 3    2 missing
+    <BLANKLINE>
+    Groups missing in some masters: 1
+        public.kern2.O    missing in Master 2
+    <BLANKLINE>
+    Glyphs in different groups: 2
+        side 2 O    public.kern2.O, -, public.kern2.O
+        side 2 Oacute    public.kern2.O, -, -
+    <BLANKLINE>
+    Largest value differences:
+        public.kern1.A public.kern2.V    -100 .. -60
+        A V    -80 .. -70
+        T O    -40 .. -30
+    <BLANKLINE>
+    Plan:
+        Master 1    0 group changes    1 pairs added    0 blocked
+        Master 2    1 group changes    1 pairs added    0 blocked
+        Master 3    1 group changes    2 pairs added    0 blocked
+    """
+    names = diff.names
+    width = max([len(name) for name in names] + [0]) + 4
+    lines = ["%d masters, %d pairs" % (len(names), len(diff.pairs))]
+    # pairs
+    lines.append("")
+    lines.append("Pairs missing in some masters: %d" % len(diff.getPartialPairs()))
+    missingCounts = (~diff.present).sum(axis=0).tolist()
+    for name, count in zip(names, missingCounts):
+        lines.append("    %s%d missing" % (name.ljust(width), count))
+    # groups
+    missingGroups = diff.getMissingGroups()
+    if missingGroups:
+        lines.append("")
+        lines.append("Groups missing in some masters: %d" % len(missingGroups))
+        for groupName, masters in missingGroups[:limit]:
+            lines.append("    %s    missing in %s" % (groupName, ", ".join([names[master] for master in masters])))
+    mismatches = diff.getGroupMismatches()
+    if mismatches:
+        lines.append("")
+        lines.append("Glyphs in different groups: %d" % len(mismatches))
+        for side, glyphName, groupNames in mismatches[:limit]:
+            lines.append("    %s %s    %s" % (side, glyphName, ", ".join([groupName or "-" for groupName in groupNames])))
+    # values
+    spreads = diff.getLargestSpreads(limit)
+    if spreads:
+        lines.append("")
+        lines.append("Largest value differences:")
+        for (side1, side2), minimum, maximum in spreads:
+            lines.append("    %s %s    %s .. %s" % (side1, side2, _formatValue(minimum), _formatValue(maximum)))
+    # plan
+    if plan is not None:
+        lines.append("")
+        lines.append("Plan:")
+        for name, masterPlan in zip(names, plan):
+            lines.append("    %s%d group changes    %d pairs added    %d blocked" % (name.ljust(width), len(masterPlan["groups"]), len(masterPlan["kerning"]), len(masterPlan["blocked"])))
+    return "\n".join(lines)
+
+
+def _formatValue(value):
+    if value == int(value):
+        return "%d" % value
+    return "%s" % value
+
+
+def writePlan(path, diff, plan):
+    """
+    Write a plan to a JSON file. Pairs are written as
+    [side1, side2, value] lists.
+    """
+    data = []
+    for name, masterPlan in zip(diff.names, plan):
+        data.append(dict(
+            name=name,
+            groups=masterPlan["groups"],
+            kerning=[[side1, side2, value] for (side1, side2), value in sorted(masterPlan["kerning"].items())],
+            blocked=[list(pair) for pair in masterPlan["blocked"]]
+        ))
+    with open(path, "w") as f:
+        json.dump(data, f, indent=1, sort_keys=True)
+
+
+# ----
+# Main
+# ----
+
+def main(args=None):
+    parser = argparse.ArgumentParser(prog="mm4.masterSync", description="Compare the kerning of masters and make it interpolation compatible.")
+    parser.add_argument("fonts", nargs="+", help="UFO paths")
+    parser.add_argument("--reference", type=int, default=0, help="index of the master that the groups are taken from")
+    parser.add_argument("--limit", type=int, default=10, help="number of items listed in each report section")
+    parser.add_argument("--plan", default=None, help="write the plan to this JSON file")
+    parser.add_argument("--apply", action="store_true", help="apply the plan and save the fonts")
+    options = parser.parse_args(args)
+    from defcon import Font
+    # register the metricsMachine implementations
+    import mm4.objects
+    start = time.time()
+    fonts = [Font(path) for path in options.fonts]
+    diff = MasterKerningDiff(fonts)
+    plan = diff.getApplyPlan(reference=options.reference)
+    print(formatReport(diff, plan, limit=options.limit))
+    if options.plan:
+        writePlan(options.plan, diff, plan)
+    if options.apply:
+        applyPlan(fonts, plan)
+        for font in fonts:
+            font.save()
+    print("")
+    print("Done in %.3f s" % (time.time() - start))
+    return 0
+
+
+# ----
+# Test
+# ----
+
+def _setupTestFonts():
+    from defcon import Font
+    # register the metricsMachine implementations
+    import mm4.objects
+    fonts = []
+    for index in range(3):
+        font = Font()
+        for glyphName in ("A", "Aacute", "O", "Oacute", "T", "V"):
+            font.newGlyph(glyphName)
+        fonts.append(font)
+    light, regular, bold = fonts
+    light.groups.update({
+        "public.kern1.A": ["A", "Aacute"],
+        "public.kern2.V": ["V"],
+        "public.kern2.O": ["O", "Oacute"],
+    })
+    light.kerning.update({
+        ("public.kern1.A", "public.kern2.V"): -100,
+        ("A", "V"): -80,
+        ("public.kern1.A", "public.kern2.O"): -20,
+        ("T", "T"): 10,
+    })
+    regular.groups.update({
+        "public.kern1.A": ["A", "Aacute"],
+        "public.kern2.V": ["V"],
+    })
+    regular.kerning.update({
+        ("public.kern1.A", "public.kern2.V"): -80,
+        ("A", "V"): -70,
+        ("T", "O"): -40,
+        ("T", "T"): 10,
+    })
+    bold.groups.update({
+        "public.kern1.A": ["A", "Aacute"],
+        "public.kern2.V": ["V"],
+        "public.kern2.O": ["O"],
+    })
+    bold.kerning.update({
+        ("public.kern1.A", "public.kern2.V"): -60,
+        ("T", "O"): -30,
+        ("T", "T"): 10,
+    })
+    return fonts
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -23,3 +23,23 @@ def glyphToGroupMapFactory(groups):
                 raise MetricsMachineError("Glyph %s is in more than one %s group." % (glyphName, side))
             glyphDict[glyphName] = groupName
     return glyphToSide1Group, glyphToSide2Group
+
+
+def decompositionBasesFactory(layer):
+    # base glyph name : glyph names that decompose to
+    # the base, including the base itself
+    unicodeData = layer.unicodeData
+    bases = {}
+    for glyphName in layer.keys():
+        # skip ligatures here
+        if "_" in glyphName:
+            continue
+        if unicodeData.pseudoUnicodeForGlyphName(glyphName) is None:
+            continue
+        base = unicodeData.decompositionBaseForGlyphName(glyphName, True)
+        if glyphName == base:
+            continue
+        if base not in bases:
+            bases[base] = set([base])
+        bases[base].add(glyphName)
+    return bases
@@ -0,0 +1,341 @@
+from ufo2fdk.kernFeatureWriter import side1Prefix, side2Prefix
+
+
+class KerningLookupIndex(object):
+
+    """
+    A compiled lookup table for glyph, glyph kerning values.
+
+    The glyph to group maps are held locally so that a lookup
+    does not need to go through the groups representation and
+    resolved glyph, glyph values are cached in rows keyed by
+    the side 1 glyph. The pairs are also indexed by their
+    members so that per glyph pair counts can be read without
+    walking the kerning. The index is patched when pairs or
+    group memberships change instead of being rebuilt.
+    """
+
+    def __init__(self, kerning, groups):
+        self._kerning = kerning
+        self._groups = groups
+        self._glyphToSide1Group = None
+        self._glyphToSide2Group = None
+        self._groupContents = None
+        self._rows = {}
+        self._columns = {}
+        self._side1Partners = None
+        self._side2Partners = None
+
+    def _compileGroups(self):
+        glyphToSide1Group = {}
+        glyphToSide2Group = {}
+        groupContents = {}
+        if self._groups is not None:
+            for groupName, glyphList in self._groups.items():
+                if groupName.startswith(side1Prefix):
+                    glyphToGroup = glyphToSide1Group
+                elif groupName.startswith(side2Prefix):
+                    glyphToGroup = glyphToSide2Group
+                else:
+                    continue
+                groupContents[groupName] = frozenset(glyphList)
+                for glyphName in glyphList:
+                    glyphToGroup[glyphName] = groupName
+        self._glyphToSide1Group = glyphToSide1Group
+        self._glyphToSide2Group = glyphToSide2Group
+        self._groupContents = groupContents
+
+    def _compilePartners(self):
+        side1Partners = {}
+        side2Partners = {}
+        for side1, side2 in self._kerning.keys():
+            partners = side1Partners.get(side1)
+            if partners is None:
+                partners = side1Partners[side1] = set()
+            partners.add(side2)
+            partners = side2Partners.get(side2)
+            if partners is None:
+                partners = side2Partners[side2] = set()
+            partners.add(side1)
+        self._side1Partners = side1Partners
+        self._side2Partners = side2Partners
+
+    def clearValues(self):
+        self._rows = {}
+        self._columns = {}
+        self._side1Partners = None
+        self._side2Partners = None
+
+    def reset(self):
+        self._glyphToSide1Group = None
+        self._glyphToSide2Group = None
+        self._groupContents = None
+        self.clearValues()
+
+    # ------
+    # lookup
+    # ------
+
+    def getValue(self, pair):
+        side1, side2 = pair
+        row = self._rows.get(side1)
+        if row is not None and side2 in row:
+            return row[side2]
+        if self._groupContents is None:
+            self._compileGroups()
+        kerning = self._kerning
+        if pair in kerning:
+            value = kerning[pair]
+        else:
+            if side1.startswith(side1Prefix):
+                side1Group = side1
+                side1Glyph = None
+            else:
+                side1Group = self._glyphToSide1Group.get(side1)
+                side1Glyph = side1
+            if side2.startswith(side2Prefix):
+                side2Group = side2
+                side2Glyph = None
+            else:
+                side2Group = self._glyphToSide2Group.get(side2)
+                side2Glyph = side2
+            if (side1Group, side2Glyph) in kerning:
+                value = kerning[side1Group, side2Glyph]
+            elif (side1Glyph, side2Group) in kerning:
+                value = kerning[side1Glyph, side2Group]
+            elif (side1Group, side2Group) in kerning:
+                value = kerning[side1Group, side2Group]
+            else:
+                value = 0
+        # only glyph, glyph lookups are cached. group
+        # name lookups are rare and resolve directly.
+        if not side1.startswith(side1Prefix) and not side2.startswith(side2Prefix):
+            if row is None:
+                row = self._rows[side1] = {}
+            row[side2] = value
+            column = self._columns.get(side2)
+            if column is None:
+                column = self._columns[side2] = set()
+            column.add(side1)
+        return value
+
+    def getValues(self, pairs):
+        getValue = self.getValue
+        return [getValue(pair) for pair in pairs]
+
+    # ------------
+    # invalidation
+    # ------------
+
+    def _expandSide(self, name, prefix):
+        if name.startswith(prefix):
+            if self._groupContents is None:
+                self._compileGroups()
+            return self._groupContents.get(name, ())
+        return (name,)
+
+    def pairsChanged(self, pairs):
+        if self._side1Partners is not None:
+            self._updatePartners(pairs)
+        rows = self._rows
+        columns = self._columns
+        if not rows:
+            return
+        for side1, side2 in pairs:
+            side2Members = self._expandSide(side2, side2Prefix)
+            for s1 in self._expandSide(side1, side1Prefix):
+                row = rows.get(s1)
+                if not row:
+                    continue
+                if len(row) < len(side2Members):
+                    found = [s2 for s2 in row if s2 in side2Members]
+                else:
+                    found = [s2 for s2 in side2Members if s2 in row]
+                for s2 in found:
+                    del row[s2]
+                    columns[s2].discard(s1)
+
+    def _updatePartners(self, pairs):
+        # this may be called more than once for a
+        # single change, so the current state of the
+        # kerning is used rather than a delta.
+        kerning = self._kerning
+        side1Partners = self._side1Partners
+        side2Partners = self._side2Partners
+        for pair in pairs:
+            side1, side2 = pair
+            if pair in kerning:
+                partners = side1Partners.get(side1)
+                if partners is None:
+                    partners = side1Partners[side1] = set()
+                partners.add(side2)
+                partners = side2Partners.get(side2)
+                if partners is None:
+                    partners = side2Partners[side2] = set()
+                partners.add(side1)
+            else:
+                partners = side1Partners.get(side1)
+                if partners is not None:
+                    partners.discard(side2)
+                    if not partners:
+                        del side1Partners[side1]
+                partners = side2Partners.get(side2)
+                if partners is not None:
+                    partners.discard(side1)
+                    if not partners:
+                        del side2Partners[side2]
+
+    def _forgetSide1Glyph(self, glyphName):
+        row = self._rows.pop(glyphName, None)
+        if row:
+            for side2 in row:
+                self._columns[side2].discard(glyphName)
+
+    def _forgetSide2Glyph(self, glyphName):
+        column = self._columns.pop(glyphName, None)
+        if column:
+            for side1 in column:
+                del self._rows[side1][glyphName]
+
+    def groupChanged(self, groupName):
+        if self._groupContents is None:
+            # nothing has been compiled
+            # so there is nothing to patch.
+            return
+        if groupName.startswith(side1Prefix):
+            glyphToGroup = self._glyphToSide1Group
+            forget = self._forgetSide1Glyph
+        elif groupName.startswith(side2Prefix):
+            glyphToGroup = self._glyphToSide2Group
+            forget = self._forgetSide2Glyph
+        else:
+            return
+        oldContents = self._groupContents.pop(groupName, frozenset())
+        newContents = frozenset()
+        if groupName in self._groups:
+            newContents = frozenset(self._groups[groupName])
+            self._groupContents[groupName] = newContents
+        for glyphName in oldContents - newContents:
+            if glyphToGroup.get(glyphName) == groupName:
+                del glyphToGroup[glyphName]
+        for glyphName in newContents:
+            glyphToGroup[glyphName] = groupName
+        # any glyph that entered or left the group
+        # may now resolve through a different pair.
+        for glyphName in oldContents ^ newContents:
+            forget(glyphName)
+
+    # ---------
+    # hierarchy
+    # ---------
+
+    def getSide1Group(self, glyphName):
+        if self._groupContents is None:
+            self._compileGroups()
+        return self._glyphToSide1Group.get(glyphName)
+
+    def getSide2Group(self, glyphName):
+        if self._groupContents is None:
+            self._compileGroups()
+        return self._glyphToSide2Group.get(glyphName)
+
+    def getSide1Partners(self, side1):
+        """
+        The side 2 names of all pairs with side1.
+        """
+        if self._side1Partners is None:
+            self._compilePartners()
+        return self._side1Partners.get(side1, frozenset())
+
+    def getSide2Partners(self, side2):
+        """
+        The side 1 names of all pairs with side2.
+        """
+        if self._side1Partners is None:
+            self._compilePartners()
+        return self._side2Partners.get(side2, frozenset())
+
+    # -----------
+    # pair counts
+    # -----------
+
+    def getGlyphPairCounts(self, glyphName):
+        if self._groupContents is None:
+            self._compileGroups()
+        if self._side1Partners is None:
+            self._compilePartners()
+        side1Group = self._glyphToSide1Group.get(glyphName)
+        side2Group = self._glyphToSide2Group.get(glyphName)
+        side1GlyphCount = len(self._side1Partners.get(glyphName, ()))
+        side2GlyphCount = len(self._side2Partners.get(glyphName, ()))
+        counts = dict(
+            side1GroupCount=0, side2GroupCount=0,
+            side1GlyphCount=0, side2GlyphCount=0,
+            side1ExceptionCount=0, side2ExceptionCount=0
+        )
+        if side1Group is None:
+            counts["side1GlyphCount"] = side1GlyphCount
+        else:
+            counts["side1GroupCount"] = len(self._side1Partners.get(side1Group, ()))
+            counts["side1ExceptionCount"] = side1GlyphCount
+        if side2Group is None:
+            counts["side2GlyphCount"] = side2GlyphCount
+        else:
+            counts["side2GroupCount"] = len(self._side2Partners.get(side2Group, ()))
+            counts["side2ExceptionCount"] = side2GlyphCount
+        return counts
+
+    # -------------
+    # notifications
+    # -------------
+
+    def kerningPairChangedNotificationCallback(self, notification):
+        self.pairsChanged([notification.data["key"]])
+
+    def kerningUpdatedNotificationCallback(self, notification):
+        self.pairsChanged(list(notification.data["other"].keys()))
+
+    def kerningChangedNotificationCallback(self, notification):
+        self.clearValues()
+
+    def groupChangedNotificationCallback(self, notification):
+        self.groupChanged(notification.data["key"])
+
+    def groupsChangedNotificationCallback(self, notification):
+        self.reset()
+
+
+class GlyphPairCounts(object):
+
+    """
+    A read only glyph name to pair counts mapping. The
+    counts for a glyph are derived from the lookup index
+    when requested so an edit never triggers a recount
+    of the whole kerning.
+    """
+
+    def __init__(self, font, index):
+        self._font = font
+        self._index = index
+
+    def __getitem__(self, glyphName):
+        if glyphName not in self._font:
+            raise KeyError(glyphName)
+        return self._index.getGlyphPairCounts(glyphName)
+
+    def __contains__(self, glyphName):
+        return glyphName in self._font
+
+    def __iter__(self):
+        return iter(self._font.keys())
+
+    def __len__(self):
+        return len(self._font)
+
+    def keys(self):
+        return list(self._font.keys())
+
+    def get(self, glyphName, default=None):
+        if glyphName not in self._font:
+            return default
+        return self._index.getGlyphPairCounts(glyphName)
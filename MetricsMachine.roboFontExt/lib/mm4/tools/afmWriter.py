@@ -0,0 +1,116 @@
+import shutil
+import tempfile
+import time
+
+from fontTools.afmLib import preferredAttributeOrder
+
+
+def writeAFM(path, afm, kerning, sep="\r"):
+    """
+    Write a fontTools AFM object to path the same way that
+    AFM.write does, but with the kerning pairs taken from
+    kerning instead of the AFM. kerning is an iterable of
+    ((side1, side2), value) in the order that the pairs
+    should be written. The pairs are spooled to a temporary
+    file while they are counted, so they are never all held
+    in memory.
+
+    >>> import os
+    >>> from fontTools.afmLib import AFM
+    >>> directory = tempfile.mkdtemp()
+    >>> afm = AFM()
+    >>> afm.addComment("test")
+    >>> afm.FontName = "Test"
+    >>> afm.FontBBox = (0, -10, 500, 700)
+    >>> afm.Unknown = 1
+    >>> afm._chars["A"] = (65, 500, (0, 0, 500, 700))
+    >>> afm._chars["A.alt"] = (-1, 500, (0, -10, 500, 700))
+    >>> afm._kerning = {("A", "A.alt"): -10, ("A", "A"): 5.5}
+    >>> afm.write(os.path.join(directory, "afmLib.afm"), sep="\\n")
+    >>> writeAFM(os.path.join(directory, "stream.afm"), afm, sorted(afm._kerning.items()), sep="\\n")
+    >>> texts = []
+    >>> for fileName in ("afmLib.afm", "stream.afm"):
+    ...     with open(os.path.join(directory, fileName), "rb") as f:
+    ...         texts.append(f.read().splitlines())
+    >>> texts[0][2:] == texts[1][2:]
+    True
+    >>> for line in texts[1][-7:]:
+    ...     print(line.decode("ascii"))
+    StartKernData
+    StartKernPairs 2
+    KPX A A 5
+    KPX A A.alt -10
+    EndKernPairs
+    EndKernData
+    EndFontMetrics
+
+    >>> shutil.rmtree(directory)
+    """
+    with tempfile.TemporaryFile(mode="w+", encoding="ascii", newline="\n") as kerningFile:
+        count = 0
+        for (side1, side2), value in kerning:
+            kerningFile.write("KPX %s %s %d\n" % (side1, side2, value))
+            count += 1
+        kerningFile.seek(0)
+        with open(path, "w", encoding="ascii", newline=sep) as f:
+            f.write("\n".join(_getHeaderLines(afm)) + "\n")
+            f.write("StartKernData\n")
+            f.write("StartKernPairs " + repr(count) + "\n")
+            shutil.copyfileobj(kerningFile, f)
+            f.write("\n".join(_getTrailerLines(afm)) + "\n")
+
+
+def _getHeaderLines(afm):
+    lines = [
+        "StartFontMetrics 2.0",
+        "Comment Generated by afmLib; at %s" % (time.strftime("%m/%d/%Y %H:%M:%S", time.localtime(time.time())))
+    ]
+    for comment in afm._comments:
+        lines.append("Comment " + comment)
+    attrs = afm._attrs
+    for attr in preferredAttributeOrder:
+        if attr in attrs:
+            value = attrs[attr]
+            if attr == "FontBBox":
+                value = "%s %s %s %s" % value
+            lines.append(attr + " " + str(value))
+    for attr, value in sorted(attrs.items()):
+        if attr in preferredAttributeOrder:
+            continue
+        lines.append(attr + " " + str(value))
+    lines.append("StartCharMetrics " + repr(len(afm._chars)))
+    items = [(charnum, (charname, width, box)) for charname, (charnum, width, box) in afm._chars.items()]
+
+    def sortKey(item):
+        # unencoded chars go at the end
+        if item[0] == -1:
+            item = (0xFFFF,) + item[1:]
+        return item
+
+    items.sort(key=sortKey)
+    for charnum, (charname, width, (l, b, r, t)) in items:
+        lines.append("C %d ; WX %d ; N %s ; B %d %d %d %d ;" % (charnum, width, charname, l, b, r, t))
+    lines.append("EndCharMetrics")
+    return lines
+
+
+def _getTrailerLines(afm):
+    lines = [
+        "EndKernPairs",
+        "EndKernData"
+    ]
+    if afm._composites:
+        lines.append("StartComposites %s" % len(afm._composites))
+        for charname, components in sorted(afm._composites.items()):
+            line = "CC %s %s ;" % (charname, len(components))
+            for basechar, xoffset, yoffset in components:
+                line = line + " PCC %s %s %s ;" % (basechar, xoffset, yoffset)
+            lines.append(line)
+        lines.append("EndComposites")
+    lines.append("EndFontMetrics")
+    return lines
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -16,427 +16,178 @@ class FeaToolsParserSyntaxError(Exception):
         return repr(self.value)
 
 
-# used for removing all comments
-commentRE = re.compile(r"#.*")
-
-# used for finding all strings
-stringRE = re.compile(
-    r"\""         # "
-    r"([^\"]*)"   # anything but "
-    r"\""         # "
-)
-
-# used for removing all comments
-terminatorRE = re.compile(";")
-
-# used for finding all feature names.
-feature_findAll_RE = re.compile(
-        r"([\s;\{\}]|^)"        # whitepace, ; {, } or start of line
-        r"feature\s+"           # feature
-        r"([\w\d]{4})"          # name
-        r"\s*{"                 # {
+# The text is read as a stream of tokens. Strings and comments
+# are dropped by the tokenizer. The tokens of a statement are
+# collected until the statement is terminated and the statement
+# is then handed to the writer, so the text is walked once and
+# nothing larger than a single statement is held.
+
+tokenRE = re.compile(
+        r"(\s+)"                        # whitespace
+        r"|(#[^\n]*)"                   # comment
+        r"|(\"[^\"]*\")"                # string
+        r"|include\s*\(\s*([^\)]+)\)"   # include(path)
+        r"|([\{\}\[\];=<>'(),])"         # punctuation
+        r"|([^\s\{\}\[\];=<>'(),#\"]+)"  # word
+        r"|(.)"                          # anything else
         )
 
-# used for finding the content of features.
-# this regular expression will be compiled
-# for each feature name found.
-featureContentRE = [
-        r"([\s;\{\}]|^)",       # whitepace, ; {, } or start of line
-        r"feature\s+",          # feature
-        # feature name         # name
-        r"\s*\{",               # {
-        r"([\S\s]*)",           # content
-        r"}\s*",                # }
-        # feature name         # name
-        r"\s*;"                 # ;
-        ]
-
-# used for finding all lookup names.
-lookup_findAll_RE = re.compile(
-        r"([\s;\{\}]|^)"        # whitepace, ; {, } or start of line
-        r"lookup\s+"            # lookup
-        r"([\w\d_.]+)"          # name
-        r"\s*{"                 # {
-        )
-
-# used for finding the content of lookups.
-# this regular expression will be compiled
-# for each lookup name found.
-lookupContentRE = [
-        r"([\s;\{\}]|^)",       # whitepace, ; {, } or start of line
-        r"lookup\s+",           # lookup
-        # lookup name          # name
-        r"\s*\{",               # {
-        r"([\S\s]*)",           # content
-        r"}\s*",                # }
-        # lookup name          # name
-        r"\s*;"                 # ;
-        ]
-
-# used for finding all table names.
-table_findAll_RE = re.compile(
-        r"([\s;\{\}]|^)"        # whitepace, ; {, } or start of line
-        r"table\s+"             # table
-        r"([\w\d/]+)"        # name
-        r"\s*{"                 # {
-        )
-
-# used for finding the content of tables.
-# this regular expression will be compiled
-# for each table name found.
-tableContentRE = [
-        r"([\s;\{\}]|^)",       # whitepace, ; {, } or start of line
-        r"table\s+",            # feature
-        # table name           # name
-        r"\s*\{",               # {
-        r"([\S\s]*)",           # content
-        r"}\s*",                # }
-        # table name           # name
-        r"\s*;"                 # ;
-        ]
-
-# used for getting tag value pairs from tables.
-tableTagValueRE = re.compile(
-    r"([\w\d_.]+)"       # tag
-    r"\s+"               #
-    r"([^;]+)"           # anything but ;
-    r";"                 # ;
-)
-
-# used for finding all class definitions.
-classDefinitionRE = re.compile(
-        r"([\s;\{\}]|^)"        # whitepace, ; {, } or start of line
-        r"@"                    # @
-        r"([\w\d_.]+)"          # name
-        r"\s*=\s*"              #  =
-        r"\["                   # [
-        r"([\w\d\s_.@]+)"       # content
-        r"\]"                   # ]
-        r"\s*;"                 # ;
-        , re.M
-        )
-
-# used for getting the contents of a class definition
-classContentRE = re.compile(
-        r"([\w\d_.@]+)"
-        )
+_includeToken = 4
+_punctuationToken = 5
+_wordToken = 6
+_unknownToken = 7
 
-# used for finding inline classes within a sequence
-sequenceInlineClassRE = re.compile(
-        r"\["                   # [
-        r"([\w\d\s_.@]+)"       # content
-        r"\]"                   # ]
-        )
-
-# used for finding all substitution type 1
-subType1And4RE = re.compile(
-        r"([\s;\{\}]|^)"        # whitepace, ; {, } or start of line
-        r"substitute|sub\s+"    # sub
-        r"([\w\d\s_.@\[\]]+)"   # target
-        r"\s+by\s+"             #  by
-        r"([\w\d\s_.@\[\]]+)"   # replacement
-        r"\s*;"                 # ;
-        )
-
-# used for finding all substitution type 3
-subType3RE = re.compile(
-        r"([\s;\{\}]|^)"        # whitepace, ; {, } or start of line
-        r"substitute|sub\s+"    # sub
-        r"([\w\d\s_.@\[\]]+)"   # target
-        r"\s+from\s+"           #  from
-        r"([\w\d\s_.@\[\]]+)"   # replacement
-        r"\s*;"                 # ;
-        )
-
-# used for finding all ignore substitution type 6
-ignoreSubType6RE = re.compile(
-        r"([\s;\{\}]|^)"                          # whitepace, ; {, } or start of line
-        r"ignore\s+substitute|ignore\s+sub\s+"    # ignore sub
-        r"([\w\d\s_.@\[\]']+)"                    # preceding context, target, trailing context
-        r"\s*;"                                   # ;
-        )
+_punctuation = set("{}[];=<>'(),")
 
-# used for finding all substitution type 6
-# XXX see failing unit test
-subType6RE = re.compile(
-        r"([\s;\{\}]|^)"        # whitepace, ; {, } or start of line
-        r"substitute|sub\s+"    # sub
-        r"([\w\d\s_.@\[\]']+)"  # preceding context, target, trailing context
-        r"\s+by\s+"             #  by
-        r"([\w\d\s_.@\[\]]+)"   # replacement
-        r"\s*;"                 # ;
-        )
-
-subType6TargetRE = re.compile(
-        r"(\["                  # [
-        r"[\w\d\s_.@]+"         # content
-        r"\]"                   # ]'
-        r"|"                    # <or>
-        r"[\w\d_.@]+)'"         # content
-        )
-
-subType6TargetExtractRE = re.compile(
-        r"([\w\d_.@]*)"       # glyph or class names
-        )
-
-# used for finding positioning type 1
-posType1RE = re.compile(
-    r"([\s;\{\}]|^)"        # whitepace, ; {, } or start of line
-    r"position|pos\s+"      # pos
-    r"([\w\d\s_.@\[\]]+)"   # target
-    r"\s+<"                 # <
-    r"([-\d\s]+)"           # value
-    r"\s*>\s*;"             # >;
-    )
-
-# used for finding positioning type 2
-posType2RE = re.compile(
-    r"([\s;\{\}]|^)"        # whitepace, ; {, } or start of line
-    r"(enum\s+|\s*)"        # enum
-    r"(position|pos\s+)"    # pos
-    r"([-\w\d\s_.@\[\]]+)"  # left, right, value
-    r"\s*;"                 # ;
-    )
-
-# used for finding all languagesystem
-languagesystemRE = re.compile(
-        r"([\s;\{\}]|^)"        # whitepace, ; {, } or start of line
-        r"languagesystem\s+"    # languagesystem
-        r"([\w\d]+)"            # script tag
-        r"\s+"                  #
-        r"([\w\d]+)"            # language tag
-        r"\s*;"                 # ;
-        )
-
-# use for finding all script
-scriptRE = re.compile(
-        r"([\s;\{\}]|^)"        # whitepace, ; {, } or start of line
-        r"script\s+"            # script
-        r"([\w\d]+)"            # script tag
-        r"\s*;"                 # ;
-        )
-
-# used for finding all language
-languageRE = re.compile(
-        r"([\s;\{\}]|^)"        # whitepace, ; {, } or start of line
-        r"language\s+"          # language
-        r"([\w\d]+)"            # language tag
-        r"\s*"                  #
-        r"([\w\d]*)"            # include_dflt or exclude_dflt or nothing
-        r"\s*;"                 # ;
-        )
-
-# use for finding all includes
-includeRE = re.compile(
-        r"([\s;\{\}]|^)"        # whitepace, ; {, } or start of line
-        r"include\s*"           # include
-        r"\(\s*"                # (
-        r"([^\)]+)"             # anything but )
-        r"\s*\)"                # )
-        r"\s*;{0,1}"            # ; which will occur zero or one times (ugh!)
-        )
-
-# used for finding subtable breaks
-subtableRE = re.compile(
-    r"([\s;\{\}]|^)"        # whitepace, ; {, } or start of line
-    r"subtable\s*"          # subtable
-    r"\s*;"                 # ;
-)
-
-# used for finding feature references
-featureReferenceRE = re.compile(
-        r"([\s;\{\}]|^)"        # whitepace, ; {, } or start of line
-        r"feature\s+"           # feature
-        r"([\w\d]{4})"          # name
-        r"\s*;"                 # {
-        )
-
-# used for finding lookup references
-lookupReferenceRE = re.compile(
-        r"([\s;\{\}]|^)"        # whitepace, ; {, } or start of line
-        r"lookup\s+"            # lookup
-        r"([\w\d]+)"            # name
-        r"\s*;"                 # {
-        )
-
-# use for finding all lookup flags
-lookupflagRE = re.compile(
-        r"([\s;\{\}]|^)"        # whitepace, ; {, } or start of line
-        r"lookupflag\s+"        # lookupflag
-        r"([\w\d,\s]+)"         # values
-        r"\s*;"                 # ;
-        )
+def _tokenize(text):
+    """
+    >>> list(_tokenize("pos a [b c] -10; # comment"))
+    [(6, 'pos'), (6, 'a'), (5, '['), (6, 'b'), (6, 'c'), (5, ']'), (6, '-10'), (5, ';')]
+    >>> list(_tokenize('name "x;y"; include( other.fea )'))
+    [(6, 'name'), (5, ';'), (4, 'other.fea ')]
+    """
+    for match in tokenRE.finditer(text):
+        kind = match.lastindex
+        if kind < _includeToken:
+            continue
+        yield kind, match.group(kind)
 
-def _parseUnknown(writer, text):
-    text = text.strip()
-    ## extract all table names
-    tableNames = table_findAll_RE.findall(text)
-    for precedingMark, tableName in tableNames:
-        # a regular expression specific to this lookup must
-        # be created so that nested lookups are safely handled
-        thisTableContentRE = list(tableContentRE)
-        thisTableContentRE.insert(2, tableName)
-        thisTableContentRE.insert(6, tableName)
-        thisTableContentRE = re.compile("".join(thisTableContentRE))
-        found = thisTableContentRE.search(text)
-        tableText = found.group(2)
-        start, end = found.span()
-        precedingText = text[:start]
-        if precedingMark:
-            precedingText += precedingMark
-        _parseUnknown(writer, precedingText)
-        _parseTable(writer, tableName, tableText)
-        text = text[end:]
-    ## extract all feature names
-    featureNames = feature_findAll_RE.findall(text)
-    for precedingMark, featureName in featureNames:
-        # a regular expression specific to this lookup must
-        # be created so that nested lookups are safely handled
-        thisFeatureContentRE = list(featureContentRE)
-        thisFeatureContentRE.insert(2, featureName)
-        thisFeatureContentRE.insert(6, featureName)
-        thisFeatureContentRE = re.compile("".join(thisFeatureContentRE))
-        found = thisFeatureContentRE.search(text)
-        featureText = found.group(2)
-        start, end = found.span()
-        precedingText = text[:start]
-        if precedingMark:
-            precedingText += precedingMark
-        _parseUnknown(writer, precedingText)
-        _parseFeature(writer, featureName, featureText)
-        text = text[end:]
-    ## extract all lookup names
-    lookupNames = lookup_findAll_RE.findall(text)
-    for precedingMark, lookupName in lookupNames:
-        # a regular expression specific to this lookup must
-        # be created so that nested lookups are safely handled
-        thisLookupContentRE = list(lookupContentRE)
-        thisLookupContentRE.insert(2, lookupName)
-        thisLookupContentRE.insert(6, lookupName)
-        thisLookupContentRE = re.compile("".join(thisLookupContentRE))
-        found = thisLookupContentRE.search(text)
-        lookupText = found.group(2)
-        start, end = found.span()
-        precedingText = text[:start]
-        if precedingMark:
-            precedingText += precedingMark
-        _parseUnknown(writer, precedingText)
-        _parseLookup(writer, lookupName, lookupText)
-        text = text[end:]
-    ## extract all class data
-    classes = classDefinitionRE.findall(text)
-    for precedingMark, className, classContent in classes:
-        text = _executeSimpleSlice(precedingMark, text, classDefinitionRE, writer)
-        className = "@" + className
-        _parseClass(writer, className, classContent)
-    ## extract substitutions
-    # sub type 1 and 4
-    subType1s = subType1And4RE.findall(text)
-    for precedingMark, target, replacement in subType1s:
-        text = _executeSimpleSlice(precedingMark, text, subType1And4RE, writer)
-        _parseSubType1And4(writer, target, replacement)
-    # sub type 3
-    subType3s = subType3RE.findall(text)
-    for precedingMark, target, replacement in subType3s:
-        text = _executeSimpleSlice(precedingMark, text, subType3RE, writer)
-        _parseSubType3(writer, target, replacement)
-    # sub type 6
-    subType6s = subType6RE.findall(text)
-    for precedingMark, target, replacement in subType6s:
-        text = _executeSimpleSlice(precedingMark, text, subType6RE, writer)
-        _parseSubType6(writer, target, replacement)
-    # ignore sub type 6
-    ignoreSubType6s = ignoreSubType6RE.findall(text)
-    for precedingMark, target in ignoreSubType6s:
-        text = _executeSimpleSlice(precedingMark, text, ignoreSubType6RE, writer)
-        _parseSubType6(writer, target, replacement=None, ignore=True)
-    ## extract positions
-    # pos type 1
-    posType1s = posType1RE.findall(text)
-    for precedingMark, target, value in posType1s:
-        text = _executeSimpleSlice(precedingMark, text, posType1RE, writer)
-        _parsePosType1(writer, target, value)
-    # pos type 2
-    posType2s = posType2RE.findall(text)
-    for precedingMark, enumTag, posTag, targetAndValue in posType2s:
-        text = _executeSimpleSlice(precedingMark, text, posType2RE, writer)
-        _parsePosType2(writer, targetAndValue)
-    ## extract other data
-    # XXX look at FDK spec. sometimes a language tag of dflt will be passed
-    # it should be handled differently than the other tags.
-    # languagesystem
-    languagesystems = languagesystemRE.findall(text)
-    for precedingMark, scriptTag, languageTag in languagesystems:
-        text = _executeSimpleSlice(precedingMark, text, languagesystemRE, writer)
-        writer.languageSystem(scriptTag, languageTag)
-    # script
-    scripts = scriptRE.findall(text)
-    for precedingMark, scriptTag in scripts:
-        text = _executeSimpleSlice(precedingMark, text, scriptRE, writer)
-        writer.script(scriptTag)
-    # language
-    languages = languageRE.findall(text)
-    for precedingMark, languageTag, otherKeyword in languages:
-        text = _executeSimpleSlice(precedingMark, text, languageRE, writer)
+def parseFeatures(writer, text):
+    """
+    >>> writer = _TestRecordingWriter()
+    >>> parseFeatures(writer, _testParse_fea)
+    >>> for call in writer.calls:
+    ...     print(call)
+    ('languageSystem', 'DFLT', 'dflt')
+    ('classDefinition', '@kern1.A', ['A', 'Aacute'])
+    ('feature', 'kern')
+    ('lookupFlag', False, False, False, False)
+    ('gposType2', ['@kern1.A', 'T'], -10.0)
+    ('gposType2', [['A', 'Aacute'], 'V'], -20.0)
+    ('subtableBreak',)
+    ('lookup', 'kern_2')
+    ('gposType1', 'A', (0.0, 0.0, 10.0, 0.0))
+    ('lookupReference', 'kern_2')
+    ('feature', 'liga')
+    ('gsubType1', 'a', 'a.alt')
+    ('gsubType4', ['f', 'i'], 'f_i')
+    ('gsubType3', 'a', ['a.alt1', 'a.alt2'])
+    ('gsubType6', ['x'], ['a', ['b', 'c']], ['y'], 'z')
+    ('gsubType6', '', [], '', None)
+    ('script', 'latn')
+    ('language', 'DEU', False)
+    ('include', 'other.fea')
+    ('table', 'hhea', [('Ascender', 750.0)])
+
+    >>> try:
+    ...     parseFeatures(writer, "feature kern { pos a b 10; } liga;")
+    ... except FeaToolsParserSyntaxError as error:
+    ...     print(error.value)
+    Invalid Syntax: } liga
+    """
+    # each open block is stored as (keyword, name, writer)
+    blocks = []
+    # the statements in an open table
+    tableStatements = None
+    statement = []
+    # the name that must follow a closing brace
+    closingName = None
+    for kind, value in _tokenize(text):
+        if kind == _wordToken:
+            statement.append(value)
+            continue
+        if kind == _includeToken:
+            if statement:
+                raise FeaToolsParserSyntaxError("Invalid Syntax: %s" % " ".join(statement))
+            writer.include(value.strip())
+            continue
+        if kind == _unknownToken:
+            raise FeaToolsParserSyntaxError("Invalid Syntax: %s" % value)
+        if value == ";":
+            if closingName is not None:
+                if statement != [closingName]:
+                    raise FeaToolsParserSyntaxError("Invalid Syntax: } %s" % " ".join(statement))
+                closingName = None
+            elif not statement:
+                pass
+            elif tableStatements is not None:
+                tableStatements.append(statement)
+            else:
+                _parseStatement(writer, statement)
+            statement = []
+        elif value == "{":
+            if closingName is not None or tableStatements is not None or len(statement) < 2:
+                raise FeaToolsParserSyntaxError("Invalid Syntax: %s {" % " ".join(statement))
+            keyword, name = statement[:2]
+            blocks.append((keyword, name, writer))
+            if keyword == "feature" and len(statement) == 2:
+                writer = writer.feature(name)
+            elif keyword == "lookup":
+                writer = writer.lookup(name)
+            elif keyword == "table" and len(statement) == 2:
+                tableStatements = []
+            else:
+                raise FeaToolsParserSyntaxError("Invalid Syntax: %s {" % " ".join(statement))
+            statement = []
+        elif value == "}":
+            if statement or closingName is not None or not blocks:
+                raise FeaToolsParserSyntaxError("Invalid Syntax: %s }" % " ".join(statement))
+            keyword, closingName, writer = blocks.pop()
+            if keyword == "table":
+                _parseTable(writer, closingName, tableStatements)
+                tableStatements = None
+        else:
+            statement.append(value)
+    if blocks:
+        keyword, name, parentWriter = blocks[-1]
+        raise FeaToolsParserSyntaxError("Invalid Syntax: %s %s is not closed" % (keyword, name))
+    if closingName is not None:
+        statement.insert(0, "} %s" % closingName)
+    if statement:
+        raise FeaToolsParserSyntaxError("Invalid Syntax: %s" % " ".join(statement))
+
+def _parseStatement(writer, statement):
+    keyword = statement[0]
+    count = len(statement)
+    if keyword in ("sub", "substitute"):
+        _parseSubstitution(writer, statement[1:])
+    elif keyword == "ignore" and count > 1 and statement[1] in ("sub", "substitute"):
+        _parseSubType6(writer, statement[2:], ignore=True)
+    elif keyword in ("pos", "position"):
+        _parsePosition(writer, statement[1:])
+    elif keyword == "enum" and count > 1 and statement[1] in ("pos", "position"):
+        _parsePosition(writer, statement[2:])
+    elif keyword.startswith("@") and count > 1 and statement[1] == "=":
+        _parseClass(writer, keyword, statement[2:])
+    elif keyword == "languagesystem" and count == 3:
+        writer.languageSystem(statement[1], statement[2])
+    elif keyword == "script" and count == 2:
+        writer.script(statement[1])
+    elif keyword == "language" and count in (2, 3):
+        otherKeyword = statement[2] if count == 3 else None
         if not otherKeyword or otherKeyword == "include_dflt":
-            writer.language(languageTag)
+            writer.language(statement[1])
         elif otherKeyword == "exclude_dflt":
-            writer.language(languageTag, includeDefault=False)
-    # include
-    inclusions = includeRE.findall(text)
-    for precedingMark, path in inclusions:
-        text = _executeSimpleSlice(precedingMark, text, includeRE, writer)
-        writer.include(path)
-    # feature reference
-    featureReferences = featureReferenceRE.findall(text)
-    for precedingMark, featureName in featureReferences:
-        text = _executeSimpleSlice(precedingMark, text, featureReferenceRE, writer)
-        writer.featureReference(featureName)
-    # lookup reference
-    lookupReferences = lookupReferenceRE.findall(text)
-    for precedingMark, lookupName in lookupReferences:
-        text = _executeSimpleSlice(precedingMark, text, lookupReferenceRE, writer)
-        writer.lookupReference(lookupName)
-    # lookupflag
-    lookupflags = lookupflagRE.findall(text)
-    for precedingMark, lookupflagValues in lookupflags:
-        text = _executeSimpleSlice(precedingMark, text, lookupflagRE, writer)
-        _parseLookupFlag(writer, lookupflagValues)
-    # subtable break
-    subtables = subtableRE.findall(text)
-    for precedingMark in subtables:
-        text = _executeSimpleSlice(precedingMark, text, subtableRE, writer)
+            writer.language(statement[1], includeDefault=False)
+    elif keyword == "feature" and count == 2:
+        writer.featureReference(statement[1])
+    elif keyword == "lookup" and count == 2:
+        writer.lookupReference(statement[1])
+    elif keyword == "lookupflag" and count > 1:
+        _parseLookupFlag(writer, " ".join(statement[1:]))
+    elif keyword == "subtable" and count == 1:
         writer.subtableBreak()
-    text = text.strip()
-    if text:
-        raise FeaToolsParserSyntaxError("Invalid Syntax: %s" % text)
-
-def _executeSimpleSlice(precedingMark, text, regex, writer):
-    first = regex.search(text)
-    start, end = first.span()
-    precedingText = text[:start]
-    if precedingMark:
-        precedingText += precedingMark
-    _parseUnknown(writer, precedingText)
-    text = text[end:]
-    return text
-
-def _parseFeature(writer, name, feature):
-    featureWriter = writer.feature(name)
-    parsed = _parseUnknown(featureWriter, feature)
-
-def _parseLookup(writer, name, lookup):
-    lookupWriter = writer.lookup(name)
-    parsed = _parseUnknown(lookupWriter, lookup)
-
-def _parseTable(writer, name, table):
+    else:
+        raise FeaToolsParserSyntaxError("Invalid Syntax: %s" % " ".join(statement))
+
+def _parseTable(writer, name, statements):
     tagValueTables = ["head", "hhea", "OS/2", "vhea"]
     # skip unknown tables
     if name not in tagValueTables:
         return
-    _parseTagValueTable(writer, name, table)
+    _parseTagValueTable(writer, name, statements)
 
-def _parseTagValueTable(writer, name, table):
+def _parseTagValueTable(writer, name, statements):
     valueTypes = {
         "head" : {
             "FontRevision" : float
@@ -471,20 +222,17 @@ def _parseTagValueTable(writer, name, table):
     }
     tableTypes = valueTypes[name]
     parsedTagValues = []
-    for tag, value in tableTagValueRE.findall(table):
-        tag = tag.strip()
-        value = value.strip()
+    for statement in statements:
+        if len(statement) < 2:
+            continue
+        tag = statement[0]
+        value = " ".join(statement[1:])
         if tag not in tableTypes:
             raise FeaToolsParserSyntaxError("Unknown Tag: %s" % tag)
         desiredType = tableTypes[tag]
         if desiredType == "listOfInts":
-            v = []
-            for line in value.splitlines():
-                for i in line.split():
-                    v.append(i)
-            value = v
             values = []
-            for i in value:
+            for i in statement[1:]:
                 try:
                     i = int(i)
                     values.append(i)
@@ -493,37 +241,83 @@ def _parseTagValueTable(writer, name, table):
             value = values
         elif desiredType == str:
             raise NotImplementedError
-        elif not isinstance(value, desiredType):
+        else:
             try:
                 value = desiredType(value)
             except ValueError:
-                raise FeaToolsParserSyntaxError("Invalid Syntax: %s" % i)
+                raise FeaToolsParserSyntaxError("Invalid Syntax: %s" % value)
         parsedTagValues.append((tag, value))
     writer.table(name, parsedTagValues)
 
 def _parseClass(writer, name, content):
-    content = classContentRE.findall(content)
+    if len(content) < 2 or content[0] != "[" or content[-1] != "]":
+        raise FeaToolsParserSyntaxError("Invalid Syntax: %s = %s" % (name, " ".join(content)))
+    content = content[1:-1]
+    for token in content:
+        if token in _punctuation:
+            raise FeaToolsParserSyntaxError("Invalid Syntax: %s = [%s]" % (name, " ".join(content)))
     writer.classDefinition(name, content)
 
-def _parseSequence(sequence):
+def _parseSequence(tokens, marked=None):
+    """
+    >>> _parseSequence("a [ b c ] @d".split(" "))
+    ['a', ['b', 'c'], '@d']
+
+    If marked is a list, the indexes of the
+    items followed by ' are added to it.
+
+    >>> marked = []
+    >>> _parseSequence("a [ b c ] ' @d '".split(" "), marked)
+    ['a', ['b', 'c'], '@d']
+    >>> marked
+    [1, 2]
+    """
     parsed = []
-    for content in sequenceInlineClassRE.findall(sequence):
-        first = sequenceInlineClassRE.search(sequence)
-        start, end = first.span()
-        precedingText = sequence[:start]
-        parsed.extend(_parseSequence(precedingText))
-        parsed.append(_parseSequence(content))
-        sequence = sequence[end:]
-    content = [i for i in sequence.split(" ") if i]
-    parsed.extend(content)
+    inlineClass = None
+    for token in tokens:
+        if token == "'" and marked is not None and inlineClass is None and parsed:
+            marked.append(len(parsed) - 1)
+        elif token == "[" and inlineClass is None:
+            inlineClass = []
+        elif token == "]" and inlineClass is not None:
+            parsed.append(inlineClass)
+            inlineClass = None
+        elif token in _punctuation:
+            raise FeaToolsParserSyntaxError("Invalid Syntax: %s" % " ".join(tokens))
+        elif inlineClass is not None:
+            inlineClass.append(token)
+        else:
+            parsed.append(token)
+    if inlineClass is not None:
+        raise FeaToolsParserSyntaxError("Invalid Syntax: %s" % " ".join(tokens))
     return parsed
 
+def _getNames(tokens):
+    return [token for token in tokens if token not in _punctuation]
+
+def _parseSubstitution(writer, tokens):
+    if "'" in tokens and "by" in tokens:
+        index = tokens.index("by")
+        _parseSubType6(writer, tokens[:index], tokens[index + 1:])
+    elif "'" in tokens:
+        raise FeaToolsParserSyntaxError("Invalid Syntax: sub %s" % " ".join(tokens))
+    elif "from" in tokens:
+        index = tokens.index("from")
+        _parseSubType3(writer, tokens[:index], tokens[index + 1:])
+    elif "by" in tokens:
+        index = tokens.index("by")
+        _parseSubType1And4(writer, tokens[:index], tokens[index + 1:])
+    else:
+        raise FeaToolsParserSyntaxError("Invalid Syntax: sub %s" % " ".join(tokens))
+
 def _parseSubType1And4(writer, target, replacement):
     target = _parseSequence(target)
     # replacement will always be one item.
     # either a single glyph/class or a list
     # reresenting an inline class.
     replacement = _parseSequence(replacement)
+    if not target or not replacement:
+        raise FeaToolsParserSyntaxError("Invalid Syntax: sub %s by %s" % (target, replacement))
     replacement = replacement[0]
     if len(target) == 1:
         target = target[0]
@@ -537,9 +331,11 @@ def _parseSubType1And4(writer, target, replacement):
 def _parseSubType3(writer, target, replacement):
     # target will only be one item representing
     # a glyph/class name.
-    target = classContentRE.findall(target)
+    target = _getNames(target)
+    if not target:
+        raise FeaToolsParserSyntaxError("Invalid Syntax: sub from %s" % " ".join(replacement))
     target = target[0]
-    replacement = classContentRE.findall(replacement)
+    replacement = _getNames(replacement)
     writer.gsubType3(target, replacement)
 
 def _parseSubType6(writer, target, replacement=None, ignore=False):
@@ -551,61 +347,48 @@ def _parseSubType6(writer, target, replacement=None, ignore=False):
     # in that case, replacement will
     # be None.
     if not ignore:
-        replacement = classContentRE.findall(replacement)
+        replacement = _getNames(replacement)
         if len(replacement) == 1:
             replacement = replacement[0]
-    #
-    targetText = target
-    #
-    precedingContext = ""
-    targets = subType6TargetRE.findall(targetText)
-    trailingContext = ""
-    #
-    targetCount = len(targets)
-    counter = 1
+    # find the marked targets
+    marked = []
+    items = _parseSequence(target, marked)
+    if not marked:
+        writer.gsubType6("", [], "", replacement)
+        return
+    precedingContext = items[:marked[0]]
+    trailingContext = items[marked[-1] + 1:]
     extractedTargets = []
-    for target in targets:
-        first = subType6TargetRE.search(targetText)
-        start, end = first.span()
-        if counter == 1:
-            precedingContext = _parseSequence(targetText[:start])
-        if counter == targetCount:
-            trailingContext = _parseSequence(targetText[end:])
+    for index in marked:
         # the target could be in a form like [o o.alt]
-        # so it has to be broken down
-        target = classContentRE.findall(target)
-        if len(target) == 1:
+        target = items[index]
+        if isinstance(target, list) and len(target) == 1:
             target = target[0]
         extractedTargets.append(target)
-        counter += 1
-        targetText = targetText[end:]
     writer.gsubType6(precedingContext, extractedTargets, trailingContext, replacement)
 
-def _parsePosType1(writer, target, value):
-    # target will only be one item representing
-    # a glyph/class name
-    value = tuple([float(i) for i in value.strip().split(" ")])
-    writer.gposType1(target, value)
-
-def _parsePosType2(writer, targetAndValue):
-    # the target and value will be coming
-    # in as single string.
-    target = " ".join(targetAndValue.split(" ")[:-1])
-    value = targetAndValue.split(" ")[-1]
-    # XXX this could cause a choke
-    value = float(value)
-    target = _parseSequence(target)
-    writer.gposType2(target, value)
-
-def _parsePosType2WithEnum(writer, targetAndValue):
-    # the target and value will be coming
-    # in as single string.
-    target = " ".join(targetAndValue.split(" ")[:-1])
-    value = targetAndValue.split(" ")[-1]
-    # XXX this could cause a choke
-    value = float(value)
-    target = _parseSequence(target)
-    writer.gposType2(target, value)
+def _parseNumber(value):
+    try:
+        return float(value)
+    except ValueError:
+        raise FeaToolsParserSyntaxError("Invalid Syntax: %s" % value)
+
+def _parsePosition(writer, tokens):
+    if "<" in tokens:
+        # target will only be one item representing
+        # a glyph/class name
+        index = tokens.index("<")
+        if tokens[-1] != ">":
+            raise FeaToolsParserSyntaxError("Invalid Syntax: pos %s" % " ".join(tokens))
+        target = " ".join(tokens[:index])
+        value = tuple([_parseNumber(i) for i in tokens[index + 1:-1]])
+        writer.gposType1(target, value)
+    else:
+        if len(tokens) < 2:
+            raise FeaToolsParserSyntaxError("Invalid Syntax: pos %s" % " ".join(tokens))
+        value = _parseNumber(tokens[-1])
+        target = _parseSequence(tokens[:-1])
+        writer.gposType2(target, value)
 
 def _parseLookupFlag(writer, values):
     values = values.replace(",", " ")
@@ -639,21 +422,6 @@ def _parseLookupFlag(writer, values):
             ignoreMarks = True
     writer.lookupFlag(rightToLeft=rightToLeft, ignoreBaseGlyphs=ignoreBaseGlyphs, ignoreLigatures=ignoreLigatures, ignoreMarks=ignoreMarks)
 
-def parseFeatures(writer, text):
-    # strip the strings.
-    # (an alternative approach would be to escape the strings.
-    # the problem is that a string could contain parsable text
-    # that would fool the parsing algorithm.)
-    text = stringRE.sub("", text)
-    # strip the comments
-    text = commentRE.sub("", text)
-    # make sure there is a space after all ;
-    # since it makes the text more digestable
-    # for the regular expressions
-    text = terminatorRE.sub("; ", text)
-    _parseUnknown(writer, text)
-
-
 class AbstractFeatureWriter(object):
 
     def feature(self, name):
@@ -975,6 +743,104 @@ class _KernFeatureLoadingWriter(AbstractFeatureWriter):
 # tests
 # -----
 
+class _TestRecordingWriter(AbstractFeatureWriter):
+
+    def __init__(self):
+        self.calls = []
+
+    def feature(self, name):
+        self.calls.append(("feature", name))
+        return self
+
+    def lookup(self, name):
+        self.calls.append(("lookup", name))
+        return self
+
+    def table(self, name, data):
+        self.calls.append(("table", name, data))
+
+    def featureReference(self, name):
+        self.calls.append(("featureReference", name))
+
+    def lookupReference(self, name):
+        self.calls.append(("lookupReference", name))
+
+    def classDefinition(self, name, contents):
+        self.calls.append(("classDefinition", name, contents))
+
+    def lookupFlag(self, rightToLeft=False, ignoreBaseGlyphs=False, ignoreLigatures=False, ignoreMarks=False):
+        self.calls.append(("lookupFlag", rightToLeft, ignoreBaseGlyphs, ignoreLigatures, ignoreMarks))
+
+    def gsubType1(self, target, replacement):
+        self.calls.append(("gsubType1", target, replacement))
+
+    def gsubType3(self, target, replacement):
+        self.calls.append(("gsubType3", target, replacement))
+
+    def gsubType4(self, target, replacement):
+        self.calls.append(("gsubType4", target, replacement))
+
+    def gsubType6(self, precedingContext, target, trailingContext, replacement):
+        self.calls.append(("gsubType6", precedingContext, target, trailingContext, replacement))
+
+    def gposType1(self, target, value):
+        self.calls.append(("gposType1", target, value))
+
+    def gposType2(self, target, value):
+        self.calls.append(("gposType2", target, value))
+
+    def languageSystem(self, languageTag, scriptTag):
+        self.calls.append(("languageSystem", languageTag, scriptTag))
+
+    def script(self, scriptTag):
+        self.calls.append(("script", scriptTag))
+
+    def language(self, languageTag, includeDefault=True):
+        self.calls.append(("language", languageTag, includeDefault))
+
+    def include(self, path):
+        self.calls.append(("include", path))
+
+    def subtableBreak(self):
+        self.calls.append(("subtableBreak",))
+
+
+_testParse_fea = """
+languagesystem DFLT dflt; # comment with a ; and a {
+@kern1.A = [A Aacute];
+
+feature kern {
+    lookupflag 0;
+    pos @kern1.A T -10;
+    enum pos [A Aacute] V -20;
+    subtable;
+    lookup kern_2 {
+        pos A <0 0 10 0>;
+    } kern_2;
+    lookup kern_2;
+} kern;
+
+feature liga {
+    sub a by a.alt;
+    sub f i by f_i;
+    sub a from [a.alt1 a.alt2];
+    sub x a' [b c]' y by z;
+    ignore sub a b;
+    script latn;
+    language DEU exclude_dflt;
+    include(other.fea)
+} liga;
+
+table hhea {
+    Ascender 750;
+} hhea;
+
+table name {
+    nameid 1 "Name";
+} name;
+"""
+
+
 _testInvalidSyntax_fea = """
 blah;
 """
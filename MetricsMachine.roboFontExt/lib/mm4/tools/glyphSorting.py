@@ -1,4 +1,8 @@
 import unicodedata
+from functools import lru_cache
+
+import defcon
+
 from mm4.tools.moreUnicodeData import recursiveDecomposition
 
 _orderedCategories = """Lu
@@ -33,6 +37,10 @@ Co
 Cn""".splitlines()
 
 
+_categoryRanks = dict((category, rank) for rank, category in enumerate(_orderedCategories))
+_knownLigatures = set("fi fl ff ffi ffl".split(" "))
+
+
 def sortBySuffixAndUnicodeCategoryAndUnicodeValue(glyphs, font):
     """
     >>> font = _setupTestFont()
@@ -40,107 +48,118 @@ def sortBySuffixAndUnicodeCategoryAndUnicodeValue(glyphs, font):
     >>> glyphList = [glyph.name for glyph in glyphs]
     >>> glyphList == _expectedTestResult
     True
+
+    The name derived sort data is cached per glyph and only
+    rebuilt when the name or the unicodes change.
+
+    >>> glyph = font["Aacute"]
+    >>> glyph.getRepresentation(sortKeyDataRepresentationName) is glyph.getRepresentation(sortKeyDataRepresentationName)
+    True
+    >>> glyph.unicodes = []
+    >>> glyph.getRepresentation(sortKeyDataRepresentationName)[1] is None
+    True
+    >>> glyphList = [glyph.name for glyph in sortBySuffixAndUnicodeCategoryAndUnicodeValue(font, font)]
+    >>> glyphList.index("Aacute") > glyphList.index("Z")
+    True
     """
-    categoryToSuffixToGlyphNames = {}
-    glyphNameToGlyph = {}
+    unicodeForGlyphName = font.unicodeData.unicodeForGlyphName
+    # gather the unicode value and the bucket of each glyph
+    records = []
+    bucketGlyphs = set()
     for glyph in glyphs:
-        glyphName = glyph.name
-        uniValue = glyph.unicode
-        # glyph object
-        glyphNameToGlyph[glyphName] = glyph
-        # handle ligatures
-        if uniValue is None and "_" in glyphName:
-            first = glyphName.split("_")[0]
-            uniValue = font.unicodeData.unicodeForGlyphName(first)
-        # unicode value
-        if uniValue is None:
-            if "." in glyphName and not glyphName.startswith("."):
-                base = glyphName.split(".")[0]
-                uniValue = font.unicodeData.unicodeForGlyphName(base)
+        glyphName, uniValue, fallbackNames, suffix, fullSuffix, isLigature = glyph.getRepresentation(sortKeyDataRepresentationName)
+        for fallbackName in fallbackNames:
+            if uniValue is not None:
+                break
+            uniValue = unicodeForGlyphName(fallbackName)
         if uniValue is not None and not isinstance(uniValue, int):
             uniValue = uniValue[0]
-        # unicode category
+        rank, category, decomposition = _getUnicodeSortData(uniValue)
+        # None sorts before any suffix
+        bucket = (rank, category, suffix is not None, suffix or "")
+        records.append((glyph, glyphName, uniValue, decomposition, fullSuffix, bucket, isLigature))
         if uniValue is not None:
-            category = unicodedata.category(chr(uniValue))
-        else:
-            category = None
-        # suffix
-        if "." not in glyphName or glyphName.startswith("."):
-            suffix = None
-        else:
-            suffix = glyphName.split(".")[1]
-        # store the data
-        if category not in categoryToSuffixToGlyphNames:
-            categoryToSuffixToGlyphNames[category] = {}
-        if suffix not in categoryToSuffixToGlyphNames[category]:
-            categoryToSuffixToGlyphNames[category][suffix] = []
-        categoryToSuffixToGlyphNames[category][suffix].append((uniValue, glyphName))
-    # order the categories
-    sortedCategories = []
-    for category in categoryToSuffixToGlyphNames.keys():
-        if category not in _orderedCategories:
-            rank = 999999
+            bucketGlyphs.add((bucket, glyphName))
+    # build the sort keys
+    uniValues = {}
+    for glyph, glyphName, uniValue, decomposition, fullSuffix, bucket, isLigature in records:
+        uniValues[glyphName] = uniValue
+    keyed = []
+    for glyph, glyphName, uniValue, decomposition, fullSuffix, bucket, isLigature in records:
+        if uniValue is None:
+            key = bucket + (isLigature, 1, glyphName)
         else:
-            rank = _orderedCategories.index(category)
-        sortedCategories.append((rank, category))
-    sortedCategories = [category for rank, category in sorted(sortedCategories)]
-    # subsort the glyphs within each suffix
-    for category, suffixToGlyphNames in categoryToSuffixToGlyphNames.items():
-        for suffix, glyphList in suffixToGlyphNames.items():
-            withUniValue = []
-            withoutUniValue = []
-            withBase = {}
-            for uniValue, glyphName in glyphList:
-                if uniValue is not None:
-                    withUniValue.append((uniValue, glyphName))
-                    # catch all glyphs that can be decomposed
-                    decomposition = recursiveDecomposition(uniValue)
-                    if decomposition != -1 and decomposition in font.unicodeData:
-                        base = font.unicodeData[decomposition][0]
-                        if "." in glyphName:
-                            suffix = glyphName.split(".", 1)[1]
-                            baseWithSuffix = base + "." + suffix
-                            if baseWithSuffix in font:
-                                base = baseWithSuffix
-                        if base not in withBase:
-                            withBase[base] = set()
-                        withBase[base].add((uniValue, glyphName))
-                else:
-                    withoutUniValue.append(glyphName)
-            withUniValue.sort()
-            withoutUniValue.sort()
-            withUniValue = [glyphName for uniValue, glyphName in withUniValue]
-            # group the decomposable glyphs with their bases
-            for base, glyphList in withBase.items():
-                if base not in withUniValue:
-                    continue
-                sortedGlyphList = []
-                for uniValue, glyphName in sorted(glyphList):
-                    withUniValue.remove(glyphName)
-                    sortedGlyphList.append(glyphName)
-                index = withUniValue.index(base) + 1
-                for glyphName in reversed(sortedGlyphList):
-                    withUniValue.insert(index, glyphName)
-            sortedGlyphNames = withUniValue + withoutUniValue
-            categoryToSuffixToGlyphNames[category][suffix] = sortedGlyphNames
+            key = bucket + (isLigature, 0, uniValue, glyphName)
+            # glyphs that can be decomposed follow their base
+            # when the base is in the same bucket.
+            if decomposition != -1 and decomposition in font.unicodeData:
+                base = font.unicodeData[decomposition][0]
+                if fullSuffix is not None:
+                    baseWithSuffix = base + "." + fullSuffix
+                    if baseWithSuffix in font:
+                        base = baseWithSuffix
+                if base != glyphName and (bucket, base) in bucketGlyphs:
+                    key = bucket + (isLigature, 0, uniValues[base], base, uniValue, glyphName)
+        keyed.append((key, glyph))
+    keyed.sort(key=_firstItem)
+    return [glyph for key, glyph in keyed]
 
-    # create the final order
-    sortedGlyphNames = []
-    knownLigatures = set("fi fl ff ffi ffl".split(" "))
-    for category in sortedCategories:
-        suffixToGlyphNames = categoryToSuffixToGlyphNames[category]
-        for suffix, glyphList in sorted(suffixToGlyphNames.items()):
-            holdingLigatures = []
-            for glyphName in glyphList:
-                if glyphName.split(".")[0] in knownLigatures or "_" in glyphName:
-                    holdingLigatures.append(glyphName)
-                else:
-                    sortedGlyphNames.append(glyphName)
-            sortedGlyphNames += holdingLigatures
-    # turn it back into glyphs
-    glyphs = [glyphNameToGlyph[glyphName] for glyphName in sortedGlyphNames]
-    # finished
-    return glyphs
+
+def _firstItem(item):
+    return item[0]
+
+
+@lru_cache(maxsize=None)
+def _getUnicodeSortData(uniValue):
+    if uniValue is None:
+        return len(_orderedCategories), None, -1
+    category = unicodedata.category(chr(uniValue))
+    rank = _categoryRanks.get(category, len(_orderedCategories))
+    return rank, category, recursiveDecomposition(uniValue)
+
+
+# --------------
+# Representation
+# --------------
+
+sortKeyDataRepresentationName = "metricsMachine.sortKeyData"
+
+
+def sortKeyDataFactory(glyph):
+    """
+    The parts of the sort data that depend only on the
+    glyph name and the glyph unicode value.
+    """
+    glyphName = glyph.name
+    uniValue = glyph.unicode
+    # names to take a unicode value from
+    # if the glyph doesn't have one.
+    fallbackNames = []
+    if uniValue is None:
+        # handle ligatures
+        if "_" in glyphName:
+            fallbackNames.append(glyphName.split("_")[0])
+        if "." in glyphName and not glyphName.startswith("."):
+            fallbackNames.append(glyphName.split(".")[0])
+    # suffix
+    if "." not in glyphName or glyphName.startswith("."):
+        suffix = None
+    else:
+        suffix = glyphName.split(".")[1]
+    if "." in glyphName:
+        fullSuffix = glyphName.split(".", 1)[1]
+    else:
+        fullSuffix = None
+    isLigature = glyphName.split(".")[0] in _knownLigatures or "_" in glyphName
+    return glyphName, uniValue, tuple(fallbackNames), suffix, fullSuffix, isLigature
+
+
+defcon.registerRepresentationFactory(
+    defcon.Glyph,
+    sortKeyDataRepresentationName,
+    sortKeyDataFactory,
+    destructiveNotifications=["Glyph.NameChanged", "Glyph.UnicodesChanged"]
+)
 
 
 def _setupTestFont():
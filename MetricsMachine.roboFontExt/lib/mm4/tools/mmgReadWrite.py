@@ -0,0 +1,242 @@
+from xml.etree.ElementTree import fromstring, ParseError
+from fontTools.misc.xmlWriter import escape, escapeattr
+from ufo2fdk.kernFeatureWriter import side1Prefix, side2Prefix
+
+
+def parseMMG(text):
+    """
+    Read the kerning groups in MMG text. The elements are
+    walked once and every problem is collected instead of
+    stopping at the first one. This returns a dict of group
+    name : (glyph names, color), a list of errors that make
+    the file unusable and a list of conflicts. A conflict
+    does not stop the import. When a group is defined twice
+    the last definition is used. When a glyph is in more
+    than one group of the same side, the last group, sorted
+    by name, gets it.
+
+    >>> groups, errors, conflicts = parseMMG(_testMMG)
+    >>> for groupName, (glyphNames, color) in sorted(groups.items()):
+    ...     print(groupName, list(glyphNames), color)
+    public.kern1.A ['A', 'A.alt1'] (1.0, 0.0, 0.0, 0.5)
+    public.kern1.B ['B', 'A.alt1'] None
+    public.kern1.bad$name [] None
+    public.kern2.B ['B'] None
+    >>> errors
+    []
+    >>> for conflict in conflicts:
+    ...     print(conflict)
+    The side 2 group B is defined more than once.
+    The group name public.kern1.bad$name is not valid.
+    Glyph A.alt1 is in more than one side 1 group: A, B.
+
+    >>> groups, errors, conflicts = parseMMG(_testInvalidMMG)
+    >>> for error in errors:
+    ...     print(error)
+    The group A does not have a valid side.
+    The group B does not have a valid color.
+    The group C contains something other than glyphs.
+    The group D has more than one glyph list.
+    >>> sorted(groups)
+    ['public.kern2.E']
+
+    >>> parseMMG("<xml>")
+    ({}, ['Invalid XML syntax.'], [])
+    """
+    from mm4.objects.mmGroups import validateGroupName
+    groups = {}
+    errors = []
+    conflicts = []
+    try:
+        tree = fromstring(text)
+    except ParseError:
+        errors.append("Invalid XML syntax.")
+        return groups, errors, conflicts
+    for element in tree:
+        if element.tag != "group":
+            continue
+        if element.get("type") != "kerning":
+            continue
+        name = element.get("name", "")
+        side = element.get("side")
+        if side == "left" or side == "side1":
+            groupName = side1Prefix + name
+            side = 1
+        elif side == "right" or side == "side2":
+            groupName = side2Prefix + name
+            side = 2
+        else:
+            errors.append("The group %s does not have a valid side." % name)
+            continue
+        color = element.get("color")
+        if color:
+            try:
+                color = tuple([float(i) for i in color.split(" ") if i])
+            except ValueError:
+                errors.append("The group %s does not have a valid color." % name)
+                continue
+        else:
+            color = None
+        glyphNames = None
+        for subelement in element:
+            if subelement.tag != "glyphs":
+                errors.append("The group %s contains something other than glyphs." % name)
+                break
+            if glyphNames is not None:
+                errors.append("The group %s has more than one glyph list." % name)
+                break
+            # drop repeated glyph names but keep the order
+            glyphNames = list(dict.fromkeys(i.strip() for i in (subelement.text or "").splitlines() if i.strip()))
+        else:
+            if glyphNames is None:
+                glyphNames = []
+            if groupName in groups:
+                conflicts.append("The side %d group %s is defined more than once." % (side, name))
+            groups[groupName] = (glyphNames, color)
+    # check the group names and the glyph to group relationships
+    for prefix, side in ((side1Prefix, 1), (side2Prefix, 2)):
+        glyphToGroups = {}
+        for groupName in sorted(groups):
+            if not groupName.startswith(prefix):
+                continue
+            if not validateGroupName(groupName):
+                conflicts.append("The group name %s is not valid." % groupName)
+            for glyphName in groups[groupName][0]:
+                if glyphName not in glyphToGroups:
+                    glyphToGroups[glyphName] = []
+                glyphToGroups[glyphName].append(groupName[len(prefix):])
+        for glyphName, groupNames in sorted(glyphToGroups.items()):
+            if len(groupNames) > 1:
+                conflicts.append("Glyph %s is in more than one side %d group: %s." % (glyphName, side, ", ".join(groupNames)))
+    return groups, errors, conflicts
+
+
+def formatMMG(side1Groups, side2Groups, colors, defaultColor=None):
+    """
+    Write MMG text for dicts of group name : glyph names.
+    The groups and the glyphs are written in sorted order.
+    A color is only written when it is in the colors dict
+    and it is not defaultColor. The text is the same as
+    the text that fontTools' XMLWriter would write.
+
+    >>> side1Groups = {"public.kern1.A" : ["A.alt1", "A"]}
+    >>> side2Groups = {"public.kern2.B&C" : ["C", "B"], "public.kern2.A" : []}
+    >>> colors = {"public.kern1.A" : (1, 0.333, 0, 0.5), "public.kern2.A" : (0, 0, 0, 1)}
+    >>> print(formatMMG(side1Groups, side2Groups, colors, defaultColor=(0, 0, 0, 1)))
+    <?xml version="1.0" encoding="UTF-8"?>
+    <xml>
+      <group color="1.0 0.33 0.0 0.5" name="A" side="side1" type="kerning">
+        <glyphs>
+          A
+          A.alt1
+        </glyphs>
+      </group>
+      <group name="A" side="side2" type="kerning">
+        <glyphs>
+        </glyphs>
+      </group>
+      <group name="B&amp;C" side="side2" type="kerning">
+        <glyphs>
+          B
+          C
+        </glyphs>
+      </group>
+    </xml>
+    """
+    lines = [
+        '<?xml version="1.0" encoding="UTF-8"?>',
+        "<xml>"
+    ]
+    for groups, side in ((side1Groups, "side1"), (side2Groups, "side2")):
+        for groupName in sorted(groups):
+            name = escapeattr(groupName[len(side1Prefix):])
+            color = colors.get(groupName, defaultColor)
+            if color != defaultColor:
+                color = escapeattr(" ".join([str(round(float(i), 2)) for i in color]))
+                lines.append('  <group color="%s" name="%s" side="%s" type="kerning">' % (color, name, side))
+            else:
+                lines.append('  <group name="%s" side="%s" type="kerning">' % (name, side))
+            lines.append("    <glyphs>")
+            for glyphName in sorted(groups[groupName]):
+                lines.append("      " + escape(glyphName))
+            lines.append("    </glyphs>")
+            lines.append("  </group>")
+    lines.append("</xml>")
+    return "\n".join(lines)
+
+
+# ----------
+# test files
+# ----------
+
+_testMMG = """<?xml version="1.0" encoding="UTF-8"?>
+<xml>
+  <group name="A" side="side1" type="kerning" color="1 0 0 .5">
+    <glyphs>
+      A
+      A.alt1
+    </glyphs>
+  </group>
+  <group name="B" side="left" type="kerning">
+    <glyphs>
+      B
+      A.alt1
+      B
+    </glyphs>
+  </group>
+  <group name="B" side="side2" type="kerning">
+    <glyphs>
+      X
+    </glyphs>
+  </group>
+  <group name="B" side="right" type="kerning">
+    <glyphs>
+      B
+    </glyphs>
+  </group>
+  <group name="bad$name" side="side1" type="kerning">
+    <glyphs></glyphs>
+  </group>
+  <group name="reference" type="reference">
+    <glyphs>
+      A
+    </glyphs>
+  </group>
+</xml>
+"""
+
+_testInvalidMMG = """<?xml version="1.0" encoding="UTF-8"?>
+<xml>
+  <group name="A" side="top" type="kerning">
+    <glyphs>
+      A
+    </glyphs>
+  </group>
+  <group name="B" side="side1" type="kerning" color="red">
+    <glyphs>
+      B
+    </glyphs>
+  </group>
+  <group name="C" side="side1" type="kerning">
+    <glyph>C</glyph>
+  </group>
+  <group name="D" side="side1" type="kerning">
+    <glyphs>
+      D
+    </glyphs>
+    <glyphs>
+      D.alt1
+    </glyphs>
+  </group>
+  <group name="E" side="side2" type="kerning">
+    <glyphs>
+      E
+    </glyphs>
+  </group>
+</xml>
+"""
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
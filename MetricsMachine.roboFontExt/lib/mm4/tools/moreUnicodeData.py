@@ -1729,6 +1729,8 @@ F0000..FFFFF; Supplementary Private Use Area-A
 """
 
 import unicodedata
+from array import array
+from bisect import bisect_right
 
 # load the data
 
@@ -1754,45 +1756,120 @@ def _parse(text):
     return result
 
 
-_scripts = _parse(_scriptsText)
-_blocks = _parse(_blocksText)
+def _compile(text):
+    """
+    Compile the ranges in text into parallel start, end and
+    name index arrays that can be searched with bisect.
+
+    >>> starts, ends, nameIndexes, names = _compile(_scriptsText)
+    >>> len(starts) == len(ends) == len(nameIndexes)
+    True
+    >>> names[nameIndexes[bisect_right(starts, 0x41) - 1]]
+    'Latin'
+    """
+    starts = array("l")
+    ends = array("l")
+    nameIndexes = array("H")
+    names = []
+    nameToIndex = {}
+    for minValue, maxValue, name in _parse(text):
+        index = nameToIndex.get(name)
+        if index is None:
+            index = nameToIndex[name] = len(names)
+            names.append(name)
+        starts.append(minValue)
+        ends.append(maxValue)
+        nameIndexes.append(index)
+    return starts, ends, nameIndexes, tuple(names)
+
+
+# the tables are only compiled when they are first needed
+_tableTexts = dict(scripts=_scriptsText, blocks=_blocksText)
+_tables = {}
+
+
+def _getTable(key):
+    table = _tables.get(key)
+    if table is None:
+        table = _tables[key] = _compile(_tableTexts[key])
+    return table
 
 # functions
 
 
 def script(value):
-    scriptName = _search(value, _scripts)
+    """
+    >>> script(0x41)
+    'Latin'
+    >>> script(0x0627)
+    'Arabic'
+    >>> script(0x0378)
+    'Unknown'
+    """
+    scriptName = _search(value, _getTable("scripts"))
     if scriptName is None:
         scriptName = "Unknown"
     return scriptName
 
 
 def block(value):
-    blockName = _search(value, _blocks)
+    """
+    >>> block(0x41)
+    'Basic Latin'
+    >>> block(0x2FE0)
+    'No_Block'
+    """
+    blockName = _search(value, _getTable("blocks"))
     if blockName is None:
         blockName = "No_Block"
     return blockName
 
 
-def _search(value, available):
-    count = len(available)
-    if count == 0:
+def scripts(values):
+    """
+    Get the script for each value in values. None values
+    are reported as Unknown.
+
+    >>> scripts([0x41, 0x0627, None, 0x41])
+    ['Latin', 'Arabic', 'Unknown', 'Latin']
+    """
+    return _searchMany(values, _getTable("scripts"), "Unknown")
+
+
+def blocks(values):
+    """
+    Get the block for each value in values. None values
+    are reported as No_Block.
+
+    >>> blocks([0x41, 0x0410, None])
+    ['Basic Latin', 'Cyrillic', 'No_Block']
+    """
+    return _searchMany(values, _getTable("blocks"), "No_Block")
+
+
+def _search(value, table):
+    starts, ends, nameIndexes, names = table
+    index = bisect_right(starts, value) - 1
+    if index < 0 or value > ends[index]:
         return None
-    elif count == 1:
-        test = available[0]
-        lessRange = greaterRange = []
-    else:
-        half = int(count / 2)
-        test = available[half]
-        lessRange = available[:half]
-        greaterRange = available[half:]
-    minValue, maxValue, name = test
-    if value < minValue:
-        return _search(value, lessRange)
-    elif value > maxValue:
-        return _search(value, greaterRange)
-    else:
-        return name
+    return names[nameIndexes[index]]
+
+
+def _searchMany(values, table, default):
+    starts, ends, nameIndexes, names = table
+    found = {None: default}
+    result = []
+    for value in values:
+        name = found.get(value)
+        if name is None:
+            index = bisect_right(starts, value) - 1
+            if index < 0 or value > ends[index]:
+                name = default
+            else:
+                name = names[nameIndexes[index]]
+            found[value] = name
+        result.append(name)
+    return result
 
 
 def recursiveDecomposition(uniValue):
@@ -1818,3 +1895,8 @@ def recursiveDecomposition(uniValue):
         else:
             decomposedUniValue = furtherDecomposedUniValue
     return decomposedUniValue
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -5,7 +5,17 @@ from .scripting import (
     testGlyph,
     testLayer,
     testFont,
+    writeLayerReport,
+    writeFontReport,
     formatGlyphReport,
     formatLayerReport,
     formatFontReport
+)
+from .fontAudit import FontAuditor
+from .reportWriters import (
+    MarkdownReportWriter,
+    JSONLinesReportWriter,
+    SARIFReportWriter,
+    ReportSummary,
+    compareReportSummaries
 )
\ No newline at end of file
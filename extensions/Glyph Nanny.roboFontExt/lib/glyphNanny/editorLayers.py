@@ -540,6 +540,78 @@ class GlyphNannyEditorDisplayManager(Subscriber):
                         **textProperties
                     )
 
+    def visualize_nearDuplicateContours(self, glyph, layer, data):
+        layer.clearSublayers()
+        if data:
+            for contourIndex, bounds in data:
+                contour = self.glyph[contourIndex]
+                path = contour.getRepresentation("merz.CGPath")
+                pathLayer = layer.appendPathSublayer(
+                    path=path,
+                    fillColor=None,
+                    strokeColor=self.colorReview,
+                    strokeWidth=self.lineWidthHighlight
+                )
+                if self.showTitles:
+                    textProperties = self.getTextProperties()
+                    textProperties["fillColor"] = self.colorReview
+                    textProperties["verticalAlignment"] = "top"
+                    xMin, yMin, xMax, yMax = contour.bounds
+                    x, y = calculateMidpoint((xMin, yMin), (xMax, yMax))
+                    pathLayer.appendTextLineSublayer(
+                        text="Near Duplicate Contour",
+                        position=(x, yMin),
+                        **textProperties
+                    )
+
+    def visualize_layerDuplicateContours(self, glyph, layer, data):
+        layer.clearSublayers()
+        if data:
+            for contourIndex, bounds, glyphNames in data:
+                contour = self.glyph[contourIndex]
+                path = contour.getRepresentation("merz.CGPath")
+                pathLayer = layer.appendPathSublayer(
+                    path=path,
+                    fillColor=None,
+                    strokeColor=self.colorInform,
+                    strokeWidth=self.lineWidthHighlight
+                )
+                if self.showTitles:
+                    textProperties = self.getTextProperties()
+                    textProperties["fillColor"] = self.colorInform
+                    textProperties["verticalAlignment"] = "top"
+                    xMin, yMin, xMax, yMax = contour.bounds
+                    x, y = calculateMidpoint((xMin, yMin), (xMax, yMax))
+                    pathLayer.appendTextLineSublayer(
+                        text="Also In: " + ", ".join(glyphNames),
+                        position=(x, yMin),
+                        **textProperties
+                    )
+
+    def visualize_overlappingComponents(self, glyph, layer, data):
+        layer.clearSublayers()
+        if data:
+            for componentIndexes, bounds in data:
+                for componentIndex in componentIndexes:
+                    component = self.glyph.components[componentIndex]
+                    path = component.getRepresentation("merz.CGPath")
+                    layer.appendPathSublayer(
+                        path=path,
+                        fillColor=None,
+                        strokeColor=self.colorReview,
+                        strokeWidth=self.lineWidthHighlight
+                    )
+                if self.showTitles:
+                    textProperties = self.getTextProperties()
+                    textProperties["fillColor"] = self.colorReview
+                    xMin, yMin, xMax, yMax = bounds
+                    x, y = calculateMidpoint((xMin, yMin), (xMax, yMax))
+                    layer.appendTextLineSublayer(
+                        text="Overlapping Components",
+                        position=(x, y),
+                        **textProperties
+                    )
+
     # Contour
     # -------
 
@@ -0,0 +1,957 @@
+"""
+Tools for auditing a complete layer.
+
+The glyphs can be tested in a pool of worker processes.
+The workers are sent the glyph outlines, not the font
+objects, and they rebuild a bare defcon font from them.
+The reports can be kept in a cache file that is keyed
+by a digest of each glyph's content, so that only the
+glyphs that have changed since the last audit are tested.
+"""
+
+import os
+import math
+import pickle
+import hashlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import defcon
+from fontTools.ufoLib import fontInfoAttributesVersion3
+from fontTools.pens.recordingPen import RecordingPointPen
+from fontPens.digestPointPen import DigestPointPen
+from .tests.registry import testRegistry
+from .tests.metrics import guessLigatureParts
+from .tests.contourArrays import representationName as contourArraysRepresentationName
+from .tests.glyph import duplicateContourTolerance
+from .tests.geometryIndex import (
+    ContourShape,
+    getContourShape,
+    getOutlineContourPoints,
+    iterNeighborKeys
+)
+
+# Increment this whenever a test changes
+# the data that it returns.
+cacheVersion = 1
+
+# -----------
+# Test Levels
+# -----------
+
+glyphLevels = ("glyphInfo", "metrics", "glyph")
+contourLevels = ("contour", "segment", "point")
+
+def sortTests(tests):
+    """
+    Sort the test identifiers into glyph level tests
+    and contour level tests, in the order that they
+    are listed in a glyph report.
+    """
+    objectLevels = {}
+    for testIdentifier in sorted(tests):
+        level = testRegistry[testIdentifier]["level"]
+        if level not in objectLevels:
+            objectLevels[level] = []
+        objectLevels[level].append(testIdentifier)
+    glyphLevelTests = []
+    for level in glyphLevels:
+        glyphLevelTests += objectLevels.get(level, [])
+    contourLevelTests = []
+    for level in contourLevels:
+        contourLevelTests += objectLevels.get(level, [])
+    return glyphLevelTests, contourLevelTests
+
+def runTests(glyph, contours, glyphLevelTests, contourLevelTests):
+    """
+    Run the tests on the glyph. This returns a dict of
+    test identifier : result. The result of a contour
+    level test is a list with one item per contour.
+    """
+    stub = "GlyphNanny."
+    results = {}
+    for testIdentifier in glyphLevelTests:
+        results[testIdentifier] = glyph.getRepresentation(stub + testIdentifier)
+    for testIdentifier in contourLevelTests:
+        results[testIdentifier] = [
+            contour.getRepresentation(stub + testIdentifier)
+            for contour in contours
+        ]
+    return results
+
+def assembleGlyphReport(results, glyphLevelTests, contourLevelTests):
+    """
+    Convert the results from runTests to a glyph report.
+    """
+    report = {}
+    for testIdentifier in glyphLevelTests:
+        report[testIdentifier] = results[testIdentifier]
+    contourCount = 0
+    if contourLevelTests:
+        contourCount = len(results[contourLevelTests[0]])
+    for contourIndex in range(contourCount):
+        for testIdentifier in contourLevelTests:
+            key = f"contour{contourIndex}: {testIdentifier}"
+            report[key] = results[testIdentifier][contourIndex]
+    return report
+
+# -------------
+# Serialization
+# -------------
+
+def serializeGlyph(glyph):
+    pen = RecordingPointPen()
+    glyph.drawPoints(pen)
+    return dict(
+        width=glyph.width,
+        unicodes=list(glyph.unicodes),
+        outline=pen.value
+    )
+
+def serializeInfo(info):
+    data = {}
+    if info is None:
+        return data
+    for attr in sorted(fontInfoAttributesVersion3):
+        if attr == "guidelines":
+            continue
+        value = getattr(info, attr)
+        if value is None:
+            continue
+        data[attr] = value
+    return data
+
+def serializeLayer(layer, glyphNames):
+    info = None
+    if layer.font is not None:
+        info = layer.font.info
+    glyphs = {}
+    for name in glyphNames:
+        glyphs[name] = serializeGlyph(layer[name])
+    return dict(
+        info=serializeInfo(info),
+        glyphs=glyphs
+    )
+
+def buildFont(data):
+    font = defcon.Font()
+    for attr, value in data["info"].items():
+        setattr(font.info, attr, value)
+    for name, glyphData in data["glyphs"].items():
+        glyph = font.newGlyph(name)
+        glyph.width = glyphData["width"]
+        glyph.unicodes = glyphData["unicodes"]
+        pointPen = glyph.getPointPen()
+        for method, args, kwargs in glyphData["outline"]:
+            getattr(pointPen, method)(*args, **kwargs)
+    return font
+
+# -------
+# Digests
+# -------
+
+def _makeDigest(data):
+    return hashlib.sha1(repr(data).encode("utf-8")).hexdigest()
+
+def getGlyphContentDigest(name, glyphData):
+    """
+    Get a digest of the name, width, Unicode values
+    and outline of a serialized glyph.
+    """
+    pen = DigestPointPen()
+    for method, args, kwargs in glyphData["outline"]:
+        getattr(pen, method)(*args, **kwargs)
+    return _makeDigest((name, glyphData["width"], glyphData["unicodes"], pen.getDigest()))
+
+def getGlyphDependencies(name, baseGlyphs, glyphNames):
+    """
+    Get the names of the glyphs that the test results of
+    a glyph depend on: the component base glyphs and the
+    presumed ligature parts. The names are not required
+    to be in glyphNames.
+    """
+    dependencies = set(baseGlyphs)
+    if "_" in name:
+        dependencies.update(guessLigatureParts(name, glyphNames))
+    dependencies.discard(name)
+    dependencies.discard(None)
+    return sorted(dependencies)
+
+def _getSerializedBaseGlyphs(glyphData):
+    return [
+        args[0]
+        for method, args, kwargs in glyphData["outline"]
+        if method == "addComponent"
+    ]
+
+def getShapeKeys(contourShapes):
+    """
+    Get the set of ShapeIndex keys of the
+    contour shapes of a glyph.
+    """
+    keys = set()
+    for shape in contourShapes:
+        key = shape.getKey(duplicateContourTolerance)
+        if key is not None:
+            keys.add(key)
+    return keys
+
+def getShapePeers(shapeKeys, shapeKeyToGlyphs):
+    """
+    Get the names of the glyphs that may have a contour
+    that is within tolerance of a contour with one of
+    the shape keys.
+    """
+    peers = set()
+    for key in shapeKeys:
+        for neighborKey in iterNeighborKeys(key):
+            peers.update(shapeKeyToGlyphs.get(neighborKey, ()))
+    return peers
+
+def getCacheKeys(data):
+    """
+    Get a cache key for each glyph in serialized layer data.
+    A key changes when the glyph's content, the content of
+    the glyphs that it depends on, the content of the glyphs
+    that have contours with shapes like its contours, the
+    font info or any Unicode value in the layer changes.
+    """
+    glyphs = data["glyphs"]
+    context = _makeDigest((
+        cacheVersion,
+        sorted(data["info"].items()),
+        sorted((name, glyphData["unicodes"]) for name, glyphData in glyphs.items())
+    ))
+    contentDigests = {}
+    shapeKeys = {}
+    shapeKeyToGlyphs = {}
+    for name, glyphData in glyphs.items():
+        contentDigests[name] = getGlyphContentDigest(name, glyphData)
+        shapeKeys[name] = getShapeKeys(
+            ContourShape(points) for points in getOutlineContourPoints(glyphData["outline"])
+        )
+        for key in shapeKeys[name]:
+            if key not in shapeKeyToGlyphs:
+                shapeKeyToGlyphs[key] = set()
+            shapeKeyToGlyphs[key].add(name)
+    keys = {}
+
+    def getKey(name, visiting):
+        if name in keys:
+            return keys[name]
+        if name in visiting:
+            return contentDigests[name]
+        visiting.add(name)
+        dependencies = getGlyphDependencies(name, _getSerializedBaseGlyphs(glyphs[name]), glyphs)
+        peers = getShapePeers(shapeKeys[name], shapeKeyToGlyphs)
+        peers.discard(name)
+        key = _makeDigest((
+            context,
+            contentDigests[name],
+            [getKey(dependency, visiting) for dependency in dependencies if dependency in glyphs],
+            [contentDigests[peer] for peer in sorted(peers)]
+        ))
+        visiting.discard(name)
+        keys[name] = key
+        return key
+
+    for name in glyphs:
+        getKey(name, set())
+    return keys
+
+# -----
+# Cache
+# -----
+
+class ReportCache(object):
+
+    """
+    A persistent store of test results keyed by
+    the keys from getCacheKeys. Only the entries
+    that were used since the cache was loaded are
+    written when the cache is saved.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._entries = {}
+        self._usedEntries = {}
+        self.load()
+
+    def load(self):
+        self._entries = {}
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "rb") as f:
+                data = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            return
+        if not isinstance(data, dict) or data.get("version") != cacheVersion:
+            return
+        self._entries = data["entries"]
+
+    def save(self):
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        data = dict(
+            version=cacheVersion,
+            entries=self._usedEntries
+        )
+        tempPath = self.path + ".tmp"
+        with open(tempPath, "wb") as f:
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tempPath, self.path)
+
+    def get(self, key):
+        """
+        Get a dict of test identifier : result for the key.
+        """
+        entry = self._entries.get(key, {})
+        self._usedEntries[key] = entry
+        return entry
+
+    def update(self, key, results):
+        entry = self.get(key)
+        entry.update(results)
+        self._entries[key] = entry
+
+# -------
+# Workers
+# -------
+
+_workerFont = None
+
+def _initializeWorker(data):
+    global _workerFont
+    # import to trigger the registration
+    # of the representation factories
+    from . import tests
+    _workerFont = buildFont(data)
+
+def _testGlyphsInWorker(glyphNames, glyphLevelTests, contourLevelTests):
+    results = {}
+    for name in glyphNames:
+        glyph = _workerFont[name]
+        results[name] = runTests(glyph, list(glyph), glyphLevelTests, contourLevelTests)
+    return results
+
+# -----
+# Audit
+# -----
+
+def auditLayer(
+        layer,
+        glyphNames,
+        tests,
+        processes=None,
+        cachePath=None,
+        progressBar=None
+    ):
+    """
+    Test the glyphs in the layer and return a dict of
+    glyph name : glyph report. layer may be a defcon or
+    a fontParts layer. processes is the number of worker
+    processes. If it is None, one per CPU is used. If it
+    is 1, the glyphs are tested in this process. If
+    cachePath is given, results are loaded from and
+    stored in the cache file at that path.
+    """
+    return dict(
+        iterAuditLayer(
+            layer,
+            glyphNames,
+            tests,
+            processes=processes,
+            cachePath=cachePath,
+            progressBar=progressBar
+        )
+    )
+
+def iterAuditLayer(
+        layer,
+        glyphNames,
+        tests,
+        processes=None,
+        cachePath=None,
+        progressBar=None
+    ):
+    """
+    The same as auditLayer, but this yields (glyph name,
+    glyph report) pairs in the order of glyphNames while
+    the glyphs are being tested. See iterLayerTestResults.
+    """
+    glyphLevelTests, contourLevelTests = sortTests(tests)
+    results = iterLayerTestResults(
+        layer,
+        glyphNames,
+        tests,
+        processes=processes,
+        cachePath=cachePath,
+        progressBar=progressBar
+    )
+    for name, glyphResults in results:
+        yield name, assembleGlyphReport(glyphResults, glyphLevelTests, contourLevelTests)
+
+def getLayerTestResults(
+        layer,
+        glyphNames,
+        tests,
+        processes=None,
+        cachePath=None,
+        progressBar=None
+    ):
+    """
+    The same as auditLayer, but this returns a dict of
+    glyph name : results from runTests.
+    """
+    return dict(
+        iterLayerTestResults(
+            layer,
+            glyphNames,
+            tests,
+            processes=processes,
+            cachePath=cachePath,
+            progressBar=progressBar
+        )
+    )
+
+def iterLayerTestResults(
+        layer,
+        glyphNames,
+        tests,
+        processes=None,
+        cachePath=None,
+        progressBar=None
+    ):
+    """
+    The same as getLayerTestResults, but this yields
+    (glyph name, results) pairs in the order of glyphNames.
+    The results of a glyph are yielded as soon as they,
+    and the results of the glyphs before it, are complete.
+    They are not kept after that.
+    """
+    if not isinstance(layer, defcon.Layer):
+        layer = layer.naked()
+    if processes is None:
+        processes = os.cpu_count() or 1
+    glyphLevelTests, contourLevelTests = sortTests(tests)
+    testIdentifiers = glyphLevelTests + contourLevelTests
+    data = None
+    if cachePath is not None or processes != 1:
+        data = serializeLayer(layer, glyphNames)
+    # load what can be loaded from the cache
+    cache = None
+    cacheKeys = {}
+    results = {}
+    pending = {}
+    if cachePath is not None:
+        cache = ReportCache(cachePath)
+        cacheKeys = getCacheKeys(data)
+    for name in glyphNames:
+        glyphResults = {}
+        if cache is not None:
+            glyphResults = cache.get(cacheKeys[name])
+        results[name] = {
+            testIdentifier : glyphResults[testIdentifier]
+            for testIdentifier in testIdentifiers
+            if testIdentifier in glyphResults
+        }
+        missing = tuple(
+            testIdentifier for testIdentifier in testIdentifiers
+            if testIdentifier not in glyphResults
+        )
+        if missing:
+            if missing not in pending:
+                pending[missing] = []
+            pending[missing].append(name)
+        elif progressBar is not None:
+            progressBar.update("Analyzing %s..." % name)
+    tested = set()
+    for names in pending.values():
+        tested.update(names)
+    incomplete = set(tested)
+    position = 0
+
+    def release():
+        # yield the complete results at the front
+        # of the glyph order and store them
+        nonlocal position
+        while position < len(glyphNames):
+            name = glyphNames[position]
+            if name in incomplete:
+                break
+            position += 1
+            glyphResults = results.pop(name)
+            if cache is not None and name in tested:
+                cache.update(cacheKeys[name], glyphResults)
+            yield name, glyphResults
+
+    # test the rest
+    yield from release()
+    if processes == 1:
+        testsForGlyph = {}
+        for missing, names in pending.items():
+            missingGlyphLevelTests, missingContourLevelTests = sortTests(missing)
+            # the representations of the tests that look at
+            # other glyphs aren't destroyed when the other
+            # glyphs change, so they may be stale.
+            staleTests = [
+                testIdentifier for testIdentifier in missingGlyphLevelTests
+                if testRegistry[testIdentifier]["level"] in crossGlyphLevels
+                or testIdentifier in shapePeerTests
+            ]
+            for name in names:
+                testsForGlyph[name] = (missingGlyphLevelTests, missingContourLevelTests, staleTests)
+        for name in glyphNames:
+            if name not in testsForGlyph:
+                continue
+            missingGlyphLevelTests, missingContourLevelTests, staleTests = testsForGlyph[name]
+            if progressBar is not None:
+                progressBar.update("Analyzing %s..." % name)
+            glyph = layer[name]
+            for testIdentifier in staleTests:
+                glyph.destroyRepresentation(testRegistry[testIdentifier]["representationName"])
+            results[name].update(
+                runTests(glyph, list(glyph), missingGlyphLevelTests, missingContourLevelTests)
+            )
+            incomplete.discard(name)
+            yield from release()
+    elif pending:
+        with ProcessPoolExecutor(max_workers=processes, initializer=_initializeWorker, initargs=(data,)) as executor:
+            futures = []
+            for missing, names in pending.items():
+                missingGlyphLevelTests, missingContourLevelTests = sortTests(missing)
+                chunkSize = max(1, int(math.ceil(len(names) / (processes * 4))))
+                for i in range(0, len(names), chunkSize):
+                    futures.append(
+                        executor.submit(
+                            _testGlyphsInWorker,
+                            names[i:i + chunkSize],
+                            missingGlyphLevelTests,
+                            missingContourLevelTests
+                        )
+                    )
+            for future in as_completed(futures):
+                for name, glyphResults in future.result().items():
+                    if progressBar is not None:
+                        progressBar.update("Analyzing %s..." % name)
+                    results[name].update(glyphResults)
+                    incomplete.discard(name)
+                yield from release()
+    # store
+    if cache is not None:
+        cache.save()
+
+# -------
+# Auditor
+# -------
+
+# The tests at these levels may look at glyphs
+# other than the one that they are testing.
+crossGlyphLevels = ("glyphInfo", "metrics")
+
+# These tests compare the contours of a glyph with
+# the contours of the other glyphs in the layer.
+shapePeerTests = ("layerDuplicateContours",)
+
+# Contour notifications that a test is destroyed
+# by and the glyph notification that is posted
+# when they are posted.
+contourToGlyphNotifications = {
+    "Contour.Changed" : "Glyph.Changed",
+    "Contour.PointsChanged" : "Glyph.ContoursChanged"
+}
+
+# Glyph notifications that can change the results
+# of the tests of other glyphs.
+cascadingNotifications = (
+    "Glyph.ContoursChanged",
+    "Glyph.ComponentsChanged",
+    "Glyph.WidthChanged",
+    "Glyph.UnicodesChanged"
+)
+
+layerNotifications = {
+    "Layer.GlyphAdded" : "_layerGlyphAddedNotificationCallback",
+    "Layer.GlyphWillBeDeleted" : "_layerGlyphWillBeDeletedNotificationCallback",
+    "Layer.GlyphDeleted" : "_layerGlyphDeletedNotificationCallback",
+    "Layer.GlyphNameChanged" : "_layerGlyphNameChangedNotificationCallback"
+}
+
+def _resultIsFailure(value):
+    if isinstance(value, dict):
+        return any(value.values())
+    return bool(value)
+
+
+class FontAuditor(object):
+
+    """
+    A live report for a layer of a font.
+
+    The auditor observes the glyphs, the layer and the
+    font info. When something changes, the tests that
+    the change affects are marked for testing in the
+    affected glyphs. A change to a font info attribute
+    only affects the tests that are registered with it.
+    The glyphs are tested the next time that the report
+    is requested. A change to a glyph also affects the
+    glyph level tests of the composites that use it and
+    the ligatures that are made from it.
+    These are found with a reverse dependency index.
+    A change to the contours of a glyph also affects the
+    glyphs that have contours with similar shapes. These
+    are found with an index of the contour shape keys.
+
+    The report is kept as a dict of glyph name : glyph
+    report, and a set of the glyphs that fail each test
+    is kept alongside it.
+
+    font may be a defcon or a fontParts font. processes
+    and cachePath are used for the first audit. See
+    auditLayer. Call close when the auditor is no
+    longer needed.
+    """
+
+    def __init__(self, font, tests=None, layerName=None, processes=1, cachePath=None):
+        if not isinstance(font, defcon.Font):
+            font = font.naked()
+        self.font = font
+        if layerName is None:
+            self.layer = font.layers.defaultLayer
+        else:
+            self.layer = font.layers[layerName]
+        if tests is None:
+            tests = testRegistry.keys()
+        self.tests = sorted(tests)
+        self._glyphLevelTests, self._contourLevelTests = sortTests(self.tests)
+        self._contourLevelTestSet = set(self._contourLevelTests)
+        self._crossGlyphTests = set(
+            testIdentifier for testIdentifier in self._glyphLevelTests
+            if testRegistry[testIdentifier]["level"] in crossGlyphLevels
+        )
+        self._shapePeerTests = set(self._glyphLevelTests) & set(shapePeerTests)
+        self._testsForNotification = {}
+        for testIdentifier in self.tests:
+            destructiveNotifications = testRegistry[testIdentifier]["destructiveNotifications"] or []
+            for notificationName in destructiveNotifications:
+                notificationName = contourToGlyphNotifications.get(notificationName, notificationName)
+                if notificationName not in self._testsForNotification:
+                    self._testsForNotification[notificationName] = set()
+                self._testsForNotification[notificationName].add(testIdentifier)
+        self._testsForInfoAttribute = {}
+        for testIdentifier in self.tests:
+            infoAttributes = testRegistry[testIdentifier]["infoAttributes"] or []
+            for attribute in infoAttributes:
+                if attribute not in self._testsForInfoAttribute:
+                    self._testsForInfoAttribute[attribute] = set()
+                self._testsForInfoAttribute[attribute].add(testIdentifier)
+        self._glyphNotifications = set(self._testsForNotification.keys()) | set(cascadingNotifications)
+        # audit
+        glyphNames = [name for name in font.glyphOrder if name in self.layer]
+        glyphNames += sorted(set(self.layer.keys()) - set(glyphNames))
+        self._results = getLayerTestResults(
+            self.layer,
+            glyphNames,
+            self.tests,
+            processes=processes,
+            cachePath=cachePath
+        )
+        self._report = {}
+        self._failures = {testIdentifier : set() for testIdentifier in self.tests}
+        for name in glyphNames:
+            self._updateReport(name, self.tests)
+        # index
+        self._dependencies = {}
+        self._dependents = {}
+        self._glyphUnicodes = {}
+        self._unicodeToGlyphs = {}
+        self._glyphShapeKeys = {}
+        self._shapeKeyToGlyphs = {}
+        for name in glyphNames:
+            self._updateDependencies(name)
+            self._indexUnicodes(name, self.layer[name].unicodes)
+            self._indexShapeKeys(name)
+        self._dirty = {}
+        self._beginObservations()
+
+    def close(self):
+        self._endObservations()
+
+    # -------
+    # Queries
+    # -------
+
+    def getReport(self):
+        """
+        Get a dict of glyph name : glyph report.
+        """
+        self._flush()
+        return dict(self._report)
+
+    def getGlyphReport(self, glyphName):
+        self._flush()
+        return self._report[glyphName]
+
+    def getGlyphsFailingTest(self, testIdentifier):
+        """
+        Get the set of the names of the glyphs that fail
+        the test. The set belongs to the auditor and it
+        must not be modified.
+        """
+        self._flush()
+        return self._failures[testIdentifier]
+
+    # -------
+    # Testing
+    # -------
+
+    def _markDirty(self, glyphName, tests):
+        if not tests:
+            return
+        if glyphName not in self._dirty:
+            self._dirty[glyphName] = set()
+        self._dirty[glyphName].update(tests)
+
+    def _markDependentsDirty(self, glyphName):
+        dependents = set()
+        toVisit = [glyphName]
+        while toVisit:
+            name = toVisit.pop()
+            for dependent in self._dependents.get(name, ()):
+                if dependent in dependents:
+                    continue
+                dependents.add(dependent)
+                toVisit.append(dependent)
+        dependents.discard(glyphName)
+        for dependent in dependents:
+            self._markDirty(dependent, self._crossGlyphTests)
+
+    def _flush(self):
+        if not self._dirty:
+            return
+        dirty = self._dirty
+        self._dirty = {}
+        for name, tests in dirty.items():
+            if name not in self.layer:
+                continue
+            glyph = self.layer[name]
+            contours = list(glyph)
+            # The cached representations, including the
+            # contour arrays that the contour level tests
+            # share, can't be trusted. Changes in other
+            # glyphs don't destroy them and defcon's
+            # Contour.move doesn't destroy them.
+            for testIdentifier in tests:
+                representationName = testRegistry[testIdentifier]["representationName"]
+                if testIdentifier in self._contourLevelTestSet:
+                    for contour in contours:
+                        contour.destroyRepresentation(representationName)
+                else:
+                    glyph.destroyRepresentation(representationName)
+            if not self._contourLevelTestSet.isdisjoint(tests):
+                for contour in contours:
+                    contour.destroyRepresentation(contourArraysRepresentationName)
+            glyphLevelTests, contourLevelTests = sortTests(tests)
+            if name not in self._results:
+                self._results[name] = {}
+            self._results[name].update(
+                runTests(glyph, contours, glyphLevelTests, contourLevelTests)
+            )
+            self._updateReport(name, tests)
+
+    def _updateReport(self, glyphName, tests):
+        results = self._results[glyphName]
+        self._report[glyphName] = assembleGlyphReport(results, self._glyphLevelTests, self._contourLevelTests)
+        for testIdentifier in tests:
+            if testIdentifier in self._contourLevelTestSet:
+                failed = any(_resultIsFailure(value) for value in results[testIdentifier])
+            else:
+                failed = _resultIsFailure(results[testIdentifier])
+            if failed:
+                self._failures[testIdentifier].add(glyphName)
+            else:
+                self._failures[testIdentifier].discard(glyphName)
+
+    def _removeGlyph(self, glyphName):
+        self._results.pop(glyphName, None)
+        self._report.pop(glyphName, None)
+        self._dirty.pop(glyphName, None)
+        for glyphNames in self._failures.values():
+            glyphNames.discard(glyphName)
+
+    # -------
+    # Indexes
+    # -------
+
+    def _updateDependencies(self, glyphName):
+        for dependency in self._dependencies.pop(glyphName, ()):
+            dependents = self._dependents[dependency]
+            dependents.discard(glyphName)
+            if not dependents:
+                del self._dependents[dependency]
+        if glyphName not in self.layer:
+            return
+        glyph = self.layer[glyphName]
+        baseGlyphs = [component.baseGlyph for component in glyph.components]
+        dependencies = getGlyphDependencies(glyphName, baseGlyphs, self.layer)
+        self._dependencies[glyphName] = dependencies
+        for dependency in dependencies:
+            if dependency not in self._dependents:
+                self._dependents[dependency] = set()
+            self._dependents[dependency].add(glyphName)
+
+    def _updateLigatureDependencies(self):
+        # the ligature parts depend on the glyphs
+        # that are in the layer
+        for glyphName in list(self._dependencies.keys()):
+            if "_" in glyphName:
+                self._updateDependencies(glyphName)
+
+    def _indexUnicodes(self, glyphName, unicodes):
+        self._glyphUnicodes[glyphName] = list(unicodes)
+        for value in unicodes:
+            if value not in self._unicodeToGlyphs:
+                self._unicodeToGlyphs[value] = set()
+            self._unicodeToGlyphs[value].add(glyphName)
+
+    def _unindexUnicodes(self, glyphName):
+        for value in self._glyphUnicodes.pop(glyphName, ()):
+            glyphNames = self._unicodeToGlyphs[value]
+            glyphNames.discard(glyphName)
+            if not glyphNames:
+                del self._unicodeToGlyphs[value]
+
+    def _indexShapeKeys(self, glyphName):
+        if not self._shapePeerTests:
+            return
+        glyph = self.layer[glyphName]
+        shapeKeys = getShapeKeys(getContourShape(contour) for contour in glyph)
+        self._glyphShapeKeys[glyphName] = shapeKeys
+        for key in shapeKeys:
+            if key not in self._shapeKeyToGlyphs:
+                self._shapeKeyToGlyphs[key] = set()
+            self._shapeKeyToGlyphs[key].add(glyphName)
+
+    def _unindexShapeKeys(self, glyphName):
+        for key in self._glyphShapeKeys.pop(glyphName, ()):
+            glyphNames = self._shapeKeyToGlyphs[key]
+            glyphNames.discard(glyphName)
+            if not glyphNames:
+                del self._shapeKeyToGlyphs[key]
+
+    def _markShapePeersDirty(self, glyphName, shapeKeys):
+        peers = getShapePeers(shapeKeys, self._shapeKeyToGlyphs)
+        peers.discard(glyphName)
+        for peer in peers:
+            self._markDirty(peer, self._shapePeerTests)
+
+    def _reindexShapeKeys(self, glyphName):
+        if not self._shapePeerTests:
+            return
+        oldShapeKeys = self._glyphShapeKeys.get(glyphName, set())
+        self._unindexShapeKeys(glyphName)
+        if glyphName in self.layer:
+            self._indexShapeKeys(glyphName)
+        newShapeKeys = self._glyphShapeKeys.get(glyphName, set())
+        self._markShapePeersDirty(glyphName, oldShapeKeys | newShapeKeys)
+
+    def _markUnicodePeersDirty(self, glyphName, unicodes):
+        peers = set()
+        for value in unicodes:
+            peers.update(self._unicodeToGlyphs.get(value, ()))
+        peers.discard(glyphName)
+        tests = self._testsForNotification.get("Glyph.UnicodesChanged")
+        for peer in peers:
+            self._markDirty(peer, tests)
+
+    # -------------
+    # Notifications
+    # -------------
+
+    def _beginObservations(self):
+        for glyph in self.layer:
+            self._beginGlyphObservations(glyph)
+        for notificationName, methodName in layerNotifications.items():
+            self.layer.addObserver(self, methodName, notificationName)
+        self.font.info.addObserver(self, "_infoValueChangedNotificationCallback", "Info.ValueChanged")
+
+    def _endObservations(self):
+        for glyph in self.layer:
+            self._endGlyphObservations(glyph)
+        for notificationName in layerNotifications.keys():
+            self.layer.removeObserver(self, notificationName)
+        self.font.info.removeObserver(self, "Info.ValueChanged")
+
+    def _beginGlyphObservations(self, glyph):
+        for notificationName in self._glyphNotifications:
+            glyph.addObserver(self, "_glyphChangedNotificationCallback", notificationName)
+
+    def _endGlyphObservations(self, glyph):
+        for notificationName in self._glyphNotifications:
+            if glyph.hasObserver(self, notificationName):
+                glyph.removeObserver(self, notificationName)
+
+    def _glyphChangedNotificationCallback(self, notification):
+        glyphName = notification.object.name
+        notificationName = notification.name
+        self._markDirty(glyphName, self._testsForNotification.get(notificationName))
+        if notificationName == "Glyph.ComponentsChanged":
+            self._updateDependencies(glyphName)
+        elif notificationName == "Glyph.ContoursChanged":
+            self._reindexShapeKeys(glyphName)
+        elif notificationName == "Glyph.UnicodesChanged":
+            oldValue = notification.data["oldValue"]
+            newValue = notification.data["newValue"]
+            self._unindexUnicodes(glyphName)
+            self._indexUnicodes(glyphName, newValue)
+            self._markUnicodePeersDirty(glyphName, set(oldValue) | set(newValue))
+        if notificationName in cascadingNotifications:
+            self._markDependentsDirty(glyphName)
+
+    def _layerGlyphAddedNotificationCallback(self, notification):
+        glyphName = notification.data["name"]
+        glyph = self.layer[glyphName]
+        self._beginGlyphObservations(glyph)
+        self._glyphAdded(glyphName)
+
+    def _layerGlyphWillBeDeletedNotificationCallback(self, notification):
+        glyphName = notification.data["name"]
+        self._endGlyphObservations(self.layer[glyphName])
+
+    def _layerGlyphDeletedNotificationCallback(self, notification):
+        glyphName = notification.data["name"]
+        self._glyphDeleted(glyphName)
+
+    def _layerGlyphNameChangedNotificationCallback(self, notification):
+        oldName = notification.data["oldValue"]
+        newName = notification.data["newValue"]
+        self._glyphDeleted(oldName)
+        self._glyphAdded(newName)
+
+    def _glyphAdded(self, glyphName):
+        glyph = self.layer[glyphName]
+        self._markDirty(glyphName, self.tests)
+        self._indexUnicodes(glyphName, glyph.unicodes)
+        self._markUnicodePeersDirty(glyphName, glyph.unicodes)
+        self._updateDependencies(glyphName)
+        self._updateLigatureDependencies()
+        self._markDependentsDirty(glyphName)
+        self._reindexShapeKeys(glyphName)
+
+    def _glyphDeleted(self, glyphName):
+        unicodes = self._glyphUnicodes.get(glyphName, [])
+        self._removeGlyph(glyphName)
+        self._unindexUnicodes(glyphName)
+        self._markUnicodePeersDirty(glyphName, unicodes)
+        self._reindexShapeKeys(glyphName)
+        self._updateDependencies(glyphName)
+        self._updateLigatureDependencies()
+        self._markDependentsDirty(glyphName)
+
+    def _infoValueChangedNotificationCallback(self, notification):
+        tests = self._testsForInfoAttribute.get(notification.data["attribute"])
+        if not tests:
+            return
+        for glyphName in self.layer.keys():
+            self._markDirty(glyphName, tests)
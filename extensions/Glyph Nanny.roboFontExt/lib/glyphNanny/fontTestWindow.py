@@ -1,4 +1,6 @@
 import os
+import hashlib
+import tempfile
 from vanilla import dialogs
 import ezui
 from defconAppKit.windows.baseWindow import BaseWindowController
@@ -81,6 +83,10 @@ class GlyphNannyFontTestWindow(ezui.WindowController):
                 font,
                 tests,
                 # progressBar=progressBar
+                # a process pool has not been verified
+                # inside RoboFont, so only the cache is used.
+                processes=1,
+                cachePath=getReportCachePath(font)
             )
         finally:
             pass
@@ -89,6 +95,17 @@ class GlyphNannyFontTestWindow(ezui.WindowController):
         FontReportWindow(font, text, report.keys())
 
 
+def getReportCachePath(font):
+    """
+    Get the path of the report cache file for the font.
+    Unsaved fonts are not cached.
+    """
+    if font.path is None:
+        return None
+    fileName = hashlib.sha1(font.path.encode("utf-8")).hexdigest() + ".cache"
+    return os.path.join(tempfile.gettempdir(), "GlyphNanny", fileName)
+
+
 class FontReportWindow(ezui.WindowController):
 
     def build(self, font, text, glyphsWithIssues):
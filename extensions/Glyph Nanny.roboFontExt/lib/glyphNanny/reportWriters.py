@@ -0,0 +1,278 @@
+"""
+Writers that write glyph reports to a stream one
+glyph at a time. They can be given to writeLayerReport
+and writeFontReport in scripting, which pass each
+glyph report to the writers as soon as the glyph has
+been tested. A writer has these methods:
+
+- writeGlyphReport(glyphName, glyphReport)
+- close()
+
+close writes whatever the format needs at the end.
+It does not close the stream.
+"""
+
+import json
+from .tests.registry import testRegistry
+from .scripting import (
+    iterGlyphReportFailures,
+    formatGlyphReport
+)
+
+def convertValueToJSON(value):
+    """
+    Convert a test result to something that can
+    be written as JSON. Tuples and sets become
+    lists and dict keys become strings. The items
+    in sets are sorted so that the output is the
+    same every time.
+    """
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, dict):
+        return {
+            _convertKeyToJSON(key) : convertValueToJSON(v)
+            for key, v in value.items()
+        }
+    if isinstance(value, (set, frozenset)):
+        items = [convertValueToJSON(v) for v in value]
+        return sorted(items, key=lambda item: json.dumps(item, sort_keys=True))
+    if isinstance(value, (list, tuple)):
+        return [convertValueToJSON(v) for v in value]
+    return repr(value)
+
+def _convertKeyToJSON(key):
+    if isinstance(key, str):
+        return key
+    return json.dumps(convertValueToJSON(key))
+
+
+class BaseReportWriter(object):
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def writeGlyphReport(self, glyphName, glyphReport):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class MarkdownReportWriter(BaseReportWriter):
+
+    """
+    Write the same text as formatLayerReport.
+    """
+
+    def __init__(self, stream):
+        super(MarkdownReportWriter, self).__init__(stream)
+        self._wroteGlyph = False
+
+    def writeGlyphReport(self, glyphName, glyphReport):
+        text = formatGlyphReport(glyphReport)
+        if not text:
+            return
+        if self._wroteGlyph:
+            self.stream.write("\n\n\n")
+        self.stream.write("# " + glyphName + "\n\n\n" + text)
+        self._wroteGlyph = True
+
+
+class JSONLinesReportWriter(BaseReportWriter):
+
+    """
+    Write one JSON object per line for each failed test:
+
+        {
+            "glyph" : glyph name,
+            "test" : test identifier,
+            "contour" : contour index or null,
+            "data" : the test result
+        }
+    """
+
+    def writeGlyphReport(self, glyphName, glyphReport):
+        for testIdentifier, contourIndex, value in iterGlyphReportFailures(glyphReport):
+            record = dict(
+                glyph=glyphName,
+                test=testIdentifier,
+                contour=contourIndex,
+                data=convertValueToJSON(value)
+            )
+            self.stream.write(json.dumps(record, sort_keys=True) + "\n")
+
+
+sarifSchema = "https://json.schemastore.org/sarif-2.1.0.json"
+
+class SARIFReportWriter(BaseReportWriter):
+
+    """
+    Write a SARIF 2.1.0 log with one result for each failed
+    test. The tests are the rules of the log. artifactURI is
+    an optional URI, for example the path of the UFO, that
+    is given as the physical location of the results.
+
+    The log is only valid JSON after close has been called.
+    """
+
+    def __init__(self, stream, artifactURI=None):
+        super(SARIFReportWriter, self).__init__(stream)
+        self.artifactURI = artifactURI
+        self._ruleIndexes = {}
+        rules = []
+        for testIdentifier, testData in sorted(testRegistry.items()):
+            self._ruleIndexes[testIdentifier] = len(rules)
+            rules.append(
+                dict(
+                    id=testIdentifier,
+                    shortDescription=dict(text=testData["title"]),
+                    fullDescription=dict(text=testData["description"]),
+                    properties=dict(level=testData["level"])
+                )
+            )
+        tool = dict(
+            driver=dict(
+                name="Glyph Nanny",
+                informationUri="http://typesupply.com",
+                rules=rules
+            )
+        )
+        self.stream.write(
+            '{"$schema": %s, "version": "2.1.0", "runs": [{"tool": %s, "results": ['
+            % (json.dumps(sarifSchema), json.dumps(tool, sort_keys=True))
+        )
+        self._resultCount = 0
+
+    def writeGlyphReport(self, glyphName, glyphReport):
+        for testIdentifier, contourIndex, value in iterGlyphReportFailures(glyphReport):
+            testData = testRegistry[testIdentifier]
+            message = testData["description"]
+            fullyQualifiedName = glyphName
+            if contourIndex is not None:
+                message = "Contour %d: %s" % (contourIndex, message)
+                fullyQualifiedName = "%s/contour%d" % (glyphName, contourIndex)
+            location = dict(
+                logicalLocations=[
+                    dict(
+                        name=glyphName,
+                        fullyQualifiedName=fullyQualifiedName,
+                        kind="object"
+                    )
+                ]
+            )
+            if self.artifactURI is not None:
+                location["physicalLocation"] = dict(
+                    artifactLocation=dict(uri=self.artifactURI)
+                )
+            result = dict(
+                ruleId=testIdentifier,
+                ruleIndex=self._ruleIndexes[testIdentifier],
+                level="warning",
+                message=dict(text=message),
+                locations=[location],
+                properties=dict(
+                    glyphName=glyphName,
+                    contourIndex=contourIndex,
+                    data=convertValueToJSON(value)
+                )
+            )
+            if self._resultCount:
+                self.stream.write(",")
+            self.stream.write("\n" + json.dumps(result, sort_keys=True))
+            self._resultCount += 1
+
+    def close(self):
+        self.stream.write("\n]}]}\n")
+
+
+class ReportSummary(BaseReportWriter):
+
+    """
+    Count the failures of each test and of each glyph.
+    A failure of a contour level test is counted once
+    for each contour. The stream is optional. If it
+    is given, the summary is written to it as JSON
+    when the writer is closed.
+
+    Summaries from different builds can be compared
+    with compareReportSummaries.
+    """
+
+    def __init__(self, stream=None):
+        super(ReportSummary, self).__init__(stream)
+        self.glyphCount = 0
+        self.tests = {}
+        self.glyphs = {}
+
+    def writeGlyphReport(self, glyphName, glyphReport):
+        self.glyphCount += 1
+        glyphCounts = {}
+        for testIdentifier, contourIndex, value in iterGlyphReportFailures(glyphReport):
+            glyphCounts[testIdentifier] = glyphCounts.get(testIdentifier, 0) + 1
+            self.tests[testIdentifier] = self.tests.get(testIdentifier, 0) + 1
+        if glyphCounts:
+            self.glyphs[glyphName] = glyphCounts
+
+    def getData(self):
+        """
+        Get the summary as a dict:
+
+            {
+                glyphCount : number of glyphs
+                failureCount : number of failures
+                tests : {test identifier : count}
+                glyphs : {glyph name : {test identifier : count}}
+            }
+
+        Glyphs without failures are not in glyphs.
+        """
+        return dict(
+            glyphCount=self.glyphCount,
+            failureCount=sum(self.tests.values()),
+            tests=dict(self.tests),
+            glyphs={glyphName : dict(counts) for glyphName, counts in self.glyphs.items()}
+        )
+
+    def close(self):
+        if self.stream is not None:
+            json.dump(self.getData(), self.stream, indent=2, sort_keys=True)
+            self.stream.write("\n")
+
+
+def compareReportSummaries(summary1, summary2):
+    """
+    Compare the data from two ReportSummary objects,
+    or the JSON that they wrote, and return the counts
+    that changed:
+
+        {
+            tests : {test identifier : (count1, count2)}
+            glyphs : {glyph name : {test identifier : (count1, count2)}}
+        }
+    """
+    tests = {}
+    for testIdentifier in set(summary1["tests"]) | set(summary2["tests"]):
+        count1 = summary1["tests"].get(testIdentifier, 0)
+        count2 = summary2["tests"].get(testIdentifier, 0)
+        if count1 != count2:
+            tests[testIdentifier] = (count1, count2)
+    glyphs = {}
+    for glyphName in set(summary1["glyphs"]) | set(summary2["glyphs"]):
+        counts1 = summary1["glyphs"].get(glyphName, {})
+        counts2 = summary2["glyphs"].get(glyphName, {})
+        changes = {}
+        for testIdentifier in set(counts1) | set(counts2):
+            count1 = counts1.get(testIdentifier, 0)
+            count2 = counts2.get(testIdentifier, 0)
+            if count1 != count2:
+                changes[testIdentifier] = (count1, count2)
+        if changes:
+            glyphs[glyphName] = changes
+    return dict(tests=tests, glyphs=glyphs)
@@ -1,5 +1,12 @@
 import re
 from .tests.registry import testRegistry
+from .fontAudit import (
+    sortTests,
+    runTests,
+    assembleGlyphReport,
+    auditLayer,
+    iterAuditLayer
+)
 
 def registeredTests():
     registered = {}
@@ -16,7 +23,9 @@ def testFont(
         font,
         tests=None,
         ignoreOverlap=False,
-        progressBar=None
+        progressBar=None,
+        processes=1,
+        cachePath=None
     ):
     if tests is None:
         tests = registeredTests().keys()
@@ -25,15 +34,26 @@ def testFont(
         layer,
         tests=tests,
         ignoreOverlap=ignoreOverlap,
-        progressBar=progressBar
+        progressBar=progressBar,
+        processes=processes,
+        cachePath=cachePath
     )
 
 def testLayer(
         layer,
         tests=None,
         ignoreOverlap=False,
-        progressBar=None
+        progressBar=None,
+        processes=1,
+        cachePath=None
     ):
+    """
+    processes is the number of worker processes that
+    the glyphs are tested in. If it is None, one per
+    CPU is used. If cachePath is given, the results
+    of glyphs that have not changed since the last
+    test are read from the cache file at that path.
+    """
     if tests is None:
         tests = registeredTests().keys()
     font = layer.font
@@ -41,44 +61,75 @@ def testLayer(
         glyphOrder = font.glyphOrder
     else:
         glyphOrder = sorted(layer.keys())
-    report = {}
-    for name in glyphOrder:
-        if progressBar is not None:
-            progressBar.update("Analyzing %s..." % name)
-        glyph = layer[name]
-        glyphReport = testGlyph(glyph, tests=tests)
-        report[name] = glyphReport
-    return report
+    return auditLayer(
+        layer,
+        glyphOrder,
+        tests,
+        processes=processes,
+        cachePath=cachePath,
+        progressBar=progressBar
+    )
 
-def testGlyph(glyph, tests=None):
+def writeFontReport(
+        font,
+        writers,
+        tests=None,
+        progressBar=None,
+        processes=1,
+        cachePath=None
+    ):
+    layer = font.defaultLayer
+    return writeLayerReport(
+        layer,
+        writers,
+        tests=tests,
+        progressBar=progressBar,
+        processes=processes,
+        cachePath=cachePath
+    )
+
+def writeLayerReport(
+        layer,
+        writers,
+        tests=None,
+        progressBar=None,
+        processes=1,
+        cachePath=None
+    ):
+    """
+    Test the layer and pass each glyph report to the
+    writeGlyphReport(glyphName, glyphReport) method of
+    the writers as soon as the glyph has been tested.
+    The complete report is not kept in memory. See
+    reportWriters for the writers. The writers are
+    not closed. processes and cachePath are the same
+    as in testLayer.
+    """
     if tests is None:
         tests = registeredTests().keys()
-    objectLevels = {}
-    for testIdentifier in sorted(tests):
-        testData = testRegistry[testIdentifier]
-        level = testData["level"]
-        if level not in objectLevels:
-            objectLevels[level] = []
-        objectLevels[level].append(testIdentifier)
-    glyphLevelTests = (
-        objectLevels.get("glyphInfo", [])
-      + objectLevels.get("metrics", [])
-      + objectLevels.get("glyph", [])
-    )
-    contourLevelTests = (
-        objectLevels.get("contour", [])
-      + objectLevels.get("segment", [])
-      + objectLevels.get("point", [])
+    font = layer.font
+    if font is not None:
+        glyphOrder = font.glyphOrder
+    else:
+        glyphOrder = sorted(layer.keys())
+    reports = iterAuditLayer(
+        layer,
+        glyphOrder,
+        tests,
+        processes=processes,
+        cachePath=cachePath,
+        progressBar=progressBar
     )
-    stub = "GlyphNanny."
-    report = {}
-    for testIdentifier in glyphLevelTests:
-        report[testIdentifier] = glyph.getRepresentation(stub + testIdentifier)
-    for contourIndex, contour in enumerate(glyph.contours):
-        for testIdentifier in contourLevelTests:
-            key = f"contour{contourIndex}: {testIdentifier}"
-            report[key] = contour.getRepresentation(stub + testIdentifier)
-    return report
+    for glyphName, glyphReport in reports:
+        for writer in writers:
+            writer.writeGlyphReport(glyphName, glyphReport)
+
+def testGlyph(glyph, tests=None):
+    if tests is None:
+        tests = registeredTests().keys()
+    glyphLevelTests, contourLevelTests = sortTests(tests)
+    results = runTests(glyph, glyph.contours, glyphLevelTests, contourLevelTests)
+    return assembleGlyphReport(results, glyphLevelTests, contourLevelTests)
 
 # --------------
 # Report Purging
@@ -102,6 +153,33 @@ def purgeDict(d):
         purged[k] = v
     return purged
 
+contourTitle_RE = re.compile(r"contour(\d+):")
+
+def iterGlyphReportFailures(report):
+    """
+    Yield (test identifier, contour index, value) for
+    the failed tests in a glyph report. The contour
+    index is None for glyph level tests. The glyph
+    level tests come first, sorted by identifier,
+    followed by the contour level tests, sorted by
+    contour index and identifier.
+    """
+    report = purgeGlyphReport(report)
+    glyphFailures = []
+    contourFailures = []
+    for key, value in report.items():
+        m = contourTitle_RE.match(key)
+        if m:
+            contourIndex = int(m.group(1))
+            key = key.split(":", 1)[-1].strip()
+            contourFailures.append((contourIndex, key, value))
+        else:
+            glyphFailures.append((key, value))
+    for testIdentifier, value in sorted(glyphFailures, key=lambda failure: failure[0]):
+        yield testIdentifier, None, value
+    for contourIndex, testIdentifier, value in sorted(contourFailures, key=lambda failure: failure[:2]):
+        yield testIdentifier, contourIndex, value
+
 # ----------
 # Formatting
 # ----------
@@ -121,34 +199,16 @@ def formatLayerReport(report):
         lines.append("\n")
     return "\n".join(lines).strip()
 
-contourTitle_RE = re.compile(r"contour([\d])+:")
-
 def formatGlyphReport(report):
-    report = purgeGlyphReport(report)
-    notContours = {}
-    contours = {}
-    for key, value in report.items():
-        m = contourTitle_RE.match(key)
-        if m:
-            contourIndex = m.group(1)
-            if contourIndex not in contours:
-                contours[contourIndex] = {}
-            key = key.split(":", 1)[-1].strip()
-            contours[contourIndex][key] = value
-        else:
-            notContours[key] = value
     lines = []
-    for key, value in sorted(notContours.items()):
+    for key, contourIndex, value in iterGlyphReportFailures(report):
         title = testRegistry[key]["title"]
-        lines.append("## " + title)
+        if contourIndex is None:
+            lines.append("## " + title)
+        else:
+            lines.append("## {title}: Contour {contourIndex}".format(title=title, contourIndex=contourIndex))
         lines.append(formatValue(value))
         lines.append("")
-    for contourIndex, contourReport in sorted(contours.items()):
-        for key, value in sorted(notContours.items()):
-            title = testRegistry[key]["title"]
-            lines.append("## {title}: Contour {contourIndex}".format(title=title, contourIndex=contourIndex))
-            lines.append(formatValue(value))
-            lines.append("")
     return "\n".join(lines).strip()
 
 def formatValue(value):
@@ -0,0 +1,146 @@
+"""
+A NumPy representation of a contour that
+is shared by the segment and point tests.
+"""
+
+import math
+import numpy
+import defcon
+
+class ContourArrays(object):
+
+    """
+    The segments of a contour, split the same way that
+    fontParts splits them, as arrays.
+
+    - onCurves: (segments, 2) on curve coordinates
+    - offCurves: (segments, 2, 2) off curve coordinates
+      of the segments that have two off curves, NaN for
+      the others
+    - isLine, isCurve, smooth: (segments,) booleans
+
+    The coordinates are also kept as tuples in
+    onCurvePoints and offCurvePoints so that the
+    values in the reports are the values in the
+    contour, not NumPy floats.
+    """
+
+    def __init__(self, contour):
+        segments = _splitSegments(
+            [(point.x, point.y, point.segmentType, point.smooth) for point in contour]
+        )
+        self.segmentCount = len(segments)
+        self.open = bool(segments) and segments[0][-1][2] == "move"
+        self.segmentTypes = []
+        self.onCurvePoints = []
+        self.offCurvePoints = []
+        smooth = []
+        offCurves = numpy.full((self.segmentCount, 2, 2), numpy.nan)
+        for index, segment in enumerate(segments):
+            onCurve = segment[-1]
+            if onCurve[2] is None:
+                self.segmentTypes.append("qcurve")
+                self.onCurvePoints.append(None)
+                self.offCurvePoints.append(tuple((x, y) for x, y, t, s in segment))
+                smooth.append(True)
+                continue
+            self.segmentTypes.append(onCurve[2])
+            self.onCurvePoints.append((onCurve[0], onCurve[1]))
+            self.offCurvePoints.append(tuple((x, y) for x, y, t, s in segment[:-1]))
+            smooth.append(onCurve[3])
+            if len(segment) == 3:
+                offCurves[index] = [(x, y) for x, y, t, s in segment[:-1]]
+        self.onCurves = numpy.array(
+            [point if point is not None else (numpy.nan, numpy.nan) for point in self.onCurvePoints],
+            dtype=float
+        ).reshape(-1, 2)
+        self.offCurves = offCurves
+        self.isLine = numpy.array([segmentType == "line" for segmentType in self.segmentTypes], dtype=bool)
+        self.isCurve = numpy.array([segmentType == "curve" for segmentType in self.segmentTypes], dtype=bool)
+        self.smooth = numpy.array(smooth, dtype=bool)
+
+    def __len__(self):
+        return self.segmentCount
+
+    def getPreviousOnCurves(self):
+        return numpy.roll(self.onCurves, 1, axis=0)
+
+    def getNextOnCurves(self):
+        return numpy.roll(self.onCurves, -1, axis=0)
+
+
+def _splitSegments(points):
+    # This follows BaseContour._get_segments in fontParts.
+    if not points:
+        return []
+    segments = [[]]
+    lastWasOffCurve = False
+    firstIsMove = points[0][2] == "move"
+    for point in points:
+        segments[-1].append(point)
+        if point[2] is not None:
+            segments.append([])
+        lastWasOffCurve = point[2] is None
+    if len(segments[-1]) == 0:
+        del segments[-1]
+    if lastWasOffCurve and firstIsMove:
+        # ignore trailing off curves
+        del segments[-1]
+    if lastWasOffCurve and not firstIsMove and len(segments) > 1:
+        segment = segments.pop(-1)
+        segment.extend(segments[0])
+        del segments[0]
+        segments.append(segment)
+    if not lastWasOffCurve and not firstIsMove:
+        segment = segments.pop(0)
+        segments.append(segment)
+    return segments
+
+def contourArraysFactory(contour):
+    return ContourArrays(contour)
+
+representationName = "GlyphNanny.contourArrays"
+
+defcon.registerRepresentationFactory(
+    cls=defcon.Contour,
+    name=representationName,
+    factory=contourArraysFactory,
+    destructiveNotifications=["Contour.PointsChanged"]
+)
+
+def getContourArrays(contour):
+    if not isinstance(contour, defcon.Contour):
+        contour = contour.naked()
+    return contour.getRepresentation(representationName)
+
+# ------------
+# Calculations
+# ------------
+
+def calculateAngles(points1, points2):
+    """
+    Calculate the angles, in degrees, of the lines between
+    two (n, 2) arrays of points. These are not rounded the
+    way that tools.calculateAngle rounds, so they may only
+    be used to rule out results. The exact values must be
+    calculated with calculateAngle.
+    """
+    delta = points2 - points1
+    return numpy.arctan2(delta[:, 1], delta[:, 0]) * 180 / math.pi
+
+def calculateLineLineIntersections(a1, a2, b1, b2):
+    """
+    Find which lines in (n, 2) arrays of line points
+    intersect. This does the arithmetic that
+    tools.calculateLineLineIntersection does, in
+    the same order, so the results are the same.
+    """
+    ua_t = (b2[:, 0] - b1[:, 0]) * (a1[:, 1] - b1[:, 1]) - (b2[:, 1] - b1[:, 1]) * (a1[:, 0] - b1[:, 0])
+    ub_t = (a2[:, 0] - a1[:, 0]) * (a1[:, 1] - b1[:, 1]) - (a2[:, 1] - a1[:, 1]) * (a1[:, 0] - b1[:, 0])
+    u_b = (b2[:, 1] - b1[:, 1]) * (a2[:, 0] - a1[:, 0]) - (b2[:, 0] - b1[:, 0]) * (a2[:, 1] - a1[:, 1])
+    hits = numpy.zeros(len(u_b), dtype=bool)
+    valid = u_b != 0
+    ua = ua_t[valid] / u_b[valid]
+    ub = ub_t[valid] / u_b[valid]
+    hits[valid] = (0 <= ua) & (ua <= 1) & (0 <= ub) & (ub <= 1)
+    return hits
@@ -0,0 +1,427 @@
+"""
+Indexes that let the glyph level tests find
+overlapping and duplicated objects without
+comparing every object with every other object.
+
+- BoundsGrid is a spatial index of bounding boxes.
+- ShapeIndex is an index of contour shapes that
+  are quantized to a tolerance.
+"""
+
+import math
+from collections import Counter
+import defcon
+from fontTools.misc import arrayTools as ftArrayTools
+from fontTools.misc.bezierTools import segmentSegmentIntersections
+from fontTools.pens.basePen import (
+    decomposeSuperBezierSegment,
+    decomposeQuadraticSegment
+)
+from fontTools.pens.recordingPen import (
+    DecomposingRecordingPen,
+    replayRecording
+)
+from fontTools.pens.pointInsidePen import PointInsidePen
+
+# -----------
+# Bounds Grid
+# -----------
+
+class BoundsGrid(object):
+
+    """
+    A uniform grid of bounding boxes. A box is stored
+    in every cell that it touches, so the boxes that
+    may intersect a box are the boxes in the cells
+    that it touches. When cellSize is close to the
+    typical size of the boxes, each box touches a few
+    cells and a query takes close to constant time.
+    See calculateCellSize.
+
+    The items must be hashable.
+    """
+
+    def __init__(self, cellSize):
+        self.cellSize = max(cellSize, 1)
+        self._cells = {}
+        self._bounds = {}
+        self._order = {}
+
+    def __len__(self):
+        return len(self._bounds)
+
+    def _iterCells(self, bounds):
+        xMin, yMin, xMax, yMax = bounds
+        cellSize = self.cellSize
+        yRange = range(int(math.floor(yMin / cellSize)), int(math.floor(yMax / cellSize)) + 1)
+        for x in range(int(math.floor(xMin / cellSize)), int(math.floor(xMax / cellSize)) + 1):
+            for y in yRange:
+                yield (x, y)
+
+    def insert(self, item, bounds):
+        self._order[item] = len(self._order)
+        self._bounds[item] = bounds
+        for cell in self._iterCells(bounds):
+            if cell not in self._cells:
+                self._cells[cell] = []
+            self._cells[cell].append(item)
+
+    def query(self, bounds):
+        """
+        Get the items with boxes that intersect or
+        touch bounds, in the order that they were
+        inserted.
+        """
+        found = set()
+        for cell in self._iterCells(bounds):
+            for item in self._cells.get(cell, ()):
+                if item in found:
+                    continue
+                if boundsTouch(bounds, self._bounds[item]):
+                    found.add(item)
+        return sorted(found, key=self._order.get)
+
+    def getIntersectingPairs(self):
+        """
+        Get the pairs of items with boxes that intersect
+        or touch. The item that was inserted first is
+        the first item in a pair.
+        """
+        seen = set()
+        pairs = []
+        for items in self._cells.values():
+            for index, item1 in enumerate(items):
+                for item2 in items[index + 1:]:
+                    pair = (item1, item2)
+                    if pair in seen:
+                        continue
+                    seen.add(pair)
+                    if boundsTouch(self._bounds[item1], self._bounds[item2]):
+                        pairs.append(pair)
+        order = self._order
+        pairs.sort(key=lambda pair: (order[pair[0]], order[pair[1]]))
+        return pairs
+
+
+def calculateCellSize(boundsList):
+    """
+    Calculate a grid cell size from the average
+    of the largest dimension of the boxes.
+    """
+    if not boundsList:
+        return 1
+    total = 0
+    for xMin, yMin, xMax, yMax in boundsList:
+        total += max(xMax - xMin, yMax - yMin)
+    return max(total / len(boundsList), 1)
+
+def boundsTouch(bounds1, bounds2):
+    xMin1, yMin1, xMax1, yMax1 = bounds1
+    xMin2, yMin2, xMax2, yMax2 = bounds2
+    return xMin1 <= xMax2 and xMin2 <= xMax1 and yMin1 <= yMax2 and yMin2 <= yMax1
+
+def expandBounds(bounds, value):
+    xMin, yMin, xMax, yMax = bounds
+    return (xMin - value, yMin - value, xMax + value, yMax + value)
+
+# ------
+# Shapes
+# ------
+
+def getContourPoints(contour):
+    return [(point.x, point.y, point.segmentType) for point in contour]
+
+def getOutlineContourPoints(outline):
+    """
+    Get the contour points from the value
+    of a RecordingPointPen. Components are
+    ignored.
+    """
+    contours = []
+    points = None
+    for method, args, kwargs in outline:
+        if method == "beginPath":
+            points = []
+        elif method == "addPoint":
+            (x, y), segmentType = args[:2]
+            points.append((x, y, segmentType))
+        elif method == "endPath":
+            contours.append(points)
+            points = None
+    return contours
+
+def comparePoints(points1, points2, tolerance):
+    """
+    Compare two lists of (x, y, segmentType) contour
+    points. If the points have the same structure and
+    are within tolerance of each other, starting from
+    any point of a closed contour, this returns the
+    largest coordinate difference. Otherwise this
+    returns None.
+    """
+    count = len(points1)
+    if not count or count != len(points2):
+        return None
+    isOpen = points1[0][2] == "move"
+    if isOpen != (points2[0][2] == "move"):
+        return None
+    if isOpen:
+        starts = [0]
+    else:
+        starts = range(count)
+    x0, y0, segmentType0 = points1[0]
+    best = None
+    for start in starts:
+        x, y, segmentType = points2[start]
+        if segmentType != segmentType0 or abs(x - x0) > tolerance or abs(y - y0) > tolerance:
+            continue
+        difference = 0
+        for index in range(count):
+            x1, y1, segmentType1 = points1[index]
+            x2, y2, segmentType2 = points2[(index + start) % count]
+            if segmentType1 != segmentType2:
+                difference = None
+                break
+            d = max(abs(x1 - x2), abs(y1 - y2))
+            if d > tolerance:
+                difference = None
+                break
+            if d > difference:
+                difference = d
+        if difference is not None and (best is None or difference < best):
+            best = difference
+    return best
+
+
+class ContourShape(object):
+
+    """
+    The points of a contour relative to the bottom
+    left corner of the box around the points. The
+    shape doesn't change when the contour is moved.
+    """
+
+    def __init__(self, points):
+        self.structure = None
+        self.points = []
+        self.width = self.height = 0
+        if not points:
+            return
+        xMin = min(x for x, y, segmentType in points)
+        yMin = min(y for x, y, segmentType in points)
+        self.points = [(x - xMin, y - yMin, segmentType) for x, y, segmentType in points]
+        self.width = max(x for x, y, segmentType in self.points)
+        self.height = max(y for x, y, segmentType in self.points)
+        segmentTypes = Counter(str(segmentType) for x, y, segmentType in points)
+        self.structure = (len(points), tuple(sorted(segmentTypes.items())))
+
+    def getKey(self, tolerance):
+        """
+        Get a key that is the same for shapes with the
+        same structure and sizes in the same multiple
+        of tolerance. Shapes that are within tolerance
+        of each other have the same key or neighbouring
+        keys. See iterNeighborKeys.
+        """
+        if self.structure is None:
+            return None
+        return (self.structure, int(self.width // tolerance), int(self.height // tolerance))
+
+
+def iterNeighborKeys(key):
+    structure, width, height = key
+    for w in (width - 1, width, width + 1):
+        for h in (height - 1, height, height + 1):
+            yield (structure, w, h)
+
+def contourShapeFactory(contour):
+    return ContourShape(getContourPoints(contour))
+
+contourShapeRepresentationName = "GlyphNanny.contourShape"
+
+defcon.registerRepresentationFactory(
+    cls=defcon.Contour,
+    name=contourShapeRepresentationName,
+    factory=contourShapeFactory,
+    destructiveNotifications=["Contour.PointsChanged"]
+)
+
+def getContourShape(contour):
+    if not isinstance(contour, defcon.Contour):
+        contour = contour.naked()
+    return contour.getRepresentation(contourShapeRepresentationName)
+
+
+class ShapeIndex(object):
+
+    """
+    An index of contour shapes. A query finds the
+    shapes that are within tolerance of a shape,
+    wherever the contours are. A query only compares
+    the shape with the shapes that have the same key
+    or a neighbouring key.
+
+    The items must be hashable.
+    """
+
+    def __init__(self, tolerance):
+        self.tolerance = tolerance
+        self._keys = {}
+        self._shapes = {}
+        self._order = {}
+
+    def __len__(self):
+        return len(self._shapes)
+
+    def insert(self, item, shape):
+        key = shape.getKey(self.tolerance)
+        if key is None:
+            return
+        self._order[item] = len(self._order)
+        self._shapes[item] = shape
+        if key not in self._keys:
+            self._keys[key] = []
+        self._keys[key].append(item)
+
+    def query(self, shape):
+        """
+        Get the items with shapes that are within
+        tolerance of the shape, in the order that
+        they were inserted.
+        """
+        key = shape.getKey(self.tolerance)
+        if key is None:
+            return []
+        found = []
+        for neighborKey in iterNeighborKeys(key):
+            for item in self._keys.get(neighborKey, ()):
+                if comparePoints(shape.points, self._shapes[item].points, self.tolerance) is not None:
+                    found.append(item)
+        return sorted(found, key=self._order.get)
+
+# --------
+# Outlines
+# --------
+
+def getComponentOutline(component, layer):
+    """
+    Get the decomposed outline of a component
+    as the value of a RecordingPen.
+    """
+    pen = DecomposingRecordingPen(layer, skipMissingComponents=True)
+    component.draw(pen)
+    return pen.value
+
+def getOutlineSegments(outline):
+    """
+    Get the line and cubic curve segments of the
+    value of a RecordingPen as tuples of points.
+    Quadratic curves are converted to cubic curves.
+    Contours that have no on curve points are
+    ignored.
+    """
+    segments = []
+    start = current = None
+    for operator, points in outline:
+        if operator == "moveTo":
+            start = current = points[0]
+        elif current is None:
+            continue
+        elif operator == "lineTo":
+            segments.append((current, points[0]))
+            current = points[0]
+        elif operator == "curveTo":
+            for pt1, pt2, pt3 in decomposeSuperBezierSegment(points):
+                segments.append((current, pt1, pt2, pt3))
+                current = pt3
+        elif operator == "qCurveTo":
+            if points[-1] is None:
+                current = None
+                continue
+            for pt1, pt2 in decomposeQuadraticSegment(points):
+                segments.append(_quadraticToCubic(current, pt1, pt2))
+                current = pt2
+        elif operator in ("closePath", "endPath"):
+            if operator == "closePath" and current != start:
+                segments.append((current, start))
+            start = current = None
+    return segments
+
+def _quadraticToCubic(pt0, pt1, pt2):
+    x0, y0 = pt0
+    x1, y1 = pt1
+    x2, y2 = pt2
+    return (
+        pt0,
+        (x0 + (x1 - x0) * 2 / 3, y0 + (y1 - y0) * 2 / 3),
+        (x2 + (x1 - x2) * 2 / 3, y2 + (y1 - y2) * 2 / 3),
+        pt2
+    )
+
+def outlinesOverlap(outline1, outline2):
+    """
+    Find out if the filled areas of two RecordingPen
+    values overlap. Outlines that only touch do
+    not overlap.
+    """
+    segments1 = getOutlineSegments(outline1)
+    segments2 = getOutlineSegments(outline2)
+    if not segments1 or not segments2:
+        return False
+    bounds1 = [ftArrayTools.calcBounds(segment) for segment in segments1]
+    bounds2 = [ftArrayTools.calcBounds(segment) for segment in segments2]
+    # outlines that cross overlap
+    grid = BoundsGrid(calculateCellSize(bounds2))
+    for index, bounds in enumerate(bounds2):
+        grid.insert(index, bounds)
+    epsilon = 1e-9
+    for segment1, bounds in zip(segments1, bounds1):
+        for index in grid.query(bounds):
+            for intersection in segmentSegmentIntersections(segment1, segments2[index]):
+                t1 = intersection.t1
+                t2 = intersection.t2
+                if epsilon < t1 < 1 - epsilon and epsilon < t2 < 1 - epsilon:
+                    return True
+    # outlines that don't cross overlap if they are
+    # nested or if they share part of an edge. in
+    # either case, a point just to one side of the
+    # middle of a segment is inside both areas.
+    sect, sectBounds = ftArrayTools.sectRect(
+        ftArrayTools.calcBounds([point for segment in segments1 for point in segment]),
+        ftArrayTools.calcBounds([point for segment in segments2 for point in segment])
+    )
+    if not sect:
+        return False
+    for segments, segmentBounds in ((segments1, bounds1), (segments2, bounds2)):
+        for segment, bounds in zip(segments, segmentBounds):
+            if not boundsTouch(bounds, sectBounds):
+                continue
+            for point in _getSidePoints(segment, 0.01):
+                if _pointInside(outline1, point) and _pointInside(outline2, point):
+                    return True
+    return False
+
+def _getSidePoints(segment, distance):
+    if len(segment) == 2:
+        (x0, y0), (x1, y1) = segment
+        x = (x0 + x1) / 2
+        y = (y0 + y1) / 2
+        dx = x1 - x0
+        dy = y1 - y0
+    else:
+        (x0, y0), (x1, y1), (x2, y2), (x3, y3) = segment
+        x = (x0 + 3 * x1 + 3 * x2 + x3) / 8
+        y = (y0 + 3 * y1 + 3 * y2 + y3) / 8
+        dx = x3 + x2 - x1 - x0
+        dy = y3 + y2 - y1 - y0
+    length = math.hypot(dx, dy)
+    if not length:
+        return []
+    nx = -dy / length * distance
+    ny = dx / length * distance
+    return [(x + nx, y + ny), (x - nx, y - ny)]
+
+def _pointInside(outline, point):
+    pen = PointInsidePen(None, point)
+    replayRecording(outline, pen)
+    return pen.getResult()
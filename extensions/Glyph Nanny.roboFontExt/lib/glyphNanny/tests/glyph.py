@@ -7,6 +7,17 @@ from .tools import (
 )
 from . import registry
 from .wrappers import *
+from .geometryIndex import (
+    BoundsGrid,
+    ShapeIndex,
+    calculateCellSize,
+    expandBounds,
+    getContourPoints,
+    getContourShape,
+    comparePoints,
+    getComponentOutline,
+    outlinesOverlap
+)
 
 # Stem Consistency
 
@@ -197,7 +208,8 @@ registry.registerTest(
     description="One or more stems do not match the registered values.",
     testFunction=testStemWidths,
     defconClass=defcon.Glyph,
-    destructiveNotifications=["Glyph.ContoursChanged"]
+    destructiveNotifications=["Glyph.ContoursChanged"],
+    infoAttributes=["postscriptStemSnapH", "postscriptStemSnapV"]
 )
 
 # Duplicate Contours
@@ -271,3 +283,162 @@ registry.registerTest(
     defconClass=defcon.Glyph,
     destructiveNotifications=["Glyph.ComponentsChanged"]
 )
+
+# Near Duplicate Contours
+
+duplicateContourTolerance = 5
+
+def testNearDuplicateContours(glyph):
+    """
+    Contours shouldn't be almost duplicated on each other.
+    Exact duplicates are left to the duplicate contours test.
+
+    Data structure:
+
+        [
+            (contourIndex, bounds),
+            ...
+        ]
+    """
+    tolerance = duplicateContourTolerance
+    contours = list(glyph)
+    contourBounds = {}
+    for index, contour in enumerate(contours):
+        bounds = contour.bounds
+        if bounds is not None:
+            contourBounds[index] = expandBounds(bounds, tolerance)
+    grid = BoundsGrid(calculateCellSize(list(contourBounds.values())))
+    for index, bounds in contourBounds.items():
+        grid.insert(index, bounds)
+    points = {}
+    nearDuplicates = set()
+    for index1, index2 in grid.getIntersectingPairs():
+        if index2 in nearDuplicates:
+            continue
+        for index in (index1, index2):
+            if index not in points:
+                points[index] = getContourPoints(contours[index])
+        difference = comparePoints(points[index1], points[index2], tolerance)
+        if difference:
+            nearDuplicates.add(index2)
+    return [(index, contours[index].bounds) for index in sorted(nearDuplicates)]
+
+registry.registerTest(
+    identifier="nearDuplicateContours",
+    level="glyph",
+    title="Near Duplicate Contours",
+    description="One or more contours are almost duplicated.",
+    testFunction=testNearDuplicateContours,
+    defconClass=defcon.Glyph,
+    destructiveNotifications=["Glyph.ContoursChanged"]
+)
+
+# Duplicate Contours In Layer
+
+def layerContourShapeIndexFactory(layer):
+    index = ShapeIndex(duplicateContourTolerance)
+    for glyph in layer:
+        for contourIndex, contour in enumerate(glyph):
+            index.insert((glyph.name, contourIndex), getContourShape(contour))
+    return index
+
+layerContourShapeIndexRepresentationName = "GlyphNanny.contourShapeIndex"
+
+defcon.registerRepresentationFactory(
+    cls=defcon.Layer,
+    name=layerContourShapeIndexRepresentationName,
+    factory=layerContourShapeIndexFactory,
+    destructiveNotifications=[
+        "Layer.GlyphChanged",
+        "Layer.GlyphAdded",
+        "Layer.GlyphDeleted",
+        "Layer.GlyphNameChanged"
+    ]
+)
+
+def testLayerDuplicateContours(glyph):
+    """
+    Contours shouldn't be copies, or near copies,
+    of contours in other glyphs. These may be
+    better as components.
+
+    Data structure:
+
+        [
+            (contourIndex, bounds, [glyphName, ...]),
+            ...
+        ]
+    """
+    layer = glyph.layer
+    if layer is None:
+        return []
+    index = layer.getRepresentation(layerContourShapeIndexRepresentationName)
+    duplicates = []
+    for contourIndex, contour in enumerate(glyph):
+        glyphNames = []
+        for otherGlyphName, otherContourIndex in index.query(getContourShape(contour)):
+            if otherGlyphName == glyph.name or otherGlyphName in glyphNames:
+                continue
+            glyphNames.append(otherGlyphName)
+        if glyphNames:
+            duplicates.append((contourIndex, contour.bounds, sorted(glyphNames)))
+    return duplicates
+
+registry.registerTest(
+    identifier="layerDuplicateContours",
+    level="glyph",
+    title="Duplicate Contours In Layer",
+    description="One or more contours are duplicated in other glyphs.",
+    testFunction=testLayerDuplicateContours,
+    defconClass=defcon.Glyph,
+    destructiveNotifications=["Glyph.ContoursChanged"]
+)
+
+# Overlapping Components
+
+def testOverlappingComponents(glyph):
+    """
+    Components shouldn't overlap each other.
+
+    Data structure:
+
+        [
+            ((componentIndex1, componentIndex2), bounds),
+            ...
+        ]
+    """
+    layer = glyph.layer
+    components = glyph.components
+    componentBounds = {}
+    for index, component in enumerate(components):
+        bounds = component.bounds
+        if bounds is not None:
+            componentBounds[index] = bounds
+    grid = BoundsGrid(calculateCellSize(list(componentBounds.values())))
+    for index, bounds in componentBounds.items():
+        grid.insert(index, bounds)
+    outlines = {}
+    overlappingComponents = []
+    for index1, index2 in grid.getIntersectingPairs():
+        component1 = components[index1]
+        component2 = components[index2]
+        # duplicates are left to the duplicate components test
+        if (component1.baseGlyph, component1.transformation) == (component2.baseGlyph, component2.transformation):
+            continue
+        for index in (index1, index2):
+            if index not in outlines:
+                outlines[index] = getComponentOutline(components[index], layer)
+        if outlinesOverlap(outlines[index1], outlines[index2]):
+            sect, bounds = ftArrayTools.sectRect(componentBounds[index1], componentBounds[index2])
+            overlappingComponents.append(((index1, index2), bounds))
+    return overlappingComponents
+
+registry.registerTest(
+    identifier="overlappingComponents",
+    level="glyph",
+    title="Overlapping Components",
+    description="One or more components overlap.",
+    testFunction=testOverlappingComponents,
+    defconClass=defcon.Glyph,
+    destructiveNotifications=["Glyph.ComponentsChanged"]
+)
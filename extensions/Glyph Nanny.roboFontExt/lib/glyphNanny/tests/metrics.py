@@ -26,20 +26,7 @@ def testLigatureMetrics(glyph):
     name = glyph.name
     if "_" not in name:
         return
-    base = name
-    suffix = None
-    if "." in name:
-        base, suffix = name.split(".", 1)
-    # guess at the ligature parts
-    parts = base.split("_")
-    leftPart = parts[0]
-    rightPart = parts[-1]
-    # try snapping on the suffixes
-    if suffix:
-        if leftPart + "." + suffix in font:
-            leftPart += "." + suffix
-        if rightPart + "." + suffix in font:
-            rightPart += "." + suffix
+    leftPart, rightPart = guessLigatureParts(name, font)
     # test
     left = glyph.leftMargin
     right = glyph.rightMargin
@@ -60,6 +47,28 @@ def testLigatureMetrics(glyph):
         return report
     return None
 
+def guessLigatureParts(name, glyphNames):
+    """
+    Guess the names of the left and right parts
+    of the ligature name. glyphNames is anything
+    that supports in and it is used to snap the
+    suffix of the ligature onto the parts.
+    """
+    base = name
+    suffix = None
+    if "." in name:
+        base, suffix = name.split(".", 1)
+    parts = base.split("_")
+    leftPart = parts[0]
+    rightPart = parts[-1]
+    # try snapping on the suffixes
+    if suffix:
+        if leftPart + "." + suffix in glyphNames:
+            leftPart += "." + suffix
+        if rightPart + "." + suffix in glyphNames:
+            rightPart += "." + suffix
+    return leftPart, rightPart
+
 registry.registerTest(
     identifier="ligatureMetrics",
     level="metrics",
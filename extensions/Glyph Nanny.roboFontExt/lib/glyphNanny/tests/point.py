@@ -1,9 +1,10 @@
+import numpy
 import defcon
 from . import registry
-from .wrappers import *
-from .tools import (
-    unwrapPoint,
-    calculateAngle
+from .tools import calculateAngle
+from .contourArrays import (
+    getContourArrays,
+    calculateAngles
 )
 
 # Stray Points
@@ -16,11 +17,9 @@ def testForStrayPoints(contour):
 
         (x, y)
     """
-    contour = wrapContour(contour)
-    if len(contour) == 1:
-        pt = contour[0].onCurve
-        pt = (pt.x, pt.y)
-        return pt
+    arrays = getContourArrays(contour)
+    if arrays.segmentCount == 1:
+        return arrays.onCurvePoints[0]
     return None
 
 registry.registerTest(
@@ -46,17 +45,25 @@ def testForUnnecessaryPoints(contour):
             ...
         ]
     """
-    contour = wrapContour(contour)
+    arrays = getContourArrays(contour)
     unnecessaryPoints = []
-    for segmentIndex, segment in enumerate(contour):
-        if segment.type == "line":
-            prevSegment = contour[segmentIndex - 1]
-            nextSegment = contour[(segmentIndex + 1) % len(contour)]
-            if nextSegment.type == "line":
-                thisAngle = calculateAngle(prevSegment.onCurve, segment.onCurve)
-                nextAngle = calculateAngle(segment.onCurve, nextSegment.onCurve)
-                if thisAngle == nextAngle:
-                    unnecessaryPoints.append(unwrapPoint(segment.onCurve))
+    if not arrays.segmentCount:
+        return unnecessaryPoints
+    onCurves = arrays.onCurves
+    prevOnCurves = arrays.getPreviousOnCurves()
+    nextOnCurves = arrays.getNextOnCurves()
+    # rounded angles can only be equal if the
+    # unrounded angles are very close
+    thisAngles = calculateAngles(prevOnCurves, onCurves)
+    nextAngles = calculateAngles(onCurves, nextOnCurves)
+    candidates = arrays.isLine & numpy.roll(arrays.isLine, -1) & (numpy.abs(thisAngles - nextAngles) < 0.002)
+    points = arrays.onCurvePoints
+    for segmentIndex in numpy.flatnonzero(candidates):
+        prevPoint = points[segmentIndex - 1]
+        point = points[segmentIndex]
+        nextPoint = points[(segmentIndex + 1) % arrays.segmentCount]
+        if calculateAngle(prevPoint, point) == calculateAngle(point, nextPoint):
+            unnecessaryPoints.append(point)
     return unnecessaryPoints
 
 registry.registerTest(
@@ -82,15 +89,12 @@ def testForOverlappingPoints(contour):
             ...
         ]
     """
-    contour = wrapContour(contour)
+    arrays = getContourArrays(contour)
     overlappingPoints = []
-    if len(contour) > 1:
-        prev = unwrapPoint(contour[-1].onCurve)
-        for segment in contour:
-            point = unwrapPoint(segment.onCurve)
-            if point == prev:
-                overlappingPoints.append(point)
-            prev = point
+    if arrays.segmentCount > 1:
+        overlaps = numpy.all(arrays.onCurves == arrays.getPreviousOnCurves(), axis=1)
+        for segmentIndex in numpy.flatnonzero(overlaps):
+            overlappingPoints.append(arrays.onCurvePoints[segmentIndex])
     return overlappingPoints
 
 registry.registerTest(
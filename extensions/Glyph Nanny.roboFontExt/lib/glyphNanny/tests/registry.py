@@ -14,7 +14,8 @@ def registerTest(
         description=None,
         testFunction=None,
         defconClass=None,
-        destructiveNotifications=None
+        destructiveNotifications=None,
+        infoAttributes=None
     ):
     representationName = "GlyphNanny." + identifier
     if destructiveNotifications is None:
@@ -29,5 +30,7 @@ def registerTest(
         level=level,
         description=description,
         title=title,
-        representationName=representationName
+        representationName=representationName,
+        destructiveNotifications=destructiveNotifications,
+        infoAttributes=infoAttributes
     )
@@ -2,11 +2,11 @@
 Segment level tests.
 """
 
+import numpy
 from fontTools.misc import bezierTools as ftBezierTools
 import defcon
 from .tools import (
     roundPoint,
-    unwrapPoint,
     calculateAngle,
     calculateAngleOffset,
     calculateLineLineIntersection,
@@ -14,6 +14,11 @@ from .tools import (
     calculateLineLength,
     calculateLineThroughPoint
 )
+from .contourArrays import (
+    getContourArrays,
+    calculateAngles,
+    calculateLineLineIntersections
+)
 from . import registry
 from .wrappers import *
 
@@ -31,20 +36,20 @@ def testForAngleNearMiss(contour):
         )
 
     """
-    contour = wrapContour(contour)
-    segments = contour.segments
-    prev = unwrapPoint(segments[-1].onCurve)
+    arrays = getContourArrays(contour)
     slightlyOffLines = set()
-    for segment in segments:
-        point = unwrapPoint(segment.onCurve)
-        if segment[-1].type == "line":
-            x = abs(prev[0] - point[0])
-            y = abs(prev[1] - point[1])
-            if x > 0 and x <= 5 and prev[1] != point[1]:
-                slightlyOffLines.add((prev, point))
-            if y > 0 and y <= 5 and prev[0] != point[0]:
-                slightlyOffLines.add((prev, point))
-        prev = point
+    if not arrays.segmentCount:
+        return slightlyOffLines
+    delta = numpy.abs(arrays.getPreviousOnCurves() - arrays.onCurves)
+    x = delta[:, 0]
+    y = delta[:, 1]
+    slightlyOff = arrays.isLine & (
+        ((x > 0) & (x <= 5) & (y != 0))
+      | ((y > 0) & (y <= 5) & (x != 0))
+    )
+    points = arrays.onCurvePoints
+    for segmentIndex in numpy.flatnonzero(slightlyOff):
+        slightlyOffLines.add((points[segmentIndex - 1], points[segmentIndex]))
     return slightlyOffLines
 
 registry.registerTest(
@@ -72,7 +77,7 @@ def testForSegmentsNearVerticalMetrics(contour):
 
     """
     font = wrapFont(contour.font)
-    glyph = wrapGlyph(contour.glyph)
+    arrays = getContourArrays(contour)
     contour = wrapContour(contour)
     threshold = 5
     # gather the blues into top and bottom groups
@@ -103,17 +108,25 @@ def testForSegmentsNearVerticalMetrics(contour):
             bottomZones.append((value, value))
     # find points
     found = {}
-    if len(contour) >= 3:
-        for segmentIndex, segment in enumerate(contour):
-            prev = segmentIndex - 1
-            next = segmentIndex + 1
-            if next == len(contour):
-                next = 0
-            prevSegment = contour[prev]
-            nextSegment = contour[next]
-            pt = (segment.onCurve.x, segment.onCurve.y)
-            prevPt = (prevSegment.onCurve.x, prevSegment.onCurve.y)
-            nextPt = (nextSegment.onCurve.x, nextSegment.onCurve.y)
+    if arrays.segmentCount >= 3:
+        ys = arrays.onCurves[:, 1]
+        prevYs = arrays.getPreviousOnCurves()[:, 1]
+        nextYs = arrays.getNextOnCurves()[:, 1]
+        candidates = numpy.zeros(arrays.segmentCount, dtype=bool)
+        for extremes, zones in (
+                ((ys >= prevYs) & (ys >= nextYs), topZones),
+                ((ys <= prevYs) & (ys <= nextYs), bottomZones)
+            ):
+            for b, t in zones:
+                candidates |= extremes & (
+                    ((ys > t) & (numpy.abs(t - ys) <= threshold))
+                  | ((ys < b) & (numpy.abs(b - ys) <= threshold))
+                )
+        points = arrays.onCurvePoints
+        for segmentIndex in numpy.flatnonzero(candidates):
+            pt = points[segmentIndex]
+            prevPt = points[segmentIndex - 1]
+            nextPt = points[(segmentIndex + 1) % arrays.segmentCount]
             pY = prevPt[1]
             x, y = pt
             nY = nextPt[1]
@@ -166,7 +179,15 @@ registry.registerTest(
     description="Two or more points are just off a vertical metric.",
     testFunction=testForSegmentsNearVerticalMetrics,
     defconClass=defcon.Contour,
-    destructiveNotifications=["Contour.PointsChanged"]
+    destructiveNotifications=["Contour.PointsChanged"],
+    infoAttributes=[
+        "postscriptBlueValues",
+        "postscriptOtherBlues",
+        "xHeight",
+        "capHeight",
+        "ascender",
+        "descender"
+    ]
 )
 
 # Unsmooth Smooths
@@ -182,20 +203,26 @@ def testUnsmoothSmooths(contour):
             ...
         ]
     """
-    contour = wrapContour(contour)
+    arrays = getContourArrays(contour)
     unsmoothSmooths = []
-    prev = contour[-1]
-    for segment in contour:
-        if prev.type == "curve" and segment.type == "curve":
-            if prev.smooth:
-                angle1 = calculateAngle(prev.offCurve[1], prev.onCurve, r=0)
-                angle2 = calculateAngle(prev.onCurve, segment.offCurve[0], r=0)
-                if angle1 != angle2:
-                    pt1 = unwrapPoint(prev.offCurve[1])
-                    pt2 = unwrapPoint(prev.onCurve)
-                    pt3 = unwrapPoint(segment.offCurve[0])
-                    unsmoothSmooths.append((pt1, pt2, pt3))
-        prev = segment
+    if not arrays.segmentCount:
+        return unsmoothSmooths
+    prevIsCurve = numpy.roll(arrays.isCurve, 1)
+    prevSmooth = numpy.roll(arrays.smooth, 1)
+    prevOffCurves = numpy.roll(arrays.offCurves, 1, axis=0)
+    prevOnCurves = arrays.getPreviousOnCurves()
+    angles1 = calculateAngles(prevOffCurves[:, 1], prevOnCurves)
+    angles2 = calculateAngles(prevOnCurves, arrays.offCurves[:, 0])
+    # rounded angles are certainly different if
+    # the unrounded angles are more than 1 apart
+    different = numpy.abs(angles1 - angles2) > 1.01
+    candidates = arrays.isCurve & prevIsCurve & prevSmooth
+    for segmentIndex in numpy.flatnonzero(candidates):
+        pt1 = arrays.offCurvePoints[segmentIndex - 1][1]
+        pt2 = arrays.onCurvePoints[segmentIndex - 1]
+        pt3 = arrays.offCurvePoints[segmentIndex][0]
+        if different[segmentIndex] or calculateAngle(pt1, pt2, r=0) != calculateAngle(pt2, pt3, r=0):
+            unsmoothSmooths.append((pt1, pt2, pt3))
     return unsmoothSmooths
 
 registry.registerTest(
@@ -221,19 +248,19 @@ def testForComplexCurves(contour):
             ...
         ]
     """
-    contour = wrapContour(contour)
+    arrays = getContourArrays(contour)
     impliedS = []
-    prev = unwrapPoint(contour[-1].onCurve)
-    for segment in contour:
-        if segment.type == "curve":
-            pt0 = prev
-            pt1, pt2 = [unwrapPoint(p) for p in segment.offCurve]
-            pt3 = unwrapPoint(segment.onCurve)
-            line1 = (pt0, pt3)
-            line2 = (pt1, pt2)
-            if calculateLineLineIntersection(line1, line2):
-                impliedS.append((prev, pt1, pt2, pt3))
-        prev = unwrapPoint(segment.onCurve)
+    if not arrays.segmentCount:
+        return impliedS
+    intersecting = arrays.isCurve & calculateLineLineIntersections(
+        arrays.getPreviousOnCurves(),
+        arrays.onCurves,
+        arrays.offCurves[:, 0],
+        arrays.offCurves[:, 1]
+    )
+    for segmentIndex in numpy.flatnonzero(intersecting):
+        pt1, pt2 = arrays.offCurvePoints[segmentIndex]
+        impliedS.append((arrays.onCurvePoints[segmentIndex - 1], pt1, pt2, arrays.onCurvePoints[segmentIndex]))
     return impliedS
 
 registry.registerTest(
@@ -263,57 +290,63 @@ def testForCrossedHandles(contour):
             ...
         ]
     """
-    contour = wrapContour(contour)
+    arrays = getContourArrays(contour)
     crossedHandles = []
-    pt0 = unwrapPoint(contour[-1].onCurve)
-    for segment in contour:
-        pt3 = unwrapPoint(segment.onCurve)
-        if segment.type == "curve":
-            pt1, pt2 = [unwrapPoint(p) for p in segment.offCurve]
-            # direct intersection
+    if not arrays.segmentCount:
+        return crossedHandles
+    directHits = arrays.isCurve & calculateLineLineIntersections(
+        arrays.getPreviousOnCurves(),
+        arrays.offCurves[:, 0],
+        arrays.offCurves[:, 1],
+        arrays.onCurves
+    )
+    for segmentIndex in numpy.flatnonzero(arrays.isCurve):
+        pt0 = arrays.onCurvePoints[segmentIndex - 1]
+        pt1, pt2 = arrays.offCurvePoints[segmentIndex]
+        pt3 = arrays.onCurvePoints[segmentIndex]
+        # direct intersection
+        if directHits[segmentIndex]:
             direct = calculateLineLineIntersection((pt0, pt1), (pt2, pt3))
-            if direct:
-                if _crossedHanldeWithNoOtherOptions(direct, pt0, pt1, pt2, pt3):
-                    pass
-                else:
-                    crossedHandles.append(dict(points=(pt0, pt1, pt2, pt3), intersection=direct))
-            # indirect intersection
+            if _crossedHanldeWithNoOtherOptions(direct, pt0, pt1, pt2, pt3):
+                pass
             else:
-                while 1:
-                    # bcp1 = ray, bcp2 = segment
-                    angle = calculateAngle(pt0, pt1)
-                    if angle in (0, 180.0):
-                        t1 = (pt0[0] + 1000, pt0[1])
-                        t2 = (pt0[0] - 1000, pt0[1])
+                crossedHandles.append(dict(points=(pt0, pt1, pt2, pt3), intersection=direct))
+        # indirect intersection
+        else:
+            while 1:
+                # bcp1 = ray, bcp2 = segment
+                angle = calculateAngle(pt0, pt1)
+                if angle in (0, 180.0):
+                    t1 = (pt0[0] + 1000, pt0[1])
+                    t2 = (pt0[0] - 1000, pt0[1])
+                else:
+                    yOffset = calculateAngleOffset(angle, 1000)
+                    t1 = (pt0[0] + 1000, pt0[1] + yOffset)
+                    t2 = (pt0[0] - 1000, pt0[1] - yOffset)
+                indirect = calculateLineLineIntersection((t1, t2), (pt2, pt3))
+                if indirect:
+                    if _crossedHanldeWithNoOtherOptions(indirect, pt0, pt1, pt2, pt3):
+                        pass
                     else:
-                        yOffset = calculateAngleOffset(angle, 1000)
-                        t1 = (pt0[0] + 1000, pt0[1] + yOffset)
-                        t2 = (pt0[0] - 1000, pt0[1] - yOffset)
-                    indirect = calculateLineLineIntersection((t1, t2), (pt2, pt3))
-                    if indirect:
-                        if _crossedHanldeWithNoOtherOptions(indirect, pt0, pt1, pt2, pt3):
-                            pass
-                        else:
-                            crossedHandles.append(dict(points=(pt0, indirect, pt2, pt3), intersection=indirect))
-                        break
-                    # bcp1 = segment, bcp2 = ray
-                    angle = calculateAngle(pt3, pt2)
-                    if angle in (90.0, 270.0):
-                        t1 = (pt3[0], pt3[1] + 1000)
-                        t2 = (pt3[0], pt3[1] - 1000)
+                        crossedHandles.append(dict(points=(pt0, indirect, pt2, pt3), intersection=indirect))
+                    break
+                # bcp1 = segment, bcp2 = ray
+                angle = calculateAngle(pt3, pt2)
+                if angle in (90.0, 270.0):
+                    t1 = (pt3[0], pt3[1] + 1000)
+                    t2 = (pt3[0], pt3[1] - 1000)
+                else:
+                    yOffset = calculateAngleOffset(angle, 1000)
+                    t1 = (pt3[0] + 1000, pt3[1] + yOffset)
+                    t2 = (pt3[0] - 1000, pt3[1] - yOffset)
+                indirect = calculateLineLineIntersection((t1, t2), (pt0, pt1))
+                if indirect:
+                    if _crossedHanldeWithNoOtherOptions(indirect, pt0, pt1, pt2, pt3):
+                        pass
                     else:
-                        yOffset = calculateAngleOffset(angle, 1000)
-                        t1 = (pt3[0] + 1000, pt3[1] + yOffset)
-                        t2 = (pt3[0] - 1000, pt3[1] - yOffset)
-                    indirect = calculateLineLineIntersection((t1, t2), (pt0, pt1))
-                    if indirect:
-                        if _crossedHanldeWithNoOtherOptions(indirect, pt0, pt1, pt2, pt3):
-                            pass
-                        else:
-                            crossedHandles.append(dict(points=(pt0, pt1, indirect, pt3), intersection=indirect))
-                        break
+                        crossedHandles.append(dict(points=(pt0, pt1, indirect, pt3), intersection=indirect))
                     break
-        pt0 = pt3
+                break
     return crossedHandles
 
 def _crossedHanldeWithNoOtherOptions(hit, pt0, pt1, pt2, pt3):
@@ -353,23 +386,33 @@ def testForUnnecessaryHandles(contour):
             ...
         ]
     """
-    contour = wrapContour(contour)
+    arrays = getContourArrays(contour)
     unnecessaryHandles = []
-    prevPoint = contour[-1].onCurve
-    for segment in contour:
-        if segment.type == "curve":
-            pt0 = prevPoint
-            pt1, pt2 = segment.offCurve
-            pt3 = segment.onCurve
-            lineAngle = calculateAngle(pt0, pt3, 0)
-            bcpAngle1 = bcpAngle2 = None
-            if (pt0.x, pt0.y) != (pt1.x, pt1.y):
-                bcpAngle1 = calculateAngle(pt0, pt1, 0)
-            if (pt2.x, pt2.y) != (pt3.x, pt3.y):
-                bcpAngle2 = calculateAngle(pt2, pt3, 0)
-            if bcpAngle1 == lineAngle and bcpAngle2 == lineAngle:
-                unnecessaryHandles.append((unwrapPoint(pt1), unwrapPoint(pt2)))
-        prevPoint = segment.onCurve
+    if not arrays.segmentCount:
+        return unnecessaryHandles
+    prevOnCurves = arrays.getPreviousOnCurves()
+    lineAngles = calculateAngles(prevOnCurves, arrays.onCurves)
+    bcpAngles1 = calculateAngles(prevOnCurves, arrays.offCurves[:, 0])
+    bcpAngles2 = calculateAngles(arrays.offCurves[:, 1], arrays.onCurves)
+    # rounded angles can't be equal if the
+    # unrounded angles are more than 1 apart
+    candidates = (
+        arrays.isCurve
+      & ~(numpy.abs(bcpAngles1 - lineAngles) > 1.01)
+      & ~(numpy.abs(bcpAngles2 - lineAngles) > 1.01)
+    )
+    for segmentIndex in numpy.flatnonzero(candidates):
+        pt0 = arrays.onCurvePoints[segmentIndex - 1]
+        pt1, pt2 = arrays.offCurvePoints[segmentIndex]
+        pt3 = arrays.onCurvePoints[segmentIndex]
+        lineAngle = calculateAngle(pt0, pt3, 0)
+        bcpAngle1 = bcpAngle2 = None
+        if pt0 != pt1:
+            bcpAngle1 = calculateAngle(pt0, pt1, 0)
+        if pt2 != pt3:
+            bcpAngle2 = calculateAngle(pt2, pt3, 0)
+        if bcpAngle1 == lineAngle and bcpAngle2 == lineAngle:
+            unnecessaryHandles.append((pt1, pt2))
     return unnecessaryHandles
 
 registry.registerTest(
@@ -397,47 +440,44 @@ def testForUnevenHandles(contour):
         ]
 
     """
-    contour = wrapContour(contour)
+    arrays = getContourArrays(contour)
     unevenHandles = []
-    prevPoint = contour[-1].onCurve
-    for segment in contour:
-        if segment.type == "curve":
-            # create rays perpendicular to the
-            # angle between the on and off
-            # through the on
-            on1 = unwrapPoint(prevPoint)
-            off1, off2 = [unwrapPoint(pt) for pt in segment.offCurve]
-            on2 = unwrapPoint(segment.onCurve)
-            curve = (on1, off1, off2, on2)
-            off1Angle = calculateAngle(on1, off1) - 90
-            on1Ray = calculateLineThroughPoint(on1, off1Angle)
-            off2Angle = calculateAngle(off2, on2) - 90
-            on2Ray = calculateLineThroughPoint(on2, off2Angle)
-            # find the intersection of the rays
-            rayIntersection = calculateLineLineIntersection(on1Ray, on2Ray)
-            if rayIntersection is not None:
-                # draw a line between the off curves and the intersection
-                # and find out where these lines intersect the curve
-                off1Intersection = calculateLineCurveIntersection((off1, rayIntersection), curve)
-                off2Intersection = calculateLineCurveIntersection((off2, rayIntersection), curve)
-                if off1Intersection is not None and off2Intersection is not None:
-                    if off1Intersection.points and off2Intersection.points:
-                        off1IntersectionPoint = (off1Intersection.points[0].x, off1Intersection.points[0].y)
-                        off2IntersectionPoint = (off2Intersection.points[0].x, off2Intersection.points[0].y)
-                        # assemble the off curves and their intersections into lines
-                        off1Line = (off1, off1IntersectionPoint)
-                        off2Line = (off2, off2IntersectionPoint)
-                        # measure and compare these
-                        # if they are not both very short calculate the ratio
-                        length1, length2 = sorted((calculateLineLength(*off1Line), calculateLineLength(*off2Line)))
-                        if length1 >= 3 and length2 >= 3:
-                            ratio = length2 / float(length1)
-                            # if outside acceptable range, flag
-                            if ratio > 1.5:
-                                off1Shape = _getUnevenHandleShape(on1, off1, off2, on2, off1Intersection, on1, off1IntersectionPoint, off1)
-                                off2Shape = _getUnevenHandleShape(on1, off1, off2, on2, off2Intersection, off2IntersectionPoint, on2, off2)
-                                unevenHandles.append((off1, off2, off1Shape, off2Shape))
-        prevPoint = segment.onCurve
+    for segmentIndex in numpy.flatnonzero(arrays.isCurve):
+        # create rays perpendicular to the
+        # angle between the on and off
+        # through the on
+        on1 = arrays.onCurvePoints[segmentIndex - 1]
+        off1, off2 = arrays.offCurvePoints[segmentIndex]
+        on2 = arrays.onCurvePoints[segmentIndex]
+        curve = (on1, off1, off2, on2)
+        off1Angle = calculateAngle(on1, off1) - 90
+        on1Ray = calculateLineThroughPoint(on1, off1Angle)
+        off2Angle = calculateAngle(off2, on2) - 90
+        on2Ray = calculateLineThroughPoint(on2, off2Angle)
+        # find the intersection of the rays
+        rayIntersection = calculateLineLineIntersection(on1Ray, on2Ray)
+        if rayIntersection is not None:
+            # draw a line between the off curves and the intersection
+            # and find out where these lines intersect the curve
+            off1Intersection = calculateLineCurveIntersection((off1, rayIntersection), curve)
+            off2Intersection = calculateLineCurveIntersection((off2, rayIntersection), curve)
+            if off1Intersection is not None and off2Intersection is not None:
+                if off1Intersection.points and off2Intersection.points:
+                    off1IntersectionPoint = (off1Intersection.points[0].x, off1Intersection.points[0].y)
+                    off2IntersectionPoint = (off2Intersection.points[0].x, off2Intersection.points[0].y)
+                    # assemble the off curves and their intersections into lines
+                    off1Line = (off1, off1IntersectionPoint)
+                    off2Line = (off2, off2IntersectionPoint)
+                    # measure and compare these
+                    # if they are not both very short calculate the ratio
+                    length1, length2 = sorted((calculateLineLength(*off1Line), calculateLineLength(*off2Line)))
+                    if length1 >= 3 and length2 >= 3:
+                        ratio = length2 / float(length1)
+                        # if outside acceptable range, flag
+                        if ratio > 1.5:
+                            off1Shape = _getUnevenHandleShape(on1, off1, off2, on2, off1Intersection, on1, off1IntersectionPoint, off1)
+                            off2Shape = _getUnevenHandleShape(on1, off1, off2, on2, off2Intersection, off2IntersectionPoint, on2, off2)
+                            unevenHandles.append((off1, off2, off1Shape, off2Shape))
     return unevenHandles
 
 def _getUnevenHandleShape(pt0, pt1, pt2, pt3, intersection, start, end, off):
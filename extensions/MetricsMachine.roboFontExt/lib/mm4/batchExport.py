@@ -0,0 +1,349 @@
+"""
+Headless batch kerning export.
+
+This does the same job as the Batch Export window but works
+with plain defcon fonts, so it can be run without RoboFont:
+
+    python -m mm4.batchExport --mode feature --subtable-breaks *.ufo
+
+The fonts are spread across a process pool. A font is skipped
+if the files that the export reads have not changed since the
+last time the font was exported with the same settings. The
+digests of the previous exports are kept in a JSON file.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+
+defaultCacheFileName = "mmBatchExportCache.json"
+
+
+# -----
+# Paths
+# -----
+
+def makeFileName(directory, baseName, extension, counter=None):
+    if counter:
+        b = "%s %d.%s" % (baseName, counter, extension)
+    else:
+        b = "%s.%s" % (baseName, extension)
+    return os.path.join(directory, b)
+
+
+def findAvailableFileName(directory, baseName, extension, counter=0):
+    # add number
+    if counter:
+        fileName = makeFileName(directory, baseName, extension, counter)
+    # no number
+    else:
+        fileName = makeFileName(directory, baseName, extension)
+    # recurse if necessary
+    if os.path.exists(fileName):
+        fileName = findAvailableFileName(directory, baseName, extension, counter + 1)
+    # done
+    return fileName
+
+
+def getOutputPath(path, mode="feature", destination="file", overwrite=True):
+    """
+    Get the path that the export of the font at path will be
+    written to. None is returned when the kerning is written
+    into the font.
+
+    >>> getOutputPath("/fonts/Light.ufo", mode="afm")
+    '/fonts/Light.afm'
+    >>> getOutputPath("/fonts/Light.ufo")
+    '/fonts/Light kern.fea'
+    >>> getOutputPath("/fonts/Light.ufo", destination="ufo") is None
+    True
+    """
+    d = os.path.dirname(path)
+    b = os.path.splitext(os.path.basename(path))[0]
+    if mode == "afm":
+        extension = "afm"
+    elif destination == "ufo":
+        return None
+    else:
+        b = "%s kern" % b
+        extension = "fea"
+    if overwrite:
+        return makeFileName(directory=d, baseName=b, extension=extension)
+    return findAvailableFileName(directory=d, baseName=b, extension=extension)
+
+
+# -------
+# Digests
+# -------
+
+def _getSourceFiles(path, mode, subtableBreaks=False):
+    # the feature export only depends on the groups,
+    # the kerning and the glyph set. the subtable breaks
+    # use the unicodes of the glyphs to find the scripts.
+    # the AFM also contains the font info and the glyph
+    # metrics.
+    fileNames = ["groups.plist", "kerning.plist", os.path.join("glyphs", "contents.plist")]
+    if mode == "afm":
+        fileNames.append("fontinfo.plist")
+    if mode == "afm" or subtableBreaks:
+        glyphsDirectory = os.path.join(path, "glyphs")
+        if os.path.isdir(glyphsDirectory):
+            fileNames += [os.path.join("glyphs", fileName) for fileName in sorted(os.listdir(glyphsDirectory)) if fileName.endswith(".glif")]
+    return fileNames
+
+
+def getFontDigest(path, mode="feature", destination="file", subtableBreaks=False, appVersion="0.0"):
+    """
+    Get a digest of the files in the UFO at path that are read
+    by the export and of the export settings.
+
+    >>> import tempfile
+    >>> path = os.path.join(tempfile.mkdtemp(), "Test.ufo")
+    >>> os.makedirs(os.path.join(path, "glyphs"))
+    >>> with open(os.path.join(path, "glyphs", "A_.glif"), "w") as f:
+    ...     _ = f.write("<glyph name='A'/>")
+    >>> digest = getFontDigest(path)
+    >>> breaksDigest = getFontDigest(path, subtableBreaks=True)
+    >>> with open(os.path.join(path, "glyphs", "A_.glif"), "w") as f:
+    ...     _ = f.write("<glyph name='A'><unicode hex='0041'/></glyph>")
+    >>> getFontDigest(path) == digest
+    True
+    >>> getFontDigest(path, subtableBreaks=True) == breaksDigest
+    False
+    """
+    digest = hashlib.sha1()
+    settings = (mode, destination, bool(subtableBreaks), appVersion)
+    digest.update(repr(settings).encode("utf-8"))
+    for fileName in _getSourceFiles(path, mode, subtableBreaks):
+        digest.update(fileName.encode("utf-8"))
+        filePath = os.path.join(path, fileName)
+        if not os.path.exists(filePath):
+            digest.update(b"\0")
+            continue
+        with open(filePath, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def readCache(path):
+    if path is None or not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r") as f:
+            cache = json.load(f)
+    except ValueError:
+        return {}
+    if not isinstance(cache, dict):
+        return {}
+    return cache
+
+
+def writeCache(path, cache):
+    if path is None:
+        return
+    with open(path, "w") as f:
+        json.dump(cache, f, indent=2, sort_keys=True)
+
+
+# ------
+# Export
+# ------
+
+def exportFont(path, outputPath, mode="feature", subtableBreaks=False, appVersion="0.0"):
+    """
+    Export the kerning of the UFO at path. If the mode is
+    feature and outputPath is None, the kern feature in the
+    font is replaced and the font is saved.
+    """
+    from defcon import Font
+    # register the metricsMachine implementations
+    import mm4.objects
+    font = Font(path)
+    mmKerning = font.kerning.metricsMachine
+    if mode == "afm":
+        mmKerning.exportKerningToAFMFile(outputPath, glyphs=font.keys(), appVersion=appVersion)
+    elif outputPath is None:
+        mmKerning.exportKerningToFeatureFile(None, appVersion=appVersion, subtableBreaks=subtableBreaks)
+        # only the features have been changed
+        font.info.dirty = False
+        font.groups.dirty = False
+        font.kerning.dirty = False
+        if font.ufoFormatVersion == 2:
+            font.lib.dirty = False
+        font.save()
+    else:
+        mmKerning.exportKerningToFeatureFile(outputPath, appVersion=appVersion, subtableBreaks=subtableBreaks)
+
+
+def _exportFontWorker(arguments):
+    path, outputPath, mode, subtableBreaks, appVersion = arguments
+    start = time.time()
+    error = None
+    try:
+        exportFont(path, outputPath, mode=mode, subtableBreaks=subtableBreaks, appVersion=appVersion)
+    except Exception as e:
+        error = "%s: %s" % (e.__class__.__name__, e)
+    return path, time.time() - start, error
+
+
+def exportFonts(paths, mode="feature", destination="file", subtableBreaks=False, overwrite=True,
+                appVersion="0.0", cachePath=None, force=False, workers=None):
+    """
+    Export the kerning of the UFOs at paths. The exports are
+    run in a pool of workers processes. If workers is 1 the
+    fonts are exported in this process.
+
+    A list of result dicts is returned in the order of paths.
+    Each contains path, outputPath, status (one of "exported",
+    "skipped" or "failed"), time and error.
+
+    >>> import tempfile
+    >>> from defcon import Font
+    >>> directory = tempfile.mkdtemp()
+    >>> cachePath = os.path.join(directory, "cache.json")
+    >>> path = os.path.join(directory, "Test.ufo")
+    >>> font = Font()
+    >>> glyph = font.newGlyph("A")
+    >>> font.kerning[("A", "A")] = -10
+    >>> font.save(path)
+
+    >>> results = exportFonts([path], mode="afm", cachePath=cachePath, workers=1)
+    >>> [(os.path.basename(r["outputPath"]), r["status"]) for r in results]
+    [('Test.afm', 'exported')]
+    >>> [r["status"] for r in exportFonts([path], mode="afm", cachePath=cachePath, workers=1)]
+    ['skipped']
+
+    >>> font.kerning[("A", "A")] = -20
+    >>> font.save()
+    >>> [r["status"] for r in exportFonts([path], mode="afm", cachePath=cachePath, workers=1)]
+    ['exported']
+
+    >>> import shutil
+    >>> shutil.rmtree(directory)
+    """
+    cache = readCache(cachePath)
+    results = []
+    jobs = []
+    for path in paths:
+        path = os.path.abspath(path)
+        result = dict(path=path, outputPath=None, status=None, time=0.0, error=None)
+        results.append(result)
+        if not os.path.isdir(path):
+            result["status"] = "failed"
+            result["error"] = "File does not exist"
+            continue
+        digest = getFontDigest(path, mode=mode, destination=destination, subtableBreaks=subtableBreaks, appVersion=appVersion)
+        result["digest"] = digest
+        previous = cache.get(path)
+        if not force and previous is not None and previous.get("digest") == digest:
+            previousOutputPath = previous.get("outputPath")
+            if previousOutputPath is None or os.path.exists(previousOutputPath):
+                result["outputPath"] = previousOutputPath
+                result["status"] = "skipped"
+                continue
+        outputPath = getOutputPath(path, mode=mode, destination=destination, overwrite=overwrite)
+        result["outputPath"] = outputPath
+        jobs.append((result, (path, outputPath, mode, subtableBreaks, appVersion)))
+    if jobs:
+        arguments = [a for result, a in jobs]
+        if workers == 1 or len(jobs) == 1:
+            outcomes = [_exportFontWorker(a) for a in arguments]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                outcomes = list(executor.map(_exportFontWorker, arguments))
+        for (result, a), (path, duration, error) in zip(jobs, outcomes):
+            result["time"] = duration
+            if error is None:
+                result["status"] = "exported"
+                cache[path] = dict(digest=result["digest"], outputPath=result["outputPath"])
+            else:
+                result["status"] = "failed"
+                result["error"] = error
+                cache.pop(path, None)
+        writeCache(cachePath, cache)
+    for result in results:
+        result.pop("digest", None)
+    return results
+
+
+# ------
+# Report
+# ------
+
+def formatReport(results, totalTime=None):
+    """
+    >>> results = [
+    ...     dict(path="/fonts/Light.ufo", outputPath="/fonts/Light.afm", status="exported", time=1.5, error=None),
+    ...     dict(path="/fonts/Bold.ufo", outputPath="/fonts/Bold.afm", status="skipped", time=0.0, error=None),
+    ...     dict(path="/fonts/Black.ufo", outputPath=None, status="failed", time=0.25, error="KeyError: 'A'"),
+    ... ]
+    >>> print(formatReport(results, totalTime=1.75))
+    Light.ufo    exported     1.500 s
+    Bold.ufo     skipped      0.000 s
+    Black.ufo    failed       0.250 s  KeyError: 'A'
+    <BLANKLINE>
+    1 exported, 1 skipped, 1 failed in 1.750 s
+    """
+    names = [os.path.basename(result["path"]) for result in results]
+    width = max([len(name) for name in names] + [0]) + 4
+    lines = []
+    counts = dict(exported=0, skipped=0, failed=0)
+    for name, result in zip(names, results):
+        status = result["status"]
+        counts[status] += 1
+        line = "%s%-10s %7.3f s" % (name.ljust(width), status, result["time"])
+        if result["error"]:
+            line += "  " + result["error"]
+        lines.append(line)
+    if totalTime is None:
+        totalTime = sum([result["time"] for result in results])
+    lines.append("")
+    lines.append("%d exported, %d skipped, %d failed in %.3f s" % (counts["exported"], counts["skipped"], counts["failed"], totalTime))
+    return "\n".join(lines)
+
+
+# ----
+# Main
+# ----
+
+def main(args=None):
+    parser = argparse.ArgumentParser(prog="mm4.batchExport", description="Export the kerning of UFOs to AFM or kern feature files.")
+    parser.add_argument("fonts", nargs="+", help="UFO paths")
+    parser.add_argument("--mode", choices=["feature", "afm"], default="feature")
+    parser.add_argument("--destination", choices=["file", "ufo"], default="file", help="write the kern feature to a file next to the UFO or into the UFO features")
+    parser.add_argument("--subtable-breaks", action="store_true", help="insert subtable breaks in the kern feature")
+    parser.add_argument("--no-overwrite", action="store_true", help="don't overwrite existing export files")
+    parser.add_argument("--app-version", default="0.0", help="version written in the export header")
+    parser.add_argument("--cache", default=defaultCacheFileName, help="file used to remember previous exports")
+    parser.add_argument("--no-cache", action="store_true", help="don't read or write the export cache")
+    parser.add_argument("--force", action="store_true", help="export fonts that have not changed")
+    parser.add_argument("--workers", type=int, default=None, help="number of worker processes")
+    options = parser.parse_args(args)
+    cachePath = options.cache
+    if options.no_cache:
+        cachePath = None
+    start = time.time()
+    results = exportFonts(
+        options.fonts,
+        mode=options.mode,
+        destination=options.destination,
+        subtableBreaks=options.subtable_breaks,
+        overwrite=not options.no_overwrite,
+        appVersion=options.app_version,
+        cachePath=cachePath,
+        force=options.force,
+        workers=options.workers
+    )
+    print(formatReport(results, totalTime=time.time() - start))
+    if any(result["status"] == "failed" for result in results):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
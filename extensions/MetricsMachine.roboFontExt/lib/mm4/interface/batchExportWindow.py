@@ -4,6 +4,7 @@ import vanilla
 from mojo.roboFont import OpenFont
 from defconAppKit.windows.baseWindow import BaseWindowController
 from mm4.interface.kerningExportSheet import KerningExportSettingsView
+from mm4.batchExport import makeFileName, findAvailableFileName
 
 from lib.tools.debugTools import ClassNameIncrementer
 
@@ -164,23 +165,3 @@ class BatchExportWindow(BaseWindowController):
             informativeText = "\n".join(informativeText)
             self.showMessage(messageText=messageText, informativeText=informativeText)
 
-
-def makeFileName(directory, baseName, extension, counter=None):
-    if counter:
-        b = "%s %d.%s" % (baseName, counter, extension)
-    else:
-        b = "%s.%s" % (baseName, extension)
-    return os.path.join(directory, b)
-
-def findAvailableFileName(directory, baseName, extension, counter=0):
-    # add number
-    if counter:
-        fileName = makeFileName(directory, baseName, extension, counter)
-    # no number
-    else:
-        fileName = makeFileName(directory, baseName, extension)
-    # recurse if necessary
-    if os.path.exists(fileName):
-        fileName = findAvailableFileName(directory, baseName, extension, counter+1)
-    # done
-    return fileName
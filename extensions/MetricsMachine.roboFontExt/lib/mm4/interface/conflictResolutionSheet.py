@@ -280,3 +280,120 @@ class ConflictResolutionSheet(BaseWindowController):
         else:
             self.lineView.setBackgroundColor(AppKit.NSColor.whiteColor())
             self.lineView.setGlyphColor(AppKit.NSColor.blackColor())
+
+
+class ImportConflictsSheet(BaseWindowController):
+
+    """
+    Show what an import will do before anything is changed:
+    the problems found in the imported groups and the top
+    level pairs that will need resolution. The resolutions
+    are only shown here. They are made in the conflict
+    resolution sheet after the groups are applied.
+    """
+
+    def __init__(self, parentWindow, messages, pairs, callback):
+        self._callback = callback
+        self._pairs = pairs
+
+        allPairs = []
+        for (side1, side2), data in sorted(pairs.items()):
+            groupValueCount = 0
+            followGroupCount = 0
+            exceptionCount = 0
+            for (l, r), pairData in data["pairs"].items():
+                resolution = pairData["resolution"]
+                if resolution == "group value":
+                    groupValueCount += 1
+                elif resolution == "follow group":
+                    followGroupCount += 1
+                else:
+                    exceptionCount += 1
+            d = dict(side1=side1, side2=side2, value=data["finalValue"], groupValueCount=groupValueCount, followGroupCount=followGroupCount, exceptionCount=exceptionCount)
+            allPairs.append(d)
+        allPairs = sorted(allPairs, key=lambda d: d['exceptionCount'], reverse=True)
+
+        width = 900
+        self.w = vanilla.Sheet((width, 500), minSize=(width, 300), maxSize=(width, 10000), parentWindow=parentWindow)
+
+        valueFormatter = KerningValueFormatter()
+        pairMemberFormatter = PairMemberFormatter.alloc().init()
+
+        # messages
+
+        self.w.messagesTitle = vanilla.TextBox((15, 15, -15, 17), "%d problems were found in the imported groups." % len(messages))
+        self.w.messages = vanilla.TextEditor((15, 40, -15, 100), "\n".join(messages), readOnly=True)
+
+        # pairs
+
+        self.w.pairsTitle = vanilla.TextBox((15, 155, -15, 17), "%d pairs will need resolution after the import." % len(allPairs))
+
+        columnDescriptions = [
+            dict(title="Side 1", key="side1", width=98, formatter=PairMemberFormatter.alloc().init()),
+            dict(title="Side 2", key="side2", width=98, formatter=PairMemberFormatter.alloc().init()),
+            dict(title="value", width=40, formatter=valueFormatter),
+            dict(title="groupValueCount", width=35, cell=CountListCell.alloc().initWithColor_(conflictResolutionListGroupValuePillColor)),
+            dict(title="followGroupCount", width=35, cell=CountListCell.alloc().initWithColor_(conflictResolutionListFollowGroupPillColor)),
+            dict(title="exceptionCount", width=35, cell=CountListCell.alloc().initWithColor_(conflictResolutionListExceptionPillColor)),
+        ]
+        topLevelPairListWidth = 440
+        self.w.topLevelPairList = vanilla.List((15, 180, topLevelPairListWidth, -65), allPairs, columnDescriptions=columnDescriptions,
+            autohidesScrollers=False, showColumnTitles=False, drawVerticalLines=True, drawFocusRing=False,
+            allowsMultipleSelection=False, selectionCallback=self.topLevelPairListSelectionCallback)
+        self.w.topLevelPairList.getNSScrollView().setHasHorizontalScroller_(False)
+        cell = self.w.topLevelPairList.getNSTableView().tableColumns()[2].dataCell()
+        cell.setAlignment_(AppKit.NSRightTextAlignment)
+
+        columnDescriptions = [
+            dict(title="Side 1", key="side1", width=98, formatter=pairMemberFormatter, editable=False),
+            dict(title="Side 2", key="side2", width=98, formatter=pairMemberFormatter, editable=False),
+            dict(title="Value", key="value", width=40, formatter=valueFormatter, editable=False),
+            dict(title="Resolution", key="resolution", editable=False)
+        ]
+        self.w.conflictsList = vanilla.List((topLevelPairListWidth + 25, 180, -15, -65), [], columnDescriptions=columnDescriptions,
+            autohidesScrollers=False, showColumnTitles=False, drawVerticalLines=True, drawFocusRing=False,
+            allowsMultipleSelection=False)
+        self.w.conflictsList.getNSScrollView().setHasHorizontalScroller_(False)
+        cell = self.w.conflictsList.getNSTableView().tableColumns()[2].dataCell()
+        cell.setAlignment_(AppKit.NSRightTextAlignment)
+
+        # bottom
+
+        self.w.bottomLine = vanilla.HorizontalLine((15, -50, -15, 1))
+
+        self.w.cancelButton = vanilla.Button((-165, -35, 70, 20), "Cancel", callback=self.cancelCallback)
+        self.w.cancelButton.bind(".", ["command"])
+        self.w.cancelButton.bind(chr(27), [])
+        self.w.importButton = vanilla.Button((-85, -35, 70, 20), "Import", callback=self.importCallback)
+
+        self.setUpBaseWindowBehavior()
+
+        if allPairs:
+            self.w.topLevelPairList.setSelection([0])
+
+        self.w.open()
+
+    def _finalize(self):
+        self._callback = None
+
+    def cancelCallback(self, sender):
+        self.w.close()
+        self._finalize()
+
+    def importCallback(self, sender):
+        self.w.close()
+        self._callback()
+        self._finalize()
+
+    def topLevelPairListSelectionCallback(self, sender):
+        selection = sender.getSelection()
+        if not selection:
+            self.w.conflictsList.set([])
+            return
+        item = sender[selection[0]]
+        pair = (item["side1"], item["side2"])
+        conflicts = []
+        for (side1, side2), data in sorted(self._pairs[pair]["pairs"].items()):
+            d = dict(side1=side1, side2=side2, value=data["value"], resolution=data["resolution"])
+            conflicts.append(d)
+        self.w.conflictsList.set(conflicts)
@@ -14,6 +14,7 @@ class PairList(vanilla.Group):
         self.font.kerning.addObserver(self, "_kerningPairDeletedChanged", "Kerning.PairDeleted")
         self.font.kerning.addObserver(self, "_kerningClearedChanged", "Kerning.Cleared")
         self.font.kerning.addObserver(self, "_kerningUpdatedChanged", "Kerning.Updated")
+        self.font.kerning.addObserver(self, "_kerningBatchChanged", "MMKerning.BatchChanged")
         self._selectionCallback = selectionCallback
 
         self._originalList = []
@@ -136,6 +137,7 @@ class PairList(vanilla.Group):
             self.font.kerning.removeObserver(self, "Kerning.PairDeleted")
             self.font.kerning.removeObserver(self, "Kerning.Cleared")
             self.font.kerning.removeObserver(self, "Kerning.Updated")
+            self.font.kerning.removeObserver(self, "MMKerning.BatchChanged")
         self.font = None
         self._selectionCallback = None
         super(PairList, self)._breakCycles()
@@ -212,6 +214,24 @@ class PairList(vanilla.Group):
                 item = self.list[index]
                 item["value"] = 0
 
+    def _kerningBatchChanged(self, notification):
+        changedPairs = notification.data["pairs"]
+        mmgroups = self.font.groups.metricsMachine
+        getSide1GroupForGlyph = mmgroups.getSide1GroupForGlyph
+        getSide2GroupForGlyph = mmgroups.getSide2GroupForGlyph
+        mmkerning = self.font.kerning.metricsMachine
+        for pair, indexes in self._indexMap.items():
+            side1, side2 = pair
+            side1Group = getSide1GroupForGlyph(side1)
+            side2Group = getSide2GroupForGlyph(side2)
+            candidates = (pair, (side1Group, side2), (side1, side2Group), (side1Group, side2Group))
+            if not any(candidate in changedPairs for candidate in candidates):
+                continue
+            value = mmkerning[pair]
+            for index in indexes:
+                item = self.list[index]
+                item["value"] = value
+
     def _kerningClearedChanged(self, notification):
         for item in self.list:
             item["value"] = 0
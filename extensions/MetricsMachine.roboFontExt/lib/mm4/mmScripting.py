@@ -239,9 +239,8 @@ class MetricsMachineKerning(roboFont.RKerning):
             pairs = self.keys()
         pairs = [normalizers.normalizeKerningKey(pair) for pair in pairs]
         factor = normalizers.normalizeTransformationScale(factor)[0]
-        self.naked().holdNotifications(note="Hold put in place by mmScripting.scaleTransformation.")
-        self._metricsMachine.transformationScale(pairs, factor)
-        self.naked().releaseHeldNotifications()
+        with self._metricsMachine.batch(note="Batch put in place by mmScripting.scaleTransformation."):
+            self._metricsMachine.transformationScale(pairs, factor)
 
     def _round(self, multiple=1):
         self.applyTransformationRound(self.keys(), multiple)
@@ -281,9 +280,8 @@ class MetricsMachineKerning(roboFont.RKerning):
             pairs = self.keys()
         pairs = [normalizers.normalizeKerningKey(pair) for pair in pairs]
         increment = normalizers.normalizeVisualRounding(increment)
-        self.naked().holdNotifications(note="Hold put in place by mmScripting.roundTransformation.")
-        self._metricsMachine.transformationRound(pairs, increment, removeRedundantExceptions)
-        self.naked().releaseHeldNotifications()
+        with self._metricsMachine.batch(note="Batch put in place by mmScripting.roundTransformation."):
+            self._metricsMachine.transformationRound(pairs, increment, removeRedundantExceptions)
 
     def shiftTransformation(self, value, pairs=None):
         """
@@ -305,9 +303,8 @@ class MetricsMachineKerning(roboFont.RKerning):
             pairs = self.keys()
         pairs = [normalizers.normalizeKerningKey(pair) for pair in pairs]
         value = normalizers.normalizeX(value)
-        self.naked().holdNotifications(note="Hold put in place by mmScripting.shiftTransformation.")
-        self._metricsMachine.transformationShift(pairs, value)
-        self.naked().releaseHeldNotifications()
+        with self._metricsMachine.batch(note="Batch put in place by mmScripting.shiftTransformation."):
+            self._metricsMachine.transformationShift(pairs, value)
 
     def thresholdTransformation(self, value, pairs=None, removeRedundantExceptions=True):
         """
@@ -335,9 +332,8 @@ class MetricsMachineKerning(roboFont.RKerning):
             pairs = self.keys()
         pairs = [normalizers.normalizeKerningKey(pair) for pair in pairs]
         value = normalizers.normalizeX(value)
-        self.naked().holdNotifications(note="Hold put in place by mmScripting.thresholdTransformation.")
-        self._metricsMachine.transformationThreshold(pairs, value, removeRedundantExceptions)
-        self.naked().releaseHeldNotifications()
+        with self._metricsMachine.batch(note="Batch put in place by mmScripting.thresholdTransformation."):
+            self._metricsMachine.transformationThreshold(pairs, value, removeRedundantExceptions)
 
     def removeTransformation(self, pairs=None):
         """
@@ -358,9 +354,8 @@ class MetricsMachineKerning(roboFont.RKerning):
         if pairs is None:
             pairs = self.keys()
         pairs = [normalizers.normalizeKerningKey(pair) for pair in pairs]
-        self.naked().holdNotifications(note="Hold put in place by mmScripting.removeTransformation.")
-        self._metricsMachine.transformationRemove(pairs)
-        self.naked().releaseHeldNotifications()
+        with self._metricsMachine.batch(note="Batch put in place by mmScripting.removeTransformation."):
+            self._metricsMachine.transformationRemove(pairs)
 
     def copyTransformation(self, side1Source, side2Source, side1Replacement, side2Replacement, pairs=None):
         """
@@ -399,13 +394,12 @@ class MetricsMachineKerning(roboFont.RKerning):
         if errors:
             raise MetricsMachineScriptingError("The copyTransformation method data is not valid: %s" % " ".join(errors))
         # apply
-        self.naked().holdNotifications(note="Hold put in place by mmScripting.copyTransformation.")
-        self._metricsMachine.transformationCopy(
-            pairs,
-            side1Source=side1Source, side2Source=side2Source,
-            side1Replacement=side1Replacement, side2Replacement=side2Replacement
-        )
-        self.naked().releaseHeldNotifications()
+        with self._metricsMachine.batch(note="Batch put in place by mmScripting.copyTransformation."):
+            self._metricsMachine.transformationCopy(
+                pairs,
+                side1Source=side1Source, side2Source=side2Source,
+                side1Replacement=side1Replacement, side2Replacement=side2Replacement
+            )
 
     # Exceptions
 
@@ -23,6 +23,10 @@ class MMContextStrings(BaseObject):
         if font is not None:
             self._font = weakref.ref(font)
         self._strings = []
+        self._enabledStrings = None
+        self._side1Masks = {}
+        self._side2Masks = {}
+        self._observingFont = False
 
     def getParent(self):
         return self.font
@@ -40,8 +44,70 @@ class MMContextStrings(BaseObject):
 
     def set(self, strings):
         self._strings = strings
+        self._enabledStrings = None
+        self._clearMatchCache()
         self.dispatcher.postNotification(notification="MMContextStrings.Changed", observable=self)
 
+    # ----------------
+    # rule match cache
+    # ----------------
+
+    # the rule results for a glyph are stored as a bit mask
+    # with one bit per enabled string. the first string that
+    # matches a pair is the lowest bit set in both masks.
+
+    def _clearMatchCache(self):
+        self._side1Masks = {}
+        self._side2Masks = {}
+
+    def _fontDataChangedNotificationCallback(self, notification):
+        self._clearMatchCache()
+
+    def _startObservingFont(self):
+        if self._observingFont:
+            return
+        font = self.getParent()
+        if font is None:
+            return
+        font.unicodeData.addObserver(self, "_fontDataChangedNotificationCallback", "UnicodeData.Changed")
+        font.groups.addObserver(self, "_fontDataChangedNotificationCallback", "Groups.Changed")
+        self._observingFont = True
+
+    def _getEnabledStrings(self):
+        if self._enabledStrings is None:
+            self._enabledStrings = [string for string in self._strings if string["enabled"]]
+        return self._enabledStrings
+
+    def _getMatchMask(self, glyphName, isLeft):
+        """
+        >>> font = _setupTestFont()
+        >>> font.metricsMachine.contextStrings.set(_testStrings1)
+        >>> contextStrings = font.metricsMachine.contextStrings
+        >>> contextStrings._getMatchMask("A", True), contextStrings._getMatchMask("a", True)
+        (1, 0)
+        >>> font["a"].unicode = ord("A")
+        >>> contextStrings._getMatchMask("a", True)
+        1
+        >>> contextStrings.set([])
+        >>> contextStrings._getMatchMask("A", True)
+        0
+        """
+        if isLeft:
+            masks = self._side1Masks
+            patternKey = "leftPattern"
+        else:
+            masks = self._side2Masks
+            patternKey = "rightPattern"
+        mask = masks.get(glyphName)
+        if mask is None:
+            self._startObservingFont()
+            mask = 0
+            for index, string in enumerate(self._getEnabledStrings()):
+                if self._matchPattern(glyphName, string[patternKey], string["pseudoUnicodes"]):
+                    mask |= 1 << index
+            masks[glyphName] = mask
+        return mask
+
     def getLongContext(self, pair, name=None):
         """
         >>> font = _setupTestFont()
@@ -130,14 +196,10 @@ class MMContextStrings(BaseObject):
                     return string
         else:
             left, right = pair
-            for string in self._strings:
-                if not string["enabled"]:
-                    continue
-                allowPseudoUnicodes = string["pseudoUnicodes"]
-                leftPattern = string["leftPattern"]
-                rightPattern = string["rightPattern"]
-                if self._matchPattern(left, leftPattern, allowPseudoUnicodes) and self._matchPattern(right, rightPattern, allowPseudoUnicodes):
-                    return string
+            mask = self._getMatchMask(left, True) & self._getMatchMask(right, False)
+            if mask:
+                index = (mask & -mask).bit_length() - 1
+                return self._getEnabledStrings()[index]
         return _fallback
 
     def _matchPattern(self, glyphName, pattern, allowPseudoUnicodes):
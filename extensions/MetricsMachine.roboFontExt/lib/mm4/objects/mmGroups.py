@@ -1,4 +1,4 @@
-from io import StringIO
+from contextlib import contextmanager
 
 import defcon
 
@@ -6,10 +6,18 @@ from ufo2fdk.kernFeatureWriter import side1Prefix, side2Prefix
 
 from mm4 import MetricsMachineImplementation, MetricsMachineError
 from mm4.objects.orderedSet import OrderedSet
-from mm4.objects.mmGroupsFactories import glyphToGroupMapFactory
+from mm4.objects.mmGroupsFactories import glyphToGroupMapFactory, decompositionBasesFactory
+from mm4.tools.mmgReadWrite import parseMMG, formatMMG
 
 
-defcon.registerRepresentationFactory(defcon.Groups, "metricsMachine.glyphToGroupsMap", glyphToGroupMapFactory)
+decompositionBasesRepresentationName = "metricsMachine.decompositionBases"
+
+defcon.registerRepresentationFactory(
+    defcon.Layer,
+    decompositionBasesRepresentationName,
+    decompositionBasesFactory,
+    destructiveNotifications=["Layer.GlyphAdded", "Layer.GlyphDeleted", "Layer.GlyphNameChanged", "Layer.GlyphUnicodesChanged"]
+)
 
 
 groupColorKey = "com.typesupply.metricsMachine4.groupColors"
@@ -38,7 +46,12 @@ class MMGroups(MetricsMachineImplementation):
         self._groupColors = self.font.lib.get(groupColorKey, {})
         self._isMutable = False
         self._kerningData = {}
+        self._touchedSuperPairs = {}
+        self._originalKerningPairs = {}
         self._kerningGroupCount = None
+        self._glyphToGroupMaps = None
+        self._glyphToGroupMapsObserved = False
+        self._patchingGlyphToGroupMaps = 0
 
     def _get_kerning(self):
         font = self.font
@@ -76,6 +89,63 @@ class MMGroups(MetricsMachineImplementation):
     def __delitem__(self, groupName):
         del self.super()[groupName]
 
+    # -------------------
+    # glyph to group maps
+    # -------------------
+
+    def _getGlyphToGroupMaps(self):
+        """
+        Get the glyph to side 1 group and glyph to side 2 group
+        dicts. These are built when first needed. The mutable
+        group editing methods patch them, and any other change
+        to the groups makes them be built again.
+
+        >>> font = _setupTestFont1()
+        >>> font.groups.update({"public.kern1.A" : ["A", "A.alt1"]})
+        >>> groups = font.groups.metricsMachine.mutableCopy()
+        >>> maps = groups.metricsMachine._getGlyphToGroupMaps()
+        >>> groups.metricsMachine.newGroup("public.kern1.B")
+        >>> groups.metricsMachine.addToGroup("public.kern1.B", ["A.alt1"])
+        >>> groups.metricsMachine.renameGroup("public.kern1.B", "public.kern1.C")
+        >>> groups.metricsMachine._getGlyphToGroupMaps() is maps
+        True
+        >>> sorted(maps[0].items())
+        [('A', 'public.kern1.A'), ('A.alt1', 'public.kern1.C')]
+
+        >>> groups["public.kern1.D"] = ["A"]
+        >>> groups.metricsMachine._getGlyphToGroupMaps()
+        Traceback (most recent call last):
+            ...
+        mm4.MetricsMachineError: Glyph A is in more than one side 1 group.
+        """
+        maps = self._glyphToGroupMaps
+        if maps is None:
+            groups = self.super()
+            maps = glyphToGroupMapFactory(groups)
+            # without notifications there is no
+            # way to know when to build them again.
+            if groups.dispatcher is None:
+                return maps
+            if not self._glyphToGroupMapsObserved:
+                groups.addObserver(self, "groupsChangedNotificationCallback", "Groups.Changed")
+                self._glyphToGroupMapsObserved = True
+            self._glyphToGroupMaps = maps
+        return maps
+
+    @contextmanager
+    def _patchGlyphToGroupMaps(self):
+        # changes made within this have
+        # been patched into the maps.
+        self._patchingGlyphToGroupMaps += 1
+        try:
+            yield
+        finally:
+            self._patchingGlyphToGroupMaps -= 1
+
+    def groupsChangedNotificationCallback(self, notification):
+        if not self._patchingGlyphToGroupMaps:
+            self._glyphToGroupMaps = None
+
     def mutableCopy(self):
         # this mimics the MMutableGroup in the old MM
         # copy the group data, and set the parent font object
@@ -84,7 +154,7 @@ class MMGroups(MetricsMachineImplementation):
         groups.update(self.super())
         groups.metricsMachine._loadKerningData()
         groups.metricsMachine._originalGroups = {}
-        glyphToSide1Group, glyphToSide2Group = self.super().getRepresentation("metricsMachine.glyphToGroupsMap")
+        glyphToSide1Group, glyphToSide2Group = self._getGlyphToGroupMaps()
         groups.metricsMachine._originalGlyphToSide1Group = dict(glyphToSide1Group)
         groups.metricsMachine._originalGlyphToSide2Group = dict(glyphToSide2Group)
         for name, contents in font.groups.items():
@@ -117,7 +187,9 @@ class MMGroups(MetricsMachineImplementation):
         """
         if groupName in self:
             return
-        self[groupName] = []
+        # an empty group has nothing to map
+        with self._patchGlyphToGroupMaps():
+            self[groupName] = []
         self._makeColorForGroup(groupName)
         self._newGroups.add(groupName)
         if postNotification:
@@ -172,24 +244,44 @@ class MMGroups(MetricsMachineImplementation):
         [('A.alt1', 'A.alt1'), ('A.alt1', 'public.kern2.A'), ('public.kern1.B', 'public.kern2.B'), ('public.kern1.MyA', 'public.kern2.A')]
         """
         # update group
-        # get the appropriate dict
-        glyphToSide1Group, glyphToSide2Group = self.super().getRepresentation("metricsMachine.glyphToGroupsMap")
+        # get the appropriate dicts
+        glyphToSide1Group, glyphToSide2Group = self._getGlyphToGroupMaps()
+        if oldName.startswith(side1Prefix):
+            oldGlyphToGroup = glyphToSide1Group
+        else:
+            oldGlyphToGroup = glyphToSide2Group
         if newName.startswith(side1Prefix):
             glyphToGroup = glyphToSide1Group
         else:
             glyphToGroup = glyphToSide2Group
         # update the group dict
         groups = self.super()
-        groups[newName] = groups[oldName]
-        del groups[oldName]
+        replacedGlyphs = groups.get(newName, [])
+        with self._patchGlyphToGroupMaps():
+            groups[newName] = groups[oldName]
+            del groups[oldName]
         # update the glyph to group mapping
+        for glyphName in replacedGlyphs:
+            if glyphToGroup.get(glyphName) == newName:
+                del glyphToGroup[glyphName]
         for glyphName in groups[newName]:
+            if oldGlyphToGroup.get(glyphName) == oldName:
+                del oldGlyphToGroup[glyphName]
+            if glyphToGroup.get(glyphName, newName) != newName:
+                # the glyph is now in more than one group.
+                # let the maps be built again so that this
+                # is reported when they are next used.
+                self._glyphToGroupMaps = None
             glyphToGroup[glyphName] = newName
         # update kerning
+        for pair in self._kerningData.keys():
+            if oldName in pair:
+                self._touchedSuperPairs[pair] = None
         self._renameGroupWithinKerning(oldName, newName, self._kerningData)
         for pair, data in self._kerningData.items():
             if newName not in pair:
                 continue
+            self._touchedSuperPairs[pair] = None
             self._renameGroupWithinKerning(oldName, newName, data["existingPairs"])
             self._renameGroupWithinKerning(oldName, newName, data["existingExceptions"])
             self._renameGroupWithinKerning(oldName, newName, data["addedPairs"])
@@ -219,7 +311,7 @@ class MMGroups(MetricsMachineImplementation):
             if postNotification:
                 self.postChangeNotification([groupName])
 
-    def _removeGroup(self, groupName, decompose=False, postNotification=True):
+    def _removeGroup(self, groupName, decompose=False, postNotification=True, kerningIndex=None):
         """
         # test groups
         >>> font = _setupTestFont1()
@@ -305,19 +397,23 @@ class MMGroups(MetricsMachineImplementation):
         True
         """
         # get the appropriate dict
-        glyphToSide1Group, glyphToSide2Group = self.super().getRepresentation("metricsMachine.glyphToGroupsMap")
+        glyphToSide1Group, glyphToSide2Group = self._getGlyphToGroupMaps()
         if groupName.startswith(side1Prefix):
             glyphToGroup = glyphToSide1Group
             isSide1Group = True
         else:
             glyphToGroup = glyphToSide2Group
             isSide1Group = False
+        # find the top level pairs referencing the group
+        if kerningIndex is None:
+            topLevelPairs = [pair for pair in self._kerningData.keys() if groupName in pair]
+        else:
+            topLevelPairs = [pair for pair in kerningIndex.pop(groupName, {}) if pair in self._kerningData]
         # remove kerning references
         pairsToSave = {}
         # gather all real pairs that should be saved
-        for pair, data in self._kerningData.items():
-            if groupName not in pair:
-                continue
+        for pair in topLevelPairs:
+            data = self._kerningData[pair]
             for subPair, value in data["existingPairs"].items():
                 if groupName in subPair:
                     continue
@@ -333,9 +429,8 @@ class MMGroups(MetricsMachineImplementation):
         # decompose grouped pairs
         if decompose:
             glyphList = self[groupName]
-            for pair, data in self._kerningData.items():
-                if groupName not in pair:
-                    continue
+            for pair in topLevelPairs:
+                data = self._kerningData[pair]
                 # 1. added pairs
                 self._decomposePairs(groupName, glyphList, data["addedPairs"], pairsToSave, isSide1Group)
                 # 2. existing exceptions
@@ -343,19 +438,19 @@ class MMGroups(MetricsMachineImplementation):
                 # 3. existing pairs
                 self._decomposePairs(groupName, glyphList, data["existingPairs"], pairsToSave, isSide1Group)
         # delete references
-        for pair in list(self._kerningData.keys()):
-            if groupName not in pair:
-                continue
+        for pair in topLevelPairs:
             del self._kerningData[pair]
+            self._touchedSuperPairs[pair] = None
         # handle groups
         # remove glyph to group mapping
         glyphList = self[groupName]
         for glyphName in glyphList:
             del glyphToGroup[glyphName]
         # remove the group
-        del self[groupName]
+        with self._patchGlyphToGroupMaps():
+            del self[groupName]
         # store the kerning
-        self._storePairs(pairsToSave)
+        self._storePairs(pairsToSave, kerningIndex)
         # remove the color
         if groupName in self._groupColors:
             self._removeColorForGroup(groupName)
@@ -543,7 +638,7 @@ class MMGroups(MetricsMachineImplementation):
         if not glyphList:
             return
         # get the appropriate glyph to group dict
-        glyphToSide1Group, glyphToSide2Group = self.super().getRepresentation("metricsMachine.glyphToGroupsMap")
+        glyphToSide1Group, glyphToSide2Group = self._getGlyphToGroupMaps()
         if groupName.startswith(side1Prefix):
             glyphToGroup = glyphToSide1Group
             isSide1Group = True
@@ -567,6 +662,7 @@ class MMGroups(MetricsMachineImplementation):
         for pair, data in list(self._kerningData.items()):
             if not data["existingPairs"] and not data["existingExceptions"] and not data["addedPairs"]:
                 del self._kerningData[pair]
+                self._touchedSuperPairs[pair] = None
         # hold kerning referencing members of the glyph list
         holdingPairs = {}
         for (side1, side2), data in list(self._kerningData.items()):
@@ -580,6 +676,7 @@ class MMGroups(MetricsMachineImplementation):
                 holdingPairs.update(data["existingExceptions"])
                 holdingPairs.update(data["addedPairs"])
                 del self._kerningData[side1, side2]
+                self._touchedSuperPairs[side1, side2] = None
         # handle the groups
         changedGroups = set()
         changedGlyphs = set()
@@ -684,7 +781,7 @@ class MMGroups(MetricsMachineImplementation):
         """
         changedGlyphs = set(glyphList)
         # get the appropriate glyph to group dict
-        glyphToSide1Group, glyphToSide2Group = self.super().getRepresentation("metricsMachine.glyphToGroupsMap")
+        glyphToSide1Group, glyphToSide2Group = self._getGlyphToGroupMaps()
         if groupName.startswith(side1Prefix):
             glyphToGroup = glyphToSide1Group
             isLeftGroup = True
@@ -696,6 +793,7 @@ class MMGroups(MetricsMachineImplementation):
         for pair, data in self._kerningData.items():
             if groupName not in pair:
                 continue
+            self._touchedSuperPairs[pair] = None
             for glyphName in glyphList:
                 holdingPairs.update(self._removeAndHoldKerningReferences(glyphName, None, data["existingPairs"], isLeftGroup))
                 holdingPairs.update(self._removeAndHoldKerningReferences(glyphName, None, data["existingExceptions"], isLeftGroup))
@@ -824,49 +922,152 @@ class MMGroups(MetricsMachineImplementation):
         >>> groups["public.kern1.O"]
         []
         """
+        additions = self._planAutoGroupsBasedOnDecomposition()
+        return self._applyAutoGroups(additions)
+
+    def _planAutoGroupsBasedOnDecomposition(self):
+        """
+        Get a group name : glyph list dict of the glyphs
+        that would be added to groups by following the
+        decomposition. Groups that are not in the groups
+        yet will be created. Nothing is changed.
+
+        >>> font = _setupTestFont2()
+        >>> groups = {
+        ...     "public.kern1.FlatLeft" : ["H", "N", "N.alt"],
+        ...     "public.kern1.O" : [],
+        ...     "public.kern2.A" : ["A", "Aacute"],
+        ...     "public.kern2.C" : ["Ccedilla"],
+        ... }
+        >>> font.groups.update(groups)
+        >>> groups = font.groups.metricsMachine.mutableCopy()
+        >>> additions = groups.metricsMachine._planAutoGroupsBasedOnDecomposition()
+        >>> additions["public.kern1.A"]
+        ['A', 'Aacute', 'Abreve', 'Acircumflex', 'Adieresis', 'Agrave', 'Amacron', 'Aogonek', 'Aring', 'Aringacute', 'Atilde']
+        >>> additions["public.kern1.FlatLeft"]
+        ['Hcircumflex', 'Nacute', 'Ncaron', 'Ntilde', 'Ntilde.alt']
+        >>> additions["public.kern2.A"]
+        ['Abreve', 'Acircumflex', 'Adieresis', 'Agrave', 'Amacron', 'Aogonek', 'Aring', 'Aringacute', 'Atilde']
+        >>> additions["public.kern2.C_1"]
+        ['C', 'Cacute', 'Ccaron', 'Ccircumflex', 'Cdotaccent']
+        >>> "public.kern1.A" in groups
+        False
+        """
         font = self.font
-        # find the base of all composed glyphs
-        bases = {}
-        for glyphName in font.keys():
-            glyph = font[glyphName]
-            uniValue = glyph.unicode
-            # skip ligatures here
-            if "_" in glyphName:
-                continue
-            if uniValue is None:
-                uniValue = font.unicodeData.pseudoUnicodeForGlyphName(glyphName)
-            if uniValue is None:
-                continue
-            base = font.unicodeData.decompositionBaseForGlyphName(glyphName, True)
-            if glyphName == base:
-                continue
-            if base not in bases:
-                bases[base] = set([base])
-            bases[base].add(glyphName)
-        # compile the groups
-        changedGroups = set()
+        # the bases of the composed glyphs are
+        # cached until the glyphs or unicodes change
+        bases = font.layers.defaultLayer.getRepresentation(decompositionBasesRepresentationName)
+        glyphToSide1Group, glyphToSide2Group = self._getGlyphToGroupMaps()
+        additions = {}
+        for prefix, glyphToGroup in ((side1Prefix, glyphToSide1Group), (side2Prefix, glyphToSide2Group)):
+            # glyph : group for the glyphs that will be grouped
+            planned = {}
+            for base, glyphList in sorted(bases.items()):
+                baseGroupName = planned.get(base, glyphToGroup.get(base))
+                if baseGroupName is None:
+                    baseGroupName = self._findBaseGroupNameForAutoGroups(prefix, base, reserved=additions)
+                if baseGroupName not in additions:
+                    additions[baseGroupName] = []
+                for glyphName in glyphList:
+                    if glyphName in planned or glyphName in glyphToGroup:
+                        continue
+                    planned[glyphName] = baseGroupName
+                    additions[baseGroupName].append(glyphName)
+        for glyphList in additions.values():
+            glyphList.sort()
+        return additions
+
+    def _applyAutoGroups(self, additions):
+        """
+        Create the groups and add the glyphs in a group name :
+        glyph list dict made by the auto groups planning. The
+        glyphs must not be in a group of the same side. No
+        notifications are posted. The changed group names and
+        the glyph names that were added are returned.
+        """
+        changedGroups = set(additions.keys())
         changedGlyphs = set()
-        for base, glyphList in sorted(bases.items()):
-            # left
-            baseGroupName = self.getSide1GroupForGlyph(base)
-            if baseGroupName is None:
-                baseGroupName = self._findBaseGroupNameForAutoGroups(side1Prefix, base)
-                self.newGroup(baseGroupName)
-            toAdd = [glyphName for glyphName in glyphList if self.getSide1GroupForGlyph(glyphName) is None]
-            self.addToGroup(baseGroupName, toAdd, postNotification=False)
-            changedGroups.add(baseGroupName)
-            changedGlyphs = changedGlyphs | set(toAdd)
-            # right
-            baseGroupName = self.getSide2GroupForGlyph(base)
-            if baseGroupName is None:
-                baseGroupName = self._findBaseGroupNameForAutoGroups(side2Prefix, base)
-                self.newGroup(baseGroupName)
-            toAdd = [glyphName for glyphName in glyphList if self.getSide2GroupForGlyph(glyphName) is None]
-            self.addToGroup(baseGroupName, toAdd, postNotification=False)
-            changedGroups.add(baseGroupName)
-            changedGlyphs = changedGlyphs | set(toAdd)
+        for glyphList in additions.values():
+            changedGlyphs.update(glyphList)
+        newGroups = [groupName for groupName in sorted(additions) if groupName not in self]
+        if self._isMutable:
+            for groupName in newGroups:
+                self._newGroup(groupName, postNotification=False)
+            self._addUngroupedGlyphsToGroups(additions)
+        else:
+            groups = self.super()
+            self.update(dict((groupName, groups.get(groupName, []) + glyphList) for groupName, glyphList in additions.items()))
+            for groupName in newGroups:
+                self._makeColorForGroup(groupName)
         return changedGroups, changedGlyphs
 
+    def _addUngroupedGlyphsToGroups(self, additions):
+        """
+        Add glyphs that are not in a group of the same side to
+        the groups in a group name : glyph list dict. This does
+        what calling addToGroup for each group would do with
+        one pass through the kerning data.
+
+        >>> font = _setupTestFont1()
+        >>> groups = {
+        ...     "public.kern1.A" : ["A"],
+        ...     "public.kern2.B" : ["B"],
+        ... }
+        >>> kerning = {
+        ...     ("A.alt1", "B.alt1") : 50,
+        ...     ("public.kern1.A", "B.alt1") : 25,
+        ... }
+        >>> font.groups.update(groups)
+        >>> font.kerning.update(kerning)
+        >>> groups = font.groups.metricsMachine.mutableCopy()
+        >>> groups.metricsMachine._addUngroupedGlyphsToGroups({"public.kern1.A" : ["A.alt1"], "public.kern2.B" : ["B.alt1"]})
+        >>> groups["public.kern1.A"], groups["public.kern2.B"]
+        (['A', 'A.alt1'], ['B', 'B.alt1'])
+        >>> expected = {('public.kern1.A', 'public.kern2.B'): {'addedPairs': {('A.alt1', 'B.alt1'): 50, ('public.kern1.A', 'B.alt1'): 25},
+        ...                                'existingExceptions': {},
+        ...                                'existingPairs': {},
+        ...                                'initialValue': None}}
+        >>> groups.metricsMachine._kerningData == expected
+        True
+        """
+        glyphToSide1Group, glyphToSide2Group = self._getGlyphToGroupMaps()
+        side1Glyphs = set()
+        side2Glyphs = set()
+        for groupName, glyphList in additions.items():
+            if groupName.startswith(side1Prefix):
+                side1Glyphs.update(glyphList)
+            else:
+                side2Glyphs.update(glyphList)
+        if not side1Glyphs and not side2Glyphs:
+            return
+        # remove any empty top level pairs
+        for pair, data in list(self._kerningData.items()):
+            if not data["existingPairs"] and not data["existingExceptions"] and not data["addedPairs"]:
+                del self._kerningData[pair]
+                self._touchedSuperPairs[pair] = None
+        # hold kerning referencing the glyphs
+        holdingPairs = {}
+        for (side1, side2), data in list(self._kerningData.items()):
+            if side1 in side1Glyphs or side2 in side2Glyphs:
+                holdingPairs.update(data["existingPairs"])
+                holdingPairs.update(data["existingExceptions"])
+                holdingPairs.update(data["addedPairs"])
+                del self._kerningData[side1, side2]
+                self._touchedSuperPairs[side1, side2] = None
+        # add glyphs to the groups
+        for groupName, glyphList in additions.items():
+            if groupName.startswith(side1Prefix):
+                glyphToGroup = glyphToSide1Group
+            else:
+                glyphToGroup = glyphToSide2Group
+            group = self[groupName]
+            for glyphName in sorted(glyphList):
+                if glyphName not in group:
+                    group.append(glyphName)
+                glyphToGroup[glyphName] = groupName
+        # store the kerning data
+        self._storePairs(holdingPairs)
+
     def _autoGroupsBasedOnSuffix(self, suffixesToFollowBase):
         """
         >>> font = _setupTestFont2()
@@ -913,21 +1114,18 @@ class MMGroups(MetricsMachineImplementation):
                     if groupName not in side2Additions:
                         side2Additions[groupName] = set()
                     side2Additions[groupName].add(glyphName)
-        changedGroups = set(side1Additions.keys()) | set(side2Additions.keys())
-        changedGlyphs = set()
+        additions = {}
         for groupName, glyphList in list(side1Additions.items()) + list(side2Additions.items()):
-            self.newGroup(groupName)
-            self.addToGroup(groupName, glyphList, postNotification=False)
-            changedGlyphs = changedGlyphs | glyphList
-        return changedGroups, changedGlyphs
+            additions[groupName] = sorted(glyphList)
+        return self._applyAutoGroups(additions)
 
-    def _findBaseGroupNameForAutoGroups(self, prefix, glyphName, count=0):
+    def _findBaseGroupNameForAutoGroups(self, prefix, glyphName, count=0, reserved=()):
         if not count:
             name = prefix + glyphName
         else:
             name = prefix + glyphName + "_%d" % count
-        if name in self:
-            return self._findBaseGroupNameForAutoGroups(prefix, glyphName, count + 1)
+        if name in self or name in reserved:
+            return self._findBaseGroupNameForAutoGroups(prefix, glyphName, count + 1, reserved)
         return name
 
     def clear(self, removeColors=True):
@@ -993,8 +1191,8 @@ class MMGroups(MetricsMachineImplementation):
                 glyphList = list(glyphList)
             groups[groupName] = glyphList
         groups.releaseHeldNotifications()
-        # just call it
-        groups.getRepresentation("metricsMachine.glyphToGroupsMap")
+        # build the glyph to group maps to validate the groups
+        self._getGlyphToGroupMaps()
 
     def updateGroupColors(self, otherFont):
         """
@@ -1071,7 +1269,7 @@ class MMGroups(MetricsMachineImplementation):
         'public.kern1.A'
         >>> font.groups.metricsMachine.getSide1GroupForGlyph("X")
         """
-        glyphToSide1Group, _ = self.super().getRepresentation("metricsMachine.glyphToGroupsMap")
+        glyphToSide1Group, _ = self._getGlyphToGroupMaps()
         return glyphToSide1Group.get(glyphName)
 
     def getSide2GroupForGlyph(self, glyphName):
@@ -1085,7 +1283,7 @@ class MMGroups(MetricsMachineImplementation):
         'public.kern2.A'
         >>> font.groups.metricsMachine.getSide2GroupForGlyph("X")
         """
-        _, glyphToSide2Group = self.super().getRepresentation("metricsMachine.glyphToGroupsMap")
+        _, glyphToSide2Group = self._getGlyphToGroupMaps()
         return glyphToSide2Group.get(glyphName)
 
     def _get_kerningGroupCount(self):
@@ -1274,9 +1472,17 @@ class MMGroups(MetricsMachineImplementation):
     def _loadKerningData(self):
         kerning = self.font.kerning
         kerningData = self._kerningData = {}
+        self._touchedSuperPairs = {}
+        originalKerningPairs = self._originalKerningPairs = {}
         for pair, value in sorted(kerning.items()):
             # get the highest level pair
             highestPair = self._getHighestLevelPair(pair)
+            # remember where the pair started so that
+            # applyKerning can find it if the top level
+            # pair is touched.
+            if highestPair not in originalKerningPairs:
+                originalKerningPairs[highestPair] = []
+            originalKerningPairs[highestPair].append(pair)
             # make a place to store the data
             data = kerningData.get(highestPair)
             if not data:
@@ -1360,15 +1566,51 @@ class MMGroups(MetricsMachineImplementation):
                 if testPair not in storage:
                     storage[testPair] = value
 
-    def _storePairs(self, pairs):
+    def _storePairs(self, pairs, kerningIndex=None):
         for pair, value in pairs.items():
             highestPair = self._getHighestLevelPair(pair)
             data = self._kerningData.get(highestPair)
             if not data:
                 data = self._defaultKerningDataStructure()
             data["addedPairs"][pair] = value
+            self._touchedSuperPairs[highestPair] = None
             if highestPair not in self._kerningData:
                 self._kerningData[highestPair] = data
+                if kerningIndex is not None:
+                    for member in highestPair:
+                        if member not in kerningIndex:
+                            kerningIndex[member] = {}
+                        kerningIndex[member][highestPair] = None
+
+    def _makeKerningIndex(self):
+        """
+        Make a dict of pair member : top level pairs that
+        _removeGroup and _storePairs can keep up to date
+        so that removing many groups does not need to look
+        through all of the kerning data for each group.
+        The top level pairs are stored in dicts to keep
+        them in the order of the kerning data.
+
+        >>> font = _setupTestFont1()
+        >>> font.groups.update({"public.kern1.A" : ["A", "A.alt1"], "public.kern2.B" : ["B"]})
+        >>> font.kerning.update({("public.kern1.A", "public.kern2.B") : -10, ("A.alt1", "C") : 20})
+        >>> groups = font.groups.metricsMachine.mutableCopy()
+        >>> kerningIndex = groups.metricsMachine._makeKerningIndex()
+        >>> list(kerningIndex["public.kern1.A"])
+        [('public.kern1.A', 'C'), ('public.kern1.A', 'public.kern2.B')]
+        >>> groups.metricsMachine._removeGroup("public.kern1.A", decompose=True, kerningIndex=kerningIndex)
+        >>> list(kerningIndex["public.kern2.B"])
+        [('public.kern1.A', 'public.kern2.B'), ('A', 'public.kern2.B'), ('A.alt1', 'public.kern2.B')]
+        >>> sorted(groups.metricsMachine._kerningData)
+        [('A', 'public.kern2.B'), ('A.alt1', 'C'), ('A.alt1', 'public.kern2.B')]
+        """
+        kerningIndex = {}
+        for pair in self._kerningData.keys():
+            for member in pair:
+                if member not in kerningIndex:
+                    kerningIndex[member] = {}
+                kerningIndex[member][pair] = None
+        return kerningIndex
 
     # ------------
     # finalization
@@ -1427,7 +1669,7 @@ class MMGroups(MetricsMachineImplementation):
         >>> groups = font.groups.metricsMachine.mutableCopy()
         >>> groups.metricsMachine.applyGroups()
         False
-        >>> groups.metricsMachine._kerningResolutionData["public.kern1.O", "semicolon"]["finalValue"]
+        >>> groups.metricsMachine.getValueForPair(("public.kern1.O", "semicolon"))
         0
 
         Test Case:
@@ -1469,85 +1711,127 @@ class MMGroups(MetricsMachineImplementation):
         >>> groups.metricsMachine.applyGroups()
         False
         """
-        # flag all glyphs referenced by the kerning
-        glyphHasKerning = self._searchForGlyphKerning()
-        # work out the resolutions
+        # work out the resolutions. super pairs that were not
+        # touched during the group editing keep their kerning
+        # as it is, so only the touched super pairs are looked at.
         self._kerningResolutionData = {}
-        for superPair, superPairData in self._kerningData.items():
-            # determine the final pair and the final value.
-            # if no pairs were assigned to this super pair
-            # before the group editing began, there will
-            # be no final value determined here.
-
-            # if this pair could have existed before, meaning the
-            # groups existed, and it didn't exist, it has an implied
-            # final value of zero. so, force this into the data.
-            superSide1, superSide2 = superPair
-            if not superPairData["existingPairs"] and superPairData["addedPairs"] and superPair not in superPairData["addedPairs"]:
-                leftIsValid = False
-                if superSide1.startswith(side1Prefix) and self._isOriginalGroup(superSide1):
-                    leftIsValid = True
-                if not superSide1.startswith(side1Prefix) and not self._glyphWasGroupedOnSide1(superSide1):
-                    leftIsValid = True
-                rightIsValid = False
-                if superSide2.startswith(side2Prefix) and self._isOriginalGroup(superSide2):
-                    rightIsValid = True
-                if not superSide2.startswith(side2Prefix) and not self._glyphWasGroupedOnSide2(superSide2):
-                    rightIsValid = True
-                if leftIsValid and rightIsValid:
-                    superPairData["existingPairs"][superPair] = 0
-
-            finalPairs = dict(superPairData["existingPairs"])
-            finalValue = set(finalPairs.values())
-            if len(finalValue) == 0:
-                # if there are existing exceptions, the implied final
-                # value is zero. otherwise, there is no known final value.
-                if superPairData["existingExceptions"]:
-                    finalValue = 0
-                else:
-                    finalValue = None
-            elif len(finalValue) == 1:
-                finalValue = list(finalValue)[0]
+        glyphHasKerning = None
+        for superPair in self._touchedSuperPairs:
+            superPairData = self._kerningData.get(superPair)
+            # super pairs that were removed or emptied have
+            # nothing left to resolve.
+            if superPairData is None:
+                continue
+            if not superPairData["existingPairs"] and not superPairData["existingExceptions"] and not superPairData["addedPairs"]:
+                continue
+            # super pairs that received no pairs during the group
+            # editing can not have a conflict. their values and
+            # exceptions are carried over as they are.
+            if not superPairData["addedPairs"]:
+                data = self._getUntouchedResolution(superPairData)
             else:
-                raise NotImplementedError
-
-            # determine if a conflict exists based on the added pairs
-            pairs, haveConflict = self._searchForConflict(superPairData, superPair, finalValue)
-            # if not, and if no final value exists, grab the final value
-            if finalValue is None and not haveConflict and pairs:
-                finalValue = list(pairs.values())[0]["value"]
-
-            # force the exceptions into the pairs
-            exceptions = dict(superPairData["existingExceptions"])
-            for subPair, value in exceptions.items():
-                pairs[subPair] = dict(value=value, resolution="exception")
-
-            # handle conflicts
-            if haveConflict:
-                # insert all possible implied pairs.
-                impliedPairs = self._insertImpliedPairs(pairs, superPair)
-                # if a final value is present, tag the pairs appropriately.
-                if finalValue is not None:
-                    self._resolveConflictsWithFinalValue(pairs, finalValue, impliedPairs)
-                    # push the super pair into the pairs
-                    if superPair not in pairs:
-                        pairs[superPair] = dict(value=finalValue, resolution="group value")
-                # otherwise, apply the resolution guessing algorithm.
-                else:
-                    finalValue = self._resolveConflictsWithoutFinalValue(pairs, superPair, impliedPairs, glyphHasKerning)
-                # look for possible exceptions
-                self._extendExceptionsToDecomposable(pairs, impliedPairs)
-                # raise the exceptions if possible
-                self._raiseExceptionLevel(pairs, superPair)
-
-            # wrap it all up and store it
-            data = dict(finalValue=finalValue, pairs=pairs, haveConflict=haveConflict)
+                # flag all glyphs referenced by the kerning
+                if glyphHasKerning is None:
+                    glyphHasKerning = self._searchForGlyphKerning()
+                data = self._resolveSuperPair(superPair, superPairData, glyphHasKerning)
             self._kerningResolutionData[superPair] = data
 
         # let the caller know if resolution is needed
         needResolution = bool(self.getAllPairsNeedingResolution())
         return needResolution
 
+    def _getExistingFinalValue(self, superPairData):
+        finalValue = set(superPairData["existingPairs"].values())
+        if len(finalValue) == 0:
+            # if there are existing exceptions, the implied final
+            # value is zero. otherwise, there is no known final value.
+            if superPairData["existingExceptions"]:
+                finalValue = 0
+            else:
+                finalValue = None
+        elif len(finalValue) == 1:
+            finalValue = list(finalValue)[0]
+        else:
+            raise NotImplementedError
+        return finalValue
+
+    def _getUntouchedResolution(self, superPairData):
+        """
+        >>> font = _setupTestFont3()
+        >>> groups = font.groups.metricsMachine.mutableCopy()
+        >>> superPairData = groups.metricsMachine._defaultKerningDataStructure()
+        >>> superPairData["existingPairs"][("public.kern1.O", "A")] = -10
+        >>> superPairData["existingExceptions"][("Q", "A")] = -5
+        >>> data = groups.metricsMachine._getUntouchedResolution(superPairData)
+        >>> data["finalValue"], data["haveConflict"]
+        (-10, False)
+        >>> data["pairs"]
+        {('Q', 'A'): {'value': -5, 'resolution': 'exception'}}
+        """
+        finalValue = self._getExistingFinalValue(superPairData)
+        pairs = {}
+        for subPair, value in superPairData["existingExceptions"].items():
+            pairs[subPair] = dict(value=value, resolution="exception")
+        return dict(finalValue=finalValue, pairs=pairs, haveConflict=False)
+
+    def _resolveSuperPair(self, superPair, superPairData, glyphHasKerning):
+        # determine the final pair and the final value.
+        # if no pairs were assigned to this super pair
+        # before the group editing began, there will
+        # be no final value determined here.
+
+        # if this pair could have existed before, meaning the
+        # groups existed, and it didn't exist, it has an implied
+        # final value of zero. so, force this into the data.
+        superSide1, superSide2 = superPair
+        if not superPairData["existingPairs"] and superPairData["addedPairs"] and superPair not in superPairData["addedPairs"]:
+            leftIsValid = False
+            if superSide1.startswith(side1Prefix) and self._isOriginalGroup(superSide1):
+                leftIsValid = True
+            if not superSide1.startswith(side1Prefix) and not self._glyphWasGroupedOnSide1(superSide1):
+                leftIsValid = True
+            rightIsValid = False
+            if superSide2.startswith(side2Prefix) and self._isOriginalGroup(superSide2):
+                rightIsValid = True
+            if not superSide2.startswith(side2Prefix) and not self._glyphWasGroupedOnSide2(superSide2):
+                rightIsValid = True
+            if leftIsValid and rightIsValid:
+                superPairData["existingPairs"][superPair] = 0
+
+        finalValue = self._getExistingFinalValue(superPairData)
+
+        # determine if a conflict exists based on the added pairs
+        pairs, haveConflict = self._searchForConflict(superPairData, superPair, finalValue)
+        # if not, and if no final value exists, grab the final value
+        if finalValue is None and not haveConflict and pairs:
+            finalValue = list(pairs.values())[0]["value"]
+
+        # force the exceptions into the pairs
+        exceptions = dict(superPairData["existingExceptions"])
+        for subPair, value in exceptions.items():
+            pairs[subPair] = dict(value=value, resolution="exception")
+
+        # handle conflicts
+        if haveConflict:
+            # insert all possible implied pairs.
+            impliedPairs = self._insertImpliedPairs(pairs, superPair)
+            # if a final value is present, tag the pairs appropriately.
+            if finalValue is not None:
+                self._resolveConflictsWithFinalValue(pairs, finalValue, impliedPairs)
+                # push the super pair into the pairs
+                if superPair not in pairs:
+                    pairs[superPair] = dict(value=finalValue, resolution="group value")
+            # otherwise, apply the resolution guessing algorithm.
+            else:
+                finalValue = self._resolveConflictsWithoutFinalValue(pairs, superPair, impliedPairs, glyphHasKerning)
+            # look for possible exceptions
+            self._extendExceptionsToDecomposable(pairs, impliedPairs)
+            # raise the exceptions if possible
+            self._raiseExceptionLevel(pairs, superPair)
+
+        # wrap it all up
+        return dict(finalValue=finalValue, pairs=pairs, haveConflict=haveConflict)
+
     def applyKerning(self):
         kerning = self.font.kerning
         groups = self.font.groups
@@ -1566,10 +1850,23 @@ class MMGroups(MetricsMachineImplementation):
                 final[pair] = value
             exceptions = self._compressFinalExceptions(exceptions, pair)
             final.update(exceptions)
+        # the kerning of the untouched super pairs is left as it
+        # is. the kerning that was in the touched super pairs is
+        # replaced by the resolved kerning.
+        removed = set()
+        for superPair in self._touchedSuperPairs:
+            removed.update(self._originalKerningPairs.get(superPair, []))
         groups.clear()
         groups.update(self)
-        kerning.clear()
-        kerning.update(final)
+        for pair in removed:
+            if pair not in final and pair in kerning:
+                del kerning[pair]
+        changed = {}
+        for pair, value in final.items():
+            if pair not in kerning or kerning[pair] != value:
+                changed[pair] = value
+        if changed:
+            kerning.update(changed)
         self._storeGroupColors()
         self._tearDownGroups()
 
@@ -2297,8 +2594,8 @@ class MMGroups(MetricsMachineImplementation):
             data = None
             superPair = None
             for pair in orderedPairs:
-                if pair in self._kerningResolutionData:
-                    data = self._kerningResolutionData[pair]
+                data = self._getResolutionData(pair)
+                if data is not None:
                     superPair = pair
                     break
             if data is None:
@@ -2333,11 +2630,21 @@ class MMGroups(MetricsMachineImplementation):
                 pairs[pair] = data["finalValue"]
         return pairs
 
+    def _getResolutionData(self, pair):
+        # super pairs that were not touched are not
+        # in the resolution data. they are resolved
+        # here as they are needed.
+        if pair in self._kerningResolutionData:
+            return self._kerningResolutionData[pair]
+        if pair in self._kerningData and pair not in self._touchedSuperPairs:
+            return self._getUntouchedResolution(self._kerningData[pair])
+        return None
+
     def getValueForPair(self, pair):
-        return self._kerningResolutionData[pair]["finalValue"]
+        return self._getResolutionData(pair)["finalValue"]
 
     def getConflictsForPair(self, pair):
-        return self._kerningResolutionData[pair]["pairs"]
+        return self._getResolutionData(pair)["pairs"]
 
     def setResolutionForPair(self, topLevelPair, pair, resolution):
         data = self._kerningResolutionData[topLevelPair]
@@ -2623,6 +2930,44 @@ class MMGroups(MetricsMachineImplementation):
         f.close()
         self._importGroupsFromMMG(text, groupNames=groupNames, clearExisting=clearExisting, apply=True)
 
+    def getConflictsForImportFromMMG(self, path, groupNames, clearExisting):
+        f = open(path, "rb")
+        text = f.read()
+        f.close()
+        return self._getConflictsForImportFromMMG(text, groupNames=groupNames, clearExisting=clearExisting)
+
+    def _getConflictsForImportFromMMG(self, text, groupNames, clearExisting):
+        """
+        >>> font = _setupTestFont1()
+        >>> font.groups.update({"public.kern1.A" : ["A", "A.alt2"]})
+        >>> font.kerning.update({("public.kern1.A", "B") : -50, ("A.alt1", "B") : -20})
+        >>> mutableGroups = font.groups.metricsMachine.mutableCopy()
+        >>> groupNames = mutableGroups.metricsMachine._importGroupsFromMMG(_testMMG, [], False, False)
+        >>> messages, pairs = mutableGroups.metricsMachine._getConflictsForImportFromMMG(_testMMG, groupNames, True)
+        >>> for message in messages:
+        ...     print(message)
+        Glyph NotInDestination is not in the font.
+        Glyph A.alt2 will be removed from side 1 group A.
+        >>> sorted(pairs)
+        [('public.kern1.A', 'public.kern2.B')]
+        >>> data = pairs["public.kern1.A", "public.kern2.B"]
+        >>> data["finalValue"]
+        -50
+        >>> sorted(data["pairs"].items())
+        [(('A.alt1', 'public.kern2.B'), {'value': -20, 'resolution': 'exception'}), (('public.kern1.A', 'B'), {'value': -50, 'resolution': 'group value'})]
+
+        # nothing has been changed
+        >>> mutableGroups["public.kern1.A"]
+        ['A', 'A.alt2']
+        >>> font.metricsMachine.mutableGroups is mutableGroups
+        True
+        """
+        newGroups, errors, conflicts = parseMMG(text)
+        if errors:
+            raise MetricsMachineError("\n".join(errors))
+        messages, pairs = self._getConflictsForImport(newGroups, groupNames=groupNames, clearExisting=clearExisting)
+        return conflicts + messages, pairs
+
     def _importGroupsFromMMG(self, text, groupNames, clearExisting, apply):
         """
         # set up the destination font
@@ -2651,37 +2996,9 @@ class MMGroups(MetricsMachineImplementation):
         >>> mutableGroups["public.kern1.B"]
         ['B']
         """
-        from xml.etree.ElementTree import fromstring
-        newGroups = {}
-        tree = fromstring(text)
-        for element in tree:
-            if element.tag == "group":
-                typ = element.get("type")
-                if typ != "kerning":
-                    continue
-                name = element.get("name")
-                side = element.get("side")
-                color = element.get("color")
-                if side == "left" or side == "side1":
-                    name = side1Prefix + name
-                elif side == "right" or side == "side2":
-                    name = side2Prefix + name
-                else:
-                    raise MetricsMachineError
-                if color:
-                    try:
-                        color = tuple([float(i) for i in color.split(" ") if i])
-                    except ValueError:
-                        raise MetricsMachineError
-                glyphNames = None
-                for subelement in element:
-                    if subelement.tag != "glyphs":
-                        raise MetricsMachineError
-                    if glyphNames is not None:
-                        raise MetricsMachineError
-                    glyphNames = [i.strip() for i in subelement.text.splitlines() if i.strip()]
-                    glyphNames = OrderedSet(glyphNames)
-                newGroups[name] = (glyphNames, color)
+        newGroups, errors, conflicts = parseMMG(text)
+        if errors:
+            raise MetricsMachineError("\n".join(errors))
         if apply:
             self._importGroups(newGroups, groupNames=groupNames, clearExisting=clearExisting)
         return newGroups.keys()
@@ -2782,43 +3099,243 @@ class MMGroups(MetricsMachineImplementation):
         # will have their kerning preserved as is.
 
         # filter only to desired groups
-        _newGroups = {}
-        for groupName, glyphList in newGroups.items():
-            if groupName not in groupNames:
-                continue
-            _newGroups[groupName] = glyphList
-        newGroups = _newGroups
+        groupNames = set(groupNames)
+        newGroups = dict((groupName, value) for groupName, value in newGroups.items() if groupName in groupNames)
 
-        font = self.font
         changedGroups = set()
         changedGlyphs = set()
         # remove groups
         if clearExisting:
+            kerningIndex = None
+            if self._isMutable:
+                kerningIndex = self._makeKerningIndex()
             for groupName in sorted(self.keys()):
                 if not groupName.startswith(side1Prefix) and not groupName.startswith(side2Prefix):
                     continue
                 if groupName not in newGroups:
                     changedGroups.add(groupName)
-                    changedGlyphs = changedGlyphs | set(self[groupName])
-                    self.removeGroup(groupName, decompose=True, postNotification=True)
+                    changedGlyphs.update(self[groupName])
+                    if self._isMutable:
+                        self._removeGroup(groupName, decompose=True, postNotification=False, kerningIndex=kerningIndex)
+                    else:
+                        self.removeGroup(groupName, postNotification=False)
         # create new groups
-        for groupName, (glyphList, color) in sorted(newGroups.items()):
-            if groupName in self:
-                toRemove = set(self[groupName]) - set(glyphList)
-                self.removeFromGroup(groupName, toRemove, postNotification=False)
-                changedGlyphs = changedGlyphs | set(toRemove)
-            else:
+        contents, movedGlyphs = self._planImportedGroups(newGroups)
+        for groupName in sorted(newGroups):
+            if groupName not in self:
                 self.newGroup(groupName, postNotification=False)
-            glyphList = [glyphName for glyphName in glyphList if glyphName in font]
-            self.addToGroup(groupName, glyphList, postNotification=False)
-            changedGroups.add(groupName)
-            changedGlyphs = changedGlyphs | set(glyphList)
-            # handle color
+        changedGroups.update(contents)
+        changedGlyphs.update(movedGlyphs[0])
+        changedGlyphs.update(movedGlyphs[1])
+        for glyphList in contents.values():
+            changedGlyphs.update(glyphList)
+        if self._isMutable:
+            self._setImportedGroupContents(contents, movedGlyphs)
+        else:
+            self.update(contents)
+        # handle color
+        for groupName, (glyphList, color) in newGroups.items():
             if color is not None:
                 self.setColorForGroup(groupName, color, postNotification=False)
         # post notification
         self.postChangeNotification(changedGroups, changedGlyphs)
 
+    def _planImportedGroups(self, newGroups):
+        """
+        Work out what importing the groups in a group name :
+        (glyph names, color) dict into the current groups would
+        do. The new groups are imported in sorted order. A glyph
+        that is in more than one group of the same side ends up
+        in the last of them. This returns a group name : glyph
+        list dict with the new contents of the groups that change
+        and a set of the side 1 glyphs and a set of the side 2
+        glyphs that move out of or into a group along the way.
+
+        >>> font = _setupTestFont1()
+        >>> font.groups.update({"public.kern1.A" : ["A", "A.alt1", "A.alt2"], "public.kern1.X" : ["X", "B"]})
+        >>> newGroups = {
+        ...     "public.kern1.A" : (["A.alt2", "A"], None),
+        ...     "public.kern1.B" : (["B", "B.alt1", "A", "NotInFont"], None),
+        ...     "public.kern2.B" : (["B"], None)
+        ... }
+        >>> contents, (moved1, moved2) = font.groups.metricsMachine._planImportedGroups(newGroups)
+        >>> for groupName, glyphList in sorted(contents.items()):
+        ...     print(groupName, glyphList)
+        public.kern1.A ['A.alt2']
+        public.kern1.B ['A', 'B', 'B.alt1']
+        public.kern1.X ['X']
+        public.kern2.B ['B']
+        >>> sorted(moved1), sorted(moved2)
+        (['A', 'A.alt1', 'B', 'B.alt1'], ['B'])
+        """
+        font = self.font
+        glyphToGroupMaps = self._getGlyphToGroupMaps()
+        contents = {}
+        movedGlyphs = (set(), set())
+        for prefix, glyphToGroup, moved in ((side1Prefix, glyphToGroupMaps[0], movedGlyphs[0]), (side2Prefix, glyphToGroupMaps[1], movedGlyphs[1])):
+            importedGroupNames = sorted(groupName for groupName in newGroups if groupName.startswith(prefix))
+            if not importedGroupNames:
+                continue
+            newGlyphSets = {}
+            glyphToNewGroups = {}
+            for groupName in importedGroupNames:
+                glyphSet = newGlyphSets[groupName] = set(newGroups[groupName][0])
+                for glyphName in glyphSet:
+                    if glyphName not in font:
+                        continue
+                    if glyphName not in glyphToNewGroups:
+                        glyphToNewGroups[glyphName] = []
+                    glyphToNewGroups[glyphName].append(groupName)
+                    if glyphToGroup.get(glyphName) != groupName:
+                        moved.add(glyphName)
+            # glyphs that stay where they are keep their place in
+            # the group. glyphs that are added are appended in order.
+            for groupName in importedGroupNames:
+                glyphSet = newGlyphSets[groupName]
+                existing = self[groupName] if groupName in self else []
+                kept = []
+                for glyphName in existing:
+                    if glyphName in glyphSet and glyphToNewGroups.get(glyphName, [groupName]) == [groupName]:
+                        kept.append(glyphName)
+                    else:
+                        moved.add(glyphName)
+                keptSet = set(kept)
+                added = sorted(glyphName for glyphName in glyphSet if glyphName not in keptSet and glyphName in glyphToNewGroups and glyphToNewGroups[glyphName][-1] == groupName)
+                contents[groupName] = kept + added
+            # other groups lose the glyphs that were taken
+            otherGroupNames = set(glyphToGroup[glyphName] for glyphName in glyphToNewGroups if glyphName in glyphToGroup)
+            for groupName in otherGroupNames:
+                if groupName in newGlyphSets:
+                    continue
+                contents[groupName] = [glyphName for glyphName in self[groupName] if glyphName not in glyphToNewGroups]
+        return contents, movedGlyphs
+
+    def _setImportedGroupContents(self, contents, movedGlyphs):
+        """
+        Set the contents of the groups in a group name : glyph
+        list dict made by the import planning. This does what
+        removeFromGroup and addToGroup would do with one pass
+        through the kerning data: all kerning that references
+        the moved glyphs on the moved side is held and then
+        stored again.
+        """
+        glyphToSide1Group, glyphToSide2Group = self._getGlyphToGroupMaps()
+        moved1, moved2 = movedGlyphs
+        # hold kerning referencing the moved glyphs
+        holdingPairs = {}
+        for pair, data in list(self._kerningData.items()):
+            if pair[0] in moved1 or pair[1] in moved2 or pair[0] in contents or pair[1] in contents:
+                self._touchedSuperPairs[pair] = None
+                for key in ("existingPairs", "existingExceptions", "addedPairs"):
+                    subPairs = data[key]
+                    for subPair in [subPair for subPair in subPairs if subPair[0] in moved1 or subPair[1] in moved2]:
+                        holdingPairs[subPair] = subPairs.pop(subPair)
+            # remove any empty top level pairs
+            if not data["existingPairs"] and not data["existingExceptions"] and not data["addedPairs"]:
+                del self._kerningData[pair]
+        # set the groups
+        for groupName, glyphList in contents.items():
+            if groupName.startswith(side1Prefix):
+                glyphToGroup = glyphToSide1Group
+            else:
+                glyphToGroup = glyphToSide2Group
+            for glyphName in self[groupName]:
+                if glyphToGroup.get(glyphName) == groupName:
+                    del glyphToGroup[glyphName]
+        for groupName, glyphList in contents.items():
+            if groupName.startswith(side1Prefix):
+                glyphToGroup = glyphToSide1Group
+            else:
+                glyphToGroup = glyphToSide2Group
+            self[groupName][:] = glyphList
+            for glyphName in glyphList:
+                glyphToGroup[glyphName] = groupName
+        # store the kerning data
+        self._storePairs(holdingPairs)
+
+    def _getConflictsForImport(self, newGroups, groupNames, clearExisting):
+        """
+        Import the groups into a scratch copy of these mutable
+        groups and find the kerning conflicts that the import
+        would create. Nothing is changed here. This returns a
+        list of messages about glyphs that can not be imported
+        or that will leave a group and a dict of the pairs that
+        will need resolution. The dict is in the form that
+        getAllPairsNeedingResolution and getConflictsForPair
+        give to the conflict resolution sheet:
+
+            top level pair : {
+                finalValue : value,
+                pairs : {pair : {value : value, resolution : resolution}},
+                haveConflict : True
+            }
+        """
+        font = self.font
+        newGroups = dict((groupName, value) for groupName, value in newGroups.items() if groupName in groupNames)
+        messages = []
+        for groupName, (glyphList, color) in sorted(newGroups.items()):
+            for glyphName in glyphList:
+                if glyphName not in font:
+                    messages.append("Glyph %s is not in the font." % glyphName)
+        scratch = self._scratchCopy()
+        scratchGroups = scratch.metricsMachine
+        scratchGroups._importGroups(newGroups, groupNames=newGroups.keys(), clearExisting=clearExisting)
+        # groups that are removed entirely are not reported
+        for groupName in sorted(self.keys()):
+            if groupName not in scratch:
+                continue
+            glyphSet = set(scratch[groupName])
+            for glyphName in self[groupName]:
+                if glyphName not in glyphSet:
+                    side = 1 if groupName.startswith(side1Prefix) else 2
+                    messages.append("Glyph %s will be removed from side %d group %s." % (glyphName, side, userFriendlyGroupName(groupName)))
+        scratchGroups.applyGroups()
+        pairs = {}
+        for pair in scratchGroups.getAllPairsNeedingResolution():
+            pairs[pair] = scratchGroups._kerningResolutionData[pair]
+        return messages, pairs
+
+    def _scratchCopy(self):
+        """
+        Make a copy of these mutable groups that can be edited
+        without changing these groups, the font or the font's
+        mutable groups.
+
+        >>> font = _setupTestFont1()
+        >>> font.groups.update({"public.kern1.A" : ["A"]})
+        >>> font.kerning.update({("public.kern1.A", "B") : -50})
+        >>> mutableGroups = font.groups.metricsMachine.mutableCopy()
+        >>> scratch = mutableGroups.metricsMachine._scratchCopy()
+        >>> scratch.metricsMachine.addToGroup("public.kern1.A", ["A.alt1"])
+        >>> scratch.metricsMachine.setColorForGroup("public.kern1.A", (1, 1, 1, 1))
+        >>> scratch["public.kern1.A"], mutableGroups["public.kern1.A"], font.groups["public.kern1.A"]
+        (['A', 'A.alt1'], ['A'], ['A'])
+        >>> mutableGroups.metricsMachine.getColorForGroup("public.kern1.A") == fallbackGroupColor
+        True
+        >>> font.metricsMachine.mutableGroups is mutableGroups
+        True
+        """
+        groups = defcon.Groups(font=self.font)
+        groups.update(dict((groupName, list(glyphList)) for groupName, glyphList in self.items()))
+        other = groups.metricsMachine
+        other._groupColors = dict(self._groupColors)
+        other._kerningData = {}
+        for pair, data in self._kerningData.items():
+            data = dict(data)
+            for key in ("existingPairs", "existingExceptions", "addedPairs"):
+                data[key] = dict(data[key])
+            other._kerningData[pair] = data
+        other._touchedSuperPairs = dict(self._touchedSuperPairs)
+        other._originalKerningPairs = self._originalKerningPairs
+        other._originalGroups = self._originalGroups
+        other._originalGlyphToSide1Group = self._originalGlyphToSide1Group
+        other._originalGlyphToSide2Group = self._originalGlyphToSide2Group
+        other._removedGroups = set(self._removedGroups)
+        other._newGroups = set(self._newGroups)
+        other._renamedGroups = dict(self._renamedGroups)
+        other._isMutable = True
+        return groups
+
     # MMG
 
     def exportGroupsToMMG(self, path):
@@ -2849,50 +3366,9 @@ class MMGroups(MetricsMachineImplementation):
         >>> text == _expectedMMGOutput
         True
         """
-        from fontTools.misc.xmlWriter import XMLWriter
-        ioFile = StringIO()
-        writer = XMLWriter(ioFile)
-        writer.begintag("xml")
-        writer.newline()
-        # side 1
-        for groupName in sorted(self.getSide1Groups()):
-            color = self.getColorForGroup(groupName)
-            if color != fallbackGroupColor:
-                color = " ".join([str(round(float(i), 2)) for i in color])
-                writer.begintag("group", name=userFriendlyGroupName(groupName), side="side1", type="kerning", color=color)
-            else:
-                writer.begintag("group", name=userFriendlyGroupName(groupName), side="side1", type="kerning")
-            writer.newline()
-            writer.begintag("glyphs")
-            writer.newline()
-            for glyphName in sorted(self[groupName]):
-                writer.write(glyphName)
-                writer.newline()
-            writer.endtag("glyphs")
-            writer.newline()
-            writer.endtag("group")
-            writer.newline()
-        # side 2
-        for groupName in sorted(self.getSide2Groups()):
-            color = self.getColorForGroup(groupName)
-            if color != fallbackGroupColor:
-                color = " ".join([str(round(float(i), 2)) for i in color])
-                writer.begintag("group", name=userFriendlyGroupName(groupName), side="side2", type="kerning", color=color)
-            else:
-                writer.begintag("group", name=userFriendlyGroupName(groupName), side="side2", type="kerning")
-            writer.newline()
-            writer.begintag("glyphs")
-            writer.newline()
-            for glyphName in sorted(self[groupName]):
-                writer.write(glyphName)
-                writer.newline()
-            writer.endtag("glyphs")
-            writer.newline()
-            writer.endtag("group")
-            writer.newline()
-        writer.endtag("xml")
-        text = ioFile.getvalue()
-        return text
+        side1Groups = dict((groupName, self[groupName]) for groupName in self.getSide1Groups())
+        side2Groups = dict((groupName, self[groupName]) for groupName in self.getSide2Groups())
+        return formatMMG(side1Groups, side2Groups, self._groupColors, defaultColor=fallbackGroupColor)
 
     # ----------------
     # reference groups
@@ -1,8 +1,10 @@
 import time
+from contextlib import contextmanager
 
 from ufo2fdk.kernFeatureWriter import side1Prefix, side2Prefix, side1FeaPrefix, side2FeaPrefix, KernFeatureWriter
 
-from mm4 import MetricsMachineImplementation
+from mm4 import MetricsMachineImplementation, MetricsMachineError
+from mm4.objects.mmKerningIndex import KerningLookupIndex, GlyphPairCounts
 
 
 GROUP_GROUP = 0
@@ -56,6 +58,13 @@ def getKerningValue(pair, kerning, mmgroups):
         return 0
 
 
+def _roundMatrixValue(side1, side2, value):
+    value = int(round(value))
+    if not -32768 <= value <= 32767:
+        raise MetricsMachineError("The value of %s %s (%d) does not fit in int16." % (side1, side2, value))
+    return value
+
+
 class MMKerning(MetricsMachineImplementation):
 
     def _get_groups(self):
@@ -66,6 +75,10 @@ class MMKerning(MetricsMachineImplementation):
 
     groups = property(_get_groups)
 
+    def __del__(self):
+        self._lookupIndex = None
+        super(MMKerning, self).__del__()
+
     def makeCopyWithoutSubscribers(self):
         font = self.font
         other = self.super().__class__(font)
@@ -138,18 +151,23 @@ class MMKerning(MetricsMachineImplementation):
         """
         (side1, side2) = pair
         if groups is None:
-            groups = self.groups
+            index = self._getLookupIndex()
+            getSide1GroupForGlyph = index.getSide1Group
+            getSide2GroupForGlyph = index.getSide2Group
+        else:
+            getSide1GroupForGlyph = groups.metricsMachine.getSide1GroupForGlyph
+            getSide2GroupForGlyph = groups.metricsMachine.getSide2GroupForGlyph
         if side1.startswith(side1Prefix):
             side1Group = side1
             side1Glyph = None
         else:
-            side1Group = groups.metricsMachine.getSide1GroupForGlyph(side1)
+            side1Group = getSide1GroupForGlyph(side1)
             side1Glyph = side1
         if side2.startswith(side2Prefix):
             side2Group = side2
             side2Glyph = None
         else:
-            side2Group = groups.metricsMachine.getSide2GroupForGlyph(side2)
+            side2Group = getSide2GroupForGlyph(side2)
             side2Glyph = side2
 
         havePotentialHigherLevelPair = False
@@ -179,6 +197,152 @@ class MMKerning(MetricsMachineImplementation):
                     havePotentialHigherLevelPair = True
         return havePotentialHigherLevelPair
 
+    # ------------
+    # Lookup Index
+    # ------------
+
+    def _getLookupIndex(self):
+        index = getattr(self, "_lookupIndex", None)
+        if index is None:
+            kerning = self.super()
+            groups = self.groups
+            index = self._lookupIndex = KerningLookupIndex(kerning, groups)
+            kerning.addObserver(index, "kerningPairChangedNotificationCallback", "Kerning.PairSet")
+            kerning.addObserver(index, "kerningPairChangedNotificationCallback", "Kerning.PairDeleted")
+            kerning.addObserver(index, "kerningChangedNotificationCallback", "Kerning.Cleared")
+            kerning.addObserver(index, "kerningUpdatedNotificationCallback", "Kerning.Updated")
+            if groups is not None:
+                groups.addObserver(index, "groupChangedNotificationCallback", "Groups.GroupSet")
+                groups.addObserver(index, "groupChangedNotificationCallback", "Groups.GroupDeleted")
+                groups.addObserver(index, "groupsChangedNotificationCallback", "Groups.Cleared")
+                groups.addObserver(index, "groupsChangedNotificationCallback", "Groups.Updated")
+        return index
+
+    def _pairsChanged(self, pairs):
+        # notifications may be held by the caller,
+        # so the index is patched immediately.
+        index = getattr(self, "_lookupIndex", None)
+        if index is not None and pairs:
+            index.pairsChanged(pairs)
+
+    # -----
+    # Batch
+    # -----
+
+    def _recordBatchChanges(self, pairs):
+        # called before the pairs are changed.
+        changes = getattr(self, "_batchChanges", None)
+        if changes is None:
+            return
+        kerning = self.super()
+        for pair in pairs:
+            if pair not in changes:
+                changes[pair] = kerning.get(pair, None)
+
+    @contextmanager
+    def batch(self, note=None):
+        """
+        Group a set of edits into one change set.
+
+        Inside the outermost block the Kerning.PairSet,
+        Kerning.PairDeleted and Kerning.Changed notifications
+        are disabled and the other kerning notifications are
+        held. When the block exits, the held notifications are
+        posted, followed by one Kerning.Changed and one
+        MMKerning.BatchChanged notification. The data of the
+        latter has a "pairs" dict mapping every changed pair
+        to an (oldValue, newValue) tuple. None means the pair
+        did not exist. Observers of the per pair notifications
+        should observe MMKerning.BatchChanged as well.
+
+        Old values are only recorded for the pairs that are
+        changed through MMKerning. Edits made directly to the
+        defcon kerning inside the block are not in the change
+        set and their per pair notifications are lost.
+
+        >>> font = _setupTestFont()
+        >>> font.kerning.update({("A", "A") : 1, ("A", "B") : 2})
+        >>> observer = _TestObserver()
+        >>> font.kerning.addObserver(observer, "notificationCallback", "Kerning.PairSet")
+        >>> font.kerning.addObserver(observer, "notificationCallback", "MMKerning.BatchChanged")
+        >>> with font.kerning.metricsMachine.batch():
+        ...     font.kerning.metricsMachine["A", "A"] = 3
+        ...     font.kerning.metricsMachine["A", "C"] = 4
+        ...     font.kerning.metricsMachine["A", "C"] = 5
+        ...     del font.kerning.metricsMachine["A", "B"]
+        ...     font.kerning.metricsMachine["A", "A"]
+        ...     len(observer.notifications)
+        3
+        0
+        >>> [name for name, data in observer.notifications]
+        ['MMKerning.BatchChanged']
+        >>> sorted(observer.notifications[-1][1]["pairs"].items())
+        [(('A', 'A'), (1, 3)), (('A', 'B'), (2, None)), (('A', 'C'), (None, 5))]
+        """
+        kerning = self.super()
+        depth = getattr(self, "_batchDepth", 0)
+        self._batchDepth = depth + 1
+        if depth:
+            try:
+                yield
+            finally:
+                self._batchDepth -= 1
+            return
+        # holding every notification would make the batch
+        # quadratic since defcon scans the held notifications
+        # for duplicates. the per pair notifications are
+        # replaced by the change set instead.
+        disabled = ("Kerning.PairSet", "Kerning.PairDeleted", "Kerning.Changed")
+        self._batchChanges = {}
+        for name in disabled:
+            kerning.disableNotifications(notification=name)
+        kerning.holdNotifications(note=note)
+        try:
+            yield
+        finally:
+            self._batchDepth -= 1
+            for name in disabled:
+                kerning.enableNotifications(notification=name)
+            changes = self._batchChanges
+            self._batchChanges = None
+            changed = {}
+            for pair, oldValue in changes.items():
+                value = kerning.get(pair, None)
+                if oldValue != value:
+                    changed[pair] = (oldValue, value)
+            kerning.releaseHeldNotifications()
+            if changed:
+                kerning.postNotification("Kerning.Changed")
+                kerning.postNotification("MMKerning.BatchChanged", data=dict(pairs=changed))
+
+    def getValues(self, pairs):
+        """
+        >>> font = _setupTestFont()
+        >>> kerning = {
+        ...     ("A", "A") : 1,
+        ...     ("public.kern1.A", "A") : 2,
+        ...     ("A", "public.kern2.A") : 3,
+        ...     ("public.kern1.A", "public.kern2.A") : 4,
+        ... }
+        >>> groups = {
+        ...     "public.kern1.A" : ["A", "Aacute"],
+        ...     "public.kern2.A" : ["A", "Aacute"],
+        ... }
+        >>> font.groups.update(groups)
+        >>> font.kerning.update(kerning)
+        >>> pairs = [("A", "A"), ("Aacute", "A"), ("A", "Aacute"), ("Aacute", "Aacute"), ("A", "B")]
+        >>> font.kerning.metricsMachine.getValues(pairs)
+        [1, 2, 3, 4, 0]
+        >>> font.kerning.metricsMachine["Aacute", "Aacute"] = 5
+        >>> font.kerning.metricsMachine.removePairs([("A", "public.kern2.A")])
+        >>> font.kerning.metricsMachine.getValues(pairs)
+        [1, 2, 5, 5, 0]
+        >>> font.groups["public.kern2.A"] = ["A"]
+        >>> font.kerning.metricsMachine.getValues(pairs)
+        [1, 2, 0, 0, 0]
+        """
+        return self._getLookupIndex().getValues(pairs)
+
     # ----
     # dict
     # ----
@@ -212,7 +376,7 @@ class MMKerning(MetricsMachineImplementation):
         >>> font.kerning.metricsMachine["A", "B"]
         0
         """
-        return getKerningValue(pair, self.super(), self.groups.metricsMachine)
+        return self._getLookupIndex().getValue(pair)
 
     def __setitem__(self, pair, value):
         """
@@ -352,6 +516,11 @@ class MMKerning(MetricsMachineImplementation):
             side2Group = groups.metricsMachine.getSide2GroupForGlyph(side2)
             side2Glyph = side2
 
+        # only one of these is changed.
+        self._recordBatchChanges([
+            (s1, s2) for (s1, s2) in ((side1, side2), (side1Group, side2Glyph), (side1Glyph, side2Group), (side1Group, side2Group))
+            if s1 is not None and s2 is not None
+        ])
         changed = None
 
         # Pair already exists. Set the new value.
@@ -407,15 +576,20 @@ class MMKerning(MetricsMachineImplementation):
                 kerning[side1Glyph, side2Glyph] = value
                 changed = set([(side1Glyph, side2Glyph)])
 
+        self._pairsChanged(changed)
         return changed
 
     def __delitem__(self, pair):
+        self._recordBatchChanges([pair])
         del self.super()[pair]
+        self._pairsChanged([pair])
 
     def removePairs(self, pairs):
         kerning = self.super()
+        self._recordBatchChanges(pairs)
         for pair in pairs:
             del kerning[pair]
+        self._pairsChanged(pairs)
 
     def get(self, pair, default=0):
         return self[pair]
@@ -441,7 +615,11 @@ class MMKerning(MetricsMachineImplementation):
         >>> sorted(font.kerning.items())
         []
         """
+        self._recordBatchChanges(list(self.keys()))
         self.super().clear()
+        index = getattr(self, "_lookupIndex", None)
+        if index is not None:
+            index.clearValues()
 
     def update(self, other):
         """
@@ -490,7 +668,9 @@ class MMKerning(MetricsMachineImplementation):
             newOther[side1, sisde2] = value
         other = newOther
         # update the internal dict and gather changes for notification
+        self._recordBatchChanges(other.keys())
         self.super().update(other)
+        self._pairsChanged(list(other.keys()))
 
     # ----------
     # exceptions
@@ -525,15 +705,15 @@ class MMKerning(MetricsMachineImplementation):
         ('group', 'group')
         """
         side1, side2 = pair
-        groups = self.groups
+        index = self._getLookupIndex()
         if side1.startswith(side1Prefix):
             side1Group = side1
         else:
-            side1Group = groups.metricsMachine.getSide1GroupForGlyph(side1)
+            side1Group = index.getSide1Group(side1)
         if side2.startswith(side2Prefix):
             side2Group = side2
         else:
-            side2Group = groups.metricsMachine.getSide2GroupForGlyph(side2)
+            side2Group = index.getSide2Group(side2)
         side1Type = side2Type = "glyph"
 
         if pair in self:
@@ -571,6 +751,7 @@ class MMKerning(MetricsMachineImplementation):
     def makeException(self, pair):
         if pair in self:
             return
+        self._recordBatchChanges([pair])
         self.super()[pair] = self[pair]
 
     def breakException(self, pair):
@@ -659,10 +840,10 @@ class MMKerning(MetricsMachineImplementation):
         >>> font.kerning.metricsMachine.getPossibleExceptions(("C", "X"))
         [('C', 'X')]
         """
-        groups = self.groups
+        index = self._getLookupIndex()
         side1, side2 = pair
-        side1Group = groups.metricsMachine.getSide1GroupForGlyph(side1)
-        side2Group = groups.metricsMachine.getSide2GroupForGlyph(side2)
+        side1Group = index.getSide1Group(side1)
+        side2Group = index.getSide2Group(side2)
         possible = []
         if side1Group is not None and side2Group is not None:
             if (side1Group, side2) not in self:
@@ -691,16 +872,16 @@ class MMKerning(MetricsMachineImplementation):
         >>> font.kerning.metricsMachine.getExceptedPairs(("A", "A"))
         [('A', 'public.kern2.A'), ('public.kern1.A', 'public.kern2.A')]
         """
-        groups = self.groups
+        index = self._getLookupIndex()
         side1, side2 = pair
         if side1.startswith(side1Prefix):
             side1Group = side1
         else:
-            side1Group = groups.metricsMachine.getSide1GroupForGlyph(side1)
+            side1Group = index.getSide1Group(side1)
         if side2.startswith(side2Prefix):
             side2Group = side2
         else:
-            side2Group = groups.metricsMachine.getSide2GroupForGlyph(side2)
+            side2Group = index.getSide2Group(side2)
         existingPairs = []
         # group, group
         # (always exists as an implied zero if it doesn't have a real value)
@@ -740,6 +921,7 @@ class MMKerning(MetricsMachineImplementation):
         {}
         """
         groups = self.groups
+        index = self._getLookupIndex()
         side1, side2 = pair
         # glyph, glyph pairs will not have conflicts
         if not side1.startswith(side1Prefix) and not side2.startswith(side2Prefix):
@@ -748,24 +930,31 @@ class MMKerning(MetricsMachineImplementation):
         if side1.startswith(side1Prefix):
             side1 = groups[side1]
         else:
-            side1Group = groups.metricsMachine.getSide1GroupForGlyph(side1)
+            side1Group = index.getSide1Group(side1)
             if side1Group is None:
                 side1 = [side1]
             else:
                 side1 = [side1Group]
         if side2.startswith(side2Prefix):
-            side2 = groups[side2]
+            side2 = set(groups[side2])
         else:
-            side2Group = groups.metricsMachine.getSide2GroupForGlyph(side2)
+            side2Group = index.getSide2Group(side2)
             if side2Group is None:
-                side2 = [side2]
+                side2 = set([side2])
             else:
-                side2 = [side2Group]
+                side2 = set([side2Group])
+        # only the existing partners of each
+        # side 1 member need to be checked.
+        kerning = self.super()
         conflicts = {}
         for s1 in side1:
-            for s2 in side2:
-                if (s1, s2) in self:
-                    conflicts[s1, s2] = self[s1, s2]
+            partners = index.getSide1Partners(s1)
+            if len(partners) < len(side2):
+                found = [s2 for s2 in partners if s2 in side2]
+            else:
+                found = [s2 for s2 in side2 if s2 in partners]
+            for s2 in found:
+                conflicts[s1, s2] = kerning[s1, s2]
         return conflicts
 
     def removeRedundantExceptions(self, pairs=None):
@@ -843,32 +1032,35 @@ class MMKerning(MetricsMachineImplementation):
         """
         if pairs is None:
             pairs = self.keys()
-        groups = self.groups
+        index = self._getLookupIndex()
+        kerning = self.super()
+        # the pairs are only ever removed, so the existing
+        # values are read directly from the kerning.
         for side1, side2 in list(pairs):
-            if (side1, side2) not in self:
+            if (side1, side2) not in kerning:
                 continue
             pairType = self.getPairType((side1, side2))
             if "exception" not in pairType:
                 continue
-            value = self[side1, side2]
+            value = kerning[side1, side2]
             higherValue = None
             if pairType == ("exception", "exception"):
-                side1Group = groups.metricsMachine.getSide1GroupForGlyph(side1)
-                side2Group = groups.metricsMachine.getSide2GroupForGlyph(side2)
-                if (side1Group, side2) in self:
-                    higherValue = self[side1Group, side2]
-                elif (side1, side2Group) in self:
-                    higherValue = self[side1, side2Group]
-                elif (side1Group, side2Group) in self:
-                    higherValue = self[side1Group, side2Group]
+                side1Group = index.getSide1Group(side1)
+                side2Group = index.getSide2Group(side2)
+                if (side1Group, side2) in kerning:
+                    higherValue = kerning[side1Group, side2]
+                elif (side1, side2Group) in kerning:
+                    higherValue = kerning[side1, side2Group]
+                elif (side1Group, side2Group) in kerning:
+                    higherValue = kerning[side1Group, side2Group]
             elif pairType[0] == "exception":
-                side1Group = groups.metricsMachine.getSide1GroupForGlyph(side1)
-                if (side1Group, side2) in self:
-                    higherValue = self[side1Group, side2]
+                side1Group = index.getSide1Group(side1)
+                if (side1Group, side2) in kerning:
+                    higherValue = kerning[side1Group, side2]
             elif pairType[1] == "exception":
-                side2Group = groups.metricsMachine.getSide2GroupForGlyph(side2)
-                if (side1, side2Group) in self:
-                    higherValue = self[side1, side2Group]
+                side2Group = index.getSide2Group(side2)
+                if (side1, side2Group) in kerning:
+                    higherValue = kerning[side1, side2Group]
             # values match
             if value == higherValue:
                 del self[side1, side2]
@@ -880,9 +1072,6 @@ class MMKerning(MetricsMachineImplementation):
     # Glyph Pair Counts
     # -----------------
 
-    def _killGlyphCounts(self):
-        self._glyphCounts = None
-
     def getGlyphCounts(self):
         """
         >>> font = _setupTestFont()
@@ -939,45 +1128,22 @@ class MMKerning(MetricsMachineImplementation):
         True
         >>> font.kerning.metricsMachine.getGlyphCounts()["X"] == expectedX
         True
+
+        The counts follow edits without a recount.
+
+        >>> font.kerning.metricsMachine["B", "public.kern2.A"] = 6
+        >>> counts = font.kerning.metricsMachine.getGlyphCounts()
+        >>> counts["B"]["side1GlyphCount"], counts["Aacute"]["side2GroupCount"]
+        (2, 3)
+        >>> font.groups["public.kern1.A"] = ["A", "Aacute", "B"]
+        >>> counts["B"]["side1GlyphCount"], counts["B"]["side1ExceptionCount"], counts["B"]["side1GroupCount"]
+        (0, 2, 2)
+        >>> font.kerning.metricsMachine.removePairs([("B", "C")])
+        >>> counts["B"]["side1ExceptionCount"], counts["C"]["side2GlyphCount"]
+        (1, 0)
         """
-        if not hasattr(self, "_glyphCounts") or self._glyphCounts is None:
-            font = self.font
-            groups = self.groups
-            # setup storage
-            data = {}
-            for name in font.keys():
-                data[name] = dict(
-                    side1GroupCount=set(), side2GroupCount=set(),
-                    side1GlyphCount=set(), side2GlyphCount=set(),
-                    side1ExceptionCount=set(), side2ExceptionCount=set()
-                )
-            # gather pairs
-            for side1, side2 in self.keys():
-                if side1.startswith(side1Prefix):
-                    side1Members = groups[side1]
-                else:
-                    side1Members = [side1]
-                if side2.startswith(side2Prefix):
-                    side2Members = groups[side2]
-                else:
-                    side2Members = [side2]
-                side1Type, side2Type = self.getPairType((side1, side2))
-                side1Key = "side1%sCount" % side1Type.title()
-                side2Key = "side2%sCount" % side2Type.title()
-                for name in side1Members:
-                    if name in data.keys():
-                        if side1Key in data[name].keys():
-                            data[name][side1Key].add((side1, side2))
-                for name in side2Members:
-                    if name in data.keys():
-                        if side2Key in data[name].keys():
-                            data[name][side2Key].add((side1, side2))
-            # convert to numbers
-            for glyphData in data.values():
-                for key, pairs in glyphData.items():
-                    glyphData[key] = len(pairs)
-            # done
-            self._glyphCounts = data
+        if getattr(self, "_glyphCounts", None) is None:
+            self._glyphCounts = GlyphPairCounts(self.font, self._getLookupIndex())
         return self._glyphCounts
 
     # ------
@@ -1212,11 +1378,29 @@ class MMKerning(MetricsMachineImplementation):
         ...     lines
         ...     _expectedFeatureText3.splitlines()
 
+        >>> font.kerning["alpha", "alpha"] = 5
+        >>> lines = font.kerning.metricsMachine._getFeatureTextWithSubtableBreaks(testMode=True).splitlines()
+        >>> lines == SubtableBreakWriter(font).write(appVersion="0.0", testMode=True).splitlines()
+        True
+        >>> "pos alpha alpha 5;" in [line.strip() for line in lines]
+        True
         """
-        writer = SubtableBreakWriter(self.font)
+        writer = SubtableBreakWriter(self.font, exportCache=self._getFeatureExportCache())
         text = writer.write(appVersion=appVersion, testMode=testMode)
         return text
 
+    def _getFeatureExportCache(self):
+        cache = getattr(self, "_featureExportCache", None)
+        if cache is None:
+            kerning = self.super()
+            cache = self._featureExportCache = FeatureExportCache()
+            kerning.addObserver(cache, "kerningPairChangedNotificationCallback", "Kerning.PairSet")
+            kerning.addObserver(cache, "kerningChangedNotificationCallback", "Kerning.PairDeleted")
+            kerning.addObserver(cache, "kerningChangedNotificationCallback", "Kerning.Cleared")
+            kerning.addObserver(cache, "kerningUpdatedNotificationCallback", "Kerning.Updated")
+            kerning.addObserver(cache, "kerningBatchChangedNotificationCallback", "MMKerning.BatchChanged")
+        return cache
+
     def _getFeatureSeperatedPairs(self, pairs):
         font = self.font
         groups = self.groups
@@ -1293,19 +1477,13 @@ class MMKerning(MetricsMachineImplementation):
         from fontTools.afmLib import AFM
         from fontTools.misc.arrayTools import unionRect
         from fontTools.encodings.StandardEncoding import StandardEncoding
+        from mm4.tools.afmWriter import writeAFM
 
         font = self.font
         glyphs = set(glyphs)
-        _kerning = self.getFlatKerning()
-        kerning = {}
-        for (side1, side2), value in _kerning.items():
-            if side1 not in glyphs or side2 not in glyphs:
-                continue
-            kerning[side1, side2] = value
 
         afm = AFM()
         afm.addComment(u"exported from MetricsMachine Extension %s" % appVersion)
-        afm._kerning = kerning
 
         fontBox = None
         for glyph in font:
@@ -1349,7 +1527,17 @@ class MMKerning(MetricsMachineImplementation):
         except UnicodeEncodeError:
             pass
 
-        afm.write(path, sep="\n")
+        # the pairs are written as they are flattened. with the
+        # glyphs in alphabetical order they are in the order
+        # that AFM.write sorts them into.
+        def iterKerning():
+            for pair, value in self.iterFlatKerning(glyphOrder=sorted(glyphs)):
+                side1, side2 = pair
+                if side1 not in glyphs or side2 not in glyphs:
+                    continue
+                yield pair, value
+
+        writeAFM(path, afm, iterKerning(), sep="\n")
 
     # ------------
     # flat kerning
@@ -1389,38 +1577,167 @@ class MMKerning(MetricsMachineImplementation):
         >>> sorted(font.kerning.metricsMachine.getFlatKerning().items())
         [(('A', 'A'), 0), (('A', 'Aacute'), 3), (('Aacute', 'A'), 2), (('Aacute', 'Aacute'), 4)]
         """
+        return dict(self.iterFlatKerning(pairs))
+
+    def iterFlatKerning(self, pairs=None, glyphOrder=None):
+        """
+        Yield ((side1, side2), value) for every flattened glyph
+        pair. The pairs are yielded one side 1 glyph at a time,
+        in glyph order, and only the pairs for the current side
+        1 glyph are held in memory. Glyphs that are not in the
+        glyph order follow in alphabetical order. If glyphOrder
+        is not given the glyph order of the font is used.
+
+        >>> font = _setupTestFont()
+        >>> font.glyphOrder = ["B", "Aacute", "A"]
+        >>> kerning = {
+        ...     ("A", "A") : 1,
+        ...     ("public.kern1.A", "A") : 2,
+        ...     ("A", "public.kern2.A") : 3,
+        ...     ("public.kern1.A", "public.kern2.A") : 4,
+        ...     ("B", "C") : 5,
+        ... }
+        >>> groups = {
+        ...     "public.kern1.A" : ["A", "Aacute"],
+        ...     "public.kern2.A" : ["A", "Aacute"],
+        ... }
+        >>> font.groups.update(groups)
+        >>> font.kerning.update(kerning)
+        >>> for pair, value in font.kerning.metricsMachine.iterFlatKerning():
+        ...     print(pair, value)
+        ('B', 'C') 5
+        ('Aacute', 'Aacute') 4
+        ('Aacute', 'A') 2
+        ('A', 'Aacute') 3
+        ('A', 'A') 1
+        >>> for pair, value in font.kerning.metricsMachine.iterFlatKerning(glyphOrder=["A", "Aacute"]):
+        ...     print(pair, value)
+        ('A', 'A') 1
+        ('A', 'Aacute') 3
+        ('Aacute', 'A') 2
+        ('Aacute', 'Aacute') 4
+        ('B', 'C') 5
+        """
         if pairs is None:
             pairs = self
         glyphGlyph, glyphGroupDecomposed, groupGlyphDecomposed, glyphGroup, groupGlyph, groupGroup = self._getFeatureSeperatedPairs(pairs)
-        flattened = dict(glyphGlyph)
         groups = self.groups
+        # index the sources by side 1 glyph. the
+        # sources are stored in precedence order
+        # so that the first value for a pair wins.
+        sources = {}
+
+        def addSource(side1, side2List, value):
+            if side1 not in sources:
+                sources[side1] = []
+            sources[side1].append((side2List, value))
+
+        for (side1, side2), value in glyphGlyph.items():
+            addSource(side1, (side2,), value)
         for (side1, side2List), value in glyphGroupDecomposed.items():
-            for side2 in side2List:
-                if (side1, side2) in flattened:
-                    continue
-                flattened[side1, side2] = value
+            addSource(side1, side2List, value)
         for (side1List, side2), value in groupGlyphDecomposed.items():
             for side1 in side1List:
-                if (side1, side2) in flattened:
-                    continue
-                flattened[side1, side2] = value
+                addSource(side1, (side2,), value)
         for (side1, side2Group), value in glyphGroup.items():
-            for side2 in groups[side2Group]:
-                if (side1, side2) in flattened:
-                    continue
-                flattened[side1, side2] = value
+            addSource(side1, groups[side2Group], value)
         for (side1Group, side2), value in groupGlyph.items():
             for side1 in groups[side1Group]:
-                if (side1, side2) in flattened:
-                    continue
-                flattened[side1, side2] = value
+                addSource(side1, (side2,), value)
         for (side1Group, side2Group), value in groupGroup.items():
             for side1 in groups[side1Group]:
-                for side2 in groups[side2Group]:
-                    if (side1, side2) in flattened:
-                        continue
-                    flattened[side1, side2] = value
-        return flattened
+                addSource(side1, groups[side2Group], value)
+        # order by glyph order
+        if glyphOrder is None:
+            glyphOrder = self.font.glyphOrder
+        order = {}
+        for index, glyphName in enumerate(glyphOrder):
+            order[glyphName] = index
+        unordered = len(order)
+
+        def sortKey(glyphName):
+            return (order.get(glyphName, unordered), glyphName)
+
+        for side1 in sorted(sources, key=sortKey):
+            row = {}
+            for side2List, value in sources.pop(side1):
+                for side2 in side2List:
+                    if side2 not in row:
+                        row[side2] = value
+            for side2 in sorted(row, key=sortKey):
+                yield (side1, side2), row[side2]
+
+    def asMatrix(self, glyphOrder=None, sparse=False, pairs=None):
+        """
+        Get the flat kerning as a NumPy int16 matrix with side 1
+        glyphs as rows and side 2 glyphs as columns, both indexed
+        by glyphOrder. If glyphOrder is not given the glyph order
+        of the font is used. Pairs with glyphs that are not in
+        glyphOrder are skipped and values are rounded. A
+        MetricsMachineError is raised if a value does not fit
+        in int16.
+
+        If sparse is True, a (rows, columns, values) tuple of
+        coordinate arrays is returned instead of a dense matrix.
+
+        NumPy is required.
+
+        >>> font = _setupTestFont()
+        >>> kerning = {
+        ...     ("public.kern1.A", "A") : 2,
+        ...     ("public.kern1.A", "public.kern2.A") : 4,
+        ...     ("B", "C") : -5,
+        ... }
+        >>> groups = {
+        ...     "public.kern1.A" : ["A", "Aacute"],
+        ...     "public.kern2.A" : ["A", "Aacute"],
+        ... }
+        >>> font.groups.update(groups)
+        >>> font.kerning.update(kerning)
+        >>> glyphOrder = ["A", "Aacute", "B", "C"]
+        >>> matrix = font.kerning.metricsMachine.asMatrix(glyphOrder)
+        >>> matrix.dtype.name
+        'int16'
+        >>> matrix.tolist()
+        [[2, 4, 0, 0], [2, 4, 0, 0], [0, 0, 0, -5], [0, 0, 0, 0]]
+        >>> rows, columns, values = font.kerning.metricsMachine.asMatrix(glyphOrder, sparse=True)
+        >>> list(zip(rows.tolist(), columns.tolist(), values.tolist()))
+        [(0, 0, 2), (0, 1, 4), (1, 0, 2), (1, 1, 4), (2, 3, -5)]
+        >>> font.kerning["B", "C"] = 40000
+        >>> font.kerning.metricsMachine.asMatrix(glyphOrder)
+        Traceback (most recent call last):
+            ...
+        mm4.MetricsMachineError: The value of B C (40000) does not fit in int16.
+        """
+        import numpy
+
+        if glyphOrder is None:
+            glyphOrder = self.font.glyphOrder
+        indexes = {}
+        for index, glyphName in enumerate(glyphOrder):
+            indexes[glyphName] = index
+        count = len(glyphOrder)
+        if sparse:
+            rows = []
+            columns = []
+            values = []
+            for (side1, side2), value in self.iterFlatKerning(pairs):
+                if side1 not in indexes or side2 not in indexes:
+                    continue
+                rows.append(indexes[side1])
+                columns.append(indexes[side2])
+                values.append(_roundMatrixValue(side1, side2, value))
+            return (
+                numpy.array(rows, dtype=numpy.int32),
+                numpy.array(columns, dtype=numpy.int32),
+                numpy.array(values, dtype=numpy.int16)
+            )
+        matrix = numpy.zeros((count, count), dtype=numpy.int16)
+        for (side1, side2), value in self.iterFlatKerning(pairs):
+            if side1 not in indexes or side2 not in indexes:
+                continue
+            matrix[indexes[side1], indexes[side2]] = _roundMatrixValue(side1, side2, value)
+        return matrix
 
     # ---------------
     # transformations
@@ -2052,25 +2369,134 @@ class BasicFeatureWriter(KernFeatureWriter):
         return {}, {}
 
 
+class FeatureExportCache(object):
+
+    """
+    The state kept by SubtableBreakWriter between exports.
+
+    This holds the classes and the lookup sections of the last
+    write, the key of the groups and unicode data they were
+    built from and, for every pair, the section entries it
+    was written to. The kerning notifications collect the
+    changed pairs. When the key still matches and only the
+    values of known pairs changed, the next write patches the
+    entries of those pairs and compiles only their sections
+    again. Anything else rebuilds the layout.
+    """
+
+    def __init__(self):
+        self.valid = False
+        self.contentKey = None
+        self.pairCount = None
+        self.classes = None
+        self.sections = None
+        self.sources = None
+        self.changedPairs = set()
+
+    def invalidate(self):
+        self.valid = False
+        self.changedPairs = set()
+
+    # -------------
+    # notifications
+    # -------------
+
+    def kerningPairChangedNotificationCallback(self, notification):
+        if self.valid:
+            self.changedPairs.add(notification.data["key"])
+
+    def kerningUpdatedNotificationCallback(self, notification):
+        if self.valid:
+            self.changedPairs.update(notification.data["other"].keys())
+
+    def kerningChangedNotificationCallback(self, notification):
+        self.invalidate()
+
+    def kerningBatchChangedNotificationCallback(self, notification):
+        if not self.valid:
+            return
+        for pair, (oldValue, newValue) in notification.data["pairs"].items():
+            if newValue is None:
+                self.invalidate()
+                return
+            self.changedPairs.add(pair)
+
+
 class SubtableBreakWriter(BasicFeatureWriter):
 
-    def write(self, appVersion, testMode=False):
+    """
+    Pass the FeatureExportCache of the previous write as
+    exportCache and only the lookup sections holding changed
+    pairs will be compiled again.
+    """
+
+    def __init__(self, font, exportCache=None, **kwargs):
+        super(SubtableBreakWriter, self).__init__(font, **kwargs)
+        if exportCache is None:
+            exportCache = FeatureExportCache()
+        self.exportCache = exportCache
+
+    def getContentKey(self):
+        groups = []
+        for sideGroups in (self.side1Groups, self.side2Groups):
+            sideGroups = sorted((groupName, tuple(sorted(glyphList))) for groupName, glyphList in sideGroups.items())
+            groups.append(tuple(sideGroups))
+        unicodeData = tuple(sorted((value, tuple(glyphNames)) for value, glyphNames in self.font.unicodeData.items()))
+        return tuple(groups), unicodeData
+
+    def getFeaPair(self, pair):
+        # None is returned if a group can not be
+        # matched to the class written for it.
         font = self.font
-
-        if testMode:
-            notes = []
-        else:
-            notes = [
-                "# Class Kerning Data Generated by MetricsMachine %s" % appVersion,
-                u"# UFO: %s" % self.font.path,
-                "# Date: %s" % time.strftime("%A %B %m, %Y %H:%M:%S"),
-                ""
-            ]
-        notes = u"\n".join(notes)
+        feaPair = []
+        sides = [
+            (pair[0], side1Prefix, side1FeaPrefix, self.side1Groups),
+            (pair[1], side2Prefix, side2FeaPrefix, self.side2Groups),
+        ]
+        for name, prefix, feaPrefix, sideGroups in sides:
+            if name.startswith(prefix):
+                className = feaPrefix + name[len(prefix):]
+                if className not in sideGroups:
+                    return None
+                glyphList = [glyphName for glyphName in font.groups.get(name, []) if glyphName in font]
+                if set(sideGroups[className]) != set(glyphList):
+                    return None
+                name = className
+            feaPair.append(name)
+        return tuple(feaPair)
+
+    def patchLayout(self, contentKey):
+        cache = self.exportCache
+        changedPairs = cache.changedPairs
+        cache.changedPairs = set()
+        if not cache.valid or cache.contentKey != contentKey or cache.pairCount != len(self.pairs):
+            return False
+        feaPairs = []
+        for pair in changedPairs:
+            feaPair = self.getFeaPair(pair)
+            if feaPair not in cache.sources or feaPair not in self.pairs:
+                return False
+            feaPairs.append(feaPair)
+        sections = cache.sections
+        for feaPair in feaPairs:
+            value = self.pairs[feaPair]
+            for index, entry in cache.sources[feaPair]:
+                section = sections[index]
+                if section["pairs"][entry] != value:
+                    section["pairs"][entry] = value
+                    section["rules"] = None
+        return True
+
+    def buildLayout(self, contentKey):
+        font = self.font
+        cache = self.exportCache
 
         # break the pairs up by type
-        # this will also decompose all special exceptions
-        glyphGlyph, glyphGroupDecomposed, groupGlyphDecomposed, glyphGroup, groupGlyph, groupGroup = self.getSeparatedPairs(self.pairs)
+        # this will also decompose all special exceptions.
+        # each pair is its own value so that the entries
+        # can be traced back to the pair they came from.
+        sourcePairs = dict((pair, pair) for pair in self.pairs)
+        glyphGlyph, glyphGroupDecomposed, groupGlyphDecomposed, glyphGroup, groupGlyph, groupGroup = self.getSeparatedPairs(sourcePairs)
 
         groups = dict(self.side1Groups)
         groups.update(self.side2Groups)
@@ -2192,36 +2618,89 @@ class SubtableBreakWriter(BasicFeatureWriter):
                 classes.append(line)
                 written.add(newName)
 
-        # write the rules
+        # lay out the sections
         order = [tag for tag, l in order]
-        rules = []
+        layout = []
+        before = []
         for note in order:
             if note not in leftIsGlyphPairs:
                 continue
-            rules.append("")
-            rules.append(note)
-            rules += self.getFeatureRulesForPairs(leftIsGlyphPairs[note])
+            before += ["", note]
+            layout.append(((None, note), before, leftIsGlyphPairs[note]))
+            before = []
         if leftIsGlyphPairs and scriptSeparatedPairs:
-            rules.append("")
-            rules.append("subtable;")
+            before = ["", "subtable;"]
         for index, (script, groupedPairs) in enumerate(sorted(scriptSeparatedPairs.items())):
-            rules.append("")
-            rules.append("# %s" % ("-" * len(script)))
-            rules.append("# %s" % script)
-            rules.append("# %s" % ("-" * len(script)))
+            before += [
+                "",
+                "# %s" % ("-" * len(script)),
+                "# %s" % script,
+                "# %s" % ("-" * len(script)),
+            ]
             for note in order:
                 if note not in groupedPairs:
                     continue
-                rules.append("")
-                rules.append(note)
-                rules += self.getFeatureRulesForPairs(groupedPairs[note])
+                before += ["", note]
+                layout.append(((script, note), before, groupedPairs[note]))
+                before = []
             if index < len(scriptSeparatedPairs) - 1:
-                rules.append("")
-                rules.append("subtable;")
+                before = ["", "subtable;"]
+
+        # reuse the rules of the unchanged sections
+        oldSections = {}
+        if cache.sections is not None:
+            for section in cache.sections:
+                oldSections[section["key"]] = section
+        sections = []
+        sources = {}
+        for index, (key, before, entries) in enumerate(layout):
+            pairs = {}
+            for entry, sourcePair in entries.items():
+                pairs[entry] = self.pairs[sourcePair]
+                if sourcePair not in sources:
+                    sources[sourcePair] = []
+                sources[sourcePair].append((index, entry))
+            rules = None
+            oldSection = oldSections.get(key)
+            if oldSection is not None and oldSection["rules"] is not None and oldSection["pairs"] == pairs:
+                rules = oldSection["rules"]
+            sections.append(dict(key=key, before=before, pairs=pairs, rules=rules))
+
+        cache.valid = True
+        cache.contentKey = contentKey
+        cache.pairCount = len(self.pairs)
+        cache.classes = classes
+        cache.sections = sections
+        cache.sources = sources
+
+    def write(self, appVersion, testMode=False):
+        if testMode:
+            notes = []
+        else:
+            notes = [
+                "# Class Kerning Data Generated by MetricsMachine %s" % appVersion,
+                u"# UFO: %s" % self.font.path,
+                "# Date: %s" % time.strftime("%A %B %m, %Y %H:%M:%S"),
+                ""
+            ]
+        notes = u"\n".join(notes)
+
+        contentKey = self.getContentKey()
+        if not self.patchLayout(contentKey):
+            self.buildLayout(contentKey)
+
+        # write the rules
+        cache = self.exportCache
+        rules = []
+        for section in cache.sections:
+            if section["rules"] is None:
+                section["rules"] = self.getFeatureRulesForPairs(section["pairs"])
+            rules += section["before"]
+            rules += section["rules"]
 
         # compile
         feature = []
-        for line in classes + rules:
+        for line in cache.classes + rules:
             if line:
                 line = "    " + line
             feature.append(line)
@@ -2267,6 +2746,15 @@ class SubtableBreakWriter(BasicFeatureWriter):
 # -----
 
 
+class _TestObserver(object):
+
+    def __init__(self):
+        self.notifications = []
+
+    def notificationCallback(self, notification):
+        self.notifications.append((notification.name, notification.data))
+
+
 def _setupTestFont(path=None):
     from fontTools.agl import AGL2UV
     import mm4.objects
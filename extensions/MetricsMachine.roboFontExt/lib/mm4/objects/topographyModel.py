@@ -0,0 +1,364 @@
+import numpy
+
+from ufo2fdk.kernFeatureWriter import side1Prefix, side2Prefix
+
+
+def getAlphaPercent(value):
+    """
+    Get the opacity, as a percentage between 10 and 100,
+    that a non-zero value is drawn with.
+
+    >>> getAlphaPercent(-5)
+    10
+    >>> getAlphaPercent(45)
+    45
+    >>> getAlphaPercent(250)
+    100
+    """
+    alpha = abs(value)
+    alpha = int(round(alpha * .01, 3) * 100)
+    if alpha > 100:
+        alpha = 100
+    elif alpha < 10:
+        alpha = 10
+    return alpha
+
+
+class TopographyModel(object):
+
+    """
+    The data drawn by the topography view.
+
+    The flat kerning of side1Glyphs x side2Glyphs is held in
+    NumPy matrices with side 1 glyphs as rows and side 2
+    glyphs as columns:
+
+    - values: the kerning value, NaN where there is no pair.
+    - exceptions: True where the pair is an exception.
+    - alphas: the opacity percentage of non-zero values.
+
+    The kerning pairs are held in tables by level: group,
+    group values in a group x group matrix, glyph, group and
+    group, glyph values in glyph x group and group x glyph
+    matrices and glyph, glyph values in a sparse dict. The
+    grid is resolved from these with NumPy. When a pair
+    changes, only the rows and columns that the pair covers
+    are resolved again.
+
+    >>> font = _setupTestFont()
+    >>> model = TopographyModel(font, ["A", "Aacute", "B"], ["A", "Aacute", "B"])
+    >>> model.load()
+    >>> model.values.tolist()
+    [[1.0, 3.0, nan], [2.0, 4.0, nan], [nan, nan, -150.0]]
+    >>> model.exceptions.tolist()
+    [[True, True, False], [True, False, False], [False, False, False]]
+    >>> model.alphas.tolist()
+    [[10, 10, 0], [10, 10, 0], [0, 0, 100]]
+
+    >>> font.kerning["public.kern1.A", "public.kern2.A"] = 0
+    >>> del font.kerning["A", "A"]
+    >>> model.update([("public.kern1.A", "public.kern2.A"), ("A", "A")])
+    >>> model.values.tolist()
+    [[3.0, 3.0, nan], [2.0, 0.0, nan], [nan, nan, -150.0]]
+    >>> model.exceptions.tolist()
+    [[True, True, False], [True, False, False], [False, False, False]]
+    >>> model.getValue("Aacute", "A")
+    2.0
+    >>> model.getValue("Aacute", "B")
+    0
+    """
+
+    def __init__(self, font, side1Glyphs=[], side2Glyphs=[]):
+        self._font = font
+        self.setGlyphs(side1Glyphs, side2Glyphs)
+
+    def setGlyphs(self, side1Glyphs, side2Glyphs):
+        """
+        Set the glyphs in the rows and columns. The values
+        are cleared until load is called.
+        """
+        self.side1Glyphs = list(side1Glyphs)
+        self.side2Glyphs = list(side2Glyphs)
+        self._side1GlyphToIndex = dict((glyphName, index) for index, glyphName in enumerate(self.side1Glyphs))
+        self._side2GlyphToIndex = dict((glyphName, index) for index, glyphName in enumerate(self.side2Glyphs))
+        groups = self._font.groups.metricsMachine
+        self._side1GroupToIndex, self._side1GroupMembers, self._side1Groups = self._compileGroups(self.side1Glyphs, groups.getSide1GroupForGlyph)
+        self._side2GroupToIndex, self._side2GroupMembers, self._side2Groups = self._compileGroups(self.side2Glyphs, groups.getSide2GroupForGlyph)
+        shape = (len(self.side1Glyphs), len(self.side2Glyphs))
+        self.values = numpy.full(shape, numpy.nan, dtype=numpy.float32)
+        self.exceptions = numpy.zeros(shape, dtype=bool)
+        self.alphas = numpy.zeros(shape, dtype=numpy.uint8)
+        self._groupGroupValues = None
+
+    def _compileGroups(self, glyphNames, getGroup):
+        # the groups are numbered in the order they are
+        # found. glyphs without a group get the number
+        # after the last group. the tables have an extra
+        # row or column at that number that is never set.
+        groupToIndex = {}
+        groupMembers = []
+        glyphGroups = []
+        for index, glyphName in enumerate(glyphNames):
+            groupName = getGroup(glyphName)
+            if groupName is None:
+                glyphGroups.append(-1)
+                continue
+            groupIndex = groupToIndex.get(groupName)
+            if groupIndex is None:
+                groupIndex = groupToIndex[groupName] = len(groupMembers)
+                groupMembers.append([])
+            groupMembers[groupIndex].append(index)
+            glyphGroups.append(groupIndex)
+        groupMembers = [numpy.array(members, dtype=numpy.intp) for members in groupMembers]
+        glyphGroups = numpy.array(glyphGroups, dtype=numpy.intp)
+        glyphGroups[glyphGroups == -1] = len(groupMembers)
+        return groupToIndex, groupMembers, glyphGroups
+
+    # -----
+    # cells
+    # -----
+
+    def _getCells(self, pair):
+        # get the table that holds the pair, its
+        # position in that table and the rows and
+        # columns that it covers in the grid.
+        side1, side2 = pair
+        if side1.startswith(side1Prefix):
+            side1Index = self._side1GroupToIndex.get(side1)
+            if side1Index is None:
+                return None
+            rows = self._side1GroupMembers[side1Index]
+        else:
+            side1Index = self._side1GlyphToIndex.get(side1)
+            if side1Index is None:
+                return None
+            rows = numpy.array([side1Index], dtype=numpy.intp)
+        if side2.startswith(side2Prefix):
+            side2Index = self._side2GroupToIndex.get(side2)
+            if side2Index is None:
+                return None
+            columns = self._side2GroupMembers[side2Index]
+        else:
+            side2Index = self._side2GlyphToIndex.get(side2)
+            if side2Index is None:
+                return None
+            columns = numpy.array([side2Index], dtype=numpy.intp)
+        isSide1Group = side1.startswith(side1Prefix)
+        isSide2Group = side2.startswith(side2Prefix)
+        if isSide1Group and isSide2Group:
+            table = self._groupGroupValues
+        elif isSide2Group:
+            table = self._glyphGroupValues
+        elif isSide1Group:
+            table = self._groupGlyphValues
+        else:
+            table = self._glyphGlyphValues
+        return table, (side1Index, side2Index), rows, columns
+
+    def _setTableValue(self, table, position, value):
+        if isinstance(table, dict):
+            side1Index, side2Index = position
+            if value is None:
+                row = table.get(side1Index)
+                if row is not None:
+                    row.pop(side2Index, None)
+                    if not row:
+                        del table[side1Index]
+            else:
+                table.setdefault(side1Index, {})[side2Index] = value
+        else:
+            if value is None:
+                value = numpy.nan
+            table[position] = value
+
+    # -------
+    # loading
+    # -------
+
+    def load(self):
+        """
+        Load all of the kerning.
+        """
+        side1GroupCount = len(self._side1GroupMembers)
+        side2GroupCount = len(self._side2GroupMembers)
+        side1Count = len(self.side1Glyphs)
+        side2Count = len(self.side2Glyphs)
+        self._groupGroupValues = numpy.full((side1GroupCount + 1, side2GroupCount + 1), numpy.nan, dtype=numpy.float32)
+        self._glyphGroupValues = numpy.full((side1Count, side2GroupCount + 1), numpy.nan, dtype=numpy.float32)
+        self._groupGlyphValues = numpy.full((side1GroupCount + 1, side2Count), numpy.nan, dtype=numpy.float32)
+        self._glyphGlyphValues = {}
+        for pair, value in self._font.kerning.items():
+            cells = self._getCells(pair)
+            if cells is None:
+                continue
+            table, position, rows, columns = cells
+            self._setTableValue(table, position, value)
+        self._resolve(numpy.arange(side1Count, dtype=numpy.intp), numpy.arange(side2Count, dtype=numpy.intp))
+
+    def update(self, pairs):
+        """
+        Load the current values of the kerning pairs in pairs.
+        Pairs that are not in the kerning are removed.
+        """
+        if self._groupGroupValues is None:
+            self.load()
+            return
+        kerning = self._font.kerning
+        for pair in pairs:
+            cells = self._getCells(pair)
+            if cells is None:
+                continue
+            table, position, rows, columns = cells
+            value = None
+            if pair in kerning:
+                value = kerning[pair]
+            self._setTableValue(table, position, value)
+            self._resolve(rows, columns)
+
+    def _resolve(self, rows, columns):
+        # resolve the values of rows x columns from the
+        # most specific level that has a value for a cell.
+        side1Groups = self._side1Groups[rows]
+        side2Groups = self._side2Groups[columns]
+        side1HasGroup = (side1Groups != len(self._side1GroupMembers))[:, None]
+        side2HasGroup = (side2Groups != len(self._side2GroupMembers))[None, :]
+        shape = (len(rows), len(columns))
+        # group, group
+        values = self._groupGroupValues[side1Groups[:, None], side2Groups[None, :]]
+        exceptions = numpy.zeros(shape, dtype=bool)
+        # group, glyph
+        levelValues = self._groupGlyphValues[side1Groups[:, None], columns[None, :]]
+        defined = ~numpy.isnan(levelValues)
+        values = numpy.where(defined, levelValues, values)
+        exceptions = numpy.where(defined, side2HasGroup, exceptions)
+        # glyph, group. this takes precedence over group,
+        # glyph the same way it does in the flat kerning.
+        levelValues = self._glyphGroupValues[rows[:, None], side2Groups[None, :]]
+        defined = ~numpy.isnan(levelValues)
+        values = numpy.where(defined, levelValues, values)
+        exceptions = numpy.where(defined, side1HasGroup, exceptions)
+        # glyph, glyph
+        columnPositions = dict((column, position) for position, column in enumerate(columns.tolist()))
+        for rowPosition, row in enumerate(rows.tolist()):
+            glyphValues = self._glyphGlyphValues.get(row)
+            if not glyphValues:
+                continue
+            rowHasGroup = side1HasGroup[rowPosition, 0]
+            for column, value in glyphValues.items():
+                columnPosition = columnPositions.get(column)
+                if columnPosition is None:
+                    continue
+                values[rowPosition, columnPosition] = value
+                exceptions[rowPosition, columnPosition] = rowHasGroup or side2HasGroup[0, columnPosition]
+        # store
+        block = numpy.ix_(rows, columns)
+        self.values[block] = values
+        self.exceptions[block] = exceptions
+        self.alphas[block] = self._getAlphas(values)
+
+    def _getAlphas(self, values):
+        alphas = numpy.zeros(values.shape, dtype=numpy.uint8)
+        nonZero = ~numpy.isnan(values) & (values != 0)
+        if nonZero.any():
+            uniqueValues, inverse = numpy.unique(numpy.abs(values[nonZero]), return_inverse=True)
+            table = numpy.array([getAlphaPercent(value) for value in uniqueValues.tolist()], dtype=numpy.uint8)
+            alphas[nonZero] = table[inverse]
+        return alphas
+
+    # -------
+    # queries
+    # -------
+
+    def getValue(self, side1, side2):
+        """
+        Get the value of a glyph pair. 0 is returned
+        if there is no pair.
+        """
+        row = self._side1GlyphToIndex.get(side1)
+        column = self._side2GlyphToIndex.get(side2)
+        if row is None or column is None:
+            return 0
+        value = self.values[row, column]
+        if numpy.isnan(value):
+            return 0
+        return float(value)
+
+    def getCells(self, minRow, maxRow, minColumn, maxColumn):
+        """
+        Get the cells with a pair in the given row and column
+        ranges, grouped the way they are drawn. A dict with
+        these keys is returned:
+
+        - zero: the cells with a value of zero.
+        - negative: an alpha to cells dict of negative values.
+        - positive: an alpha to cells dict of positive values.
+        - exceptions: the cells with an exception.
+
+        The cells are lists of (row, column) tuples.
+
+        >>> font = _setupTestFont()
+        >>> model = TopographyModel(font, ["A", "Aacute", "B"], ["A", "Aacute", "B"])
+        >>> model.load()
+        >>> cells = model.getCells(0, 3, 1, 3)
+        >>> cells["positive"]
+        {0.1: [(0, 1), (1, 1)]}
+        >>> cells["negative"]
+        {1.0: [(2, 2)]}
+        >>> cells["zero"]
+        []
+        >>> cells["exceptions"]
+        [(0, 1)]
+        """
+        values = self.values[minRow:maxRow, minColumn:maxColumn]
+        alphas = self.alphas[minRow:maxRow, minColumn:maxColumn]
+        defined = ~numpy.isnan(values)
+        result = dict(zero=[], negative={}, positive={}, exceptions=[])
+
+        def getCells(rows, columns):
+            return list(zip((rows + minRow).tolist(), (columns + minColumn).tolist()))
+
+        result["zero"] = getCells(*numpy.nonzero(defined & (values == 0)))
+        for key, mask in (("negative", values < 0), ("positive", values > 0)):
+            rows, columns = numpy.nonzero(mask & defined)
+            # split the cells by alpha with one sort instead
+            # of masking the whole range once per alpha
+            cellAlphas = alphas[rows, columns]
+            order = numpy.argsort(cellAlphas, kind="stable")
+            uniqueAlphas, starts = numpy.unique(cellAlphas[order], return_index=True)
+            ends = starts[1:].tolist() + [len(order)]
+            for alpha, start, end in zip(uniqueAlphas.tolist(), starts.tolist(), ends):
+                indexes = order[start:end]
+                result[key][alpha * .01] = getCells(rows[indexes], columns[indexes])
+        result["exceptions"] = getCells(*numpy.nonzero(self.exceptions[minRow:maxRow, minColumn:maxColumn]))
+        return result
+
+
+# ----
+# Test
+# ----
+
+def _setupTestFont():
+    import mm4.objects
+    from defcon import Font
+    font = Font()
+    for glyphName in "A Aacute B".split(" "):
+        font.newGlyph(glyphName)
+    groups = {
+        "public.kern1.A" : ["A", "Aacute"],
+        "public.kern2.A" : ["A", "Aacute"],
+    }
+    kerning = {
+        ("A", "A") : 1,
+        ("public.kern1.A", "A") : 2,
+        ("A", "public.kern2.A") : 3,
+        ("public.kern1.A", "public.kern2.A") : 4,
+        ("B", "B") : -150,
+    }
+    font.groups.update(groups)
+    font.kerning.update(kerning)
+    return font
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
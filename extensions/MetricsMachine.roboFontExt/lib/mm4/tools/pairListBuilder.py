@@ -62,6 +62,170 @@ def createPairs(leftGlyphs, rightGlyphs, font=None,
     return pairs
 
 
+def iterPairs(leftGlyphs, rightGlyphs, font=None,
+        createFlipped=False, createOpenClose=False, createCloseOpen=False,
+        compressGroups=False, avoidDuplicates=False, existingPairs=[]):
+    """
+    Streaming version of createPairs. The pairs are generated
+    one at a time, in the same order and with the same
+    filtering as createPairs, without building a record for
+    every combination of the glyphs.
+
+    >>> font = _setupTestFont()
+    >>> left = ["A", "Aacute", "parenleft"]
+    >>> right = ["B", "E", "Egrave", "parenright"]
+    >>> settings = dict(font=font, createFlipped=True, createOpenClose=True, compressGroups=True, avoidDuplicates=True, existingPairs=[("A", "parenright")])
+    >>> pairs = iterPairs(left, right, **settings)
+    >>> next(pairs)
+    ('A', 'B')
+    >>> list(iterPairs(left, right, **settings)) == createPairs(left, right, **settings)
+    True
+    """
+    leftGlyphs = list(leftGlyphs)
+    rightGlyphs = list(rightGlyphs)
+    if not leftGlyphs or not rightGlyphs:
+        return
+    # open and close relatives
+    closeRelatives = {}
+    openRelatives = {}
+    if createOpenClose or createCloseOpen:
+        unicodeData = font.unicodeData
+        for glyphName in set(leftGlyphs) | set(rightGlyphs):
+            closeRelatives[glyphName] = unicodeData.closeRelativeForGlyphName(glyphName)
+            openRelatives[glyphName] = unicodeData.openRelativeForGlyphName(glyphName)
+
+    def rawPairs(left, right):
+        yield left, right
+        if createOpenClose or createCloseOpen:
+            leftClose = closeRelatives[left]
+            rightOpen = openRelatives[right]
+            if createOpenClose:
+                if leftClose is not None:
+                    yield right, leftClose
+                if rightOpen is not None:
+                    yield rightOpen, left
+            if createCloseOpen:
+                if leftClose is not None:
+                    yield leftClose, right
+                if rightOpen is not None:
+                    yield left, rightOpen
+
+    # group representatives
+    if compressGroups:
+        blocks = _getPairBlocks(leftGlyphs, rightGlyphs, closeRelatives, openRelatives, createFlipped, createOpenClose, createCloseOpen)
+        leftReferences = set()
+        rightReferences = set()
+        for lefts, rights in blocks:
+            leftReferences.update(lefts)
+            rightReferences.update(rights)
+        groups = font.groups.metricsMachine
+        leftRepresentatives = _getGroupRepresentatives(leftReferences, groups.getSide1GroupForGlyph, groups.getRepresentativeForGroup)
+        rightRepresentatives = _getGroupRepresentatives(rightReferences, groups.getSide2GroupForGlyph, groups.getRepresentativeForGroup)
+        compressed = set()
+    if avoidDuplicates:
+        existing = set(existingPairs)
+        seen = set()
+    # generate
+    for left in leftGlyphs:
+        for right in rightGlyphs:
+            sources = [rawPairs(left, right)]
+            if createFlipped:
+                sources.append(rawPairs(right, left))
+            for source in sources:
+                for pair in source:
+                    if compressGroups:
+                        l, r = pair
+                        if l in leftRepresentatives or r in rightRepresentatives:
+                            pair = (leftRepresentatives.get(l, l), rightRepresentatives.get(r, r))
+                            # the compressed pair is created
+                            # by another combination, or it
+                            # has already been created here.
+                            if pair in compressed or _pairInBlocks(pair, blocks):
+                                continue
+                            compressed.add(pair)
+                    if avoidDuplicates:
+                        if pair in existing or pair in seen:
+                            continue
+                        seen.add(pair)
+                    yield pair
+
+
+def _getPairBlocks(leftGlyphs, rightGlyphs, closeRelatives, openRelatives,
+        createFlipped, createOpenClose, createCloseOpen):
+    """
+    Every kind of pair made from every left, right combination
+    covers all combinations of a set of left glyphs and a set
+    of right glyphs. Get these as (lefts, rights) set tuples.
+
+    >>> font = _setupTestFont()
+    >>> close = dict(A=None, parenleft="parenright")
+    >>> open = dict(A=None, parenleft=None)
+    >>> for lefts, rights in _getPairBlocks(["A", "parenleft"], ["A"], close, open, False, True, False):
+    ...     sorted(lefts), sorted(rights)
+    (['A', 'parenleft'], ['A'])
+    (['A'], ['parenright'])
+    """
+    blocks = []
+    sides = [(set(leftGlyphs), set(rightGlyphs))]
+    if createFlipped:
+        sides.append((sides[0][1], sides[0][0]))
+    for lefts, rights in sides:
+        blocks.append((lefts, rights))
+        if createOpenClose or createCloseOpen:
+            leftCloses = set(closeRelatives[glyphName] for glyphName in lefts) - {None}
+            rightOpens = set(openRelatives[glyphName] for glyphName in rights) - {None}
+        if createOpenClose:
+            if leftCloses:
+                blocks.append((rights, leftCloses))
+            if rightOpens:
+                blocks.append((rightOpens, lefts))
+        if createCloseOpen:
+            if leftCloses:
+                blocks.append((leftCloses, rights))
+            if rightOpens:
+                blocks.append((lefts, rightOpens))
+    return blocks
+
+
+def _pairInBlocks(pair, blocks):
+    left, right = pair
+    for lefts, rights in blocks:
+        if left in lefts and right in rights:
+            return True
+    return False
+
+
+def _getGroupRepresentatives(references, getGroup, getRepresentative):
+    """
+    Map the glyphs in references to the representative of their
+    group. Only glyphs that map to a different glyph are included
+    and only representatives that are in references are used.
+
+    >>> font = _setupTestFont()
+    >>> groups = font.groups.metricsMachine
+    >>> _getGroupRepresentatives({"Aacute", "A", "B", "E"}, groups.getSide2GroupForGlyph, groups.getRepresentativeForGroup)
+    {'Aacute': 'A', 'E': 'B'}
+    >>> _getGroupRepresentatives({"Aacute", "E"}, groups.getSide2GroupForGlyph, groups.getRepresentativeForGroup)
+    {}
+    """
+    groupRepresentatives = {}
+    representatives = {}
+    for glyph in sorted(references):
+        group = getGroup(glyph)
+        if group is None:
+            continue
+        if group not in groupRepresentatives:
+            representative = getRepresentative(group)
+            # only use the representative if it is in the source glyphs
+            if representative not in references:
+                representative = None
+            groupRepresentatives[group] = representative
+        representative = groupRepresentatives[group]
+        if representative is not None and representative != glyph:
+            representatives[glyph] = representative
+    return representatives
+
+
 def _createFlipped(pairDict):
     """
     >>> pair = _makePairDict("A", "B")
@@ -1,4 +1,6 @@
 import fnmatch
+import re
+from functools import lru_cache
 from ufo2fdk.kernFeatureWriter import side1Prefix, side2Prefix
 
 """
@@ -43,7 +45,7 @@ separator
 def isValidExpression(expression, allowGroups=False, allowReferenceGroups=False):
     if not expression.strip():
         return False
-    expression = _tokenize(expression)
+    expression = compileExpression(expression).tokens
     if expression is None:
         return False
     for e in expression:
@@ -64,13 +66,12 @@ def isValidKerningExpression(expression, allowGroups=True, allowVariables=True):
     if not expression.strip():
         return False
     # split into sides
-    sides, partCount = _splitKerningExpression(expression)
-    if sides is None:
+    sideTokens = compileExpression(expression).sideTokens
+    if sideTokens is None:
         return False
     # tokenize each side
     expression = []
-    for side in sides:
-        e = _tokenize(side)
+    for e in sideTokens:
         # bad expression
         if not e:
             return False
@@ -95,15 +96,11 @@ def isValidKerningExpression(expression, allowGroups=True, allowVariables=True):
 # ----------
 
 def searchGlyphList(expression, glyphList, groups=None, expandGroups=False):
-    allowGroups = groups is not None
-    if allowGroups:
-        return _evaluateGlyphExpression(expression, glyphList, groups=groups, expandGroups=expandGroups)
-    else:
-        return _evaluateGlyphExpression(expression, glyphList)
+    return compileExpression(expression).searchGlyphList(glyphList, groups=groups, expandGroups=expandGroups)
 
 
 def expressionMatchesGlyphName(expression, glyphName, groups):
-    return bool(searchGlyphList(expression, [glyphName], groups=groups))
+    return compileExpression(expression).matchesGlyphName(glyphName, groups)
 
 # ------------
 # Kerning List
@@ -111,50 +108,177 @@ def expressionMatchesGlyphName(expression, glyphName, groups):
 
 
 def searchKerningPairList(expression, pairList, font, allowVariables=True):
-    return _evaluateKerningExpression(expression, pairList, font, allowVariables)
+    return compileExpression(expression).searchKerningPairList(pairList, font, allowVariables=allowVariables)
 
 
 def createGlyphListFromPairList(expression, pairList, font, side):
-    sides, count = _splitKerningExpression(expression)
-    if sides is None:
-        return []
-    sideIndex = side == "side2"
-    expression = sides[sideIndex]
-    expression = _tokenize(expression)
-    result = None
-    for subExpression in expression:
-        tp = subExpression["type"]
-        operator = subExpression["operator"]
-        # expand
-        v = None
-        if tp == "variable":
-            pattern = subExpression["pattern"]
-            kerning = font.kerning
-            if pattern == "all":
-                v = set(list(font.keys()) + [i for i in font.groups.keys() if i.startswith("public.kern")])
-            elif pattern == "glyph":
-                v = set(font.keys())
-            elif pattern == "group":
-                v = set([i for i in font.groups.keys() if i.startswith("public.kern")])
-            elif pattern == "exception":
-                v = set([pair[sideIndex] for pair in pairList if kerning.getPairType(pair)[sideIndex] == "exception"])
-        elif tp == "glyphName":
-            v = _expandGlyphName(subExpression, font.keys())
-        elif tp == "groupName":
-            v = _expandGroupName(subExpression, font.groups)
-        elif tp == "groupLookup":
-            v = _expandGroupLookup(subExpression, font.groups)
-        elif tp == "referenceGroupName":
-            v = _expandReferenceGroupName(subExpression, font.groups)
-            e = set([])
-            for groupName in v:
-                e = e | set(font.groups.metricsMachine.getReferenceGroup(groupName))
-            v = e
-        # handle the operator
-        result = _handleOperator(operator, result, v)
-    if result is None:
-        result = set([])
-    return list(result)
+    return compileExpression(expression).createGlyphListFromPairList(pairList, font, side)
+
+# --------
+# Compiled
+# --------
+
+
+@lru_cache(maxsize=256)
+def compileExpression(expression):
+    """
+    Get an ExpressionMatcher for expression. Matchers are
+    cached by the expression text so that repeated searches
+    with the same text, for example while a filter field is
+    being edited, do not tokenize the text again.
+
+    >>> compileExpression("A or B") is compileExpression("A or B")
+    True
+    """
+    return ExpressionMatcher(expression)
+
+
+class ExpressionMatcher(object):
+
+    """
+    A tokenized glyph or kerning expression.
+
+    A kerning expression is evaluated against the distinct
+    names found on each side of the pair list instead of
+    against each pair. The sub-expression results are
+    combined with set operations and the pair list is then
+    filtered in a single pass. Sub-expressions that depend
+    on the whole pair, the all and exception variables,
+    are tested per pair.
+
+    >>> font = _setupTestFont()
+    >>> matcher = ExpressionMatcher("A] or B, exception")
+    >>> matcher.searchKerningPairList(font.kerning.keys(), font)
+    [('public.kern1.A', 'B')]
+    >>> matcher.searchKerningPairList([("public.kern1.A", "C")], font)
+    []
+    >>> ExpressionMatcher("A], all").searchKerningPairList([("public.kern1.A", "B"), ("public.kern1.A", "C")], font)
+    [('public.kern1.A', 'B')]
+    >>> ExpressionMatcher("Uppercase not (Uppercase)").searchKerningPairList(font.kerning.keys(), font)
+    []
+    >>> ExpressionMatcher("A*").matchesGlyphName("Aacute", font.groups)
+    True
+    >>> ExpressionMatcher("[A]").searchGlyphList(sorted(font.keys()), groups=font.groups, expandGroups=True)
+    ['A', 'Aacute']
+    """
+
+    def __init__(self, expression):
+        self.expression = expression
+        self.tokens = _tokenize(expression)
+        sides, self.partCount = _splitKerningExpression(expression)
+        if sides is None:
+            self.sideTokens = None
+        else:
+            self.sideTokens = tuple(_tokenize(side) for side in sides)
+
+    # ----------
+    # glyph list
+    # ----------
+
+    def searchGlyphList(self, glyphList, groups=None, expandGroups=False):
+        glyphOrder = list(glyphList)
+        result = None
+        for subExpression in self.tokens or ():
+            tp = subExpression["type"]
+            operator = subExpression["operator"]
+            v = None
+            if tp == "glyphName":
+                v = _expandGlyphName(subExpression, glyphOrder)
+            elif tp == "groupName":
+                v = _expandGroupName(subExpression, groups)
+                if expandGroups:
+                    v = _expandGroupContents(v, groups)
+            elif tp == "groupLookup":
+                v = _expandGroupLookup(subExpression, groups)
+                if expandGroups:
+                    v = _expandGroupContents(v, groups)
+            elif tp == "referenceGroupName":
+                v = _expandReferenceGroupName(subExpression, groups)
+                e = set()
+                for groupName in v:
+                    e.update(groups.metricsMachine.getReferenceGroup(groupName))
+                v = e
+            result = _handleOperator(operator, result, v)
+        if not result:
+            return []
+        # order the result
+        final = []
+        if groups:
+            final += sorted([groupName for groupName in result if groupName in groups])
+        final += [glyphName for glyphName in glyphOrder if glyphName in result]
+        return final
+
+    def matchesGlyphName(self, glyphName, groups):
+        return bool(self.searchGlyphList([glyphName], groups=groups))
+
+    # ------------
+    # kerning list
+    # ------------
+
+    def searchKerningPairList(self, pairList, font, allowVariables=True):
+        if self.sideTokens is None:
+            return []
+        pairs = list(pairList)
+        side1Names, side1Test = _evaluateKerningExpressionSide(self.sideTokens[0], pairs, font, 0, allowVariables)
+        side2Names, side2Test = _evaluateKerningExpressionSide(self.sideTokens[1], pairs, font, 1, allowVariables)
+        findOverlap = self.partCount == 2
+        if side1Test is None and side2Test is None:
+            if findOverlap:
+                return [pair for pair in pairs if pair[0] in side1Names and pair[1] in side2Names]
+            return [pair for pair in pairs if pair[0] in side1Names or pair[1] in side2Names]
+        if side1Test is None:
+            side1Test = _makeNameTest(side1Names, 0)
+        if side2Test is None:
+            side2Test = _makeNameTest(side2Names, 1)
+        if findOverlap:
+            return [pair for pair in pairs if side1Test(pair) and side2Test(pair)]
+        return [pair for pair in pairs if side1Test(pair) or side2Test(pair)]
+
+    def createGlyphListFromPairList(self, pairList, font, side):
+        if self.sideTokens is None:
+            return []
+        sideIndex = side == "side2"
+        result = None
+        for subExpression in self.sideTokens[sideIndex] or ():
+            tp = subExpression["type"]
+            operator = subExpression["operator"]
+            # expand
+            v = None
+            if tp == "variable":
+                pattern = subExpression["pattern"]
+                if pattern == "all":
+                    v = set(list(font.keys()) + [i for i in font.groups.keys() if i.startswith("public.kern")])
+                elif pattern == "glyph":
+                    v = set(font.keys())
+                elif pattern == "group":
+                    v = set([i for i in font.groups.keys() if i.startswith("public.kern")])
+                elif pattern == "exception":
+                    getPairType = font.kerning.metricsMachine.getPairType
+                    v = set([pair[sideIndex] for pair in pairList if getPairType(pair)[sideIndex] == "exception"])
+            elif tp == "glyphName":
+                v = _expandGlyphName(subExpression, font.keys())
+            elif tp == "groupName":
+                v = _expandGroupName(subExpression, font.groups)
+            elif tp == "groupLookup":
+                v = _expandGroupLookup(subExpression, font.groups)
+            elif tp == "referenceGroupName":
+                v = _expandReferenceGroupName(subExpression, font.groups)
+                e = set()
+                for groupName in v:
+                    e.update(font.groups.metricsMachine.getReferenceGroup(groupName))
+                v = e
+            # handle the operator
+            result = _handleOperator(operator, result, v)
+        if result is None:
+            result = set([])
+        return list(result)
+
+
+def _makeNameTest(names, side):
+    def test(pair):
+        return pair[side] in names
+    return test
+
 
 # --------
 # Internal
@@ -387,6 +511,24 @@ def _tokenize(text):
 
 # expression expansion
 
+@lru_cache(maxsize=1024)
+def _compilePattern(pattern):
+    """
+    >>> match = _compilePattern("A*")
+    >>> bool(match("Aacute")), bool(match("B"))
+    (True, False)
+    """
+    return re.compile(fnmatch.translate(pattern)).match
+
+
+def _getSideNames(pairList, side):
+    return set([pair[side] for pair in pairList])
+
+
+def _getPairsWithSideIn(pairList, side, names):
+    return set([pair for pair in pairList if pair[side] in names])
+
+
 
 # =============
 # = glyphName =
@@ -400,8 +542,8 @@ def _expandGlyphName(subExpression, glyphList):
     >>> sorted(_expandGlyphName(dict(operator=None, pattern="A*"), font.keys()))
     ['A', 'Aacute']
     """
-    pattern = subExpression["pattern"]
-    result = set([glyphName for glyphName in glyphList if fnmatch.fnmatchcase(glyphName, pattern)])
+    match = _compilePattern(subExpression["pattern"])
+    result = set([glyphName for glyphName in glyphList if match(glyphName)])
     return result
 
 
@@ -413,9 +555,8 @@ def _expandGlyphNameInPairs(subExpression, pairList, side):
     >>> list(_expandGlyphNameInPairs(dict(operator=None, pattern="B"), font.kerning.keys(),1))
     [('public.kern1.A', 'B')]
     """
-    pattern = subExpression["pattern"]
-    result = set([pair for pair in pairList if not (pair[side].startswith(side1Prefix) and pair[side].startswith(side2Prefix)) and fnmatch.fnmatchcase(pair[side], pattern)])
-    return result
+    names = _expandGlyphName(subExpression, _getSideNames(pairList, side))
+    return _getPairsWithSideIn(pairList, side, names)
 
 # =============
 # = groupName =
@@ -429,12 +570,16 @@ def _expandGroupName(subExpression, groups):
     >>> sorted(result)
     ['public.kern1.A', 'public.kern2.A']
     """
+    return _expandGroupNameInNames(subExpression, groups.keys())
+
+
+def _expandGroupNameInNames(subExpression, names):
     pattern = subExpression["pattern"]
     groupPrefix = subExpression["groupPrefix"]
     if groupPrefix is None:
         groupPrefix = "public.kern?."
-    pattern = groupPrefix + pattern
-    result = set([groupName for groupName in groups.keys() if fnmatch.fnmatchcase(groupName, pattern)])
+    match = _compilePattern(groupPrefix + pattern)
+    result = set([name for name in names if name.startswith("public.kern") and match(name)])
     return result
 
 
@@ -462,19 +607,21 @@ def _expandGroupNameInPairs(subExpression, pairList, side):
     >>> sorted(result)
     [('B', 'public.kern2.A'), ('public.kern1.A', 'public.kern2.A')]
     """
-    pattern = subExpression["pattern"]
-    groupPrefix = subExpression["groupPrefix"]
-    if groupPrefix is None:
-        groupPrefix = "public.kern?."
-    pattern = groupPrefix + pattern
-    result = set([pair for pair in pairList if pair[side].startswith("public.kern") and fnmatch.fnmatchcase(pair[side], pattern)])
-    return result
+    names = _expandGroupNameInNames(subExpression, _getSideNames(pairList, side))
+    return _getPairsWithSideIn(pairList, side, names)
 
 
 # ===============
 # = groupLookup =
 # ===============
 
+def _expandGroupContents(groupNames, groups):
+    result = set()
+    for groupName in groupNames:
+        result.update(groups[groupName])
+    return result
+
+
 def _expandGroupLookup(subExpression, groups):
     """
     >>> font = _setupTestFont()
@@ -525,25 +672,9 @@ def _expandGroupLookupInPairs(subExpression, pairList, groups, side):
     >>> sorted(result)
     [('B', 'public.kern2.A'), ('public.kern1.A', 'public.kern2.A')]
     """
-    pattern = subExpression["pattern"]
-    groupPrefix = subExpression["groupPrefix"]
-    # find all glyphs matching the name pattern
-    font = groups.getParent()
-    matchedGlyphs = _expandGlyphName(dict(operator=None, pattern=pattern), font.keys())
-    # find the groups for all matched glyphs
-    matchedGroups = set()
-    for glyphName in matchedGlyphs:
-        if groupPrefix != "public.kern2.":
-            g = groups.metricsMachine.getSide1GroupForGlyph(glyphName)
-            if g is not None:
-                matchedGroups.add(g)
-        if groupPrefix != "public.kern1.":
-            g = groups.metricsMachine.getSide2GroupForGlyph(glyphName)
-            if g is not None:
-                matchedGroups.add(g)
+    matchedGroups = _expandGroupLookup(subExpression, groups)
     # run through all the pairs and grab the ones containing one of the found groups
-    result = set([pair for pair in pairList if pair[side] in matchedGroups])
-    return result
+    return _getPairsWithSideIn(pairList, side, matchedGroups)
 
 
 # ======================
@@ -556,8 +687,8 @@ def _expandReferenceGroupName(subExpression, groups):
     >>> list(_expandReferenceGroupName(dict(operator=None, pattern="Uppercase", groupPrefix=None), font.groups))
     ['Uppercase']
     """
-    pattern = subExpression["pattern"]
-    result = set([groupName for groupName in groups.keys() if fnmatch.fnmatchcase(groupName, pattern)])
+    match = _compilePattern(subExpression["pattern"])
+    result = set([groupName for groupName in groups.keys() if match(groupName)])
     return result
 
 
@@ -575,22 +706,27 @@ def _expandReferenceGroupNameInPairs(subExpression, pairList, groups, side):
     >>> sorted(result)
     [('B', 'public.kern2.A'), ('public.kern1.A', 'B'), ('public.kern1.A', 'public.kern2.A')]
     """
-    pattern = subExpression["pattern"]
-    referenceGroups = [set(groups.metricsMachine.getReferenceGroup(groupName)) for groupName in groups.metricsMachine.getReferenceGroupNames() if fnmatch.fnmatchcase(groupName, pattern)]
-    result = set([])
-    for pair in pairList:
-        member = pair[side]
-        for group in referenceGroups:
-            if member.startswith("public.kern"):
-                kerningGroup = groups[member]
-                if not isinstance(kerningGroup, set):
-                    kerningGroup = set(kerningGroup)
-                if group & kerningGroup:
-                    result.add(pair)
-                    break
-            elif pair[side] in group:
-                result.add(pair)
-                break
+    names = _expandReferenceGroupNameInNames(subExpression, _getSideNames(pairList, side), groups)
+    return _getPairsWithSideIn(pairList, side, names)
+
+
+def _expandReferenceGroupNameInNames(subExpression, names, groups):
+    match = _compilePattern(subExpression["pattern"])
+    referenceGlyphs = set()
+    for groupName in groups.metricsMachine.getReferenceGroupNames():
+        if match(groupName):
+            referenceGlyphs.update(groups.metricsMachine.getReferenceGroup(groupName))
+    result = set()
+    if not referenceGlyphs:
+        return result
+    for name in names:
+        if name.startswith("public.kern"):
+            # a kerning group matches if it shares
+            # a glyph with a matched reference group
+            if name in groups and not referenceGlyphs.isdisjoint(groups[name]):
+                result.add(name)
+        elif name in referenceGlyphs:
+            result.add(name)
     return result
 
 
@@ -642,61 +778,31 @@ def _expandVariableInPairs(subExpression, pairList, font, side):
     kerning = font.kerning
     if pattern == "all":
         result = set(kerning.keys())
-    elif pattern == "glyph":
-        result = set([pair for pair in pairList if not pair[side].startswith("public.kern1") and not pair[side].startswith("public.kern2")])
-    elif pattern == "group":
-        result = set([pair for pair in pairList if pair[side].startswith("public.kern1") or pair[side].startswith("public.kern2")])
     elif pattern == "exception":
-        result = set([pair for pair in pairList if kerning.metricsMachine.getPairType(pair)[side] == "exception"])
+        getPairType = kerning.metricsMachine.getPairType
+        result = set([pair for pair in pairList if getPairType(pair)[side] == "exception"])
+    else:
+        names = _expandVariableInNames(subExpression, _getSideNames(pairList, side))
+        result = _getPairsWithSideIn(pairList, side, names)
     return result
 
 
-# evaluation
-
-# glyph and group list
+def _expandVariableInNames(subExpression, names):
+    """
+    Expand the glyph and group variables. The all and
+    exception variables depend on the whole pair so they
+    can't be expanded from the names on one side.
+    """
+    pattern = subExpression["pattern"]
+    groupPrefixes = ("public.kern1", "public.kern2")
+    if pattern == "glyph":
+        result = set([name for name in names if not name.startswith(groupPrefixes)])
+    elif pattern == "group":
+        result = set([name for name in names if name.startswith(groupPrefixes)])
+    return result
 
-def _evaluateGlyphExpression(expression, glyphList, groups=None, expandGroups=False):
-    # store the incoming orders
-    glyphOrder = list(glyphList)
-    groupOrder = list(sorted(groups.keys()))
-    # tokenize
-    expression = _tokenize(expression)
-    # evaluate each sub-expression
-    result = None
-    for subExpression in expression:
-        tp = subExpression["type"]
-        operator = subExpression["operator"]
-        v = None
-        if tp == "glyphName":
-            v = _expandGlyphName(subExpression, glyphList)
-        elif tp == "groupName":
-            v = _expandGroupName(subExpression, groups)
-            if expandGroups:
-                e = set([])
-                for groupName in v:
-                    e = e | groups[groupName]
-                v = e
-        elif tp == "groupLookup":
-            v = _expandGroupLookup(subExpression, groups)
-            if expandGroups:
-                e = set([])
-                for groupName in v:
-                    e = e | groups[groupName]
-                v = e
-        elif tp == "referenceGroupName":
-            v = _expandReferenceGroupName(subExpression, groups)
-            e = set([])
-            for groupName in v:
-                e = e | set(groups.metricsMachine.getReferenceGroup(groupName))
-            v = e
-        result = _handleOperator(operator, result, v)
-    # order the result
-    final = []
-    if groups:
-        final += [groupName for groupName in groupOrder if groupName in result]
-    final += [glyphName for glyphName in glyphOrder if glyphName in result]
-    return final
 
+# evaluation
 
 # ===========
 # = kerning =
@@ -720,56 +826,87 @@ def _evaluateKerningExpression(expression, pairList, font, allowVariables):
     >>> sorted(result)
     [('B', 'public.kern2.A')]
     """
-    # store the incoming order
-    pairOrder = list(pairList)
-    # break up the parts
-    parts, partCount = _splitKerningExpression(expression)
-    findOverlap = partCount == 2
-    left, right = parts
-    # tokenize
-    left = _tokenize(left)
-    right = _tokenize(right)
-    # evaluate each side
-    leftResults = _evaluateKerningExpressionSide(left, pairList, font, 0, allowVariables)
-    rightResults = _evaluateKerningExpressionSide(right, pairList, font, 1, allowVariables)
-    # combine
-    if findOverlap:
-        results = leftResults & rightResults
-    else:
-        results = leftResults | rightResults
-    # reorder
-    final = []
-    for pair in pairOrder:
-        if pair in results:
-            final.append(pair)
-    # return
-    return final
+    return compileExpression(expression).searchKerningPairList(pairList, font, allowVariables)
 
 
 def _evaluateKerningExpressionSide(expression, pairList, font, side, allowVariables):
-    pairList = set(pairList)
-    # expand each sub-expression
-    result = None
-    for subExpression in expression:
+    """
+    Evaluate the tokenized expression for one side of the pairs
+    in pairList. If every sub-expression can be answered from
+    the name on this side the matching names are returned with
+    None. Otherwise None is returned with a function that tests
+    a pair.
+
+    >>> font = _setupTestFont()
+    >>> pairs = list(font.kerning.keys())
+    >>> names, test = _evaluateKerningExpressionSide(_tokenize("A] or B"), pairs, font, 0, True)
+    >>> sorted(names), test
+    (['B', 'public.kern1.A'], None)
+    >>> names, test = _evaluateKerningExpressionSide(_tokenize("exception"), pairs, font, 0, True)
+    >>> names, sorted([pair for pair in pairs if test(pair)])
+    (None, [('B', 'public.kern2.A')])
+    """
+    names = _getSideNames(pairList, side)
+    terms = []
+    testPairs = False
+    for subExpression in expression or ():
         tp = subExpression["type"]
         operator = subExpression["operator"]
         # expand
         v = None
-        if tp == "variable" and allowVariables:
-            v = _expandVariableInPairs(subExpression, pairList, font, side)
+        if tp == "variable":
+            if allowVariables:
+                pattern = subExpression["pattern"]
+                if pattern in ("all", "exception"):
+                    testPairs = True
+                    terms.append((operator, pattern, None))
+                    continue
+                v = _expandVariableInNames(subExpression, names)
         elif tp == "glyphName":
-            v = _expandGlyphNameInPairs(subExpression, pairList, side)
+            v = _expandGlyphName(subExpression, names)
         elif tp == "groupName":
-            v = _expandGroupNameInPairs(subExpression, pairList, side)
+            v = _expandGroupNameInNames(subExpression, names)
         elif tp == "groupLookup":
-            v = _expandGroupLookupInPairs(subExpression, pairList, font.groups, side)
+            v = names & _expandGroupLookup(subExpression, font.groups)
         elif tp == "referenceGroupName":
-            v = _expandReferenceGroupNameInPairs(subExpression, pairList, font.groups, side)
-        # handle the operator
+            v = _expandReferenceGroupNameInNames(subExpression, names, font.groups)
+        if v is not None:
+            terms.append((operator, None, v))
+    if testPairs:
+        return None, _makePairTest(terms, font, side)
+    # handle the operators
+    result = None
+    for operator, variable, v in terms:
         result = _handleOperator(operator, result, v)
     if result is None:
         result = set([])
-    return result
+    return result, None
+
+
+def _makePairTest(terms, font, side):
+    kerning = font.kerning
+    getPairType = kerning.metricsMachine.getPairType
+
+    def test(pair):
+        result = None
+        for operator, variable, v in terms:
+            if variable == "all":
+                matched = pair in kerning
+            elif variable == "exception":
+                matched = getPairType(pair)[side] == "exception"
+            else:
+                matched = pair[side] in v
+            if result is None:
+                result = matched
+            elif operator == "not":
+                result = result and not matched
+            elif operator == "or":
+                result = result or matched
+            elif operator == "and":
+                result = result and matched
+        return bool(result)
+
+    return test
 
 
 # ==========
@@ -778,6 +915,8 @@ def _evaluateKerningExpressionSide(expression, pairList, font, side, allowVariab
 
 
 def _handleOperator(operator, old, new):
+    if new is None:
+        return old
     if old is None:
         return new
     else: